@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.database import get_db
 from app.security.auth import get_current_user
 from app.services.activity_log_service import ActivityLogService
+from app.services.log_retention_service import log_retention
 from app.models.user import User
 from typing import Optional
 from datetime import datetime
@@ -127,41 +128,8 @@ async def get_activity_stats(
     Son X saatteki kategori ve sonuç bazlı istatistikler
     """
     try:
-        # Son X saatteki tüm logları al
-        logs = await ActivityLogService.get_recent_activity(
-            db=db,
-            limit=10000,  # Yeterince büyük limit
-            hours=hours,
-        )
-
-        # İstatistikleri hesapla
-        stats = {
-            "total": len(logs),
-            "by_category": {},
-            "by_success": {},
-            "by_action": {},
-        }
-
-        for log in logs:
-            # Kategoriye göre
-            category = log.get('category', 'unknown')
-            stats['by_category'][category] = stats['by_category'].get(category, 0) + 1
-
-            # Sonuca göre
-            success = log.get('success', 'unknown')
-            stats['by_success'][success] = stats['by_success'].get(success, 0) + 1
-
-            # Aksiyona göre (top 10)
-            action = log.get('action', 'unknown')
-            stats['by_action'][action] = stats['by_action'].get(action, 0) + 1
-
-        # Top 10 aksiyon
-        top_actions = dict(sorted(
-            stats['by_action'].items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10])
-        stats['by_action'] = top_actions
+        # Sayaçlar veritabanında GROUP BY ile hesaplanır (satır yüklenmez)
+        stats = await ActivityLogService.get_stats(db=db, hours=hours, top_actions=10)
 
         return {
             "success": True,
@@ -207,3 +175,16 @@ async def cleanup_old_logs(
     except Exception as e:
         logger.error(f"Error cleaning up old logs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/activity-logs/retention")
+async def get_retention_status(
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Log retention politikalarını ve son çalıştırma / ilerleme bilgisini getir
+    """
+    return {
+        "success": True,
+        "data": log_retention.stats(),
+    }
@@ -16,7 +16,7 @@ from app.models.user import User
 from app.models.ip_pool import IPPool, IPAllocation
 from app.models.peer_template import PeerTemplate
 from app.models.activity_log import ActivityLog
-from app.services.ip_pool_service import IPPoolService
+from app.services.dashboard_summary_service import dashboard_summary
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -41,80 +41,10 @@ async def get_dashboard_stats(
         - Son 24 saatteki aktivite sayısı
     """
     try:
-        stats = {}
-
-        # IP Pool istatistikleri
-        pools = await IPPoolService.get_pools(db)
-        total_pools = len(pools)
-        total_ips = 0
-        allocated_ips = 0
-
-        for pool in pools:
-            pool_stats = await IPPoolService.get_pool_stats(db, pool.id)
-            total_ips += pool_stats.get('total_ips', 0)
-            allocated_ips += pool_stats.get('allocated', 0)
-
-        available_ips = total_ips - allocated_ips
-        ip_usage_percent = (allocated_ips / total_ips * 100) if total_ips > 0 else 0
-
-        stats['ip_pool'] = {
-            'total_pools': total_pools,
-            'total_ips': total_ips,
-            'allocated_ips': allocated_ips,
-            'available_ips': available_ips,
-            'usage_percent': round(ip_usage_percent, 2)
-        }
-
-        # Peer Template istatistikleri
-        result = await db.execute(select(func.count(PeerTemplate.id)))
-        total_templates = result.scalar() or 0
-
-        # En çok kullanılan template
-        result = await db.execute(
-            select(PeerTemplate)
-            .order_by(desc(PeerTemplate.usage_count))
-            .limit(1)
-        )
-        most_used_template = result.scalar_one_or_none()
-
-        stats['templates'] = {
-            'total_templates': total_templates,
-            'most_used_template': {
-                'name': most_used_template.name if most_used_template else None,
-                'usage_count': most_used_template.usage_count if most_used_template else 0
-            } if most_used_template else None
-        }
-
-        # Kullanıcı istatistikleri
-        result = await db.execute(select(func.count(User.id)))
-        total_users = result.scalar() or 0
-
-        result = await db.execute(
-            select(func.count(User.id)).where(User.is_active == True)
-        )
-        active_users = result.scalar() or 0
-
-        stats['users'] = {
-            'total_users': total_users,
-            'active_users': active_users
-        }
-
-        # Aktivite istatistikleri (son 24 saat)
-        twenty_four_hours_ago = utcnow() - timedelta(hours=24)
-        result = await db.execute(
-            select(func.count(ActivityLog.id)).where(
-                ActivityLog.created_at >= twenty_four_hours_ago
-            )
-        )
-        activities_24h = result.scalar() or 0
-
-        stats['activity'] = {
-            'last_24h': activities_24h
-        }
-
+        summary = await dashboard_summary.get(db)
         return {
             'success': True,
-            'data': stats
+            'data': summary['stats']
         }
 
     except Exception as e:
@@ -134,21 +64,23 @@ async def get_ip_pool_usage(
         Her pool için: isim, toplam IP, tahsis edilmiş IP, kullanılabilir IP, yüzde
     """
     try:
-        pools = await IPPoolService.get_pools(db, is_active=True)
-        usage_data = []
-
-        for pool in pools:
-            pool_stats = await IPPoolService.get_pool_stats(db, pool.id)
-            usage_data.append({
-                'pool_id': pool.id,
-                'pool_name': pool.name,
-                'interface_name': pool.interface_name,
-                'subnet': pool.subnet,
-                'total_ips': pool_stats.get('total_ips', 0),
-                'allocated': pool_stats.get('allocated', 0),
-                'available': pool_stats.get('available', 0),
-                'usage_percent': pool_stats.get('usage_percent', 0)
-            })
+        summary = await dashboard_summary.get(db)
+        usage_data = [
+            {
+                'pool_id': pool['pool_id'],
+                'pool_name': pool['pool_name'],
+                'interface_name': pool['interface_name'],
+                'subnet': pool['subnet'],
+                'ip_version': pool['ip_version'],
+                'total_ips': pool['total_ips'],
+                'allocated': pool['allocated'],
+                'in_use': pool['in_use'],
+                'available': pool['available'],
+                'usage_percent': pool['usage_percent']
+            }
+            for pool in summary['pool_usage']
+            if pool['is_active']
+        ]
 
         return {
             'success': True,
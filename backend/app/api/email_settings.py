@@ -9,6 +9,7 @@ from app.database.database import get_db
 from app.security.auth import get_current_user, require_admin
 from app.models.user import User
 from app.services.email_service import EmailService
+from app.services.notification_dispatcher import notification_dispatcher
 from app.models.email_settings import EmailSettings, EmailLog
 from sqlalchemy import select, desc
 import logging
@@ -117,6 +118,7 @@ async def save_email_settings(
         )
         
         await db.commit()
+        notification_dispatcher.invalidate_settings("email")
         
         return {
             "success": True,
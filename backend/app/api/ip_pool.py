@@ -435,7 +435,7 @@ async def sync_pool_with_mikrotik(
     """
     try:
         from app.mikrotik.connection import mikrotik_conn
-        import ipaddress
+        from app.services.ip_allocation_index import pool_contains
 
         # Pool'u al
         pool = await IPPoolService.get_pool(db, pool_id)
@@ -447,9 +447,6 @@ async def sync_pool_with_mikrotik(
         # MikroTik'ten peer'ları al
         peers = await mikrotik_conn.get_wireguard_peers(pool.interface_name)
 
-        start_ip = ipaddress.ip_address(pool.start_ip)
-        end_ip = ipaddress.ip_address(pool.end_ip)
-
         synced_count = 0
         skipped_count = 0
 
@@ -470,10 +467,8 @@ async def sync_pool_with_mikrotik(
                     ip_only = addr
 
                 try:
-                    ip_obj = ipaddress.ip_address(ip_only)
-
-                    # IP pool aralığında mı?
-                    if start_ip <= ip_obj <= end_ip:
+                    # IP pool aralığında mı? (farklı IP sürümündeki adresler atlanır)
+                    if pool_contains(pool, ip_only):
                         # Bu IP için zaten allocation var mı?
                         existing = await IPPoolService.get_allocation_by_peer(db, str(peer_id))
 
@@ -8,6 +8,8 @@ from typing import Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.mikrotik.connection import mikrotik_conn
+from app.utils.cache import mikrotik_cache
+from app.services.interface_sampler import interface_sampler
 from app.security.auth import get_current_user
 from app.models.user import User
 from app.models.settings import MikroTikSettings
@@ -258,7 +260,9 @@ async def get_connection_status(
                 "username": db_settings.username,
                 "password": "***" if db_settings.password else "",  # Şifreyi gizle
                 "use_tls": db_settings.use_tls,
-                "configured": bool(db_settings.host and db_settings.username)
+                "configured": bool(db_settings.host and db_settings.username),
+                "session_pool": mikrotik_conn.get_pool_stats(),
+                "cache": mikrotik_cache.stats()
             }
         else:
             # Veritabanında yoksa runtime ayarlarından oku
@@ -271,7 +275,9 @@ async def get_connection_status(
                 "username": mikrotik_conn.username,
                 "password": password_display,  # Şifreyi gizle
                 "use_tls": mikrotik_conn.use_tls,
-                "configured": bool(mikrotik_conn.host and mikrotik_conn.username)
+                "configured": bool(mikrotik_conn.host and mikrotik_conn.username),
+                "session_pool": mikrotik_conn.get_pool_stats(),
+                "cache": mikrotik_cache.stats()
             }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Durum bilgisi alınamadı: {str(e)}")
@@ -387,6 +393,7 @@ async def get_wan_traffic(
 ) -> Dict[str, Any]:
     """
     WAN interface'in trafik istatistiklerini getirir
+    Veriler paylaşımlı interface örnekleyiciden okunur (istek başına router sorgusu yapılmaz)
     
     Returns:
         WAN interface RX/TX bytes ve rate bilgileri
@@ -396,28 +403,10 @@ async def get_wan_traffic(
         if not await mikrotik_conn.ensure_connected():
             raise HTTPException(status_code=503, detail="MikroTik router'a bağlanılamadı")
 
-        # Tüm interface'leri al (generic interface, traffic stats dahil)
-        all_interfaces = await mikrotik_conn.execute_command("/interface", "print")
-
-        logger.info(f"MikroTik'ten alınan interface sayısı: {len(all_interfaces)}")
-
-        # Debug: Tüm interface'leri logla
-        for iface in all_interfaces:
-            logger.info(f"  Interface: {iface.get('name')} - type: {iface.get('type')}, comment: {iface.get('comment', 'N/A')}, running: {iface.get('running')}")
-
-        # WAN interface'i bul - SADECE COMMENT'e bakarak
-        wan_interface_name = None
-
-        # Comment'te "WAN" yazan interface'i bul (case-insensitive)
-        for iface in all_interfaces:
-            comment = iface.get('comment', '').lower()
-            if 'wan' in comment:
-                wan_interface_name = iface.get('name')
-                logger.info(f"✅ WAN interface bulundu (comment ile): {wan_interface_name}, comment: {iface.get('comment')}")
-                break
+        counters = await interface_sampler.counters()
+        wan_interface_name = interface_sampler.wan_interface_name
 
         if not wan_interface_name:
-            logger.warning("WAN interface bulunamadı, hiç ethernet interface yok")
             return {
                 "success": False,
                 "message": "WAN interface bulunamadı",
@@ -430,12 +419,8 @@ async def get_wan_traffic(
                 }
             }
 
-        logger.info(f"WAN interface seçildi: {wan_interface_name}")
-
-        # Seçilen WAN interface'in detaylarını bul
-        wan_interface = next((iface for iface in all_interfaces if iface.get('name') == wan_interface_name), None)
-
-        if not wan_interface:
+        wan_counters = counters.get(wan_interface_name)
+        if not wan_counters:
             logger.error(f"WAN interface detayları bulunamadı: {wan_interface_name}")
             return {
                 "success": False,
@@ -449,29 +434,26 @@ async def get_wan_traffic(
                 }
             }
 
-        logger.info(f"WAN interface detayları: {wan_interface}")
-
-        # Trafik bilgilerini parse et (interface print içinde rx-byte, tx-byte var)
-        rx_bytes = int(wan_interface.get('rx-byte', 0) or 0)
-        tx_bytes = int(wan_interface.get('tx-byte', 0) or 0)
-
-        # NOT: Rate hesaplaması frontend'de yapılacak (bytes farkı / zaman farkı)
-        # MikroTik API'de monitor-traffic her versiyonda desteklenmiyor
+        rx_bytes = wan_counters["rx_bytes"]
+        tx_bytes = wan_counters["tx_bytes"]
+        latest = await interface_sampler.latest()
+        wan_rates = (latest.get("wan") if latest else None) or {}
 
-        result = {
+        return {
             "success": True,
             "data": {
                 "interface_name": wan_interface_name,
                 "rx_bytes": rx_bytes,
                 "tx_bytes": tx_bytes,
                 "total_bytes": rx_bytes + tx_bytes,
-                "running": wan_interface.get('running', 'false') == 'true'
+                "rx_rate": wan_rates.get("rx_rate", 0),
+                "tx_rate": wan_rates.get("tx_rate", 0),
+                "running": wan_counters["running"],
+                # Hız örneği veya sayaçlar eskiyse True; sayaçlar counter_interval aralığıyla yenilenir
+                "stale": bool(latest and latest.get("stale")) or interface_sampler.counters_stale(),
+                "counters_age_seconds": round(interface_sampler.counters_age() or 0.0, 1)
             }
         }
-
-        logger.info(f"WAN Traffic sonuç: interface={wan_interface_name}, rx={rx_bytes}, tx={tx_bytes}")
-
-        return result
     except HTTPException:
         raise
     except Exception as e:
@@ -480,3 +462,23 @@ async def get_wan_traffic(
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"WAN trafik bilgisi alınamadı: {str(e)}")
 
+
+@router.get("/traffic-history")
+async def get_traffic_history(
+    seconds: Optional[float] = None,
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Interface örnekleyicinin bellekteki son trafik örneklerini getirir
+    (WAN ve WireGuard hızları, WebSocket traffic_update ile aynı format)
+
+    Args:
+        seconds: Sadece son N saniyenin örnekleri (varsayılan: tüm tampon)
+    """
+    await interface_sampler.latest()
+    return {
+        "success": True,
+        "data": interface_sampler.history(seconds),
+        "sampler": interface_sampler.stats()
+    }
+
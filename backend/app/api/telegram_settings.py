@@ -14,6 +14,7 @@ from app.models.user import User
 from app.models.telegram_settings import TelegramSettings
 from app.models.telegram_notification_log import TelegramNotificationLog
 from app.services.telegram_notification_service import TelegramNotificationService
+from app.services.notification_dispatcher import notification_dispatcher
 from sqlalchemy import func
 import logging
 
@@ -105,6 +106,7 @@ async def update_telegram_settings(
 
         await db.commit()
         await db.refresh(settings)
+        notification_dispatcher.invalidate_settings("telegram")
 
         logger.info(f"✅ Telegram ayarları güncellendi (enabled={settings.enabled})")
 
@@ -10,7 +10,6 @@ from app.security.auth import get_current_user
 from app.models.user import User
 from app.database.database import get_db
 from app.services.traffic_service import (
-    save_traffic_log,
     get_traffic_logs,
     get_traffic_summary
 )
@@ -19,6 +18,8 @@ from app.services.peer_traffic_service import (
     get_peer_traffic_logs,
     get_peer_traffic_summary
 )
+from app.services.traffic_sampler import traffic_sampler
+from app.services.traffic_rollup_service import traffic_rollup_engine, RAW_PERIOD
 from app.mikrotik.connection import mikrotik_conn
 import logging
 
@@ -297,57 +298,27 @@ async def get_yearly_traffic(
 
 @router.post("/record")
 async def record_traffic(
-    period_type: str = Query(..., description="Periyot tipi: hourly, daily, monthly, yearly"),
+    period_type: str = Query(RAW_PERIOD, description="Periyot tipi: sadece raw (özet katmanları rollup ile güncellenir)"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
-    Mevcut trafik kullanımını kaydeder
+    Mevcut trafik kullanımını ham örnek olarak kaydeder
     """
+    if period_type != RAW_PERIOD:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sadece '{RAW_PERIOD}' örnek kaydedilebilir; saatlik/günlük/aylık/yıllık veriler rollup ile oluşturulur"
+        )
+
     try:
         # MikroTik bağlantısını kontrol et
         await mikrotik_conn.ensure_connected()
         
-        # Tüm interface'leri al
-        interfaces = await mikrotik_conn.get_wireguard_interfaces()
-        total_rx_bytes = 0
-        total_tx_bytes = 0
-        interface_count = len(interfaces)
-        peer_count = 0
-        active_peer_count = 0
-        
-        # Her interface için peer'ları al ve trafik topla
-        for iface in interfaces:
-            interface_name = iface.get('name') or iface.get('.id')
-            if interface_name:
-                try:
-                    peers = await mikrotik_conn.get_wireguard_peers(interface_name)
-                    peer_count += len(peers)
-                    
-                    for peer in peers:
-                        # Aktif peer sayısını kontrol et
-                        disabled = peer.get('disabled', 'true')
-                        if disabled == 'false' or disabled is False:
-                            active_peer_count += 1
-                        
-                        # Trafik verilerini topla
-                        rx_bytes = int(peer.get('rx-bytes') or peer.get('rx') or 0)
-                        tx_bytes = int(peer.get('tx-bytes') or peer.get('tx') or 0)
-                        total_rx_bytes += rx_bytes
-                        total_tx_bytes += tx_bytes
-                except Exception as e:
-                    logger.error(f"Peer trafik verisi alınamadı ({interface_name}): {e}")
-        
-        # Trafik log kaydı oluştur
-        log = await save_traffic_log(
-            db=db,
-            period_type=period_type,
-            total_rx_bytes=total_rx_bytes,
-            total_tx_bytes=total_tx_bytes,
-            interface_count=interface_count,
-            peer_count=peer_count,
-            active_peer_count=active_peer_count
-        )
+        # Son örnekten bu yana kullanım (delta) ham örnek olarak kaydedilir,
+        # tüm özet katmanları rollup ile güncellenir
+        log = await traffic_sampler.sample(RAW_PERIOD, db)
+        await traffic_rollup_engine.run(db)
         
         return {
             "success": True,
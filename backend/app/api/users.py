@@ -12,6 +12,7 @@ from app.database.database import get_db
 from sqlalchemy import select
 from passlib.context import CryptContext
 from app.utils.activity_logger import log_user_action
+from app.services.dashboard_summary_service import dashboard_summary
 import logging
 
 logger = logging.getLogger(__name__)
@@ -283,6 +284,7 @@ async def create_user(
         db.add(new_user)
         await db.commit()
         await db.refresh(new_user)
+        dashboard_summary.invalidate()
         
         logger.info(f"Yeni kullanıcı oluşturuldu: {new_user.username} (Admin: {new_user.is_admin})")
         
@@ -405,6 +407,7 @@ async def delete_user(
         # Kullanıcıyı sil
         db.delete(user)
         await db.commit()
+        dashboard_summary.invalidate()
 
         logger.info(f"Kullanıcı silindi: {user.username} (ID: {user_id})")
         
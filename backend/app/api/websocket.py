@@ -7,16 +7,19 @@ from typing import Optional, Dict, Set
 import asyncio
 import logging
 
-from app.websocket.connection_manager import manager
+from app.websocket.connection_manager import manager, POLICY_DROP_OLDEST
 from app.security.auth import get_current_user_ws, WebSocketException
 from app.database.database import get_db
-from app.mikrotik.connection import mikrotik_conn
+from app.services.interface_sampler import interface_sampler
+from app.services.peer_snapshot_store import peer_snapshot_store
 
 logger = logging.getLogger(__name__)
 
-# WAN Traffic için aktif bağlantılar ve streaming task
+# Monitoring döngüsünün yayınladığı peer farkları /ws/wireguard/{interface} abonelerine iletilir
+peer_snapshot_store.subscribe(manager.broadcast_peer_update)
+
+# WAN Traffic için aktif bağlantılar (örnekler paylaşımlı interface örnekleyiciden gelir)
 wan_traffic_clients: Set[WebSocket] = set()
-wan_traffic_task: Optional[asyncio.Task] = None
 wan_traffic_lock = asyncio.Lock()
 
 router = APIRouter()
@@ -25,26 +28,61 @@ router = APIRouter()
 @router.websocket("/ws/wireguard/{interface_name}")
 async def websocket_endpoint(
     websocket: WebSocket,
-    interface_name: str
+    interface_name: str,
+    token: Optional[str] = None
 ):
     """
     WireGuard interface için WebSocket endpoint'i
     Peer değişikliklerini gerçek zamanlı olarak istemcilere iletir
+    Bağlantı açılınca bellekteki peer snapshot'ı gönderilir, sonrasında
+    her monitoring turunda sadece farklar ("peer_diff") gelir
+
+    Message Types (Server → Client):
+        - {"type": "peer_snapshot", "interface": "...", "data": [...]} - Tam peer listesi
+        - {"type": "peer_diff", "interface": "...", "generation": n, "data": {
+              "added": [...], "removed": [id, ...], "changed": {id: {alan: değer}},
+              "counters": {id: {rx/tx sayaç alanı: değer}},
+              "handshake": [{"peer_id", "is_online", "event_time"}],
+              "rates": {id: {"rx_rate", "tx_rate"}}, "interval": saniye}}
+        - {"type": "pong"} - Heartbeat yanıtı
 
     Args:
         websocket: WebSocket bağlantısı
         interface_name: WireGuard interface adı (wg0, wg1, vb.)
+        token: JWT access token (query parameter: ?token=xxx)
     """
+    # Önce kabul edilir; böylece kimlik doğrulama hatası istemciye 1008 olarak ulaşır
+    # (accept'ten önce kapatılan bağlantı tarayıcıda 1006 görünür ve istemci tekrar dener)
+    await websocket.accept()
+
+    # Peer verisi gönderildiği için kimlik doğrulaması zorunlu
+    if not token:
+        await websocket.close(code=1008, reason="Token required")
+        logger.warning("WireGuard WebSocket bağlantısı reddedildi: token yok")
+        return
+
+    async for db in get_db():
+        try:
+            await get_current_user_ws(websocket, token, db)
+        except WebSocketException as e:
+            logger.error(f"WebSocket authentication failed: {e.reason}")
+            await websocket.close(code=e.code, reason=e.reason)
+            return
+        break
+
     await manager.connect(websocket, interface_name)
 
     try:
+        # İlk durum: bellekteki snapshot (router'a gidilmez)
+        await manager.send_peer_snapshot(websocket, interface_name)
+
         # Bağlantı açık kaldığı sürece bekle
         # İstemciden gelen mesajları dinle (ping/pong için)
         while True:
             data = await websocket.receive_text()
             # Ping mesajına pong ile cevap ver
             if data == "ping":
-                await websocket.send_json({"type": "pong"})
+                manager.send(websocket, {"type": "pong"})
     except WebSocketDisconnect:
         manager.disconnect(websocket, interface_name)
         logger.info(f"WebSocket bağlantısı kapatıldı: {interface_name}")
@@ -95,8 +133,8 @@ async def notifications_websocket(
             # Bağlantıyı kaydet
             await manager.connect_user(websocket, user.id)
 
-            # Bağlantı başarılı mesajı gönder
-            await websocket.send_json({
+            # Bağlantı başarılı mesajı gönder (bildirimlerle aynı kuyruk, sıra korunur)
+            manager.send(websocket, {
                 "type": "connected",
                 "message": "Successfully connected to notification stream",
                 "user_id": user.id,
@@ -114,17 +152,15 @@ async def notifications_websocket(
 
                     # Ping/pong heartbeat
                     if data == "ping":
-                        await websocket.send_json({"type": "pong"})
+                        manager.send(websocket, {"type": "pong"})
                     elif data == "pong":
                         # Client'tan pong aldık, sessizce devam et
                         pass
 
                 except asyncio.TimeoutError:
                     # 60 saniyede mesaj gelmedi, keepalive ping gönder
-                    try:
-                        await websocket.send_json({"type": "ping"})
-                    except Exception:
-                        # Ping gönderilemedi, bağlantı kopmuş
+                    if not manager.send(websocket, {"type": "ping"}):
+                        # Gönderim kuyruğu kapanmış, bağlantı kopmuş
                         break
 
         except WebSocketDisconnect:
@@ -147,172 +183,17 @@ async def notifications_websocket(
         break
 
 
-async def wan_traffic_broadcaster():
+async def broadcast_to_wan_clients(message: dict):
     """
-    WAN ve WireGuard traffic verilerini MikroTik monitor-traffic komutuyla alıp broadcast eden background task.
-    İlk client bağlandığında başlar, son client ayrıldığında durur.
+    WAN traffic client'larına mesaj gönder
+    Mesaj bir kez serialize edilip client kuyruklarına bırakılır, yavaş client broadcaster'ı bekletmez
     """
     global wan_traffic_clients
 
-    logger.info("Traffic broadcaster started")
-    wan_interface_name = None
-    wg_interface_names = []
-
-    while wan_traffic_clients:
-        try:
-            # MikroTik'ten traffic verisi al
-            if not await mikrotik_conn.ensure_connected():
-                await broadcast_to_wan_clients({
-                    "type": "error",
-                    "message": "MikroTik bağlantısı kurulamadı"
-                })
-                await asyncio.sleep(5)
-                continue
-
-            # Interface'leri bul (sadece bir kez)
-            if not wan_interface_name or not wg_interface_names:
-                # Tüm interface'leri al (WAN için)
-                all_interfaces = await mikrotik_conn.execute_command("/interface", "print")
-                for iface in all_interfaces:
-                    iface_name = iface.get('name', '')
-                    comment = iface.get('comment', '').lower()
-
-                    # WAN interface (comment'te WAN yazan)
-                    if 'wan' in comment and not wan_interface_name:
-                        wan_interface_name = iface_name
-                        logger.info(f"WAN interface bulundu: {wan_interface_name}")
-
-                # WireGuard interface'lerini ayrı endpoint'ten al
-                try:
-                    wg_interfaces = await mikrotik_conn.execute_command("/interface/wireguard", "print")
-                    for wg in wg_interfaces:
-                        wg_name = wg.get('name', '')
-                        if wg_name and wg_name not in wg_interface_names:
-                            wg_interface_names.append(wg_name)
-                            logger.info(f"WireGuard interface bulundu: {wg_name}")
-                except Exception as e:
-                    logger.warning(f"WireGuard interface listesi alınamadı: {e}")
-
-                if not wan_interface_name:
-                    logger.warning("WAN interface bulunamadı")
-
-            # Monitor edilecek interface listesi oluştur
-            interfaces_to_monitor = []
-            if wan_interface_name:
-                interfaces_to_monitor.append(wan_interface_name)
-            interfaces_to_monitor.extend(wg_interface_names)
-
-            if not interfaces_to_monitor:
-                await broadcast_to_wan_clients({
-                    "type": "error",
-                    "message": "İzlenecek interface bulunamadı"
-                })
-                await asyncio.sleep(5)
-                continue
-
-            # MikroTik monitor-traffic komutu ile anlık rate al
-            loop = asyncio.get_event_loop()
-
-            def get_monitor_traffic():
-                """MikroTik monitor-traffic komutunu çalıştır"""
-                try:
-                    api = mikrotik_conn.api
-                    if api is None:
-                        return None
-
-                    resource = api.get_resource('/interface')
-                    # Virgülle ayrılmış interface listesi
-                    interface_str = ','.join(interfaces_to_monitor)
-                    result = resource.call('monitor-traffic', {
-                        'interface': interface_str,
-                        'once': ''
-                    })
-                    return list(result) if result else None
-                except Exception as e:
-                    logger.error(f"monitor-traffic error: {e}")
-                    return None
-
-            traffic_data = await loop.run_in_executor(None, get_monitor_traffic)
-            current_time = asyncio.get_event_loop().time()
-
-            if traffic_data and len(traffic_data) > 0:
-                wan_data = None
-                wg_total_rx_bps = 0
-                wg_total_tx_bps = 0
-                wg_interfaces_data = []
-
-                for data in traffic_data:
-                    iface_name = data.get('name', '')
-                    rx_rate_bps = int(data.get('rx-bits-per-second', 0) or 0)
-                    tx_rate_bps = int(data.get('tx-bits-per-second', 0) or 0)
-
-                    if iface_name == wan_interface_name:
-                        wan_data = {
-                            "interface_name": iface_name,
-                            "rx_rate": round(rx_rate_bps / 8, 2),
-                            "tx_rate": round(tx_rate_bps / 8, 2),
-                            "rx_rate_bps": rx_rate_bps,
-                            "tx_rate_bps": tx_rate_bps,
-                            "running": True
-                        }
-                    elif iface_name in wg_interface_names:
-                        wg_total_rx_bps += rx_rate_bps
-                        wg_total_tx_bps += tx_rate_bps
-                        wg_interfaces_data.append({
-                            "name": iface_name,
-                            "rx_rate_bps": rx_rate_bps,
-                            "tx_rate_bps": tx_rate_bps
-                        })
-
-                # Broadcast
-                await broadcast_to_wan_clients({
-                    "type": "traffic_update",
-                    "data": {
-                        "wan": wan_data,
-                        "wireguard": {
-                            "total_rx_rate": round(wg_total_rx_bps / 8, 2),
-                            "total_tx_rate": round(wg_total_tx_bps / 8, 2),
-                            "total_rx_rate_bps": wg_total_rx_bps,
-                            "total_tx_rate_bps": wg_total_tx_bps,
-                            "interfaces": wg_interfaces_data
-                        },
-                        "timestamp": current_time
-                    }
-                })
-            else:
-                # monitor-traffic başarısız, interface'leri sıfırla
-                wan_interface_name = None
-                wg_interface_names = []
-
-            # 500ms bekle
-            await asyncio.sleep(0.5)
-
-        except asyncio.CancelledError:
-            logger.info("Traffic broadcaster cancelled")
-            break
-        except Exception as e:
-            logger.error(f"Traffic broadcaster error: {e}")
-            wan_interface_name = None
-            wg_interface_names = []
-            await asyncio.sleep(2)
-
-    logger.info("Traffic broadcaster stopped")
-
-
-async def broadcast_to_wan_clients(message: dict):
-    """WAN traffic client'larına mesaj gönder"""
-    global wan_traffic_clients
-
-    disconnected = []
-    for client in wan_traffic_clients:
-        try:
-            await client.send_json(message)
-        except Exception:
-            disconnected.append(client)
-
     # Kopmuş bağlantıları temizle
-    for client in disconnected:
+    for client in manager.fanout(wan_traffic_clients, message):
         wan_traffic_clients.discard(client)
+        manager.release(client)
 
 
 @router.websocket("/ws/wan-traffic")
@@ -334,7 +215,7 @@ async def wan_traffic_websocket(
         - {"type": "error", "message": "..."} - Hata mesajı
         - {"type": "pong"} - Heartbeat yanıtı
     """
-    global wan_traffic_clients, wan_traffic_task
+    global wan_traffic_clients
 
     await websocket.accept()
 
@@ -353,18 +234,23 @@ async def wan_traffic_websocket(
             # Client'ı listeye ekle
             async with wan_traffic_lock:
                 wan_traffic_clients.add(websocket)
+                # Trafik akışı kayıplı olabilir: yetişemeyen client'ın en eski örnekleri atılır
+                manager.register(websocket, POLICY_DROP_OLDEST)
 
-                # İlk client ise broadcaster'ı başlat
-                if wan_traffic_task is None or wan_traffic_task.done():
-                    wan_traffic_task = asyncio.create_task(wan_traffic_broadcaster())
-                    logger.info("WAN Traffic broadcaster task started")
+                # İlk client ise örnekleyiciye abone ol (örnekleyici tek döngüde router'ı sorgular)
+                interface_sampler.subscribe(broadcast_to_wan_clients)
 
             # Bağlantı başarılı mesajı
-            await websocket.send_json({
+            manager.send(websocket, {
                 "type": "connected",
                 "message": "WAN Traffic stream'e bağlandı"
             })
 
+            # Grafik boş başlamasın: tampondaki son örnek hemen gönderilir
+            recent = interface_sampler.history()
+            if recent:
+                manager.send(websocket, {"type": "traffic_update", "data": recent[-1]})
+
             logger.info(f"User {user.username} connected to WAN Traffic stream")
 
             # Bağlantıyı canlı tut
@@ -376,13 +262,11 @@ async def wan_traffic_websocket(
                     )
 
                     if data == "ping":
-                        await websocket.send_json({"type": "pong"})
+                        manager.send(websocket, {"type": "pong"})
 
                 except asyncio.TimeoutError:
                     # Keepalive ping
-                    try:
-                        await websocket.send_json({"type": "ping"})
-                    except Exception:
+                    if not manager.send(websocket, {"type": "ping"}):
                         break
 
         except WebSocketDisconnect:
@@ -400,11 +284,10 @@ async def wan_traffic_websocket(
             # Client'ı listeden çıkar
             async with wan_traffic_lock:
                 wan_traffic_clients.discard(websocket)
+                manager.release(websocket)
 
-                # Son client ayrıldıysa task'ı durdur
-                if not wan_traffic_clients and wan_traffic_task:
-                    wan_traffic_task.cancel()
-                    wan_traffic_task = None
-                    logger.info("WAN Traffic broadcaster stopped (no clients)")
+                # Son client ayrıldıysa aboneliği bırak
+                if not wan_traffic_clients:
+                    interface_sampler.unsubscribe(broadcast_to_wan_clients)
 
         break
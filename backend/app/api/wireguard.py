@@ -3,30 +3,33 @@ WireGuard API endpoint'leri
 Interface ve peer yönetimi için API'ler
 """
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Request
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from app.mikrotik.connection import mikrotik_conn
 from app.security.auth import get_current_user
 from app.models.user import User
 from app.models.peer_key import PeerKey
 from app.database.database import get_db
-from app.services.log_service import create_log  # Greenlet conflict çözüldü - background task ile kullan
+from app.config import settings
+from app.services.log_service import create_log  # Loglar log_sink kuyruğuna alınır, isteği bekletmez
 from app.services.notification_service import (
     notify_peer_created,
     notify_peer_deleted,
     notify_interface_started,
     notify_interface_stopped,
 )
-from sqlalchemy import select, delete
-from app.services.peer_handshake_service import track_peer_status, get_peer_logs, get_peer_status_summary
-from app.utils.qrcode_generator import generate_qrcode
+from sqlalchemy import select, delete, or_
+from app.services.peer_handshake_service import peer_state_tracker, get_peer_logs, get_peer_status_summary
+from app.services.peer_snapshot_store import peer_snapshot_store
+from app.services.interface_sampler import interface_sampler
+from app.services.wireguard_key_pool import wireguard_key_pool
+from app.services.peer_config_service import build_client_config, find_interface, find_peer_key, peer_config_renderer
+from app.utils.qrcode_generator import png_data_uri
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timezone, timedelta
 from app.utils.datetime_helper import utcnow
 from app.websocket.connection_manager import manager as ws_manager
-import subprocess
-import base64
-import os
 import logging
 import re
 
@@ -34,38 +37,6 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-async def update_allocation_background(allocation_id: int, peer_id: str, public_key: str):
-    """
-    Arka planda IP allocation'ı güncelle (bağımsız DB session ile)
-
-    Args:
-        allocation_id: IP Allocation ID
-        peer_id: Peer ID
-        public_key: Public key
-    """
-    try:
-        from app.database.database import AsyncSessionLocal
-        from app.models.ip_pool import IPAllocation
-        from sqlalchemy import update
-
-        async with AsyncSessionLocal() as db:
-            stmt = (
-                update(IPAllocation)
-                .where(IPAllocation.id == allocation_id)
-                .values(
-                    peer_id=str(peer_id),
-                    peer_public_key=public_key
-                )
-            )
-            await db.execute(stmt)
-            await db.commit()
-            logger.info(f"✅ IP allocation güncellendi (arka plan) - Peer ID: {peer_id}, Allocation ID: {allocation_id}")
-    except Exception as e:
-        logger.error(f"⚠️ IP allocation güncellenemedi (arka plan): {e}")
-        import traceback
-        logger.debug(traceback.format_exc())
-
-
 async def send_peer_notification_background(user_id: int, peer_name: str, interface: str, action: str = "created"):
     """
     Arka planda bildirim gönder (bağımsız DB session ile)
@@ -105,8 +76,8 @@ async def send_peer_notification_background(user_id: int, peer_name: str, interf
 
 async def create_activity_log_background(username: str, action: str, details: str = None, ip_address: str = None):
     """
-    Arka planda activity log oluştur (bağımsız DB session ile)
-    Greenlet conflict'i önlemek için background task olarak çalıştırılır
+    Activity log kaydını log yazıcısının kuyruğuna alır
+    Kayıt log_sink tarafından toplu olarak, istek session'ından bağımsız yazılır
 
     Args:
         username: Kullanıcı adı
@@ -115,17 +86,13 @@ async def create_activity_log_background(username: str, action: str, details: st
         ip_address: İstemci IP adresi
     """
     try:
-        from app.database.database import AsyncSessionLocal
-
-        async with AsyncSessionLocal() as db:
-            await create_log(
-                db=db,
-                username=username,
-                action=action,
-                details=details,
-                ip_address=ip_address
-            )
-            logger.debug(f"✅ Activity log oluşturuldu: {action} - {username}")
+        await create_log(
+            None,
+            username=username,
+            action=action,
+            details=details,
+            ip_address=ip_address
+        )
     except Exception as e:
         # Log hatası uygulamayı etkilememeli
         logger.error(f"⚠️ Activity log oluşturulamadı (işlem başarılı): {e}")
@@ -168,46 +135,13 @@ async def update_template_usage_background(template_id: int):
 def generate_wireguard_keys():
     """
     WireGuard özel ve genel anahtar çifti oluşturur
+    Anahtarlar uygulama içinde (X25519) üretilir ve önceden doldurulmuş havuzdan alınır;
+    wg komutu gerekmez
     
     Returns:
         tuple: (private_key, public_key)
     """
-    try:
-        # wg komutu varsa kullan
-        result = subprocess.run(
-            ['wg', 'genkey'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        private_key = result.stdout.strip()
-        
-        # Public key'i oluştur
-        pub_result = subprocess.run(
-            ['wg', 'pubkey'],
-            input=private_key,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        public_key = pub_result.stdout.strip()
-        
-        return private_key, public_key
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        # wg komutu yoksa, Python ile oluştur
-        # WireGuard anahtarları 32 byte (256 bit) random data'dan oluşur
-        private_key_bytes = os.urandom(32)
-        private_key = base64.b64encode(private_key_bytes).decode('utf-8')
-        
-        # Public key, private key'den türetilir (Curve25519)
-        # Bu basit bir yaklaşım, gerçekte Curve25519 kullanılmalı
-        # Ancak WireGuard için wg komutu gerekli
-        # Şimdilik random bir public key oluşturalım
-        public_key_bytes = os.urandom(32)
-        public_key = base64.b64encode(public_key_bytes).decode('utf-8')
-        
-        logger.warning("wg komutu bulunamadı, random anahtarlar oluşturuldu. Gerçek WireGuard anahtarları için wg komutu gerekli.")
-        return private_key, public_key
+    return wireguard_key_pool.take()
 
 
 @router.get("/generate-keys")
@@ -244,17 +178,10 @@ async def generate_keys(
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         
-        # Subprocess hatalarını özel olarak işle
-        if "wg" in error_msg.lower() or "subprocess" in error_msg.lower() or "command not found" in error_msg.lower():
-            raise HTTPException(
-                status_code=500,
-                detail="WireGuard anahtarları oluşturulamadı. Sistemde 'wg' komutu bulunamadı veya çalıştırılamadı. Lütfen WireGuard'ın yüklü olduğundan emin olun."
-            )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Anahtarlar oluşturulamadı: {error_msg}"
-            )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Anahtarlar oluşturulamadı: {error_msg}"
+        )
 
 
 class PeerAddRequest(BaseModel):
@@ -307,29 +234,12 @@ async def get_interfaces(
         await mikrotik_conn.ensure_connected()
         interfaces = await mikrotik_conn.get_wireguard_interfaces()
         
-        # Her interface için peer'ları al ve durumları takip et
+        # Her interface için peer snapshot'ını tazele (durum takibi snapshot yenilenirken yapılır)
         for iface in interfaces:
             interface_name = iface.get('name') or iface.get('.id')
             if interface_name:
                 try:
-                    peers = await mikrotik_conn.get_wireguard_peers(interface_name)
-                    for peer in peers:
-                        peer_id = peer.get('id') or peer.get('.id')
-                        if peer_id:
-                            # Public key'i normalize et - hem 'public-key' hem 'public_key' kontrolü yap
-                            public_key = peer.get('public-key') or peer.get('public_key')
-                            if public_key:
-                                public_key = str(public_key).strip()
-                            
-                            # Durumu takip et
-                            await track_peer_status(
-                                db=db,
-                                peer_id=str(peer_id),
-                                interface_name=interface_name,
-                                peer_name=peer.get('comment') or peer.get('name'),
-                                public_key=public_key,
-                                last_handshake_value=peer.get('last-handshake')
-                            )
+                    await peer_snapshot_store.get_snapshot(db, interface_name)
                 except Exception as e:
                     logger.error(f"Peer durum tracking hatası ({interface_name}): {e}")
         
@@ -485,6 +395,8 @@ async def add_interface(
             private_key=interface_data.private_key,
             **kwargs
         )
+        # Trafik örnekleyici yeni interface'i izlemeye başlasın
+        interface_sampler.invalidate_interfaces()
 
         # IP adresi belirtilmişse, interface'e IP adresi ekle
         if interface_data.ip_address and interface_data.ip_address.strip():
@@ -498,14 +410,14 @@ async def add_interface(
                 logger.warning(f"IP adresi eklenemedi: {ip_error}")
                 # IP adresi eklenemese bile interface oluşturuldu, devam et
 
-        # [REMOVED] Log kaydı - greenlet conflict
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     "interface_added",
-        #     details=f"Interface: {interface_data.name}, Port: {interface.get('listen-port')}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        await create_log(
+            db,
+            current_user.username,
+            "interface_added",
+            details=f"Interface: {interface_data.name}, Port: {interface.get('listen-port')}",
+            ip_address="127.0.0.1"
+        )
         
         return {
             "success": True,
@@ -542,14 +454,14 @@ async def update_interface(
         
         interface = await mikrotik_conn.update_wireguard_interface(name, **kwargs)
         
-        # [REMOVED] Log kaydı - greenlet conflict
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     "interface_updated",
-        #     details=f"Interface: {name}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        await create_log(
+            db,
+            current_user.username,
+            "interface_updated",
+            details=f"Interface: {name}",
+            ip_address="127.0.0.1"
+        )
         
         return {
             "success": True,
@@ -574,15 +486,18 @@ async def delete_interface(
     """
     try:
         await mikrotik_conn.delete_wireguard_interface(name)
+        peer_state_tracker.forget_interface(name)
+        peer_snapshot_store.forget(name)
+        interface_sampler.invalidate_interfaces()
         
-        # [REMOVED] Log kaydı - greenlet conflict
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     "interface_deleted",
-        #     details=f"Interface: {name}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        await create_log(
+            db,
+            current_user.username,
+            "interface_deleted",
+            details=f"Interface: {name}",
+            ip_address="127.0.0.1"
+        )
         
         return {
             "success": True,
@@ -635,15 +550,15 @@ async def toggle_interface(
     try:
         await mikrotik_conn.toggle_interface(name, enable)
 
-        # [REMOVED] Log kaydı - greenlet conflict
-        # action = f"interface_{'enabled' if enable else 'disabled'}"
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     action,
-        #     details=f"Interface: {name}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        action = f"interface_{'enabled' if enable else 'disabled'}"
+        await create_log(
+            db,
+            current_user.username,
+            action,
+            details=f"Interface: {name}",
+            ip_address="127.0.0.1"
+        )
 
         # Bildirim gönder - hata olursa devam et
         try:
@@ -682,51 +597,10 @@ async def get_peers(
     Belirli bir interface'e ait peer'ları listeler ve durumlarını takip eder
     """
     try:
-        # Bağlantının açık olduğundan emin ol
-        await mikrotik_conn.ensure_connected()
-        # Cache kullanma - toggle sonrası güncel veri için use_cache=False
-        peers = await mikrotik_conn.get_wireguard_peers(interface, use_cache=False)
-
-        # Her peer için durumu takip et ve DB'de olup olmadığını kontrol et
-        from sqlalchemy import select
-
-        for peer in peers:
-            peer_id = peer.get('id') or peer.get('.id')
-            # Debug: Peer ID yapısını logla (sadece debug modunda)
-            logger.debug(f"📋 Peer ID kontrol - id: {peer.get('id')}, .id: {peer.get('.id')}, tüm anahtarlar: {list(peer.keys())[:10]}")
-            if peer_id:
-                try:
-                    # Public key'i normalize et - hem 'public-key' hem 'public_key' kontrolü yap
-                    public_key = peer.get('public-key') or peer.get('public_key')
-                    if public_key:
-                        public_key = str(public_key).strip()
-
-                    await track_peer_status(
-                        db=db,
-                        peer_id=str(peer_id),
-                        interface_name=interface,
-                        peer_name=peer.get('comment') or peer.get('name'),
-                        public_key=public_key,
-                        last_handshake_value=peer.get('last-handshake')
-                    )
-
-                    # DB'de bu peer kayıtlı mı kontrol et
-                    if public_key:
-                        stmt = select(PeerKey).where(
-                            PeerKey.public_key == public_key,
-                            PeerKey.interface_name == interface
-                        )
-                        result = await db.execute(stmt)
-                        peer_in_db = result.scalar_one_or_none()
-                        peer['saved_in_db'] = peer_in_db is not None
-                        logger.info(f"📊 Peer {peer_id} - saved_in_db: {peer['saved_in_db']}, public_key: {public_key[:20]}...")
-                    else:
-                        peer['saved_in_db'] = False
-                        logger.info(f"📊 Peer {peer_id} - saved_in_db: False (no public_key)")
-
-                except Exception as e:
-                    logger.error(f"Peer durum tracking hatası ({peer_id}): {e}")
-                    peer['saved_in_db'] = False
+        # Peer listesi bellekteki snapshot'tan okunur (peer monitoring 15 saniyede bir yeniler).
+        # Snapshot eskiyse veya peer'lar bu process'te değiştirildiyse router'dan tek sefer çekilir;
+        # durum takibi ve saved_in_db hesaplaması snapshot yenilenirken toplu yapılır
+        peers = await peer_snapshot_store.get_peers(db, interface)
 
         return {
             "success": True,
@@ -786,34 +660,28 @@ async def add_peer(
             # İlk pool'u kullan
             pool = pools[0]
 
-            # Sıradaki boş IP'yi bul
-            next_ip = await IPPoolService.find_next_available_ip(db, pool.id)
-
-            if not next_ip:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"IP pool dolu: {pool.name}. Lütfen bir peer silin veya pool'u genişletin."
-                )
-
-            # IP'yi HEMEN pool'da allocate et (peer oluşturmadan önce)
-            # Böylece başka bir peer aynı IP'yi alamaz
+            # Sıradaki boş IP'yi bul ve HEMEN pool'da allocate et (peer oluşturmadan önce)
+            # Seçim ve rezervasyon havuz kilidi altında tek adımda yapılır,
+            # böylece eşzamanlı iki istek aynı IP'yi alamaz
             ip_allocation = await IPPoolService.allocate_ip(
                 db=db,
                 pool_id=pool.id,
-                ip_address=next_ip,
                 peer_name=peer_data.name or peer_data.comment or "Auto-allocated peer",
                 notes=f"Otomatik tahsis edildi - {peer_data.interface}"
             )
 
             if not ip_allocation:
                 raise HTTPException(
-                    status_code=500,
-                    detail=f"IP pool'da tahsis yapılamadı: {next_ip}"
+                    status_code=400,
+                    detail=f"IP pool dolu: {pool.name}. Lütfen bir peer silin veya pool'u genişletin."
                 )
 
-            # IP'yi /32 subnet ile kullan (tek IP için)
-            peer_data.allowed_address = f"{next_ip}/32"
-            logger.info(f"✅ Otomatik IP tahsis edildi ve pool'da rezerve edildi: {next_ip}/32 (Pool: {pool.name}, Allocation ID: {ip_allocation.id})")
+            next_ip = ip_allocation.ip_address
+
+            # IP'yi tek adreslik prefix ile kullan (IPv4 /32, IPv6 /128)
+            host_prefix = 128 if ":" in next_ip else 32
+            peer_data.allowed_address = f"{next_ip}/{host_prefix}"
+            logger.info(f"✅ Otomatik IP tahsis edildi ve pool'da rezerve edildi: {peer_data.allowed_address} (Pool: {pool.name}, Allocation ID: {ip_allocation.id})")
 
         if peer_data.allowed_address:
             logger.info(f"🔍 Gelen allowed_address (frontend'den): '{peer_data.allowed_address}'")
@@ -942,34 +810,19 @@ async def add_peer(
             raise HTTPException(status_code=400, detail="Public key boş olamaz")
         
         # Public key kontrolü - Aynı public key ile peer zaten var mı kontrol et
-        # Cache'i bypass et, doğrudan API'den çek (güncel veri için)
-        try:
-            # Cache'i bypass et, doğrudan API'den çek (güncel veri için)
-            existing_peers = await mikrotik_conn.get_wireguard_peers(peer_data.interface, use_cache=False)
-            
-            for existing_peer in existing_peers:
-                # Key alanlarını normalize et - hem 'public-key' hem 'public_key' kontrolü yap
-                existing_public_key = existing_peer.get('public-key') or existing_peer.get('public_key')
-                if existing_public_key:
-                    existing_public_key_normalized = str(existing_public_key).strip()
-                    # Normalize edilmiş key'leri karşılaştır
-                    if existing_public_key_normalized == public_key_normalized:
-                        # Mevcut peer bilgilerini döndür
-                        peer_id = existing_peer.get('.id') or existing_peer.get('id')
-                        peer_comment = existing_peer.get('comment') or existing_peer.get('name') or 'N/A'
-                        logger.warning(f"⚠️ Bu public key ile peer zaten mevcut: {public_key_normalized[:20]}...")
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Bu public key ile peer zaten mevcut! Peer ID: {peer_id}, Comment: {peer_comment}. Lütfen farklı bir public key kullanın."
-                        )
-        except HTTPException:
-            raise
-        except Exception as e:
-            # Kontrol sırasında hata olursa devam et (peer eklemeyi dene)
-            # MikroTik zaten duplicate kontrolü yapacak
-            logger.warning(f"Public key kontrolü sırasında hata (devam ediliyor): {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
+        # Sadece güncel snapshot indeksine bakılır (router'a gidilmez); snapshot eskiyse
+        # MikroTik "already exists" hatası ile duplicate'i zaten reddeder
+        existing_peer = await peer_snapshot_store.lookup(
+            peer_data.interface, public_key=public_key_normalized, fallback=False
+        )
+        if existing_peer:
+            peer_id = existing_peer.get('.id') or existing_peer.get('id')
+            peer_comment = existing_peer.get('comment') or existing_peer.get('name') or 'N/A'
+            logger.warning(f"⚠️ Bu public key ile peer zaten mevcut: {public_key_normalized[:20]}...")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Bu public key ile peer zaten mevcut! Peer ID: {peer_id}, Comment: {peer_comment}. Lütfen farklı bir public key kullanın."
+            )
         
         peer = None  # Peer değişkenini önceden tanımla
 
@@ -1005,13 +858,8 @@ async def add_peer(
                         **{"allowed-address": full_allowed_address}
                     )
                     logger.info(f"✅ Allowed-address güncellendi: {full_allowed_address}")
-
-                    # Güncellenmiş peer'ı tekrar al
-                    peers = await mikrotik_conn.get_wireguard_peers(peer_data.interface, use_cache=False)
-                    for p in peers:
-                        if (p.get('.id') or p.get('id')) == peer_id:
-                            peer = p
-                            break
+                    # Router'dan tekrar okunmaz, set edilen değer peer kaydına yansıtılır
+                    peer['allowed-address'] = full_allowed_address
                 except Exception as e:
                     logger.error(f"❌ Allowed-address güncellenemedi: {e}")
                     # Hata olsa bile peer eklendi, devam et
@@ -1027,24 +875,18 @@ async def add_peer(
             # "entry already exists" hatasını yakala ve daha anlaşılır hale getir
             if "entry already exists" in error_msg.lower() or "already exists" in error_msg.lower():
                 logger.error(f"❌ Peer eklenemedi - Public key zaten mevcut: {public_key_normalized[:20]}...")
-                # Mevcut peer'ı bul ve bilgi ver - cache'i bypass et
+                # Mevcut peer'ı bul ve bilgi ver (filtreli print, tüm liste çekilmez)
                 try:
-                    # Cache'i bypass et, doğrudan API'den çek (güncel veri için)
-                    existing_peers = await mikrotik_conn.get_wireguard_peers(peer_data.interface, use_cache=False)
-                    
-                    for existing_peer in existing_peers:
-                        # Key alanlarını normalize et - hem 'public-key' hem 'public_key' kontrolü yap
-                        existing_public_key = existing_peer.get('public-key') or existing_peer.get('public_key')
-                        if existing_public_key:
-                            existing_public_key_normalized = str(existing_public_key).strip()
-                            # Normalize edilmiş key'leri karşılaştır
-                            if existing_public_key_normalized == public_key_normalized:
-                                peer_id = existing_peer.get('.id') or existing_peer.get('id')
-                                peer_comment = existing_peer.get('comment') or existing_peer.get('name') or 'N/A'
-                                raise HTTPException(
-                                    status_code=400,
-                                    detail=f"Bu public key ile peer zaten mevcut! Peer ID: {peer_id}, Comment: {peer_comment}. Lütfen farklı bir public key kullanın."
-                                )
+                    existing_peer = await peer_snapshot_store.lookup(
+                        peer_data.interface, public_key=public_key_normalized
+                    )
+                    if existing_peer:
+                        peer_id = existing_peer.get('.id') or existing_peer.get('id')
+                        peer_comment = existing_peer.get('comment') or existing_peer.get('name') or 'N/A'
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Bu public key ile peer zaten mevcut! Peer ID: {peer_id}, Comment: {peer_comment}. Lütfen farklı bir public key kullanın."
+                        )
                 except HTTPException:
                     raise
                 except Exception as lookup_error:
@@ -1068,102 +910,103 @@ async def add_peer(
                         detail=f"Peer eklenemedi: {error_msg}"
                     )
         
-        # Private key'i veritabanına kaydet (eğer varsa ve peer başarıyla eklendiyse)
+        # Veritabanı kayıtları tek transaction'da yapılır (tek commit):
+        # - Private key kaydı (peer_keys)
+        # - Otomatik tahsis edilen IP'nin peer ID ile güncellenmesi
+        # - Manuel girilen IP bir pool'a aitse tahsis kaydı
         # NOT: MikroTik RouterOS'ta peer'lar için private-key alanı YOKTUR
         # Private key sadece QR kod ve config dosyası oluştururken kullanılır
         # Bu yüzden private key'i veritabanında saklıyoruz
-        logger.info(f"🔍 Private key kontrolü: peer={peer is not None}, peer_data.private_key={'VAR' if peer_data.private_key else 'YOK'}, private_key.strip()={'VAR' if (peer_data.private_key and peer_data.private_key.strip()) else 'YOK'}")
-        if peer and peer_data.private_key and peer_data.private_key.strip():
-            # Peer ID'yi farklı formatlardan al (*E, .id, id, vb.)
-            peer_id = peer.get('.id') or peer.get('id') or peer.get('*id')
-            if peer_id is None:
-                # Tüm anahtarları kontrol et
-                for key in peer.keys():
-                    if key.endswith('id') or key == '.id' or key.startswith('*'):
-                        peer_id = peer.get(key)
-                        logger.debug(f"Peer ID alternatif alandan bulundu: {key} = {peer_id}")
-                        break
-            
-            private_key_normalized = peer_data.private_key.strip()
-
-            # Client AllowedIPs değerini al
-            # Kullanıcının girdiği endpoint_allowed_address değerini client config için de kullan
-            # Eğer kullanıcı subnet girmediyse varsayılan olarak 0.0.0.0/0 kullan
-            client_allowed_ips = "0.0.0.0/0, ::/0"  # Varsayılan
-            if peer_data.endpoint_allowed_address and peer_data.endpoint_allowed_address.strip():
-                client_allowed_ips = peer_data.endpoint_allowed_address.strip()
-                logger.info(f"🔍 Client AllowedIPs kullanıcı tarafından belirlendi: {client_allowed_ips}")
-            else:
-                logger.info(f"🔍 Client AllowedIPs varsayılan kullanılıyor: {client_allowed_ips}")
-
-            logger.info(f"🔍 Private key kaydediliyor: Peer ID={peer_id}, Public Key={public_key_normalized[:30]}... (uzunluk: {len(public_key_normalized)}), Private Key uzunluk={len(private_key_normalized)}, Client AllowedIPs={client_allowed_ips}")
-            logger.info(f"🔍 Peer objesi: {peer}")
+        if peer and peer_id:
+            from app.services.ip_pool_service import IPPoolService
+            from app.services.ip_allocation_index import ip_allocation_index, pool_contains
 
-            if peer_id:
-                try:
-                    # Mevcut private key kaydı var mı kontrol et (hem public key hem peer ID ile)
-                    result_by_public = await db.execute(
-                        select(PeerKey).where(PeerKey.public_key == public_key_normalized)
+            tracked_pool_ids = []
+            try:
+                if peer_data.private_key and peer_data.private_key.strip():
+                    private_key_normalized = peer_data.private_key.strip()
+
+                    # Client AllowedIPs değerini al
+                    # Kullanıcının girdiği endpoint_allowed_address değerini client config için de kullan
+                    # Eğer kullanıcı subnet girmediyse varsayılan olarak 0.0.0.0/0 kullan
+                    client_allowed_ips = "0.0.0.0/0, ::/0"  # Varsayılan
+                    if peer_data.endpoint_allowed_address and peer_data.endpoint_allowed_address.strip():
+                        client_allowed_ips = peer_data.endpoint_allowed_address.strip()
+
+                    # Mevcut private key kaydı var mı kontrol et (public key veya peer ID ile, tek sorgu)
+                    result = await db.execute(
+                        select(PeerKey).where(
+                            or_(PeerKey.public_key == public_key_normalized, PeerKey.peer_id == str(peer_id))
+                        )
                     )
-                    existing_key_by_public = result_by_public.scalar_one_or_none()
-                    
-                    result_by_id = await db.execute(
-                        select(PeerKey).where(PeerKey.peer_id == str(peer_id))
+                    existing_keys = result.scalars().all()
+                    existing_key = next(
+                        (k for k in existing_keys if k.public_key == public_key_normalized),
+                        existing_keys[0] if existing_keys else None
                     )
-                    existing_key_by_id = result_by_id.scalar_one_or_none()
-                    
-                    existing_key = existing_key_by_public or existing_key_by_id
-                    
-                    if existing_key:
-                        # Mevcut kaydı güncelle
-                        existing_key.private_key = private_key_normalized
-                        existing_key.peer_id = str(peer_id)
-                        existing_key.interface_name = peer_data.interface
-                        existing_key.public_key = public_key_normalized  # Public key'i de güncelle (eşleştirme için)
-                        existing_key.client_allowed_ips = client_allowed_ips  # Client AllowedIPs'i kaydet
-                        existing_key.endpoint_address = peer_data.endpoint_address  # Endpoint adresi
-                        existing_key.endpoint_port = peer_data.endpoint_port  # Endpoint portu
-                        existing_key.template_id = peer_data.template_id  # Template ID (usage tracking için)
-                        await db.commit()
-                        logger.info(f"✅ Private key güncellendi: Peer ID={peer_id}, Public Key={public_key_normalized[:30]}..., Private Key uzunluk={len(private_key_normalized)}")
-                    else:
-                        # Yeni kayıt oluştur
-                        new_key = PeerKey(
+
+                    if existing_key is None:
+                        existing_key = PeerKey(peer_id=str(peer_id))
+                        db.add(existing_key)
+                    existing_key.private_key = private_key_normalized
+                    existing_key.peer_id = str(peer_id)
+                    existing_key.interface_name = peer_data.interface
+                    existing_key.public_key = public_key_normalized  # Public key'i de güncelle (eşleştirme için)
+                    existing_key.client_allowed_ips = client_allowed_ips  # Client AllowedIPs'i kaydet
+                    existing_key.endpoint_address = peer_data.endpoint_address  # Endpoint adresi
+                    existing_key.endpoint_port = peer_data.endpoint_port  # Endpoint portu
+                    existing_key.template_id = peer_data.template_id  # Template ID (usage tracking için)
+                else:
+                    logger.info(f"ℹ️ Private key girilmedi, kayıt yapılmayacak")
+
+                if ip_allocation:
+                    # Otomatik tahsis peer oluşturulmadan önce yapıldı, şimdi peer ID ile eşleştir
+                    ip_allocation.peer_id = str(peer_id)
+                    ip_allocation.peer_public_key = public_key_normalized
+                elif allowed_ips:
+                    # IP Pool tracking - Manuel IP bir pool'a aitse allocation kaydı oluştur
+                    pools = await IPPoolService.get_pools(
+                        db,
+                        interface_name=peer_data.interface,
+                        is_active=True
+                    )
+                    for allowed_ip_with_cidr in allowed_ips:
+                        # CIDR'den IP'yi ayır (örn: "192.168.100.2/32" -> "192.168.100.2")
+                        ip_only = allowed_ip_with_cidr.split('/')[0]
+
+                        # IP pool aralığında mı? (farklı IP sürümündeki pool'lar atlanır, ilk eşleşen kullanılır)
+                        pool = next((p for p in pools if pool_contains(p, ip_only)), None)
+                        if pool is None:
+                            continue
+
+                        ip_allocation = await IPPoolService.allocate_ip(
+                            db=db,
+                            pool_id=pool.id,
+                            ip_address=ip_only,
                             peer_id=str(peer_id),
-                            interface_name=peer_data.interface,
-                            public_key=public_key_normalized,
-                            private_key=private_key_normalized,
-                            client_allowed_ips=client_allowed_ips,
-                            endpoint_address=peer_data.endpoint_address,
-                            endpoint_port=peer_data.endpoint_port,
-                            template_id=peer_data.template_id
-                        )
-                        db.add(new_key)
-                        await db.commit()
-                        logger.info(f"✅ Private key kaydedildi: Peer ID={peer_id}, Public Key={public_key_normalized[:30]}..., Private Key uzunluk={len(private_key_normalized)}")
-                        
-                        # Kayıt sonrası doğrulama
-                        verify_result = await db.execute(
-                            select(PeerKey).where(PeerKey.public_key == public_key_normalized)
+                            peer_public_key=public_key_normalized,
+                            peer_name=peer_data.name or peer_data.comment or str(peer_id),
+                            notes=f"Manuel tahsis (VPN Template) - {peer_data.interface}",
+                            commit=False
                         )
-                        verify_key = verify_result.scalar_one_or_none()
-                        if verify_key:
-                            logger.info(f"✅ Kayıt doğrulandı: Veritabanında bulundu, Private Key uzunluk={len(verify_key.private_key)}")
+                        if ip_allocation:
+                            tracked_pool_ids.append(pool.id)
+                            logger.info(f"📊 Manuel IP pool'da kaydedildi: {ip_only} (Pool: {pool.name})")
                         else:
-                            logger.error(f"❌ Kayıt doğrulanamadı: Veritabanında bulunamadı!")
-                except Exception as key_error:
-                    # Private key kaydı başarısız olsa bile peer ekleme başarılı olduğu için devam et
-                    logger.error(f"❌ Private key kaydı yapılamadı (peer ekleme başarılı): {key_error}")
-                    import traceback
-                    logger.error(traceback.format_exc())
-                    await db.rollback()
-            else:
-                logger.warning(f"⚠️ Peer ID bulunamadı, private key kaydedilemedi. Peer: {peer}")
-        else:
-            if not peer:
-                logger.warning(f"⚠️ Peer eklenemedi veya peer objesi None, private key kaydedilemedi")
-            elif not peer_data.private_key or not peer_data.private_key.strip():
-                logger.info(f"ℹ️ Private key girilmedi, kayıt yapılmayacak")
+                            logger.warning(f"⚠️ Manuel IP pool'da kaydedilemedi (zaten tahsisli olabilir): {ip_only}")
+
+                await db.commit()
+                peer_snapshot_store.invalidate(peer_data.interface)
+                logger.info(f"✅ Peer veritabanı kayıtları yazıldı: Peer ID={peer_id}")
+            except Exception as db_error:
+                # Veritabanı kaydı başarısız olsa bile peer ekleme başarılı olduğu için devam et
+                logger.error(f"❌ Peer veritabanı kayıtları yazılamadı (peer ekleme başarılı): {db_error}")
+                await db.rollback()
+                # Commit edilmeyen tahsisler indekste işaretli kalmasın
+                for pool_id in tracked_pool_ids:
+                    ip_allocation_index.invalidate(pool_id)
+        elif peer is not None:
+            logger.warning(f"⚠️ Peer ID bulunamadı, veritabanı kayıtları yapılamadı. Peer: {peer}")
 
         # Endpoint'e Erişim İçin İzin Verilen IP Adresleri için IP route ekle
         if peer and peer_data.endpoint_allowed_address:
@@ -1257,65 +1100,6 @@ async def add_peer(
         #     if "locked" in str(log_error).lower() or "database" in str(log_error).lower():
         #         logger.warning("⚠️ Veritabanı kilitli, log kaydı atlandı. Peer başarıyla eklendi.")
 
-        # IP Pool tracking - Manuel IP için de allocation kaydı oluştur
-        # Eğer "auto" kullanılmadıysa ama IP bir pool'a aitse, onu track et
-        if not ip_allocation and allowed_ips and peer_id:
-            try:
-                from app.services.ip_pool_service import IPPoolService
-                import ipaddress
-
-                # Bu interface için pool'ları al
-                pools = await IPPoolService.get_pools(
-                    db,
-                    interface_name=peer_data.interface,
-                    is_active=True
-                )
-
-                if pools:
-                    # Her allowed IP'yi kontrol et
-                    for allowed_ip_with_cidr in allowed_ips:
-                        # CIDR'den IP'yi ayır (örn: "192.168.100.2/32" -> "192.168.100.2")
-                        ip_only = allowed_ip_with_cidr.split('/')[0]
-
-                        # Bu IP hangi pool'a ait?
-                        for pool in pools:
-                            try:
-                                ip_obj = ipaddress.ip_address(ip_only)
-                                start_ip = ipaddress.ip_address(pool.start_ip)
-                                end_ip = ipaddress.ip_address(pool.end_ip)
-
-                                # IP pool aralığında mı?
-                                if start_ip <= ip_obj <= end_ip:
-                                    # Bu IP'yi pool'da track et
-                                    logger.info(f"📊 Manuel IP pool aralığında bulundu, track ediliyor: {ip_only} (Pool: {pool.name})")
-
-                                    # Allocation kaydı oluştur
-                                    ip_allocation = await IPPoolService.allocate_ip(
-                                        db=db,
-                                        pool_id=pool.id,
-                                        ip_address=ip_only,
-                                        peer_id=str(peer_id),
-                                        peer_public_key=public_key_normalized,
-                                        peer_name=peer_data.name or peer_data.comment or str(peer_id),
-                                        notes=f"Manuel tahsis (VPN Template) - {peer_data.interface}"
-                                    )
-
-                                    if ip_allocation:
-                                        logger.info(f"✅ Manuel IP pool'da kaydedildi: {ip_only} (Allocation ID: {ip_allocation.id})")
-                                    else:
-                                        logger.warning(f"⚠️ Manuel IP pool'da kaydedilemedi (zaten tahsisli olabilir): {ip_only}")
-
-                                    # Sadece ilk eşleşen pool'u kullan
-                                    break
-                            except Exception as pool_check_error:
-                                logger.debug(f"Pool kontrolü hatası: {pool_check_error}")
-                                continue
-            except Exception as tracking_error:
-                # IP pool tracking hatası peer eklemeyi engellemez
-                logger.warning(f"⚠️ IP pool tracking hatası (peer ekleme başarılı): {tracking_error}")
-                import traceback
-                logger.debug(traceback.format_exc())
-
         # Bildirim gönder - arka planda (bağımsız DB session ile)
         peer_name = peer_data.comment if peer_data.comment and peer_data.comment.strip() else public_key_normalized[:16]
         background_tasks.add_task(
@@ -1327,16 +1111,6 @@ async def add_peer(
         )
         logger.info(f"📬 Peer oluşturma bildirimi arka planda gönderilecek: {peer_name}")
 
-        # IP Pool entegrasyonu - allocation'ı peer_id ile güncelle (arka planda)
-        if ip_allocation and peer_id:
-            background_tasks.add_task(
-                update_allocation_background,
-                allocation_id=ip_allocation.id,
-                peer_id=str(peer_id),
-                public_key=public_key_normalized
-            )
-            logger.info(f"📬 IP allocation güncellemesi arka planda yapılacak - Allocation ID: {ip_allocation.id}")
-
         # Template kullanım istatistiklerini güncelle (arka planda)
         if peer_data.template_id:
             background_tasks.add_task(
@@ -1405,40 +1179,17 @@ async def update_peer(
         existing_allowed_ips = []
         interface_name = peer_data.interface
 
-        # Eğer interface belirtilmemişse, peer_id'den bul
+        # Peer'ı indeksten veya router'a filtreli print ile bul (?.id=)
+        # Interface belirtilmemişse peer tüm interface'lerde aranır, interface alanı cevaptan okunur
         if not interface_name:
             logger.warning(f"⚠️ Interface belirtilmedi, peer_id'den aranıyor: {peer_id}")
-            try:
-                # Tüm WireGuard interface'lerini al
-                interfaces = await mikrotik_conn.get_wireguard_interfaces(use_cache=False)
-                for iface in interfaces:
-                    iface_name = iface.get('name') or iface.get('.id')
-                    if iface_name:
-                        # Bu interface'deki peer'ları kontrol et
-                        peers = await mikrotik_conn.get_wireguard_peers(iface_name, use_cache=False)
-                        for p in peers:
-                            p_id = p.get('.id') or p.get('id')
-                            if str(p_id) == str(peer_id) or str(p_id).lstrip('*') == str(peer_id).lstrip('*'):
-                                existing_peer = p
-                                interface_name = iface_name
-                                logger.info(f"✅ Peer bulundu! Interface: {interface_name}, Peer ID: {p_id}")
-                                break
-                        if existing_peer:
-                            break
-            except Exception as e:
-                logger.error(f"❌ Interface bulunamadı: {e}")
-
-        # Interface varsa (ya da bulunduysa), mevcut peer bilgisini al
-        if interface_name and not existing_peer:
-            try:
-                peers = await mikrotik_conn.get_wireguard_peers(interface_name, use_cache=False)
-                for p in peers:
-                    p_id = p.get('.id') or p.get('id')
-                    if str(p_id) == str(peer_id) or str(p_id).lstrip('*') == str(peer_id).lstrip('*'):
-                        existing_peer = p
-                        break
-            except Exception as e:
-                logger.warning(f"⚠️ Mevcut peer bilgisi alınamadı: {e}")
+        try:
+            existing_peer = await peer_snapshot_store.lookup(interface_name, peer_id=peer_id)
+            if existing_peer and not interface_name:
+                interface_name = existing_peer.get('interface')
+                logger.info(f"✅ Peer bulundu! Interface: {interface_name}, Peer ID: {peer_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Mevcut peer bilgisi alınamadı: {e}")
 
         # Mevcut allowed-address'i parse et
         if existing_peer:
@@ -1629,14 +1380,14 @@ async def update_peer(
                 logger.error(f"❌ Veritabanı güncellenemedi: {e}")
                 # Hata olsa bile MikroTik güncellemesi başarılı olduğu için devam et
 
-        # [REMOVED] Log kaydı - greenlet conflict
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     "peer_updated",
-        #     details=f"Peer ID: {peer_id}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        await create_log(
+            db,
+            current_user.username,
+            "peer_updated",
+            details=f"Peer ID: {peer_id}",
+            ip_address="127.0.0.1"
+        )
 
         return {
             "success": True,
@@ -1679,15 +1430,15 @@ async def toggle_peer(
         
         logger.info(f"Peer güncelleme sonucu: {peer}")
         
-        # [REMOVED] Log kaydı - greenlet conflict
-        # action = f"peer_{'enabled' if enable else 'disabled'}"
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     action,
-        #     details=f"Peer ID: {peer_id}, Interface: {interface}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        action = f"peer_{'enabled' if enable else 'disabled'}"
+        await create_log(
+            db,
+            current_user.username,
+            action,
+            details=f"Peer ID: {peer_id}, Interface: {interface}",
+            ip_address="127.0.0.1"
+        )
         
         return {
             "success": True,
@@ -1724,13 +1475,9 @@ async def delete_peer(
         # Peer'ı silmeden önce allowed-address bilgisini al (IP route'ları silmek için)
         peer_to_delete = None
         try:
-            peers = await mikrotik_conn.get_wireguard_peers(interface, use_cache=False)
-            for p in peers:
-                p_id = p.get('.id') or p.get('id')
-                if str(p_id) == str(peer_id) or str(p_id).lstrip('*') == str(peer_id).lstrip('*'):
-                    peer_to_delete = p
-                    logger.info(f"🔍 Silinecek peer bulundu: {p_id}")
-                    break
+            peer_to_delete = await peer_snapshot_store.lookup(interface, peer_id=peer_id)
+            if peer_to_delete:
+                logger.info(f"🔍 Silinecek peer bulundu: {peer_id}")
         except Exception as e:
             logger.warning(f"⚠️ Peer bilgisi alınamadı (devam ediliyor): {e}")
 
@@ -1823,14 +1570,14 @@ async def delete_peer(
             logger.warning(f"⚠️ PeerMetadata silme hatası (peer silme başarılı): {metadata_error}")
             await db.rollback()
         
-        # [REMOVED] Log kaydı - greenlet conflict
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     "peer_deleted",
-        #     details=f"Peer ID: {peer_id}, Interface: {interface}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        await create_log(
+            db,
+            current_user.username,
+            "peer_deleted",
+            details=f"Peer ID: {peer_id}, Interface: {interface}",
+            ip_address="127.0.0.1"
+        )
 
         # Bildirim gönder - arka planda (bağımsız DB session ile)
         # Silinen peer'ın ismini belirle
@@ -1916,16 +1663,8 @@ async def import_peer_from_mikrotik(
         # Bağlantının açık olduğundan emin ol
         await mikrotik_conn.ensure_connected()
 
-        # MikroTik'ten peer bilgilerini al
-        peers = await mikrotik_conn.get_wireguard_peers(import_data.interface_name, use_cache=False)
-
-        # Peer'ı bul
-        peer = None
-        for p in peers:
-            p_id = p.get('.id') or p.get('id')
-            if str(p_id) == str(import_data.peer_id) or str(p_id).lstrip('*') == str(import_data.peer_id).lstrip('*'):
-                peer = p
-                break
+        # MikroTik'ten peer bilgilerini al (indeks veya ?.id= filtreli print)
+        peer = await peer_snapshot_store.lookup(import_data.interface_name, peer_id=import_data.peer_id)
 
         if not peer:
             raise HTTPException(status_code=404, detail=f"Peer bulunamadı: {import_data.peer_id}")
@@ -2041,6 +1780,7 @@ async def import_peer_from_mikrotik(
                         pool = pools[0]
                         # IP allocation oluştur
                         from app.models.ip_pool import IPAllocation
+                        from app.services.ip_allocation_index import ip_allocation_index
                         allocation = IPAllocation(
                             pool_id=pool.id,
                             ip_address=first_ip,
@@ -2050,11 +1790,14 @@ async def import_peer_from_mikrotik(
                             status='allocated'
                         )
                         db.add(allocation)
+                        ip_allocation_index.invalidate(pool.id)
                         logger.info(f"✅ IP allocation oluşturuldu: {first_ip}")
             except Exception as pool_error:
                 logger.warning(f"⚠️ IP allocation oluşturulamadı (devam ediliyor): {pool_error}")
 
         await db.commit()
+        # saved_in_db alanı değişti, snapshot'ı yenile
+        peer_snapshot_store.invalidate(import_data.interface_name)
 
         # Route ekleme - allowed_address'teki subnet'ler için IP route oluştur
         # (Panel'den eklenen peer'larla aynı davranış)
@@ -2143,14 +1886,14 @@ async def import_peer_from_mikrotik(
                 logger.error(f"❌ Template usage count güncellenemedi: {template_error}")
                 # Hata olsa bile devam et
 
-        # [REMOVED] Log kaydı - greenlet conflict
-        # await create_log(
-        #     db,
-        #     current_user.username,
-        #     "peer_imported",
-        #     details=f"Peer ID: {import_data.peer_id}, Interface: {import_data.interface_name}",
-        #     ip_address="127.0.0.1"
-        # )
+        # Log kaydı (kuyruğa alınır, isteği bekletmez)
+        await create_log(
+            db,
+            current_user.username,
+            "peer_imported",
+            details=f"Peer ID: {import_data.peer_id}, Interface: {import_data.interface_name}",
+            ip_address="127.0.0.1"
+        )
 
         # Bildirim gönder
         peer_name = peer.get('comment') or peer.get('name') or str(import_data.peer_id)[:16]
@@ -2370,353 +2113,40 @@ async def get_peer_qrcode(
     Private key veritabanında saklanır veya query parameter olarak gönderilir.
     """
     try:
-        # Peer bilgilerini al - Cache'i atla, güncel verileri çek
-        peers = await mikrotik_conn.get_wireguard_peers(interface, use_cache=False)
+        # Peer ID'yi decode et (URL encoding'den gelebilir)
+        import urllib.parse
+        decoded_peer_id = urllib.parse.unquote(peer_id).strip()
 
-        # Peer ID eşleştirmesi - MikroTik'te .id farklı formatlarda olabilir (*4, *5, vb.)
-        peer = None
+        # Peer'ı indeksten veya router'a filtreli print ile bul (?.id=, bulunamazsa ?public-key=)
+        peer = await peer_snapshot_store.lookup(interface, peer_id=decoded_peer_id)
+        if not peer and len(decoded_peer_id) >= 40:
+            # ID yerine public key gönderilmiş olabilir
+            peer = await peer_snapshot_store.lookup(interface, public_key=decoded_peer_id)
 
-        # Peer ID'yi normalize et (URL decode ve trim)
-        import urllib.parse
-        try:
-            decoded_peer_id = urllib.parse.unquote(peer_id)
-        except (ValueError, TypeError, Exception) as e:
-            logger.debug(f"URL decode hatası: {peer_id}, Hata: {e}")
-            decoded_peer_id = peer_id
-        
-        # Peer ID varyantları oluştur (*A, A, *4, 4 gibi formatlar için)
-        peer_id_variants = [peer_id, decoded_peer_id, str(peer_id), str(decoded_peer_id)]
-        # * ile başlayan ID'ler için hem *A hem A formatını ekle
-        if str(peer_id).startswith("*"):
-            peer_id_variants.append(str(peer_id)[1:])  # *A -> A
-            peer_id_variants.append(str(peer_id))  # *A -> *A (zaten var ama emin olmak için)
-        if str(decoded_peer_id).startswith("*"):
-            peer_id_variants.append(str(decoded_peer_id)[1:])  # *A -> A
-            peer_id_variants.append(str(decoded_peer_id))  # *A -> *A
-        
-        # Tüm varyantları string'e çevir ve normalize et
-        peer_id_variants = [str(v).strip() for v in peer_id_variants if v]
-        # Tekrarları kaldır
-        peer_id_variants = list(dict.fromkeys(peer_id_variants))
-        
-        logger.info(f"🔍 QR kod için peer aranıyor: Peer ID={peer_id} (decoded: {decoded_peer_id}), Interface={interface}, Varyantlar={peer_id_variants}")
-        logger.info(f"📋 MikroTik'ten gelen peer sayısı: {len(peers)}")
-        if peers:
-            # Tüm peer'ların ID'lerini logla
-            all_peer_ids = []
-            for idx, p in enumerate(peers[:5]):
-                peer_id_from_mikrotik = p.get(".id") or p.get("id") or p.get("*id")
-                if peer_id_from_mikrotik is None:
-                    # Tüm anahtarları kontrol et
-                    for key in p.keys():
-                        if key.endswith('id') or key == '.id' or key.startswith('*'):
-                            peer_id_from_mikrotik = p.get(key)
-                            break
-                all_peer_ids.append(f"Peer[{idx}]: {peer_id_from_mikrotik} (tip: {type(peer_id_from_mikrotik).__name__})")
-            logger.info(f"📋 İlk 5 peer ID'leri: {all_peer_ids}")
-        
-        for p in peers:
-            # .id ve id alanlarını kontrol et - MikroTik'te genelde .id kullanılır
-            peer_dot_id = p.get(".id") or p.get("id") or p.get("*id")
-            
-            # Eğer hala None ise, tüm anahtarları kontrol et
-            if peer_dot_id is None:
-                for key in p.keys():
-                    if key.endswith('id') or key == '.id' or key.startswith('*'):
-                        peer_dot_id = p.get(key)
-                        logger.debug(f"Peer ID alternatif alandan bulundu: {key} = {peer_dot_id}")
-                        break
-            
-            if peer_dot_id is None:
-                logger.debug(f"Peer'da ID bulunamadı. Peer keys: {list(p.keys())}")
-                continue
-            
-            peer_dot_id_str = str(peer_dot_id).strip()
-            
-            # Direkt eşleşme kontrolü (hem string hem orijinal değer ile)
-            if peer_dot_id_str in peer_id_variants or peer_dot_id in peer_id_variants:
-                peer = p
-                logger.info(f"✅ Peer bulundu (direkt eşleşme): Peer ID={peer_dot_id_str} (aranan: {peer_id})")
-                break
-            
-            # Case-insensitive eşleşme (büyük/küçük harf duyarsız)
-            peer_dot_id_upper = peer_dot_id_str.upper()
-            variants_upper = [v.upper() for v in peer_id_variants]
-            if peer_dot_id_upper in variants_upper:
-                peer = p
-                logger.info(f"✅ Peer bulundu (case-insensitive eşleşme): Peer ID={peer_dot_id_str} (aranan: {peer_id})")
-                break
-            
-            # * karakterini kaldırarak karşılaştırma (hem baştan hem sondan)
-            peer_dot_id_normalized = peer_dot_id_str.lstrip("*").rstrip("*")
-            for variant in peer_id_variants:
-                variant_normalized = str(variant).lstrip("*").rstrip("*")
-                if peer_dot_id_normalized == variant_normalized:
-                    peer = p
-                    logger.info(f"✅ Peer bulundu (normalize edilmiş eşleşme): {peer_dot_id_normalized} == {variant_normalized}")
-                    break
-                
-                # Case-insensitive normalize edilmiş eşleşme
-                if peer_dot_id_normalized.upper() == variant_normalized.upper():
-                    peer = p
-                    logger.info(f"✅ Peer bulundu (case-insensitive normalize eşleşme): {peer_dot_id_normalized.upper()} == {variant_normalized.upper()}")
-                    break
-            
-            if peer:
-                break
-        
-        # Eğer hala bulunamadıysa, tüm peer'ları ve varyantları logla
-        if not peer:
-            logger.error(f"❌ Peer bulunamadı! Aranan ID: {peer_id}, Decoded: {decoded_peer_id}")
-            logger.error(f"❌ Varyantlar: {peer_id_variants}")
-            logger.error(f"❌ MikroTik'ten gelen tüm peer ID'leri:")
-            for idx, p in enumerate(peers):
-                p_id = p.get(".id") or p.get("id") or p.get("*id")
-                if p_id is None:
-                    for key in p.keys():
-                        if key.endswith('id') or key == '.id' or key.startswith('*'):
-                            p_id = p.get(key)
-                            break
-                logger.error(f"  Peer[{idx}]: {p_id} (tip: {type(p_id).__name__})")
-        
         if not peer:
-            logger.error(f"❌ QR kod için peer bulunamadı. Peer ID: {peer_id} (decoded: {decoded_peer_id}), Interface: {interface}, Mevcut peer sayısı: {len(peers)}")
-            if peers:
-                logger.error(f"Mevcut peer ID'leri: {[str(p.get('.id') or p.get('id') or 'YOK') for p in peers]}")
-                logger.error(f"İlk peer örneği: {peers[0] if peers else 'YOK'}")
+            logger.warning(f"QR kod için peer bulunamadı. Peer ID: {peer_id}, Interface: {interface}")
             raise HTTPException(status_code=404, detail=f"Peer bulunamadı (ID: {peer_id})")
         
-        # Interface bilgilerini al - cache'i atla, doğrudan API'den çek (güncel veri için)
-        interfaces = await mikrotik_conn.get_wireguard_interfaces(use_cache=False)
-        interface_data = None
-        for i in interfaces:
-            if i.get("name") == interface or i.get(".id") == interface:
-                interface_data = i
-                break
-        
+        # Interface bilgileri (interface listesi cache'ten okunur)
+        interface_data = await find_interface(interface)
         if not interface_data:
             logger.warning(f"QR kod için interface bulunamadı. Interface: {interface}")
             raise HTTPException(status_code=404, detail=f"Interface bulunamadı: {interface}")
-        
-        # Debug: Interface verilerini logla
-        logger.info(f"📋 QR kod için interface verileri alındı: {interface_data.get('name')}")
-        logger.debug(f"Interface tüm anahtarları: {list(interface_data.keys())}")
-        # Public key'i farklı alanlardan kontrol et
-        interface_public_key_debug = interface_data.get("public-key") or interface_data.get("public_key") or interface_data.get("publicKey")
-        logger.info(f"🔑 Interface public key (debug): {interface_public_key_debug[:30] if interface_public_key_debug else 'BULUNAMADI'}...")
-        # Tüm alanları kontrol et (public içeren)
-        for key in interface_data.keys():
-            if 'public' in key.lower() or 'key' in key.lower():
-                logger.debug(f"Interface key alanı bulundu: {key} = {str(interface_data.get(key))[:30] if interface_data.get(key) else 'None'}...")
-        
-        # WireGuard config oluştur (client tarafı için)
-        config_lines = ["[Interface]"]
-        config_lines.append("")
-        
-        # Private key - Önce query parameter'dan kontrol et, yoksa veritabanından al
-        # NOT: MikroTik RouterOS'ta peer'lar için private-key alanı YOKTUR
-        # Private key veritabanında saklanır veya query parameter olarak gönderilir
-        client_private_key = private_key  # Query parameter'dan al
 
-        # Query parameter'da yoksa veritabanından al
-        if not client_private_key:
-            try:
-                # ÖNCELİKLE Peer ID ile dene - bu en güvenilir yöntem
-                logger.info(f"🔍 QR kod için veritabanından private key aranıyor: Peer ID={peer_id}, tip={type(peer_id).__name__}, repr={repr(peer_id)}")
-
-                # Tüm veritabanındaki peer_id'leri logla (debugging için)
-                all_peer_keys_result = await db.execute(select(PeerKey))
-                all_peer_keys = all_peer_keys_result.scalars().all()
-                logger.info(f"📋 Veritabanındaki tüm peer_id'ler: {[pk.peer_id for pk in all_peer_keys]}")
-
-                # Orijinal peer_id ile dene
-                logger.info(f"🔍 Arama yapılıyor: PeerKey.peer_id == '{peer_id}'")
-                peer_id_result = await db.execute(
-                    select(PeerKey).where(PeerKey.peer_id == str(peer_id))
-                )
-                peer_key_record = peer_id_result.scalar_one_or_none()
-                logger.info(f"🔍 Orijinal peer_id ile sonuç: {'BULUNDU' if peer_key_record else 'BULUNAMADI'}")
-
-                # Eğer bulunamadıysa ve ID yıldız (*) ile başlıyorsa, normalize edilmiş ID ile dene (* karakterini kaldır)
-                if not peer_key_record and str(peer_id).startswith("*"):
-                    normalized_id = str(peer_id)[1:]
-                    logger.info(f"🔍 Normalize edilmiş ID ile deneniyor (yıldız kaldırıldı): '{normalized_id}'")
-                    peer_id_result_normalized = await db.execute(
-                        select(PeerKey).where(PeerKey.peer_id == normalized_id)
-                    )
-                    peer_key_record = peer_id_result_normalized.scalar_one_or_none()
-                    logger.info(f"🔍 Normalize edilmiş ID ile sonuç: {'BULUNDU' if peer_key_record else 'BULUNAMADI'}")
-
-                # Eğer hala bulunamadıysa ve ID yıldız ile BAŞLAMIYOR ise, başına * ekleyerek dene
-                if not peer_key_record and not str(peer_id).startswith("*"):
-                    with_asterisk_id = "*" + str(peer_id)
-                    logger.info(f"🔍 Yıldız eklenerek deneniyor: '{with_asterisk_id}'")
-                    peer_id_result_with_asterisk = await db.execute(
-                        select(PeerKey).where(PeerKey.peer_id == with_asterisk_id)
-                    )
-                    peer_key_record = peer_id_result_with_asterisk.scalar_one_or_none()
-                    logger.info(f"🔍 Yıldız eklenerek sonuç: {'BULUNDU' if peer_key_record else 'BULUNAMADI'}")
+        # Private key, client AllowedIPs ve endpoint PeerKey kaydından (tek sorgu)
+        # NOT: MikroTik RouterOS'ta peer'lar için private-key alanı YOKTUR
+        key_record = await find_peer_key(db, peer, decoded_peer_id)
+        if not private_key and not (key_record and key_record.private_key):
+            logger.warning(f"⚠️ Private key bulunamadı. Peer ID: {peer_id}, Interface: {interface}. QR kod için placeholder kullanılıyor.")
 
-                if peer_key_record:
-                    client_private_key = peer_key_record.private_key
-                    logger.info(f"✅ Private key Peer ID ile bulundu: Peer ID={peer_id}, Private Key uzunluk={len(client_private_key) if client_private_key else 0}")
-                else:
-                    # Peer ID ile bulunamadıysa, Public Key ile dene (fallback)
-                    peer_public_key = peer.get('public-key') or peer.get('public_key')
-                    if peer_public_key:
-                        peer_public_key_normalized = str(peer_public_key).strip()
-                        logger.warning(f"⚠️ Peer ID ile bulunamadı, Public Key ile deneniyor: {peer_public_key_normalized[:30]}...")
-
-                        result = await db.execute(
-                            select(PeerKey).where(PeerKey.public_key == peer_public_key_normalized)
-                        )
-                        peer_key_record = result.scalar_one_or_none()
+        config = build_client_config(peer, interface_data, private_key, key_record)
 
-                        if peer_key_record:
-                            client_private_key = peer_key_record.private_key
-                            logger.info(f"✅ Private key Public Key ile bulundu: Private Key uzunluk={len(client_private_key) if client_private_key else 0}")
-                        else:
-                            logger.error(f"❌ Veritabanında private key bulunamadı! Peer ID={peer_id}, Public Key={peer_public_key_normalized[:30] if peer_public_key_normalized else 'YOK'}...")
-                    else:
-                        logger.error(f"❌ Peer'da public key yok ve Peer ID ile de bulunamadı: Peer ID={peer_id}")
-            except Exception as db_error:
-                logger.error(f"❌ Veritabanından private key alınamadı: {db_error}")
-                import traceback
-                logger.error(traceback.format_exc())
-        
-        # Private key'i normalize et (trim ve boşlukları temizle)
-        if client_private_key:
-            client_private_key = str(client_private_key).strip()
-        
-        if client_private_key and len(client_private_key) > 0:
-            config_lines.append(f"PrivateKey = {client_private_key}")
-        else:
-            # Private key yoksa placeholder kullan
-            config_lines.append("PrivateKey = <YOUR_PRIVATE_KEY>")
-            logger.warning(f"⚠️ Private key bulunamadı. Peer ID: {peer_id}, Interface: {interface}. QR kod için placeholder kullanılıyor.")
-        
-        # Address (client'ın kullanacağı IP) - panelden çek (peer'dan allowed-address'ten)
-        if peer.get("allowed-address"):
-            # allowed-address virgülle ayrılmış olabilir, /32 olan IP'yi bul
-            addresses = peer.get("allowed-address").split(",")
-            client_address = None
-            for addr in addresses:
-                addr = addr.strip()
-                if "/32" in addr:
-                    client_address = addr
-                    break
-            if not client_address:
-                # /32 yoksa ilk adresi al
-                client_address = addresses[0].strip()
-            if client_address:
-                config_lines.append(f"Address = {client_address}")
-        
-        # MTU - varsayılan 1380
-        mtu = peer.get("mtu") or interface_data.get("mtu") or 1380
-        config_lines.append(f"MTU = {mtu}")
-        
-        # DNS - varsayılan 1.1.1.1
-        dns_value = peer.get("dns") or "1.1.1.1"
-        config_lines.append(f"DNS = {dns_value}")
-        
-        config_lines.append("")
-        config_lines.append("[Peer]")
-        config_lines.append("")
-        
-        # Server'ın public key'i - panelden çek (interface'den)
-        # Interface'den public key'i normalize et - tüm olası alan adlarını kontrol et
-        interface_public_key = None
-        # Önce standart alan adlarını kontrol et
-        interface_public_key = interface_data.get("public-key") or interface_data.get("public_key") or interface_data.get("publicKey")
-        
-        # Eğer bulunamadıysa, tüm alanları tarayarak public key'i bul
-        if not interface_public_key:
-            for key in interface_data.keys():
-                key_lower = key.lower()
-                # Public key içeren tüm alanları kontrol et
-                if ('public' in key_lower and 'key' in key_lower) or key_lower == 'public-key' or key_lower == 'public_key':
-                    potential_key = interface_data.get(key)
-                    if potential_key and len(str(potential_key).strip()) > 20:  # WireGuard key'leri genelde 40+ karakter
-                        interface_public_key = potential_key
-                        logger.info(f"Interface public key alternatif alandan bulundu: {key} = {interface_public_key[:20]}...")
-                        break
-        
-        if interface_public_key:
-            interface_public_key = str(interface_public_key).strip()
-            logger.info(f"✅ Interface public key kullanılıyor: {interface_public_key[:20]}... (uzunluk: {len(interface_public_key)})")
-            config_lines.append(f"PublicKey = {interface_public_key}")
-        else:
-            logger.error(f"❌ Interface public key bulunamadı. Interface: {interface}, Tüm alanlar: {list(interface_data.keys())}")
-            # Hata fırlatmak yerine uyarı ver ve devam et
-            config_lines.append("PublicKey = <INTERFACE_PUBLIC_KEY_NOT_FOUND>")
-        
-        # Allowed IPs - Client'ın hangi trafiği VPN üzerinden yönlendireceğini belirtir
-        # Kullanıcının girdiği değeri database'den al
-        peer_public_key = peer.get("public-key") or peer.get("public_key")
-        allowed_ips_value = "0.0.0.0/0, ::/0"  # Varsayılan
-        if peer_public_key:
-            try:
-                result = await db.execute(
-                    select(PeerKey).where(PeerKey.public_key == str(peer_public_key).strip())
-                )
-                peer_key_record = result.scalar_one_or_none()
-                if peer_key_record and peer_key_record.client_allowed_ips:
-                    allowed_ips_value = peer_key_record.client_allowed_ips
-                    logger.info(f"✅ Database'den client_allowed_ips alındı: {allowed_ips_value}")
-            except Exception as e:
-                logger.warning(f"⚠️ Database'den client_allowed_ips alınamadı: {e}")
-                allowed_ips_value = peer.get("endpoint-allowed-address") or peer.get("endpoint_allowed_address") or "0.0.0.0/0, ::/0"
-        else:
-            allowed_ips_value = peer.get("endpoint-allowed-address") or peer.get("endpoint_allowed_address") or "0.0.0.0/0, ::/0"
-        if allowed_ips_value:
-            allowed_ips_value = str(allowed_ips_value).strip()
-        if not allowed_ips_value or allowed_ips_value == "":
-            allowed_ips_value = "0.0.0.0/0, ::/0"
-        config_lines.append(f"AllowedIPs = {allowed_ips_value}")
-
-        # Endpoint - Database'den endpoint bilgisini al, yoksa varsayılan kullan
-        endpoint_address = None
-        endpoint_port = None
-        if peer_key_record:
-            endpoint_address = peer_key_record.endpoint_address
-            endpoint_port = peer_key_record.endpoint_port
-            logger.info(f"✅ Database'den endpoint bilgisi alındı: {endpoint_address}:{endpoint_port}")
-
-        # Endpoint oluştur - database'den veya varsayılan
-        if endpoint_address and endpoint_port:
-            endpoint = f"{endpoint_address}:{endpoint_port}"
-            config_lines.append(f"Endpoint = {endpoint}")
-        elif interface_data.get("listen-port"):
-            # Fallback: endpoint bilgisi yoksa varsayılan kullan
-            listen_port = interface_data.get("listen-port")
-            endpoint = f"vpn.sahacam.com:{listen_port}"
-            config_lines.append(f"Endpoint = {endpoint}")
-            logger.warning(f"⚠️ Database'de endpoint bilgisi yok, varsayılan kullanılıyor: {endpoint}")
-        
-        # Persistent Keepalive - varsayılan 25
-        if peer.get("persistent-keepalive"):
-            keepalive = peer.get("persistent-keepalive")
-            # 's' harfini kaldır
-            if keepalive.endswith("s"):
-                keepalive = keepalive[:-1]
-            elif keepalive.endswith("m"):
-                minutes = int(keepalive[:-1])
-                keepalive = str(minutes * 60)
-            config_lines.append(f"PersistentKeepalive = {keepalive}")
-        else:
-            # Default persistent keepalive: 25
-            config_lines.append("PersistentKeepalive = 25")
-        
-        # Pre-shared Key - normalize et
-        preshared_key = peer.get("preshared-key") or peer.get("preshared_key")
-        if preshared_key:
-            preshared_key = str(preshared_key).strip()
-            config_lines.append(f"PresharedKey = {preshared_key}")
-        
-        config = "\n".join(config_lines)
-        
-        # QR kod oluştur
-        qr_code = generate_qrcode(config)
+        # QR kod - aynı config daha önce render edildiyse cache'ten gelir
+        try:
+            qr_code = png_data_uri(await peer_config_renderer.qrcode_png(config))
+        except Exception as qr_error:
+            logger.error(f"QR kod oluşturma hatası: {qr_error}")
+            qr_code = None
         
         return {
             "success": True,
@@ -2745,352 +2175,33 @@ async def get_peer_config(
     Private key veritabanında saklanır veya query parameter olarak gönderilir.
     """
     try:
-        # Peer bilgilerini al - Cache'i atla, güncel verileri çek
-        peers = await mikrotik_conn.get_wireguard_peers(interface, use_cache=False)
-
-        # Debug: MikroTik'ten gelen peer verilerini logla
-        logger.debug(f"Config için peer listesi alındı. Interface: {interface}, Peer sayısı: {len(peers)}")
-        if peers:
-            logger.debug(f"İlk peer örneği: {peers[0]}")
-            logger.debug(f"Tüm peer ID'leri: {[str(p.get('.id', 'YOK')) + ' (tip: ' + str(type(p.get('.id'))) + ')' for p in peers]}")
-        
         # Peer ID'yi decode et (URL encoding'den gelebilir)
-        try:
-            decoded_peer_id = peer_id
-            if "%" in peer_id:
-                import urllib.parse
-                decoded_peer_id = urllib.parse.unquote(peer_id)
-        except (ValueError, TypeError, Exception) as e:
-            logger.debug(f"URL decode hatası: {peer_id}, Hata: {e}")
-            decoded_peer_id = peer_id
-        
-        logger.debug(f"Aranan peer ID: {peer_id} (decoded: {decoded_peer_id})")
-        
-        # Peer ID eşleştirmesi - MikroTik'te .id farklı formatlarda olabilir (*4, *5, vb.)
-        peer = None
-        
-        # Peer ID varyantları oluştur (*A, A, *4, 4 gibi formatlar için)
-        peer_id_variants = [peer_id, decoded_peer_id, str(peer_id), str(decoded_peer_id)]
-        # * ile başlayan ID'ler için hem *A hem A formatını ekle
-        if str(peer_id).startswith("*"):
-            peer_id_variants.append(str(peer_id)[1:])  # *A -> A
-            peer_id_variants.append(str(peer_id))  # *A -> *A (zaten var ama emin olmak için)
-        if str(decoded_peer_id).startswith("*"):
-            peer_id_variants.append(str(decoded_peer_id)[1:])  # *A -> A
-            peer_id_variants.append(str(decoded_peer_id))  # *A -> *A
-        
-        # Tüm varyantları string'e çevir ve normalize et
-        peer_id_variants = [str(v).strip() for v in peer_id_variants if v]
-        # Tekrarları kaldır
-        peer_id_variants = list(dict.fromkeys(peer_id_variants))
-        
-        logger.info(f"🔍 Config için peer aranıyor: Peer ID={peer_id} (decoded: {decoded_peer_id}), Interface={interface}, Varyantlar={peer_id_variants}")
-        logger.info(f"📋 MikroTik'ten gelen peer sayısı: {len(peers)}")
-        if peers:
-            # Tüm peer'ların ID'lerini logla
-            all_peer_ids = []
-            for idx, p in enumerate(peers[:5]):
-                peer_id_from_mikrotik = p.get(".id") or p.get("id") or p.get("*id")
-                if peer_id_from_mikrotik is None:
-                    # Tüm anahtarları kontrol et
-                    for key in p.keys():
-                        if key.endswith('id') or key == '.id' or key.startswith('*'):
-                            peer_id_from_mikrotik = p.get(key)
-                            break
-                all_peer_ids.append(f"Peer[{idx}]: {peer_id_from_mikrotik} (tip: {type(peer_id_from_mikrotik).__name__})")
-            logger.info(f"📋 İlk 5 peer ID'leri: {all_peer_ids}")
-        
-        for p in peers:
-            # .id ve id alanlarını kontrol et - MikroTik'te genelde .id kullanılır
-            peer_dot_id = p.get(".id") or p.get("id") or p.get("*id")
-            
-            # Eğer hala None ise, tüm anahtarları kontrol et
-            if peer_dot_id is None:
-                for key in p.keys():
-                    if key.endswith('id') or key == '.id' or key.startswith('*'):
-                        peer_dot_id = p.get(key)
-                        logger.debug(f"Peer ID alternatif alandan bulundu: {key} = {peer_dot_id}")
-                        break
-            
-            if peer_dot_id is None:
-                logger.debug(f"Peer'da ID bulunamadı. Peer keys: {list(p.keys())}")
-                continue
-            
-            peer_dot_id_str = str(peer_dot_id).strip()
-            
-            # Direkt eşleşme kontrolü (hem string hem orijinal değer ile)
-            if peer_dot_id_str in peer_id_variants or peer_dot_id in peer_id_variants:
-                logger.info(f"✅ Peer bulundu (direkt eşleşme): Peer ID={peer_dot_id_str} (aranan: {peer_id})")
-                peer = p
-                break
-            
-            # Case-insensitive eşleşme (büyük/küçük harf duyarsız)
-            peer_dot_id_upper = peer_dot_id_str.upper()
-            variants_upper = [v.upper() for v in peer_id_variants]
-            if peer_dot_id_upper in variants_upper:
-                logger.info(f"✅ Peer bulundu (case-insensitive eşleşme): Peer ID={peer_dot_id_str} (aranan: {peer_id})")
-                peer = p
-                break
-            
-            # * karakterini kaldırarak karşılaştırma (hem baştan hem sondan)
-            peer_dot_id_normalized = peer_dot_id_str.lstrip("*").rstrip("*")
-            for variant in peer_id_variants:
-                variant_normalized = str(variant).lstrip("*").rstrip("*")
-                if peer_dot_id_normalized == variant_normalized:
-                    logger.info(f"✅ Peer bulundu (normalize edilmiş eşleşme): {peer_dot_id_normalized} == {variant_normalized}")
-                    peer = p
-                    break
-                
-                # Case-insensitive normalize edilmiş eşleşme
-                if peer_dot_id_normalized.upper() == variant_normalized.upper():
-                    logger.info(f"✅ Peer bulundu (case-insensitive normalize eşleşme): {peer_dot_id_normalized.upper()} == {variant_normalized.upper()}")
-                    peer = p
-                    break
-            
-            if peer:
-                break
-            
-            # * karakterini kaldırarak karşılaştırma
-            peer_dot_id_normalized = peer_dot_id_str.lstrip("*")
-            for variant in peer_id_variants:
-                variant_normalized = str(variant).lstrip("*")
-                if peer_dot_id_normalized == variant_normalized:
-                    logger.debug(f"Peer bulundu! Normalize edilmiş eşleşme: {peer_dot_id_normalized} == {variant_normalized}")
-                    peer = p
-                    break
-            
-            if peer:
-                break
-            
-            # Public key ile de eşleştirme yap (fallback) - normalize edilmiş key'leri kullan
-            peer_public_key = p.get("public-key") or p.get("public_key")
-            if peer_public_key:
-                peer_public_key_normalized = str(peer_public_key).strip()
-                if peer_public_key_normalized == str(peer_id).strip() or peer_public_key_normalized == str(decoded_peer_id).strip():
-                    logger.debug(f"Peer public key ile bulundu!")
-                    peer = p
-                    break
-        
+        import urllib.parse
+        decoded_peer_id = urllib.parse.unquote(peer_id).strip()
+
+        # Peer'ı indeksten veya router'a filtreli print ile bul (?.id=, bulunamazsa ?public-key=)
+        peer = await peer_snapshot_store.lookup(interface, peer_id=decoded_peer_id)
+        if not peer and len(decoded_peer_id) >= 40:
+            # ID yerine public key gönderilmiş olabilir
+            peer = await peer_snapshot_store.lookup(interface, public_key=decoded_peer_id)
+
         if not peer:
-            logger.warning(f"Config için peer bulunamadı. Peer ID: {peer_id} (decoded: {decoded_peer_id}), Interface: {interface}, Mevcut peer sayısı: {len(peers)}")
-            if peers:
-                logger.debug(f"Mevcut peer ID'leri: {[str(p.get('.id', 'YOK')) for p in peers]}")
-                logger.debug(f"Peer ID varyantları denenmiş: {peer_id_variants}")
-                # İlk peer'ın tüm anahtarlarını göster
-                if len(peers) > 0:
-                    logger.debug(f"İlk peer'ın tüm anahtarları: {list(peers[0].keys())}")
+            logger.warning(f"Config için peer bulunamadı. Peer ID: {peer_id}, Interface: {interface}")
             raise HTTPException(status_code=404, detail=f"Peer bulunamadı (ID: {peer_id})")
         
-        # Interface bilgilerini al - cache'i atla, doğrudan API'den çek (güncel veri için)
-        interfaces = await mikrotik_conn.get_wireguard_interfaces(use_cache=False)
-        interface_data = None
-        for i in interfaces:
-            if i.get("name") == interface or i.get(".id") == interface:
-                interface_data = i
-                break
-        
+        # Interface bilgileri (interface listesi cache'ten okunur)
+        interface_data = await find_interface(interface)
         if not interface_data:
             logger.warning(f"Config için interface bulunamadı. Interface: {interface}")
             raise HTTPException(status_code=404, detail=f"Interface bulunamadı: {interface}")
-        
-        # Debug: Interface verilerini logla
-        logger.info(f"📋 Config için interface verileri alındı: {interface_data.get('name')}")
-        logger.debug(f"Interface tüm anahtarları: {list(interface_data.keys())}")
-        # Public key'i farklı alanlardan kontrol et
-        interface_public_key_debug = interface_data.get("public-key") or interface_data.get("public_key") or interface_data.get("publicKey")
-        logger.info(f"🔑 Interface public key (debug): {interface_public_key_debug[:30] if interface_public_key_debug else 'BULUNAMADI'}...")
-        # Tüm alanları kontrol et (public içeren)
-        for key in interface_data.keys():
-            if 'public' in key.lower() or 'key' in key.lower():
-                logger.debug(f"Interface key alanı bulundu: {key} = {str(interface_data.get(key))[:30] if interface_data.get(key) else 'None'}...")
-        
-        # WireGuard config oluştur (client tarafı için)
-        config_lines = ["[Interface]"]
-        config_lines.append("")
-        
-        # Private key - Önce query parameter'dan kontrol et, yoksa veritabanından al
-        # NOT: MikroTik RouterOS'ta peer'lar için private-key alanı YOKTUR
-        # Private key veritabanında saklanır veya query parameter olarak gönderilir
-        client_private_key = private_key  # Query parameter'dan al
-        
-        # Query parameter'da yoksa veritabanından al
-        if not client_private_key:
-            try:
-                # ÖNCELİKLE Peer ID ile dene - bu en güvenilir yöntem
-                logger.info(f"🔍 Config için veritabanından private key aranıyor: Peer ID={peer_id}, tip={type(peer_id).__name__}, repr={repr(peer_id)}")
-
-                # Tüm veritabanındaki peer_id'leri logla (debugging için)
-                all_peer_keys_result = await db.execute(select(PeerKey))
-                all_peer_keys = all_peer_keys_result.scalars().all()
-                logger.info(f"📋 Veritabanındaki tüm peer_id'ler: {[pk.peer_id for pk in all_peer_keys]}")
-
-                # Orijinal peer_id ile dene
-                logger.info(f"🔍 Arama yapılıyor: PeerKey.peer_id == '{peer_id}'")
-                peer_id_result = await db.execute(
-                    select(PeerKey).where(PeerKey.peer_id == str(peer_id))
-                )
-                peer_key_record = peer_id_result.scalar_one_or_none()
-                logger.info(f"🔍 Orijinal peer_id ile sonuç: {'BULUNDU' if peer_key_record else 'BULUNAMADI'}")
-
-                # Eğer bulunamadıysa ve ID yıldız (*) ile başlıyorsa, normalize edilmiş ID ile dene (* karakterini kaldır)
-                if not peer_key_record and str(peer_id).startswith("*"):
-                    normalized_id = str(peer_id)[1:]
-                    logger.info(f"🔍 Normalize edilmiş ID ile deneniyor (yıldız kaldırıldı): '{normalized_id}'")
-                    peer_id_result_normalized = await db.execute(
-                        select(PeerKey).where(PeerKey.peer_id == normalized_id)
-                    )
-                    peer_key_record = peer_id_result_normalized.scalar_one_or_none()
-                    logger.info(f"🔍 Normalize edilmiş ID ile sonuç: {'BULUNDU' if peer_key_record else 'BULUNAMADI'}")
-
-                # Eğer hala bulunamadıysa ve ID yıldız ile BAŞLAMIYOR ise, başına * ekleyerek dene
-                if not peer_key_record and not str(peer_id).startswith("*"):
-                    with_asterisk_id = "*" + str(peer_id)
-                    logger.info(f"🔍 Yıldız eklenerek deneniyor: '{with_asterisk_id}'")
-                    peer_id_result_with_asterisk = await db.execute(
-                        select(PeerKey).where(PeerKey.peer_id == with_asterisk_id)
-                    )
-                    peer_key_record = peer_id_result_with_asterisk.scalar_one_or_none()
-                    logger.info(f"🔍 Yıldız eklenerek sonuç: {'BULUNDU' if peer_key_record else 'BULUNAMADI'}")
 
-                if peer_key_record:
-                    client_private_key = peer_key_record.private_key
-                    logger.info(f"✅ Private key Peer ID ile bulundu: Peer ID={peer_id}, Private Key uzunluk={len(client_private_key) if client_private_key else 0}")
-                else:
-                    # Peer ID ile bulunamadıysa, Public Key ile dene (fallback)
-                    peer_public_key = peer.get('public-key') or peer.get('public_key')
-                    if peer_public_key:
-                        peer_public_key_normalized = str(peer_public_key).strip()
-                        logger.warning(f"⚠️ Peer ID ile bulunamadı, Public Key ile deneniyor: {peer_public_key_normalized[:30]}...")
-
-                        result = await db.execute(
-                            select(PeerKey).where(PeerKey.public_key == peer_public_key_normalized)
-                        )
-                        peer_key_record = result.scalar_one_or_none()
-
-                        if peer_key_record:
-                            client_private_key = peer_key_record.private_key
-                            logger.info(f"✅ Private key Public Key ile bulundu: Private Key uzunluk={len(client_private_key) if client_private_key else 0}")
-                        else:
-                            logger.error(f"❌ Veritabanında private key bulunamadı! Peer ID={peer_id}, Public Key={peer_public_key_normalized[:30] if peer_public_key_normalized else 'YOK'}...")
-                    else:
-                        logger.error(f"❌ Peer'da public key yok ve Peer ID ile de bulunamadı: Peer ID={peer_id}")
-            except Exception as db_error:
-                logger.error(f"❌ Veritabanından private key alınamadı: {db_error}")
-                import traceback
-                logger.error(traceback.format_exc())
-        
-        # Private key'i normalize et (trim ve boşlukları temizle)
-        if client_private_key:
-            client_private_key = str(client_private_key).strip()
-        
-        if client_private_key and len(client_private_key) > 0:
-            config_lines.append(f"PrivateKey = {client_private_key}")
-        else:
-            # Private key yoksa placeholder kullan
-            config_lines.append("PrivateKey = <YOUR_PRIVATE_KEY>")
+        # Private key, client AllowedIPs ve endpoint PeerKey kaydından (tek sorgu)
+        # NOT: MikroTik RouterOS'ta peer'lar için private-key alanı YOKTUR
+        key_record = await find_peer_key(db, peer, decoded_peer_id)
+        if not private_key and not (key_record and key_record.private_key):
             logger.warning(f"⚠️ Private key bulunamadı. Peer ID: {peer_id}, Interface: {interface}. Config için placeholder kullanılıyor.")
-        
-        # Address (client'ın kullanacağı IP) - panelden çek (peer'dan allowed-address'ten)
-        if peer.get("allowed-address"):
-            # allowed-address virgülle ayrılmış olabilir, /32 olan IP'yi bul
-            addresses = peer.get("allowed-address").split(",")
-            client_address = None
-            for addr in addresses:
-                addr = addr.strip()
-                if "/32" in addr:
-                    client_address = addr
-                    break
-            if not client_address:
-                # /32 yoksa ilk adresi al
-                client_address = addresses[0].strip()
-            if client_address:
-                config_lines.append(f"Address = {client_address}")
-        
-        # MTU - varsayılan 1380
-        mtu = peer.get("mtu") or interface_data.get("mtu") or 1380
-        config_lines.append(f"MTU = {mtu}")
-        
-        # DNS - varsayılan 1.1.1.1
-        dns_value = peer.get("dns") or "1.1.1.1"
-        config_lines.append(f"DNS = {dns_value}")
-        
-        config_lines.append("")
-        config_lines.append("[Peer]")
-        config_lines.append("")
-        
-        # Server'ın public key'i - panelden çek (interface'den)
-        # Interface'den public key'i normalize et - hem 'public-key' hem 'public_key' kontrolü yap
-        interface_public_key = interface_data.get("public-key") or interface_data.get("public_key")
-        if interface_public_key:
-            interface_public_key = str(interface_public_key).strip()
-            config_lines.append(f"PublicKey = {interface_public_key}")
-        else:
-            logger.warning(f"⚠️ Interface public key bulunamadı. Interface: {interface}")
-        
-        # Allowed IPs - Client'ın hangi trafiği VPN üzerinden yönlendireceğini belirtir
-        # Kullanıcının girdiği değeri database'den al
-        peer_public_key = peer.get("public-key") or peer.get("public_key")
-        allowed_ips_value = "0.0.0.0/0, ::/0"  # Varsayılan
-        if peer_public_key:
-            try:
-                result = await db.execute(
-                    select(PeerKey).where(PeerKey.public_key == str(peer_public_key).strip())
-                )
-                peer_key_record = result.scalar_one_or_none()
-                if peer_key_record and peer_key_record.client_allowed_ips:
-                    allowed_ips_value = peer_key_record.client_allowed_ips
-                    logger.info(f"✅ Database'den client_allowed_ips alındı: {allowed_ips_value}")
-            except Exception as e:
-                logger.warning(f"⚠️ Database'den client_allowed_ips alınamadı: {e}")
-                allowed_ips_value = peer.get("endpoint-allowed-address") or peer.get("endpoint_allowed_address") or "0.0.0.0/0, ::/0"
-        else:
-            allowed_ips_value = peer.get("endpoint-allowed-address") or peer.get("endpoint_allowed_address") or "0.0.0.0/0, ::/0"
-        if allowed_ips_value:
-            allowed_ips_value = str(allowed_ips_value).strip()
-        if not allowed_ips_value or allowed_ips_value == "":
-            allowed_ips_value = "0.0.0.0/0, ::/0"
-        config_lines.append(f"AllowedIPs = {allowed_ips_value}")
-
-        # Endpoint - Database'den endpoint bilgisini al, yoksa varsayılan kullan
-        endpoint_address = None
-        endpoint_port = None
-        if peer_key_record:
-            endpoint_address = peer_key_record.endpoint_address
-            endpoint_port = peer_key_record.endpoint_port
-            logger.info(f"✅ Database'den endpoint bilgisi alındı: {endpoint_address}:{endpoint_port}")
-
-        # Endpoint oluştur - database'den veya varsayılan
-        if endpoint_address and endpoint_port:
-            endpoint = f"{endpoint_address}:{endpoint_port}"
-            config_lines.append(f"Endpoint = {endpoint}")
-        elif interface_data.get("listen-port"):
-            # Fallback: endpoint bilgisi yoksa varsayılan kullan
-            listen_port = interface_data.get("listen-port")
-            endpoint = f"vpn.sahacam.com:{listen_port}"
-            config_lines.append(f"Endpoint = {endpoint}")
-            logger.warning(f"⚠️ Database'de endpoint bilgisi yok, varsayılan kullanılıyor: {endpoint}")
-        
-        # Persistent Keepalive - varsayılan 25
-        if peer.get("persistent-keepalive"):
-            keepalive = peer.get("persistent-keepalive")
-            # 's' harfini kaldır
-            if keepalive.endswith("s"):
-                keepalive = keepalive[:-1]
-            elif keepalive.endswith("m"):
-                minutes = int(keepalive[:-1])
-                keepalive = str(minutes * 60)
-            config_lines.append(f"PersistentKeepalive = {keepalive}")
-        else:
-            # Default persistent keepalive: 25
-            config_lines.append("PersistentKeepalive = 25")
-        
-        # Pre-shared Key - normalize et
-        preshared_key = peer.get("preshared-key") or peer.get("preshared_key")
-        if preshared_key:
-            preshared_key = str(preshared_key).strip()
-            config_lines.append(f"PresharedKey = {preshared_key}")
-        
-        config = "\n".join(config_lines)
+
+        config = build_client_config(peer, interface_data, private_key, key_record)
         
         return {
             "success": True,
@@ -3134,6 +2245,85 @@ class BulkPeerOperation(BaseModel):
     interface: str
 
 
+async def _run_bulk_peer_operation(operation: BulkPeerOperation, command: str, action_label: str) -> Dict[str, Any]:
+    """
+    Toplu peer işlemini MikroTik'e tek pipeline ile gönderir ve peer bazlı sonuçları toplar
+
+    Args:
+        operation: Toplu işlem verisi (peer_ids ve interface)
+        command: MikroTik komutu (enable, disable, remove)
+        action_label: Mesajlarda kullanılacak işlem adı (örn: "aktif edildi")
+    """
+    # Tüm peer'lar tek round trip'te işlenir, event loop bloklanmaz
+    peer_results = await mikrotik_conn.bulk_update_peers(operation.interface, command, operation.peer_ids)
+
+    # Tekrarlanan ID'ler tek sonuçta birleşir, toplam işlenen peer sayısıdır
+    results = {
+        "success": [],
+        "failed": [],
+        "total": len(peer_results),
+    }
+
+    for peer_id, error in peer_results.items():
+        if error is None:
+            results["success"].append(peer_id)
+        else:
+            logger.error(f"❌ Toplu peer işlemi başarısız ({command}): {peer_id}, Hata: {error}")
+            results["failed"].append({"peer_id": peer_id, "error": error})
+
+    success_count = len(results["success"])
+    failed_count = len(results["failed"])
+    logger.info(f"✅ Toplu peer işlemi ({command}): {success_count} başarılı, {failed_count} başarısız")
+
+    return {
+        "success": failed_count == 0,
+        "message": f"{success_count} peer başarıyla {action_label}, {failed_count} başarısız",
+        "results": results
+    }
+
+
+@router.get("/peers/{interface}/export")
+async def export_peer_configs(
+    interface: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    group: Optional[str] = Query(None, description="Yalnızca bu gruptaki peer'lar"),
+    include_qr: bool = Query(True, description="Config'lerin yanına QR kod PNG'leri eklensin mi"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Interface'in (veya bir grubun) tüm client config'lerini ve QR kodlarını ZIP olarak indirir
+    ZIP parça parça akıtılır; QR'lar render havuzunda paralel üretilir
+    """
+    interface_data = await find_interface(interface)
+    if not interface_data:
+        raise HTTPException(status_code=404, detail=f"Interface bulunamadı: {interface}")
+
+    entries = await peer_config_renderer.prepare_export(db, interface_data, group)
+    if not entries:
+        detail = f"'{group}' grubunda peer bulunamadı" if group else f"Interface'de peer bulunamadı: {interface}"
+        raise HTTPException(status_code=404, detail=detail)
+
+    logger.info(f"📦 Config export: interface={interface}, grup={group or '-'}, {len(entries)} peer, kullanıcı={current_user.username}")
+
+    # Export private key içerdiği için kayıt altına alınır
+    background_tasks.add_task(
+        create_activity_log_background,
+        username=current_user.username,
+        action="peer_configs_exported",
+        details=f"Interface: {interface}, Grup: {group or '-'}, Peer: {len(entries)}, QR: {'evet' if include_qr else 'hayır'}",
+        ip_address=request.client.host if request and request.client else None
+    )
+
+    file_name = re.sub(r'[^\w.-]+', '_', f"{interface}_{group}" if group else interface)
+    return StreamingResponse(
+        peer_config_renderer.stream_zip(entries, include_qr=include_qr),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}_configs.zip"'}
+    )
+
+
 @router.post("/peers/bulk/enable")
 async def bulk_enable_peers(
     operation: BulkPeerOperation,
@@ -3148,57 +2338,8 @@ async def bulk_enable_peers(
     """
     logger.info(f"📦 Toplu peer aktif etme isteği: {len(operation.peer_ids)} peer")
     
-    results = {
-        "success": [],
-        "failed": [],
-        "total": len(operation.peer_ids),
-    }
-    
     try:
-        # MikroTik bağlantısını kontrol et
-        if not mikrotik_conn.connection:
-            await mikrotik_conn.connect()
-        
-        for peer_id in operation.peer_ids:
-            try:
-                # Peer'ı enable et
-                mikrotik_conn.connection.get_resource('/interface/wireguard/peers').call(
-                    'enable',
-                    {'.id': peer_id}
-                )
-                results["success"].append(peer_id)
-                logger.info(f"✅ Peer aktif edildi: {peer_id}")
-                
-                # [REMOVED] Log kaydı - greenlet conflict
-                # await create_log(
-                #     db=db,
-                #     action="enable_peer",
-                #     user=current_user.username,
-                #     details=f"Peer {peer_id} aktif edildi (bulk operation)",
-                #     success=True
-                # )
-            except Exception as e:
-                logger.error(f"❌ Peer aktif edilemedi: {peer_id}, Hata: {e}")
-                results["failed"].append({"peer_id": peer_id, "error": str(e)})
-                
-                # [REMOVED] Log kaydı - greenlet conflict
-                # await create_log(
-                #     db=db,
-                #     action="enable_peer",
-                #     user=current_user.username,
-                #     details=f"Peer {peer_id} aktif edilemedi: {str(e)}",
-                #     success=False
-                # )
-        
-        success_count = len(results["success"])
-        failed_count = len(results["failed"])
-        
-        return {
-            "success": failed_count == 0,
-            "message": f"{success_count} peer başarıyla aktif edildi, {failed_count} başarısız",
-            "results": results
-        }
-    
+        return await _run_bulk_peer_operation(operation, "enable", "aktif edildi")
     except Exception as e:
         logger.error(f"❌ Toplu peer aktif etme hatası: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -3218,57 +2359,8 @@ async def bulk_disable_peers(
     """
     logger.info(f"📦 Toplu peer pasif etme isteği: {len(operation.peer_ids)} peer")
     
-    results = {
-        "success": [],
-        "failed": [],
-        "total": len(operation.peer_ids),
-    }
-    
     try:
-        # MikroTik bağlantısını kontrol et
-        if not mikrotik_conn.connection:
-            await mikrotik_conn.connect()
-        
-        for peer_id in operation.peer_ids:
-            try:
-                # Peer'ı disable et
-                mikrotik_conn.connection.get_resource('/interface/wireguard/peers').call(
-                    'disable',
-                    {'.id': peer_id}
-                )
-                results["success"].append(peer_id)
-                logger.info(f"✅ Peer pasif edildi: {peer_id}")
-                
-                # [REMOVED] Log kaydı - greenlet conflict
-                # await create_log(
-                #     db=db,
-                #     action="disable_peer",
-                #     user=current_user.username,
-                #     details=f"Peer {peer_id} pasif edildi (bulk operation)",
-                #     success=True
-                # )
-            except Exception as e:
-                logger.error(f"❌ Peer pasif edilemedi: {peer_id}, Hata: {e}")
-                results["failed"].append({"peer_id": peer_id, "error": str(e)})
-                
-                # [REMOVED] Log kaydı - greenlet conflict
-                # await create_log(
-                #     db=db,
-                #     action="disable_peer",
-                #     user=current_user.username,
-                #     details=f"Peer {peer_id} pasif edilemedi: {str(e)}",
-                #     success=False
-                # )
-        
-        success_count = len(results["success"])
-        failed_count = len(results["failed"])
-        
-        return {
-            "success": failed_count == 0,
-            "message": f"{success_count} peer başarıyla pasif edildi, {failed_count} başarısız",
-            "results": results
-        }
-    
+        return await _run_bulk_peer_operation(operation, "disable", "pasif edildi")
     except Exception as e:
         logger.error(f"❌ Toplu peer pasif etme hatası: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -3288,62 +2380,118 @@ async def bulk_delete_peers(
     """
     logger.info(f"📦 Toplu peer silme isteği: {len(operation.peer_ids)} peer")
     
-    results = {
-        "success": [],
-        "failed": [],
-        "total": len(operation.peer_ids),
-    }
-    
     try:
-        # MikroTik bağlantısını kontrol et
-        if not mikrotik_conn.connection:
-            await mikrotik_conn.connect()
-        
-        for peer_id in operation.peer_ids:
-            try:
-                # Peer'ı sil
-                mikrotik_conn.connection.get_resource('/interface/wireguard/peers').call(
-                    'remove',
-                    {'.id': peer_id}
-                )
-                results["success"].append(peer_id)
-                logger.info(f"✅ Peer silindi: {peer_id}")
-                
-                # [REMOVED] Log kaydı - greenlet conflict
-                # await create_log(
-                #     db=db,
-                #     action="delete_peer",
-                #     user=current_user.username,
-                #     details=f"Peer {peer_id} silindi (bulk operation)",
-                #     success=True
-                # )
-            except Exception as e:
-                logger.error(f"❌ Peer silinemedi: {peer_id}, Hata: {e}")
-                results["failed"].append({"peer_id": peer_id, "error": str(e)})
-                
-                # [REMOVED] Log kaydı - greenlet conflict
-                # await create_log(
-                #     db=db,
-                #     action="delete_peer",
-                #     user=current_user.username,
-                #     details=f"Peer {peer_id} silinemedi: {str(e)}",
-                #     success=False
-                # )
-        
-        success_count = len(results["success"])
-        failed_count = len(results["failed"])
-        
-        return {
-            "success": failed_count == 0,
-            "message": f"{success_count} peer başarıyla silindi, {failed_count} başarısız",
-            "results": results
-        }
-    
+        return await _run_bulk_peer_operation(operation, "remove", "silindi")
     except Exception as e:
         logger.error(f"❌ Toplu peer silme hatası: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class BulkProvisionPeerSpec(BaseModel):
+    """Toplu oluşturmada tek peer tanımı (PeerAddRequest ile aynı alanlar)"""
+    name: Optional[str] = None
+    comment: Optional[str] = None
+    allowed_address: Optional[str] = None  # Boş veya "auto" ise IP Pool'dan tahsis edilir
+    public_key: Optional[str] = None  # Boşsa anahtar çifti otomatik üretilir
+    private_key: Optional[str] = None
+    preshared_key: Optional[str] = None
+    persistent_keepalive: Optional[str] = None
+    endpoint_allowed_address: Optional[str] = None
+    endpoint_address: Optional[str] = None
+    endpoint_port: Optional[int] = None
+    group_name: Optional[str] = None
+    group_color: Optional[str] = None
+    tags: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class BulkProvisionRequest(BaseModel):
+    """Toplu peer oluşturma isteği: peer listesi veya şablon + adet"""
+    interface: str
+    peers: Optional[List[BulkProvisionPeerSpec]] = None
+    template_id: Optional[int] = None
+    count: Optional[int] = Field(default=None, gt=0, le=settings.PROVISION_MAX_PEERS)  # Şablonla oluşturulacak peer sayısı
+    name_prefix: Optional[str] = None  # Şablonla oluşturmada peer adı öneki (varsayılan: şablon adı)
+
+
+@router.post("/peers/bulk/provision")
+async def bulk_provision_peers(
+    provision: BulkProvisionRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Birden fazla peer'ı tek işte oluşturur (müşteri lokasyonu kurulumu)
+    İş arka planda çalışır; ilerleme /ws/notifications üzerinden
+    "peer_provision_progress" mesajlarıyla akar, sonuç /peers/bulk/provision/{job_id} ile alınır
+    """
+    from app.services.peer_provisioning_service import peer_provisioning
+
+    if provision.peers:
+        specs = []
+        for peer in provision.peers:
+            spec = peer.model_dump()
+            spec["metadata"] = {
+                "group_name": spec.pop("group_name"),
+                "group_color": spec.pop("group_color"),
+                "tags": spec.pop("tags"),
+                "notes": spec.pop("notes"),
+            }
+            specs.append(spec)
+    elif provision.template_id and provision.count:
+        from app.services.peer_template_service import PeerTemplateService
+
+        template = await PeerTemplateService.get_template(db, provision.template_id)
+        if not template or not template.is_active:
+            raise HTTPException(status_code=404, detail=f"Aktif şablon bulunamadı: {provision.template_id}")
+        allowed = (template.allowed_address or "").strip().lower()
+        if provision.count > 1 and allowed not in ("", "auto"):
+            raise HTTPException(
+                status_code=400,
+                detail="Şablonda sabit IP tanımlı; birden fazla peer için şablonun allowed_address değeri 'auto' olmalı"
+            )
+        specs = peer_provisioning.specs_from_template(template, provision.count, provision.name_prefix)
+    else:
+        raise HTTPException(status_code=400, detail="Peer listesi veya template_id ile count gerekli")
+
+    if len(specs) > settings.PROVISION_MAX_PEERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tek istekte en fazla {settings.PROVISION_MAX_PEERS} peer oluşturulabilir"
+        )
+
+    logger.info(f"📦 Toplu peer oluşturma isteği: {len(specs)} peer, interface={provision.interface}, kullanıcı={current_user.username}")
+    job = peer_provisioning.submit(
+        provision.interface,
+        specs,
+        user_id=current_user.id,
+        username=current_user.username,
+        ip_address=request.client.host if request and request.client else None,
+        template_id=provision.template_id
+    )
+    return {
+        "success": True,
+        "message": f"{len(specs)} peer için oluşturma işi başlatıldı",
+        "job_id": job["job_id"],
+        "total": job["total"]
+    }
+
+
+@router.get("/peers/bulk/provision/{job_id}")
+async def get_bulk_provision_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Toplu oluşturma işinin durumunu ve peer bazlı sonuçlarını döner"""
+    from app.services.peer_provisioning_service import peer_provisioning
+
+    job = peer_provisioning.get_job(job_id)
+    if not job or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return {"success": True, "data": job}
+
+
 @router.post("/sync")
 async def sync_wireguard_from_mikrotik(
     request: Request,
@@ -3379,6 +2527,7 @@ async def sync_wireguard_from_mikrotik(
         # Sync başlat
         logger.info(f"Manuel sync tetiklendi: {current_user.username}")
         sync_result = await SyncService.perform_initial_sync(db)
+        peer_snapshot_store.invalidate()
 
         # Activity log kaydet
         await ActivityLogger.log(
@@ -3428,14 +2577,7 @@ async def get_peer_template(
     """
     try:
         # Önce peer'ın public key'ini al
-        peers = await mikrotik_conn.get_wireguard_peers(interface, use_cache=False)
-        peer = None
-        
-        for p in peers:
-            p_id = p.get('.id') or p.get('id')
-            if str(p_id) == str(peer_id) or str(p_id).lstrip('*') == str(peer_id).lstrip('*'):
-                peer = p
-                break
+        peer = await peer_snapshot_store.lookup(interface, peer_id=peer_id)
         
         if not peer:
             return {"template_id": None, "message": "Peer bulunamadı"}
@@ -3492,14 +2634,7 @@ async def update_peer_template(
         from sqlalchemy import update
         
         # Önce peer'ın public key'ini al (database'de güncellemek için)
-        peers = await mikrotik_conn.get_wireguard_peers(interface, use_cache=False)
-        peer = None
-        
-        for p in peers:
-            p_id = p.get('.id') or p.get('id')
-            if str(p_id) == str(peer_id) or str(p_id).lstrip('*') == str(peer_id).lstrip('*'):
-                peer = p
-                break
+        peer = await peer_snapshot_store.lookup(interface, peer_id=peer_id)
         
         if not peer:
             raise HTTPException(status_code=404, detail=f"Peer bulunamadı: {peer_id}")
@@ -3541,6 +2676,7 @@ async def update_peer_template(
             )
             db.add(new_peer_key)
             await db.commit()
+            peer_snapshot_store.invalidate(interface)
             logger.info(f"✅ Peer key kaydı oluşturuldu: {peer_id}")
         else:
             logger.info(f"✅ Template güncellendi: {peer_id} -> template_id={template_id}")
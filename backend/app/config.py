@@ -18,6 +18,77 @@ class Settings(BaseSettings):
     MIKROTIK_USER: str = "admin"
     MIKROTIK_PASSWORD: str = ""
     MIKROTIK_USE_TLS: bool = False
+    MIKROTIK_POOL_SIZE: int = 4  # Eşzamanlı RouterOS API oturumu sayısı
+    MIKROTIK_POOL_TIMEOUT: float = 30.0  # Havuzdan oturum beklerken maksimum süre (saniye)
+    # RouterOS API istemcisi: "routeros-api" (thread pool) veya "asyncio" (native, pipelined)
+    MIKROTIK_API_BACKEND: Literal["routeros-api", "asyncio"] = "routeros-api"
+    # Son başarılı router I/O'sundan bu kadar saniye geçmeden bağlantı test komutu gönderilmez
+    MIKROTIK_LIVENESS_IDLE_SECONDS: float = 30.0
+    # Bellekteki peer snapshot'ının router'dan yeniden çekilmeden sunulabileceği maksimum yaş (saniye)
+    PEER_SNAPSHOT_MAX_AGE: float = 20.0
+
+    # Trafik örnekleme ve rollup ayarları
+    TRAFFIC_SAMPLE_INTERVAL_SECONDS: int = 300  # Ham trafik örneği alma aralığı (saniye)
+    TRAFFIC_RAW_RETENTION_DAYS: int = 7  # Ham örneklerin saklanma süresi (gün)
+    TRAFFIC_HOURLY_RETENTION_DAYS: int = 90  # Saatlik özetlerin saklanma süresi (gün)
+    TRAFFIC_DAILY_RETENTION_DAYS: int = 730  # Günlük özetlerin saklanma süresi (gün), aylık/yıllık süresiz
+
+    # Dashboard özetinin yeniden hesaplanmadan sunulabileceği süre (saniye)
+    DASHBOARD_SUMMARY_TTL: float = 10.0
+
+    # WebSocket gönderim kuyrukları: bağlantı başına bekleyebilecek frame sayısı ve gönderim timeout'u (saniye)
+    WEBSOCKET_OUTBOX_SIZE: int = 64
+    WEBSOCKET_SEND_TIMEOUT: float = 5.0
+
+    # Interface örnekleyici: hız örnekleme aralığı, sayaç yenileme aralığı (saniye) ve halka tampon boyutu
+    INTERFACE_SAMPLE_INTERVAL: float = 1.0
+    INTERFACE_COUNTER_INTERVAL: float = 10.0
+    INTERFACE_SAMPLE_HISTORY: int = 120
+
+    # Bildirim dağıtıcısı: kuyruk boyutu, birleştirme penceresi (saniye) ve eşiği,
+    # kanal başına dakikalık gönderim sınırı ve tekrar deneme sayısı
+    NOTIFICATION_QUEUE_SIZE: int = 1000
+    NOTIFICATION_COALESCE_WINDOW: float = 5.0
+    NOTIFICATION_COALESCE_THRESHOLD: int = 3
+    NOTIFICATION_TELEGRAM_RATE: float = 20
+    NOTIFICATION_EMAIL_RATE: float = 30
+    NOTIFICATION_MAX_RETRIES: int = 3
+
+    # Log yazıcısı: audit/aktivite kayıtları kuyruğa alınır ve toplu INSERT ile yazılır
+    LOG_SINK_QUEUE_SIZE: int = 10000  # Kuyruk dolunca kaydeden istek yer açılana kadar bekler
+    LOG_SINK_BATCH_SIZE: int = 200  # Bu kadar kayıt birikince hemen yazılır
+    LOG_SINK_FLUSH_INTERVAL_MS: int = 500  # İlk kayıttan en geç bu kadar milisaniye sonra yazılır
+
+    # Log retention: tablo başına saklama süresi (gün, 0 = süresiz), çalışma aralığı (saniye),
+    # parça başına silinecek satır sayısı ve parçalar arası bekleme (saniye)
+    ACTIVITY_LOG_RETENTION_DAYS: int = 90
+    AUDIT_LOG_RETENTION_DAYS: int = 365
+    PEER_HANDSHAKE_RETENTION_DAYS: int = 90
+    TELEGRAM_LOG_RETENTION_DAYS: int = 90
+    EMAIL_LOG_RETENTION_DAYS: int = 90
+    LOG_RETENTION_INTERVAL_SECONDS: int = 3600
+    LOG_RETENTION_BATCH_SIZE: int = 5000
+    LOG_RETENTION_BATCH_PAUSE: float = 0.05
+
+    # Toplu peer oluşturma: istek başına maksimum peer ve router'a tek pipeline'da gönderilecek add sayısı
+    PROVISION_MAX_PEERS: int = 1000
+    PROVISION_ROUTER_BATCH_SIZE: int = 100
+
+    # WireGuard anahtar havuzu: önceden üretilip bellekte tutulan anahtar çifti sayısı
+    # ve arka planda yeniden doldurmanın başlayacağı eşik (0 = havuz kapalı, anahtar istek anında üretilir)
+    WG_KEY_POOL_SIZE: int = 256
+    WG_KEY_POOL_LOW_WATERMARK: int = 64
+
+    # Client config QR render cache'i: tutulacak PNG sayısı (LRU) ve render için process havuzu boyutu
+    # (0 worker = render thread'de yapılır)
+    CONFIG_RENDER_CACHE_SIZE: int = 512
+    CONFIG_RENDER_WORKERS: int = 2
+
+    # Redis cache ayarları
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 20  # Redis bağlantı havuzu boyutu
+    REDIS_L1_TTL: float = 5.0  # Process içi (L1) cache süresi (saniye), Redis TTL'inden uzun olamaz; 0 ise L1 kapalı
+    REDIS_L1_MAX_SIZE: int = 500  # Process içi (L1) cache'te tutulacak maksimum anahtar sayısı
 
     # Veritabanı
     DATABASE_URL: str = "sqlite:///./router_manager.db"
@@ -82,6 +82,8 @@ async def init_db():
         peer_handshake,
         traffic_log,
         peer_traffic_log,
+        peer_traffic_counter,
+        traffic_rollup,
         peer_key,
         notification,
         ip_pool,
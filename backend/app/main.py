@@ -16,7 +16,7 @@ from app.database.database import init_db
 from app.api import auth, wireguard, logs, mikrotik, traffic, users, notifications, backup, two_factor, sessions, avatar, activity_logs, websocket, ip_pool, peer_metadata, peer_template, dashboard, telegram_settings, telegram_logs, email_settings, system
 from app.utils.logger import setup_logger
 from app.utils.crypto import decrypt_password
-from app.utils.redis_cache import init_redis, get_cache_stats
+from app.utils.redis_cache import init_redis, close_redis, get_cache_stats
 from app.config import settings
 
 # Logger kurulumu
@@ -48,8 +48,8 @@ async def lifespan(app: FastAPI):
     
     # Redis cache başlat
     logger.info("Redis cache başlatılıyor...")
-    init_redis()
-    cache_stats = get_cache_stats()
+    await init_redis()
+    cache_stats = await get_cache_stats()
     logger.info(f"📊 Redis Cache Stats: {cache_stats}")
     
     # MikroTik ayarlarını veritabanından yükle
@@ -166,6 +166,22 @@ async def lifespan(app: FastAPI):
         import traceback
         logger.debug(traceback.format_exc())
     
+    # Log retention zamanlayıcısını başlat
+    try:
+        from app.services.log_retention_service import log_retention
+        log_retention.start()
+        logger.info("Log retention zamanlayıcısı başlatıldı")
+    except Exception as e:
+        logger.warning(f"Log retention zamanlayıcısı başlatılamadı: {e}")
+
+    # WireGuard anahtar havuzunu doldurmaya başla
+    try:
+        from app.services.wireguard_key_pool import wireguard_key_pool
+        wireguard_key_pool.start()
+        logger.info("WireGuard anahtar havuzu başlatıldı")
+    except Exception as e:
+        logger.warning(f"WireGuard anahtar havuzu başlatılamadı: {e}")
+
     logger.info("Uygulama başlatıldı")
     yield
     # Kapanışta temizlik işlemleri
@@ -179,6 +195,37 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Peer expiry zamanlayıcısı durdurulamadı: {e}")
 
+    # Log retention zamanlayıcısını durdur
+    from app.services.log_retention_service import log_retention
+    await log_retention.stop()
+
+    # Çalışan toplu peer oluşturma işlerini durdur
+    from app.services.peer_provisioning_service import peer_provisioning
+    await peer_provisioning.stop()
+
+    # Anahtar havuzu doldurma görevini durdur
+    from app.services.wireguard_key_pool import wireguard_key_pool
+    await wireguard_key_pool.stop()
+
+    # QR render process havuzunu kapat
+    from app.services.peer_config_service import peer_config_renderer
+    await peer_config_renderer.stop()
+
+    # Bekleyen Telegram/email bildirimlerini gönder ve bağlantıları kapat
+    from app.services.notification_dispatcher import notification_dispatcher
+    await notification_dispatcher.stop()
+
+    # Bekleyen audit/aktivite loglarını veritabanına yaz
+    from app.services.log_sink import log_sink
+    await log_sink.stop()
+
+    # Interface örnekleyiciyi durdur
+    from app.services.interface_sampler import interface_sampler
+    await interface_sampler.stop()
+
+    # Redis bağlantı havuzunu kapat
+    await close_redis()
+
 
 # FastAPI uygulaması oluştur
 app = FastAPI(
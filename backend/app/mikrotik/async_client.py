@@ -0,0 +1,388 @@
+"""
+Asyncio tabanlı MikroTik RouterOS API istemcisi
+RouterOS API wire protokolünü (uzunluk önekli kelimeler, !re/!done cümleleri, .tag) doğrudan uygular
+Thread executor kullanmaz, birden fazla komut tek socket üzerinde .tag ile paralel (pipelined) çalışır
+"""
+import asyncio
+import binascii
+import hashlib
+import itertools
+import logging
+import socket
+import ssl
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RouterOsTrapError(Exception):
+    """Router komutu !trap ile reddetti (örn: 'entry already exists')"""
+
+    def __init__(self, message: str, command: str):
+        self.trap_message = message
+        self.command = command
+        # routeros-api ile aynı mesaj formatı (hata metni üzerinden yapılan kontroller için)
+        super().__init__(f'Error "{message}" executing command {command}')
+
+
+class RouterOsConnectionError(ConnectionError):
+    """Socket kapandı, !fatal alındı veya protokol bozuldu"""
+
+
+class RouterOsResponse(list):
+    """
+    Komut yanıtı: !re satırları (dict listesi) + !done cümlesinin attribute'ları
+    Örn: add komutu yeni kaydın .id değerini done_message['ret'] içinde döner
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.done_message: Dict[str, str] = {}
+
+
+def encode_length(length: int) -> bytes:
+    """RouterOS API kelime uzunluğunu kodlar (1-5 byte)"""
+    if length < 0x80:
+        return bytes([length])
+    if length < 0x4000:
+        return (length | 0x8000).to_bytes(2, "big")
+    if length < 0x200000:
+        return (length | 0xC00000).to_bytes(3, "big")
+    if length < 0x10000000:
+        return (length | 0xE0000000).to_bytes(4, "big")
+    if length < 0x100000000:
+        return b"\xF0" + length.to_bytes(4, "big")
+    raise ValueError("RouterOS API kelimesi çok uzun")
+
+
+def encode_sentence(words: List[bytes]) -> bytes:
+    """Kelime listesini tek bir cümle olarak kodlar (sonunda boş kelime)"""
+    return b"".join(encode_length(len(word)) + word for word in words) + b"\x00"
+
+
+async def read_length(reader: asyncio.StreamReader) -> int:
+    """Stream'den kelime uzunluğunu okur"""
+    first = (await reader.readexactly(1))[0]
+    if first < 0x80:
+        return first
+    if first < 0xC0:
+        return ((first & 0x3F) << 8) | (await reader.readexactly(1))[0]
+    if first < 0xE0:
+        return ((first & 0x1F) << 16) | int.from_bytes(await reader.readexactly(2), "big")
+    if first < 0xF0:
+        return ((first & 0x0F) << 24) | int.from_bytes(await reader.readexactly(3), "big")
+    if first == 0xF0:
+        return int.from_bytes(await reader.readexactly(4), "big")
+    raise RouterOsConnectionError(f"Geçersiz kelime uzunluğu öneki: {first:#x}")
+
+
+async def read_sentence(reader: asyncio.StreamReader) -> List[bytes]:
+    """Stream'den boş kelimeye kadar tek bir cümle okur"""
+    words = []
+    while True:
+        length = await read_length(reader)
+        if length == 0:
+            return words
+        words.append(await reader.readexactly(length))
+
+
+def _encode_key(key: str) -> str:
+    """routeros-api ile uyumlu anahtar dönüşümü (id -> .id, _ -> -)"""
+    key = key.replace("_", "-")
+    if key in ("id", "proplist"):
+        return "." + key
+    return key
+
+
+def _decode_key(key: str) -> str:
+    """routeros-api ile uyumlu anahtar dönüşümü (.id -> id)"""
+    if key in (".id", ".proplist"):
+        return key[1:]
+    return key
+
+
+def _encode_value(value: Any) -> str:
+    """Python değerini RouterOS API değerine çevirir"""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, bytes):
+        return value.decode()
+    return str(value)
+
+
+def _parse_attributes(words: List[bytes]) -> Tuple[Dict[str, str], Optional[str]]:
+    """Cümledeki =key=value kelimelerini ve .tag değerini ayrıştırır"""
+    attributes: Dict[str, str] = {}
+    tag = None
+    for word in words:
+        if word.startswith(b"="):
+            key, _, value = word[1:].partition(b"=")
+            attributes[_decode_key(key.decode())] = value.decode("utf-8", errors="replace")
+        elif word.startswith(b".tag="):
+            tag = word[5:].decode()
+    return attributes, tag
+
+
+class _PendingCommand:
+    """Yanıtı beklenen tek bir etiketli komut"""
+
+    __slots__ = ("command", "rows", "future", "trap")
+
+    def __init__(self, command: str, future: asyncio.Future):
+        self.command = command
+        self.rows = RouterOsResponse()
+        self.future = future
+        self.trap: Optional[str] = None
+
+
+class AsyncRouterOsClient:
+    """
+    Tek socket üzerinde çalışan asyncio RouterOS API istemcisi
+    Her komut benzersiz bir .tag ile gönderilir, arka plan okuyucu task'ı
+    gelen cümleleri etiketlerine göre ilgili komuta dağıtır
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str,
+                 use_ssl: bool = False, timeout: float = 15.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password or ""
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, _PendingCommand] = {}
+        self._tags = itertools.count(1)
+        self._connected = False
+
+        # İstatistikler
+        self.commands_sent = 0
+        self.commands_failed = 0
+        self.max_in_flight = 0
+
+    @property
+    def connected(self) -> bool:
+        """Socket açık ve okuyucu task'ı çalışıyor mu?"""
+        return self._connected and self._reader_task is not None and not self._reader_task.done()
+
+    async def connect(self):
+        """Router'a bağlanır ve login olur"""
+        ssl_context = ssl.create_default_context() if self.use_ssl else None
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context,
+                                    server_hostname=self.host if ssl_context else None),
+            timeout=self.timeout
+        )
+        sock = self._writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+        self._connected = True
+        self._reader_task = asyncio.create_task(self._read_loop())
+        try:
+            await self._login()
+        except Exception:
+            await self.close()
+            raise
+        logger.info(f"MikroTik asyncio API bağlantısı kuruldu: {self.host}:{self.port} (TLS: {self.use_ssl})")
+
+    async def _login(self):
+        """
+        Önce challenge-response (RouterOS < 6.43) dener,
+        router challenge vermezse plaintext login (RouterOS >= 6.43) kullanır
+        """
+        try:
+            response = await self.call("/", "login")
+        except RouterOsTrapError:
+            response = RouterOsResponse()
+        if "ret" not in response.done_message:
+            response = await self.call("/", "login", {"name": self.username, "password": self.password})
+        if "ret" in response.done_message:
+            challenge = binascii.unhexlify(response.done_message["ret"])
+            digest = hashlib.md5(b"\x00" + self.password.encode() + challenge).hexdigest()
+            await self.call("/", "login", {"name": self.username, "response": "00" + digest})
+
+    async def _read_loop(self):
+        """Gelen cümleleri okuyup etiketlerine göre bekleyen komutlara dağıtır"""
+        error: Exception = RouterOsConnectionError("MikroTik bağlantısı kapandı (connection closed)")
+        try:
+            while True:
+                words = await read_sentence(self._reader)
+                if not words:
+                    continue
+                self._dispatch(words)
+        except asyncio.CancelledError:
+            pass
+        except RouterOsConnectionError as e:
+            error = e
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            error = RouterOsConnectionError(f"MikroTik bağlantısı koptu (connection lost): {e}")
+        except Exception as e:
+            logger.error(f"MikroTik asyncio API okuma hatası: {e}")
+            error = RouterOsConnectionError(f"MikroTik API yanıtı parse edilemedi (Malformed): {e}")
+        finally:
+            self._connected = False
+            self._fail_all(error)
+
+    def _dispatch(self, words: List[bytes]):
+        """Tek bir yanıt cümlesini ilgili komuta işler"""
+        reply = words[0]
+        attributes, tag = _parse_attributes(words[1:])
+
+        if reply == b"!fatal":
+            # !fatal etiket taşımaz, bağlantı router tarafından kapatılacak
+            message = attributes.get("message") or (words[1].decode(errors="replace") if len(words) > 1 else "")
+            raise RouterOsConnectionError(f"MikroTik fatal hata, connection kapatılıyor: {message}")
+
+        pending = self._pending.get(tag) if tag is not None else None
+        if pending is None:
+            # Timeout sonrası iptal edilmiş komutların geç gelen yanıtları
+            logger.debug(f"Bilinmeyen tag için yanıt atlandı: {tag} ({reply!r})")
+            return
+
+        if reply == b"!re":
+            pending.rows.append(attributes)
+        elif reply == b"!trap":
+            pending.trap = attributes.get("message", "unknown error")
+        elif reply == b"!done":
+            del self._pending[tag]
+            pending.rows.done_message = attributes
+            if pending.future.done():
+                return
+            if pending.trap is not None:
+                pending.future.set_exception(RouterOsTrapError(pending.trap, pending.command))
+            else:
+                pending.future.set_result(pending.rows)
+        elif reply == b"!empty":
+            # RouterOS 7.18+ boş sonuç bildirimi, ardından !done gelir
+            pass
+        else:
+            raise RouterOsConnectionError(f"Malformed sentence: {reply!r}")
+
+    def _fail_all(self, error: Exception):
+        """Bekleyen tüm komutları hata ile sonlandırır"""
+        pending, self._pending = self._pending, {}
+        for item in pending.values():
+            if not item.future.done():
+                item.future.set_exception(error)
+
+    def send(self, path: str, command: str, arguments: Optional[Dict[str, Any]] = None,
+             queries: Optional[Dict[str, Any]] = None) -> Tuple[str, asyncio.Future]:
+        """
+        Komutu yanıt beklemeden socket'e yazar (pipelining için)
+
+        Returns:
+            (tag, future) - future !done geldiğinde RouterOsResponse ile tamamlanır
+        """
+        if not self.connected:
+            raise RouterOsConnectionError("MikroTik asyncio API bağlantısı yok (not connected)")
+
+        tag = str(next(self._tags))
+        command_word = path.rstrip("/") + "/" + command
+        words = [command_word.encode()]
+        for key, value in (arguments or {}).items():
+            words.append(f"={_encode_key(key)}={_encode_value(value)}".encode())
+        for key, value in (queries or {}).items():
+            words.append(f"?{_encode_key(key)}={_encode_value(value)}".encode())
+        words.append(f".tag={tag}".encode())
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tag] = _PendingCommand(command_word, future)
+        # Tek write çağrısı: event loop içinde cümleler birbirine karışmaz
+        self._writer.write(encode_sentence(words))
+        self.commands_sent += 1
+        self.max_in_flight = max(self.max_in_flight, len(self._pending))
+        return tag, future
+
+    async def wait(self, tag: str, future: asyncio.Future, timeout: Optional[float] = None) -> RouterOsResponse:
+        """send() ile gönderilmiş komutun yanıtını bekler, timeout'ta komutu router'da iptal eder"""
+        try:
+            await self._writer.drain()
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.commands_failed += 1
+            self._cancel_tag(tag)
+            raise asyncio.TimeoutError(f"MikroTik komutu timeout oldu ({timeout or self.timeout}s)")
+        except Exception:
+            self.commands_failed += 1
+            raise
+
+    def _cancel_tag(self, tag: str):
+        """Yanıtı artık beklenmeyen komutu router tarafında /cancel ile durdurur"""
+        self._pending.pop(tag, None)
+        if self.connected:
+            try:
+                self._writer.write(encode_sentence([b"/cancel", f"=tag={tag}".encode()]))
+            except Exception as e:
+                logger.debug(f"/cancel gönderilemedi: {e}")
+
+    async def call(self, path: str, command: str, arguments: Optional[Dict[str, Any]] = None,
+                   queries: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> RouterOsResponse:
+        """Tek bir komut gönderir ve yanıtını bekler"""
+        tag, future = self.send(path, command, arguments, queries)
+        return await self.wait(tag, future, timeout)
+
+    async def call_many(self, path: str, command: str, argument_list: List[Dict[str, Any]],
+                        timeout: Optional[float] = None) -> List[Any]:
+        """
+        Aynı komutu farklı argümanlarla pipelined olarak gönderir
+        Tüm cümleler yanıt beklenmeden yazılır, yanıtlar tag'lerine göre toplanır
+
+        Returns:
+            Her argüman için RouterOsResponse veya RouterOsTrapError (sırası korunur)
+        """
+        sent = [self.send(path, command, arguments) for arguments in argument_list]
+        results = await asyncio.gather(
+            *(self.wait(tag, future, timeout) for tag, future in sent),
+            return_exceptions=True
+        )
+        for result in results:
+            # Trap komuta özeldir, diğer hatalar (bağlantı, timeout) tüm batch'i etkiler
+            if isinstance(result, BaseException) and not isinstance(result, RouterOsTrapError):
+                raise result
+        return results
+
+    async def execute(self, path: str, command: str, kwargs: Dict[str, Any],
+                      timeout: Optional[float] = None) -> RouterOsResponse:
+        """
+        MikroTikConnection.execute_command ile aynı semantikte komut çalıştırır
+        print için kwargs filtre (query), diğer komutlar için argüman olarak gönderilir
+        """
+        if command == "print":
+            return await self.call(path, "print", queries=kwargs, timeout=timeout)
+        if command in ("add", "set", "remove", "enable", "disable"):
+            return await self.call(path, command, arguments=kwargs, timeout=timeout)
+        raise ValueError(f"Bilinmeyen komut: {command}")
+
+    async def close(self):
+        """Bağlantıyı kapatır, bekleyen komutları hata ile sonlandırır"""
+        self._connected = False
+        if self._reader_task is not None and not self._reader_task.done():
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._reader_task = None
+        if self._writer is not None:
+            try:
+                self._writer.close()
+                await self._writer.wait_closed()
+            except Exception as e:
+                logger.debug(f"Socket kapatma hatası (göz ardı edildi): {e}")
+        self._writer = None
+        self._reader = None
+        self._fail_all(RouterOsConnectionError("MikroTik bağlantısı kapatıldı (connection closed)"))
+
+    def stats(self) -> Dict[str, Any]:
+        """İstemci istatistiklerini döner"""
+        return {
+            "backend": "asyncio",
+            "connected": self.connected,
+            "in_flight": len(self._pending),
+            "max_in_flight": self.max_in_flight,
+            "commands_sent": self.commands_sent,
+            "commands_failed": self.commands_failed,
+        }
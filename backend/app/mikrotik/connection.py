@@ -4,12 +4,16 @@ WireGuard ve diğer router işlemleri için API bağlantısı yönetir
 """
 import asyncio
 import logging
-from typing import Optional, List, Dict, Any
+import time
+from typing import Optional, List, Dict, Any, Tuple
 # routeros_api 0.19.0 versiyonunda RouterOsApiPool kullanılıyor
 from routeros_api import RouterOsApiPool
+from routeros_api.exceptions import RouterOsApiConnectionError, FatalRouterOsApiError, RouterOsApiCommunicationError
 from app.config import settings
+from app.mikrotik.pool import RouterSessionPool
+from app.mikrotik.async_client import AsyncRouterOsClient, RouterOsConnectionError, RouterOsTrapError
 from app.utils.cache import mikrotik_cache
-from app.utils.redis_cache import get_cache, set_cache, invalidate_pattern
+from app.utils.redis_cache import get_cache, set_cache, delete_cache, invalidate_pattern
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +29,144 @@ def get_telegram_service():
     return _telegram_service
 
 
+def _raise_parse_error(e: Exception, context: str):
+    """routeros-api '!re'/'Malformed' hatalarını daha anlaşılır hale getirir"""
+    error_str = str(e)
+    if "!re" in error_str or "Malformed" in error_str:
+        logger.error(f"MikroTik API parse hatası: {e}")
+        logger.error(context)
+        raise Exception(f"MikroTik API yanıtı parse edilemedi. Bağlantıyı kontrol edin. Hata: {error_str}")
+    raise e
+
+
+def _is_connection_error(e: Exception) -> bool:
+    """Hatanın socket/bağlantı kaynaklı olup olmadığını döner (retry ve lazy reconnect için)"""
+    if isinstance(e, (RouterOsApiConnectionError, FatalRouterOsApiError, RouterOsConnectionError,
+                      ConnectionError, asyncio.TimeoutError, OSError)):
+        return True
+    error_msg = str(e).lower()
+    return any(word in error_msg for word in ("connection", "timeout", "network", "bad file descriptor"))
+
+
+def _run_command_sync(api: Any, path: str, command: str, kwargs: Dict[str, Any]) -> Any:
+    """
+    Tek bir RouterOS komutunu blocking olarak çalıştırır
+    Resource alma ve komut çalıştırma tek executor çağrısında yapılır
+
+    Args:
+        api: Havuzdan alınmış RouterOsApi nesnesi
+        path: API path (örn: "/interface/wireguard")
+        command: Komut (print, add, set, remove, enable, disable)
+        kwargs: Komut parametreleri
+    """
+    # Path'i parse et (örn: "/interface/wireguard" -> ["interface", "wireguard"])
+    path_parts = [p for p in path.strip("/").split("/") if p]
+    resource = api.get_resource('/' + '/'.join(path_parts))
+
+    if command == "print":
+        # routeros-api'de filtreler query olarak geçilir ("?interface=name")
+        try:
+            return list(resource.get(**kwargs))
+        except Exception as e:
+            _raise_parse_error(e, f"Path: {path}, Kwargs: {kwargs}")
+    elif command == "add":
+        return resource.add(**kwargs)
+    elif command == "set":
+        # MikroTik API'de set komutu için parametreleri logla
+        logger.debug(f"MikroTik set komutu parametreleri: {kwargs}")
+        try:
+            result = resource.set(**kwargs)
+            logger.info(f"✅ MikroTik set komutu başarılı - Sonuç: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"❌ MikroTik set komutu hatası: {e}")
+            logger.error(f"Parametreler: {kwargs}")
+            raise
+    elif command == "remove":
+        return resource.remove(**kwargs)
+    elif command in ("enable", "disable"):
+        return resource.call(command, kwargs)
+    raise ValueError(f"Bilinmeyen komut: {command}")
+
+
+def _run_batch_sync(api: Any, path: str, command: str, item_ids: List[str],
+                    arguments: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    Aynı komutu birden fazla .id için tek oturumda pipelined çalıştırır (blocking)
+    Önce tüm cümleler gönderilir, ardından yanıtlar tag sırasıyla okunur
+
+    Returns:
+        {id: None (başarılı) veya hata mesajı}
+    """
+    resource = api.get_resource(path)
+    promises = []
+    for item_id in item_ids:
+        params = dict(arguments)
+        params[".id"] = item_id
+        promises.append((item_id, resource.call_async(command, params)))
+
+    results: Dict[str, Optional[str]] = {}
+    for item_id, promise in promises:
+        try:
+            promise.get()
+            results[item_id] = None
+        except RouterOsApiCommunicationError as e:
+            # !trap sadece ilgili .id'yi etkiler (örn: no such item)
+            message = e.original_message
+            results[item_id] = message.decode(errors="replace") if isinstance(message, bytes) else str(message)
+    return results
+
+
+def _run_pipeline_sync(api: Any, path: str, command: str,
+                       argument_list: List[Dict[str, Any]]) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Aynı komutu farklı argümanlarla tek oturumda pipelined çalıştırır (blocking)
+    Önce tüm cümleler gönderilir, ardından yanıtlar tag sırasıyla okunur
+
+    Returns:
+        Her argüman için (ret, hata mesajı) - add komutunda ret yeni kaydın .id değeridir
+    """
+    resource = api.get_resource(path)
+    promises = [resource.call_async(command, dict(arguments)) for arguments in argument_list]
+
+    results: List[Tuple[Optional[str], Optional[str]]] = []
+    for promise in promises:
+        try:
+            response = promise.get()
+            results.append((getattr(response, "done_message", {}).get("ret"), None))
+        except RouterOsApiCommunicationError as e:
+            message = e.original_message
+            results.append((None, message.decode(errors="replace") if isinstance(message, bytes) else str(message)))
+    return results
+
+
+# Geçersiz peer ID değerleri (frontend'den gelebilecek boş/tanımsız değerler)
+_INVALID_PEER_IDS = ("", "none", "undefined", "null")
+
+
+def normalize_peer_id(peer_id: Any) -> Optional[str]:
+    """
+    Peer .id değerini RouterOS formatına getirir ("5", "*5", " *a " -> "*5", "*A")
+    RouterOS .id değerleri onaltılıktır; geçersiz değerler (public key, "undefined" vb.) için None döner
+    """
+    if peer_id is None:
+        return None
+    value = str(peer_id).strip().lstrip("*").upper()
+    if value.lower() in _INVALID_PEER_IDS:
+        return None
+    try:
+        int(value, 16)
+    except ValueError:
+        return None
+    return f"*{value}"
+
+
 class MikroTikConnection:
     """
     MikroTik RouterOS API bağlantı yönetimi
     Async destekli bağlantı ve komut çalıştırma
+    Komutlar RouterSessionPool üzerinden paralel oturumlarda (routeros-api backend)
+    veya tek socket üzerinde pipelined olarak (asyncio backend) çalışır
     """
     
     def __init__(self):
@@ -38,53 +176,109 @@ class MikroTikConnection:
         self.username = settings.MIKROTIK_USER
         self.password = settings.MIKROTIK_PASSWORD
         self.use_tls = settings.MIKROTIK_USE_TLS
-        self.connection: Optional[RouterOsApiPool] = None  # RouterOsApiPool instance
-        self.api: Optional[Any] = None  # API object
+        self.connection: Optional[Any] = None  # İlk oturumun RouterOsApiPool'u veya AsyncRouterOsClient
+        self.api: Optional[Any] = None  # İlk oturumun API nesnesi (bağlantı durumu göstergesi)
+        self.session_pool: Optional[RouterSessionPool] = None
+        self.async_client: Optional[AsyncRouterOsClient] = None
+        self.backend = settings.MIKROTIK_API_BACKEND
+        self._plaintext_login: Optional[bool] = None  # İlk bağlantıda belirlenen login modu
+
+        # Pasif liveness: son başarılı I/O zamanı ve probe istatistikleri
+        self._last_io = 0.0
+        self.probes_sent = 0
+        self.probes_skipped = 0
+        self.probes_failed = 0
+        self.lazy_reconnects = 0
+
+        # Tam yeniden bağlanma kilidi ve havuz nesli: eşzamanlı hata alan çağrılar havuzu tek tek
+        # yeniden kurmaz; kilidi bekleyen çağrı, nesil değişmişse başkasının kurduğu havuzu kullanır
+        self._reconnect_lock: Optional[asyncio.Lock] = None
+        self._pool_generation = 0
+
+        # Peer değişiklik sayaçları: peer'ları değiştiren her işlem ilgili sayacı artırır,
+        # bellekteki peer snapshot'ları bu sayaç ile bayatlığını anlar
+        self._peer_generations: Dict[str, int] = {}
+        self._global_peer_generation = 0
     
+    def _create_session(self):
+        """
+        Yeni bir RouterOS API oturumu açar (blocking)
+        RouterOS eski versiyonları plaintext login gerektirebilir,
+        ilk başarılı login modu sonraki oturumlarda tekrar kullanılır
+
+        Returns:
+            (RouterOsApiPool, api) çifti
+        """
+        modes = [self._plaintext_login] if self._plaintext_login is not None else [False, True]
+        last_error = None
+        for plaintext in modes:
+            try:
+                pool = RouterOsApiPool(
+                    self.host,
+                    username=self.username,
+                    password=self.password,
+                    port=self.port,
+                    use_ssl=self.use_tls,
+                    plaintext_login=plaintext
+                )
+                api = pool.get_api()
+                if self._plaintext_login is None:
+                    login_type = "plaintext login" if plaintext else "normal login"
+                    logger.info(f"MikroTik bağlantısı kuruldu ({login_type}, TLS: {self.use_tls})")
+                self._plaintext_login = plaintext
+                return pool, api
+            except Exception as e:
+                last_error = e
+                if not plaintext and len(modes) > 1:
+                    # Normal login başarısız, plaintext dene
+                    logger.warning(f"Normal login başarısız, plaintext login deneniyor: {e}")
+        raise last_error
+
     async def connect(self) -> bool:
         """
         MikroTik router'a bağlanır
+        Oturum havuzunu oluşturur ve ilk oturumu açarak kimlik bilgilerini doğrular
         
         Returns:
             Bağlantı başarılıysa True
         """
         try:
-            # RouterOS API blocking olduğu için thread pool'da çalıştır
-            # RouterOsApiPool kullanımı
-            loop = asyncio.get_event_loop()
-            
-            def create_connection():
-                # RouterOS eski versiyonları plaintext login gerektirebilir
-                # Önce normal login dene, başarısız olursa plaintext kullan
-                try:
-                    pool = RouterOsApiPool(
-                        self.host,
-                        username=self.username,
-                        password=self.password,
-                        port=self.port,
-                        use_ssl=self.use_tls,
-                        plaintext_login=False
-                    )
-                    api = pool.get_api()
-                    logger.info(f"MikroTik bağlantısı kuruldu (normal login, TLS: {self.use_tls})")
-                    return pool, api
-                except Exception as e:
-                    # Normal login başarısız, plaintext dene
-                    logger.warning(f"Normal login başarısız, plaintext login deneniyor: {e}")
-                    pool = RouterOsApiPool(
-                        self.host,
-                        username=self.username,
-                        password=self.password,
-                        port=self.port,
-                        use_ssl=self.use_tls,
-                        plaintext_login=True  # Eski RouterOS için
-                    )
-                    api = pool.get_api()
-                    logger.info(f"MikroTik bağlantısı kuruldu (plaintext login, TLS: {self.use_tls})")
-                    return pool, api
-            
-            self.connection, self.api = await loop.run_in_executor(None, create_connection)
-            logger.info(f"MikroTik router'a bağlanıldı: {self.host}:{self.port}")
+            # Ayarlar değişmiş olabilir, login modunu ve backend'i yeniden belirle
+            self._plaintext_login = None
+            self.backend = settings.MIKROTIK_API_BACKEND
+            await self._close_pool()
+
+            if self.backend == "asyncio":
+                # Native asyncio istemci: thread kullanmaz, komutlar tek socket'te pipelined çalışır
+                client = AsyncRouterOsClient(
+                    self.host,
+                    self.port,
+                    self.username,
+                    self.password,
+                    use_ssl=self.use_tls
+                )
+                await client.connect()
+                self.async_client = client
+                self.connection, self.api = client, client
+                self._pool_generation += 1
+                self._mark_io()
+                logger.info(f"MikroTik router'a bağlanıldı: {self.host}:{self.port} (asyncio API)")
+                return True
+
+            session_pool = RouterSessionPool(
+                self._create_session,
+                size=settings.MIKROTIK_POOL_SIZE,
+                checkout_timeout=settings.MIKROTIK_POOL_TIMEOUT
+            )
+            # RouterOS API blocking olduğu için havuzun thread pool'unda çalıştır
+            pool, api = await session_pool.run_blocking(self._create_session)
+            await session_pool.add_session(pool, api)
+
+            self.session_pool = session_pool
+            self.connection, self.api = pool, api
+            self._pool_generation += 1
+            self._mark_io()
+            logger.info(f"MikroTik router'a bağlanıldı: {self.host}:{self.port} (oturum havuzu: {session_pool.size})")
             return True
         except Exception as e:
             logger.error(f"MikroTik bağlantı hatası: {e}")
@@ -92,24 +286,189 @@ class MikroTikConnection:
             self.api = None
             return False
     
+    async def _close_pool(self):
+        """Oturum havuzundaki tüm oturumları ve asyncio istemcisini kapatır"""
+        session_pool = self.session_pool
+        self.session_pool = None
+        if session_pool is not None:
+            await session_pool.close()
+            session_pool.shutdown_executor()
+        client = self.async_client
+        self.async_client = None
+        if client is not None:
+            await client.close()
+
     async def disconnect(self):
         """Bağlantıyı kapatır"""
-        if self.connection:
+        if self.connection or self.session_pool or self.async_client:
             try:
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, self.connection.disconnect)
+                await self._close_pool()
                 logger.info("MikroTik bağlantısı kapatıldı")
             except Exception as e:
                 logger.error(f"Bağlantı kapatma hatası: {e}")
             finally:
                 self.connection = None
                 self.api = None
+
+    async def run_with_api(self, func, timeout: Optional[float] = None) -> Any:
+        """
+        Havuzdan bir oturum alıp blocking bir fonksiyonu o oturumun API nesnesiyle çalıştırır
+        Doğrudan routeros-api çağrısı gereken yerler (monitor-traffic gibi) için kullanılır
+
+        Args:
+            func: api parametresi alan blocking fonksiyon
+            timeout: Opsiyonel timeout (saniye)
+
+        Returns:
+            Fonksiyonun dönüş değeri
+        """
+        if self.session_pool is None:
+            raise Exception("MikroTik router'a bağlanılamadı")
+
+        session_pool = self.session_pool
+        async with session_pool.session() as session:
+            call = session_pool.run_blocking(func, session.api)
+            try:
+                if timeout:
+                    return await asyncio.wait_for(call, timeout=timeout)
+                return await call
+            except Exception as e:
+                # Bağlantı hatasında yalnızca bu oturum atılır, havuzdaki diğer oturumlar çalışmaya devam eder
+                if _is_connection_error(e):
+                    session.broken = True
+                raise
+
+    async def call(self, path: str, command: str, arguments: Optional[Dict[str, Any]] = None,
+                   queries: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Ham RouterOS API komutu çalıştırır (monitor-traffic gibi özel komutlar için)
+        Retry yapmaz, iki backend ile de çalışır
+
+        Args:
+            path: API path (örn: "/interface")
+            command: Komut adı (örn: "monitor-traffic")
+            arguments: Komut argümanları (=key=value)
+            queries: Filtreler (?key=value)
+            timeout: Opsiyonel timeout (saniye)
+
+        Returns:
+            Yanıt satırları (dict listesi)
+        """
+        if self.async_client is not None:
+            result = list(await self.async_client.call(path, command, arguments, queries, timeout=timeout))
+        else:
+            result = await self.run_with_api(
+                lambda api: list(api.get_resource(path).call(command, arguments or {}, queries or {})),
+                timeout=timeout
+            )
+        self._mark_io()
+        return result
+
+    async def _run_command(self, path: str, command: str, kwargs: Dict[str, Any]) -> Any:
+        """Komutu aktif backend ile çalıştırır"""
+        if self.async_client is not None:
+            try:
+                result = await self.async_client.execute(path, command, kwargs)
+            except Exception as e:
+                if command == "print":
+                    _raise_parse_error(e, f"Path: {path}, Kwargs: {kwargs}")
+                raise
+        else:
+            # Resource alma + komut tek executor çağrısında, havuzdan alınan oturumda çalışır
+            result = await self.run_with_api(
+                lambda api: _run_command_sync(api, path, command, kwargs)
+            )
+        self._mark_io()
+        return result
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Oturum havuzu / asyncio istemci istatistiklerini döner"""
+        liveness = self.get_liveness_stats()
+        if self.async_client is not None:
+            return {"connected": self.async_client.connected, **self.async_client.stats(), "liveness": liveness}
+        if self.session_pool is None:
+            return {"connected": False, "liveness": liveness}
+        return {"connected": True, "backend": "routeros-api", **self.session_pool.stats(), "liveness": liveness}
     
+    def _mark_peers_changed(self, interface: Optional[str] = None):
+        """
+        Peer değişikliğini kaydeder
+        Interface bilinmiyorsa tüm interface'ler değişmiş sayılır
+        """
+        if interface:
+            self._peer_generations[interface] = self._peer_generations.get(interface, 0) + 1
+        else:
+            self._global_peer_generation += 1
+
+    def get_peer_generation(self, interface: str) -> int:
+        """Interface'in peer değişiklik sayacını döner (snapshot tutarlılığı için)"""
+        return self._global_peer_generation + self._peer_generations.get(interface, 0)
+
+    def _mark_io(self):
+        """Başarılı router I/O zamanını kaydeder (pasif liveness tespiti için)"""
+        self._last_io = time.monotonic()
+
+    async def _notify_disconnect(self, description: str, error: str):
+        """MikroTik bağlantı kopması için Telegram bildirimi gönderir"""
+        try:
+            from app.database.database import AsyncSessionLocal
+            TelegramService = get_telegram_service()
+            async with AsyncSessionLocal() as db:
+                await TelegramService.send_critical_event(
+                    db=db,
+                    event_type="mikrotik_disconnect",
+                    title="⚠️ MikroTik Bağlantısı Koptu",
+                    description=description,
+                    details=f"Host: {self.host}:{self.port}\nHata: {error}"
+                )
+                logger.info(f"Telegram bildirimi gönderildi: mikrotik_disconnect")
+        except Exception as telegram_error:
+            # Telegram hatası bağlantı işlemini etkilemez
+            logger.error(f"Telegram bildirimi gönderilemedi: {telegram_error}")
+
+    def get_liveness_stats(self) -> Dict[str, Any]:
+        """Liveness probe istatistiklerini döner (kaç probe atlandı/gönderildi)"""
+        idle = time.monotonic() - self._last_io if self._last_io else None
+        return {
+            "idle_threshold_seconds": settings.MIKROTIK_LIVENESS_IDLE_SECONDS,
+            "seconds_since_last_io": round(idle, 1) if idle is not None else None,
+            "probes_sent": self.probes_sent,
+            "probes_skipped": self.probes_skipped,
+            "probes_failed": self.probes_failed,
+            "lazy_reconnects": self.lazy_reconnects,
+        }
+    
+    async def _reconnect(self, generation: int) -> bool:
+        """
+        Havuzu/istemciyi kapatıp yeniden bağlanır (kilitli)
+        Kilidi beklerken başka bir çağrı havuzu zaten yenilediyse (nesil değiştiyse) tekrar kurulmaz,
+        böylece aynı anda hata alan komutlar birbirinin yeni kurduğu havuzu kapatmaz
+
+        Args:
+            generation: Çağıranın hata aldığı havuzun nesli (_pool_generation)
+        """
+        if self._reconnect_lock is None:
+            self._reconnect_lock = asyncio.Lock()
+        async with self._reconnect_lock:
+            if self._pool_generation != generation and self.api is not None:
+                return True
+            try:
+                await self.disconnect()
+            except Exception as disconnect_error:
+                logger.debug(f"Disconnect hatası (göz ardı edildi): {disconnect_error}")
+            self._last_io = 0.0
+            logger.info(f"MikroTik'e otomatik bağlanılıyor: {self.host}:{self.port}")
+            return await self.connect()
+
     async def ensure_connected(self) -> bool:
         """
         Bağlantının aktif olduğundan emin olur, değilse yeniden bağlanır
         Her cihaz yeniden başladığında otomatik bağlanır
         
+        Pasif liveness: Son başarılı I/O MIKROTIK_LIVENESS_IDLE_SECONDS içindeyse
+        test komutu gönderilmez. Kopmuş bağlantı gerçek komut başarısız olduğunda
+        execute_command içinde tespit edilip yeniden kurulur.
+        
         Returns:
             Bağlantı başarılıysa True
         """
@@ -118,91 +477,45 @@ class MikroTikConnection:
             logger.error("MikroTik bağlantı bilgileri eksik (host veya username yok)")
             return False
         
+        generation = self._pool_generation
+
         # Bağlantı varsa ve aktifse kontrol et
-        if self.connection is not None and self.api is not None:
+        if (self.session_pool is not None or self.async_client is not None) and self.api is not None:
+            # asyncio istemcide socket kapanması okuyucu task'ı tarafından anında tespit edilir
+            client_alive = self.async_client is None or self.async_client.connected
+            idle = time.monotonic() - self._last_io
+            if client_alive and idle < settings.MIKROTIK_LIVENESS_IDLE_SECONDS:
+                self.probes_skipped += 1
+                return True
+            
             try:
-                # Basit bir test komutu çalıştırarak bağlantının aktif olduğunu doğrula
+                if not client_alive:
+                    raise RouterOsConnectionError("MikroTik asyncio API bağlantısı kapanmış (connection closed)")
+                # Uzun süre I/O yapılmadı, basit bir test komutu ile bağlantıyı doğrula
                 # Timeout ile sınırlı (15 saniye - yavaş ağlar için artırıldı)
-                loop = asyncio.get_event_loop()
-                
-                # Test komutu için timeout ekle
-                def test_connection():
-                    try:
-                        return self.api.get_resource('/system/resource').get()
-                    except Exception as test_error:
-                        # Bad file descriptor veya connection hatası
-                        raise test_error
-                
-                # asyncio.wait_for ile timeout kontrolü
-                await asyncio.wait_for(
-                    loop.run_in_executor(None, test_connection),
-                    timeout=15.0  # 15 saniye timeout (yavaş ağlar için)
-                )
+                self.probes_sent += 1
+                await self.call('/system/resource', 'print', timeout=15.0)  # 15 saniye timeout (yavaş ağlar için)
                 return True
             except asyncio.TimeoutError:
                 # Bağlantı timeout oldu
+                self.probes_failed += 1
                 logger.warning(f"MikroTik bağlantısı timeout (15s), yeniden bağlanılıyor")
-                
-                # Telegram bildirimi gönder
-                try:
-                    from app.database.database import AsyncSessionLocal
-                    TelegramService = get_telegram_service()
-                    async with AsyncSessionLocal() as db:
-                        await TelegramService.send_critical_event(
-                            db=db,
-                            event_type="mikrotik_disconnect",
-                            title="⚠️ MikroTik Bağlantısı Koptu",
-                            description=f"Router bağlantısı timeout (15s)",
-                            details=f"Host: {self.host}:{self.port}\nHata: Connection timeout"
-                        )
-                        logger.info(f"Telegram bildirimi gönderildi: mikrotik_disconnect (timeout)")
-                except Exception as telegram_error:
-                    logger.error(f"Telegram bildirimi gönderilemedi: {telegram_error}")
-                
-                # Bağlantıyı zorla kapat
-                try:
-                    await self.disconnect()
-                except:
-                    pass
-                self.connection = None
-                self.api = None
+                await self._notify_disconnect("Router bağlantısı timeout (15s)", "Connection timeout")
                 
             except Exception as e:
                 # Bağlantı kopmuş, yeniden bağlan
+                self.probes_failed += 1
                 logger.warning(f"MikroTik bağlantısı kopmuş, yeniden bağlanılıyor: {e}")
-                
-                # Telegram bildirimi gönder (async, non-blocking)
-                try:
-                    from app.database.database import AsyncSessionLocal
-                    TelegramService = get_telegram_service()
-                    async with AsyncSessionLocal() as db:
-                        await TelegramService.send_critical_event(
-                            db=db,
-                            event_type="mikrotik_disconnect",
-                            title="⚠️ MikroTik Bağlantısı Koptu",
-                            description=f"Router bağlantısı kesildi",
-                            details=f"Host: {self.host}:{self.port}\nHata: {str(e)}"
-                        )
-                        logger.info(f"Telegram bildirimi gönderildi: mikrotik_disconnect")
-                except Exception as telegram_error:
-                    # Telegram hatası bağlantı işlemini etkilemez
-                    logger.error(f"Telegram bildirimi gönderilemedi: {telegram_error}")
-                
-                try:
-                    await self.disconnect()
-                except Exception as disconnect_error:
-                    logger.debug(f"Disconnect hatası (göz ardı edildi): {disconnect_error}")
-                self.connection = None
-                self.api = None
+                await self._notify_disconnect("Router bağlantısı kesildi", str(e))
         
-        # Bağlantı yoksa veya kopmuşsa yeniden bağlan
-        logger.info(f"MikroTik'e otomatik bağlanılıyor: {self.host}:{self.port}")
-        return await self.connect()
+        # Bağlantı yoksa veya kopmuşsa yeniden bağlan (başka bir çağrı yenilediyse onun havuzu kullanılır)
+        return await self._reconnect(generation)
     
     async def execute_command(self, path: str, command: str = "print", **kwargs) -> List[Dict[str, Any]]:
         """
         MikroTik API komutu çalıştırır
         Retry mekanizması ve timeout desteği ile
+        Her çağrı havuzdan ayrı bir oturum alır, farklı çağrılar paralel çalışabilir
         
         Args:
             path: API path (örn: "/interface/wireguard")
@@ -215,91 +528,20 @@ class MikroTikConnection:
         max_retries = 3  # Maksimum 3 deneme
         retry_delay = 1.0  # Her deneme arasında 1 saniye bekle (stabil)
         
+        generation = self._pool_generation
+        disconnect_notified = False
         for attempt in range(max_retries):
             try:
-                # Bağlantının açık olduğundan emin ol (her komut öncesi kontrol et)
+                # Bağlantının açık olduğundan emin ol (yakın zamanda I/O yapıldıysa probe gönderilmez)
                 if not await self.ensure_connected():
                     raise Exception("MikroTik router'a bağlanılamadı")
+                generation = self._pool_generation
                 
-                loop = asyncio.get_event_loop()
-                
-                # API nesnesini kullan (RouterOsApiPool'dan get_api() ile alınmış)
-                api = self.api
-                
-                if api is None:
-                    raise Exception("API nesnesi bulunamadı. Bağlantı kurulmamış olabilir.")
-                
-                # Path'i parse et (örn: "/interface/wireguard" -> ["interface", "wireguard"])
-                path_parts = [p for p in path.strip("/").split("/") if p]
-                
-                # Resource'a eriş - routeros-api'de get_resource metodu kullanılır
-                def get_resource():
-                    # get_resource metodu path string'i alır
-                    resource_path = '/' + '/'.join(path_parts)
-                    return api.get_resource(resource_path)
-                
-                resource = await loop.run_in_executor(None, get_resource)
-                
-                # Komutu çalıştır - kwargs dictionary olarak geçilmeli
-                if command == "print":
-                    # Print komutu için kwargs'ı filtrele (interface gibi)
-                    # routeros-api'de interface filtresi için "?interface=name" formatı kullanılır
-                    print_kwargs = {}
-                    if "interface" in kwargs:
-                        # Interface filtresi için query kullan
-                        def execute():
-                            try:
-                                return list(resource.get(interface=kwargs["interface"]))
-                            except Exception as e:
-                                error_str = str(e)
-                                # !re hatasını yakala ve daha anlaşılır hale getir
-                                if "!re" in error_str or "Malformed" in error_str:
-                                    logger.error(f"MikroTik API parse hatası: {e}")
-                                    logger.error(f"Path: {path}, Interface: {kwargs.get('interface')}")
-                                    # Bağlantıyı yeniden kurmayı dene
-                                    raise Exception(f"MikroTik API yanıtı parse edilemedi. Bağlantıyı kontrol edin. Hata: {error_str}")
-                                raise
-                        result = await loop.run_in_executor(None, execute)
-                    else:
-                        # Diğer filtreler için
-                        for k, v in kwargs.items():
-                            if k != "interface":
-                                print_kwargs[k] = v
-                        if print_kwargs:
-                            def execute():
-                                try:
-                                    return list(resource.get(**print_kwargs))
-                                except Exception as e:
-                                    error_str = str(e)
-                                    # !re hatasını yakala ve daha anlaşılır hale getir
-                                    if "!re" in error_str or "Malformed" in error_str:
-                                        logger.error(f"MikroTik API parse hatası: {e}")
-                                        logger.error(f"Path: {path}, Kwargs: {print_kwargs}")
-                                        raise Exception(f"MikroTik API yanıtı parse edilemedi. Bağlantıyı kontrol edin. Hata: {error_str}")
-                                    raise
-                            result = await loop.run_in_executor(None, execute)
-                        else:
-                            def execute():
-                                try:
-                                    return list(resource.get())
-                                except Exception as e:
-                                    error_str = str(e)
-                                    # !re hatasını yakala ve daha anlaşılır hale getir
-                                    if "!re" in error_str or "Malformed" in error_str:
-                                        logger.error(f"MikroTik API parse hatası: {e}")
-                                        logger.error(f"Path: {path}")
-                                        raise Exception(f"MikroTik API yanıtı parse edilemedi. Bağlantıyı kontrol edin. Hata: {error_str}")
-                                    raise
-                            result = await loop.run_in_executor(None, execute)
-                elif command == "add":
+                if command == "add":
                     # Add komutu için kwargs'ı logla
                     logger.info(f"🔍 MikroTik API add komutu - Path: {path}, kwargs: {kwargs}")
                     if "allowed-address" in kwargs:
                         logger.info(f"🔍 add komutu allowed-address: '{kwargs['allowed-address']}'")
-
-                    def execute():
-                        return resource.add(**kwargs)
-                    result = await loop.run_in_executor(None, execute)
                 elif command == "set":
                     # Set komutu için kwargs'ı logla
                     logger.info(f"🔍 MikroTik API set komutu - Path: {path}, kwargs: {kwargs}")
@@ -307,33 +549,15 @@ class MikroTikConnection:
                         logger.info(f"🔍 set komutu allowed-address: '{kwargs['allowed-address']}'")
                         logger.info(f"🔍 allowed-address karakter sayısı: {len(kwargs['allowed-address'])}")
                         logger.info(f"🔍 allowed-address virgül sayısı: {kwargs['allowed-address'].count(',')}")
-
-                    def execute():
-                        # MikroTik API'de set komutu için parametreleri logla
-                        logger.debug(f"MikroTik set komutu parametreleri: {kwargs}")
-                        try:
-                            result = resource.set(**kwargs)
-                            logger.info(f"✅ MikroTik set komutu başarılı - Sonuç: {result}")
-                            return result
-                        except Exception as e:
-                            logger.error(f"❌ MikroTik set komutu hatası: {e}")
-                            logger.error(f"Parametreler: {kwargs}")
-                            raise
-                    result = await loop.run_in_executor(None, execute)
-                elif command == "remove":
-                    def execute():
-                        return resource.remove(**kwargs)
-                    result = await loop.run_in_executor(None, execute)
-                elif command == "enable":
-                    def execute():
-                        return resource.enable(**kwargs)
-                    result = await loop.run_in_executor(None, execute)
-                elif command == "disable":
-                    def execute():
-                        return resource.disable(**kwargs)
-                    result = await loop.run_in_executor(None, execute)
-                else:
-                    raise ValueError(f"Bilinmeyen komut: {command}")
+                
+                result = await self._run_command(path, command, kwargs)
+
+                if command == "add":
+                    # add yeni kaydın .id değerini !done cümlesinde (ret) döner, !re satırı gelmez
+                    ret = getattr(result, "done_message", {}).get("ret")
+                    if isinstance(ret, bytes):
+                        ret = ret.decode()
+                    return [{"ret": ret}] if ret else []
                 
                 # Sonucu dict listesine dönüştür
                 if isinstance(result, list):
@@ -358,25 +582,29 @@ class MikroTikConnection:
                     if "!re" in error_msg or "Malformed" in error_msg or "malformed" in error_msg.lower():
                         logger.warning(f"⚠️ MikroTik API parse hatası, bağlantıyı yeniden kuruyoruz... (Deneme {attempt + 1}/{max_retries})")
                         try:
-                            await self.disconnect()
                             await asyncio.sleep(retry_delay)
-                            if await self.connect():
+                            if await self._reconnect(generation):
                                 logger.info("✅ Bağlantı yeniden kuruldu, komutu tekrar deniyoruz...")
                                 await asyncio.sleep(retry_delay)
                                 continue  # Retry yap
                         except Exception as retry_error:
                             logger.error(f"❌ Bağlantı yeniden kurma hatası: {retry_error}")
                     
-                    # Bağlantı veya timeout hatası varsa yeniden dene
-                    if "connection" in error_msg.lower() or "timeout" in error_msg.lower() or "network" in error_msg.lower() or "bad file descriptor" in error_msg.lower():
+                    # Bağlantı veya timeout hatası varsa yeniden bağlan ve dene (lazy reconnect)
+                    if _is_connection_error(e):
                         logger.warning(f"⚠️ Bağlantı/Network/Timeout hatası, yeniden deniyoruz... (Deneme {attempt + 1}/{max_retries})")
-                        # Connection nesnesini temizle (timeout sonrası socket geçersiz olabilir)
-                        self.connection = None
-                        self.api = None
+                        self.lazy_reconnects += 1
                         await asyncio.sleep(retry_delay)
-                        if await self.connect():
+                        if self.session_pool is not None and attempt == 0 and self._pool_generation == generation:
+                            # Başarısız oturum havuzdan atıldı; önce havuzu kapatmadan yeni bir oturumla dene
+                            continue  # Retry yap
+                        # Tam yeniden bağlanma kilitli; başka bir çağrı havuzu yenilediyse onu kullanır
+                        if await self._reconnect(generation):
                             await asyncio.sleep(retry_delay)
                             continue  # Retry yap
+                        # Yeniden bağlanılamadı, geçici bir kesinti değil
+                        disconnect_notified = True
+                        await self._notify_disconnect("Router bağlantısı kesildi", error_msg or type(e).__name__)
                 
                 # Son denemede veya retry yapılamayacak hata türünde, hata mesajını iyileştir
                 import traceback
@@ -385,7 +613,10 @@ class MikroTikConnection:
                 if "!re" in error_msg or "Malformed" in error_msg or "malformed" in error_msg.lower():
                     raise Exception(f"MikroTik API yanıtı parse edilemedi. Bu genellikle bağlantı sorunu veya MikroTik API versiyonu uyumsuzluğu nedeniyle oluşur. Lütfen bağlantıyı kontrol edin. Hata: {error_msg}")
                 
-                if "connection" in error_msg.lower() or "timeout" in error_msg.lower() or "network" in error_msg.lower():
+                if _is_connection_error(e):
+                    # Denemeler tükendi; bildirim sadece burada (veya yeniden bağlanma başarısız olunca) gider
+                    if not disconnect_notified:
+                        await self._notify_disconnect("Router bağlantısı kesildi", error_msg or type(e).__name__)
                     raise Exception(f"MikroTik router'a bağlanılamadı veya yanıt alınamadı. Lütfen bağlantı ayarlarınızı kontrol edin. Hata: {error_msg}")
                 
                 # Diğer hatalar için olduğu gibi fırlat
@@ -406,7 +637,7 @@ class MikroTikConnection:
         
         # Redis cache'den kontrol et
         if use_cache:
-            cached_result = get_cache(cache_key)
+            cached_result = await get_cache(cache_key)
             if cached_result is not None:
                 logger.debug("WireGuard interfaces Redis cache'den alındı")
                 return cached_result
@@ -492,10 +723,81 @@ class MikroTikConnection:
 
         # Cache'le (60 saniye) - sadece cache kullanılıyorsa
         if use_cache:
-            set_cache(cache_key, normalized_interfaces, ttl=60)
+            await set_cache(cache_key, normalized_interfaces, ttl=60)
 
         return normalized_interfaces
     
+    @staticmethod
+    def _normalize_peer(peer: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Router'dan gelen peer kaydının key, endpoint ve disabled alanlarını normalize eder
+        MikroTik API'den gelen alanlar sürüme göre farklı formatlarda gelebilir
+        """
+        normalized_peer = dict(peer)  # Yeni bir dict oluştur
+        
+        # Public key normalize et - hem 'public-key' hem 'public_key' kontrolü yap
+        public_key = normalized_peer.get('public-key') or normalized_peer.get('public_key') or normalized_peer.get('publicKey')
+        if public_key:
+            # Key'i normalize et (trim ve boşlukları temizle)
+            public_key = str(public_key).strip()
+            # Normalize edilmiş key'i hem 'public-key' hem 'public_key' olarak kaydet
+            normalized_peer['public-key'] = public_key
+            normalized_peer['public_key'] = public_key
+        
+        # Private key normalize et - hem 'private-key' hem 'private_key' kontrolü yap
+        private_key = normalized_peer.get('private-key') or normalized_peer.get('private_key') or normalized_peer.get('privateKey')
+        if private_key:
+            # Key'i normalize et (trim ve boşlukları temizle)
+            private_key = str(private_key).strip()
+            # Normalize edilmiş key'i hem 'private-key' hem 'private_key' olarak kaydet
+            normalized_peer['private-key'] = private_key
+            normalized_peer['private_key'] = private_key
+        
+        # Preshared key normalize et
+        preshared_key = normalized_peer.get('preshared-key') or normalized_peer.get('preshared_key') or normalized_peer.get('presharedKey')
+        if preshared_key:
+            preshared_key = str(preshared_key).strip()
+            normalized_peer['preshared-key'] = preshared_key
+            normalized_peer['preshared_key'] = preshared_key
+
+        # Endpoint address normalize et
+        endpoint_addr = normalized_peer.get('current-endpoint-address') or normalized_peer.get('endpoint-address') or normalized_peer.get('endpoint_address')
+        if endpoint_addr:
+            normalized_peer['current-endpoint-address'] = endpoint_addr
+            normalized_peer['endpoint-address'] = endpoint_addr
+
+        # Endpoint port normalize et
+        endpoint_port = normalized_peer.get('current-endpoint-port') or normalized_peer.get('endpoint-port') or normalized_peer.get('endpoint_port')
+        if endpoint_port:
+            normalized_peer['current-endpoint-port'] = endpoint_port
+            normalized_peer['endpoint-port'] = endpoint_port
+
+        # Endpoint (birleşik string) oluştur - current-endpoint yoksa elle oluştur
+        if not normalized_peer.get('endpoint'):
+            if endpoint_addr and endpoint_port and endpoint_port not in [0, '0']:
+                normalized_peer['endpoint'] = f"{endpoint_addr}:{endpoint_port}"
+            elif endpoint_addr:
+                normalized_peer['endpoint'] = endpoint_addr
+
+        # Disabled alanını normalize et (boolean'a çevir)
+        # MikroTik'ten "true"/"false" string veya true/false boolean olarak gelebilir
+        disabled_value = normalized_peer.get('disabled')
+        if disabled_value is not None:
+            if isinstance(disabled_value, str):
+                # String ise "true" veya "false" kontrolü yap
+                normalized_peer['disabled'] = disabled_value.lower() in ('true', 'yes', '1')
+            elif isinstance(disabled_value, bool):
+                # Boolean ise olduğu gibi kullan
+                normalized_peer['disabled'] = disabled_value
+            else:
+                # Diğer tipler için boolean'a çevir
+                normalized_peer['disabled'] = bool(disabled_value)
+        else:
+            # disabled None ise varsayılan olarak False (aktif)
+            normalized_peer['disabled'] = False
+
+        return normalized_peer
+
     async def get_wireguard_peers(self, interface: str, use_cache: bool = True) -> List[Dict[str, Any]]:
         """
         Belirli bir interface'e ait peer'ları getirir
@@ -512,7 +814,7 @@ class MikroTikConnection:
         
         # Cache'den kontrol et (eğer cache kullanılıyorsa)
         if use_cache:
-            cached_result = get_cache(cache_key)
+            cached_result = await get_cache(cache_key)
             if cached_result is not None:
                 logger.debug(f"WireGuard peers cache'den alındı: {interface}")
                 return cached_result
@@ -523,72 +825,7 @@ class MikroTikConnection:
         
         # Peer verilerini normalize et - key alanlarını düzelt
         # MikroTik API'den gelen key alanları farklı formatlarda gelebilir
-        normalized_peers = []
-        for peer in peers:
-            normalized_peer = dict(peer)  # Yeni bir dict oluştur
-            
-            # Public key normalize et - hem 'public-key' hem 'public_key' kontrolü yap
-            public_key = normalized_peer.get('public-key') or normalized_peer.get('public_key') or normalized_peer.get('publicKey')
-            if public_key:
-                # Key'i normalize et (trim ve boşlukları temizle)
-                public_key = str(public_key).strip()
-                # Normalize edilmiş key'i hem 'public-key' hem 'public_key' olarak kaydet
-                normalized_peer['public-key'] = public_key
-                normalized_peer['public_key'] = public_key
-            
-            # Private key normalize et - hem 'private-key' hem 'private_key' kontrolü yap
-            private_key = normalized_peer.get('private-key') or normalized_peer.get('private_key') or normalized_peer.get('privateKey')
-            if private_key:
-                # Key'i normalize et (trim ve boşlukları temizle)
-                private_key = str(private_key).strip()
-                # Normalize edilmiş key'i hem 'private-key' hem 'private_key' olarak kaydet
-                normalized_peer['private-key'] = private_key
-                normalized_peer['private_key'] = private_key
-            
-            # Preshared key normalize et
-            preshared_key = normalized_peer.get('preshared-key') or normalized_peer.get('preshared_key') or normalized_peer.get('presharedKey')
-            if preshared_key:
-                preshared_key = str(preshared_key).strip()
-                normalized_peer['preshared-key'] = preshared_key
-                normalized_peer['preshared_key'] = preshared_key
-
-            # Endpoint address normalize et
-            endpoint_addr = normalized_peer.get('current-endpoint-address') or normalized_peer.get('endpoint-address') or normalized_peer.get('endpoint_address')
-            if endpoint_addr:
-                normalized_peer['current-endpoint-address'] = endpoint_addr
-                normalized_peer['endpoint-address'] = endpoint_addr
-
-            # Endpoint port normalize et
-            endpoint_port = normalized_peer.get('current-endpoint-port') or normalized_peer.get('endpoint-port') or normalized_peer.get('endpoint_port')
-            if endpoint_port:
-                normalized_peer['current-endpoint-port'] = endpoint_port
-                normalized_peer['endpoint-port'] = endpoint_port
-
-            # Endpoint (birleşik string) oluştur - current-endpoint yoksa elle oluştur
-            if not normalized_peer.get('endpoint'):
-                if endpoint_addr and endpoint_port and endpoint_port not in [0, '0']:
-                    normalized_peer['endpoint'] = f"{endpoint_addr}:{endpoint_port}"
-                elif endpoint_addr:
-                    normalized_peer['endpoint'] = endpoint_addr
-
-            # Disabled alanını normalize et (boolean'a çevir)
-            # MikroTik'ten "true"/"false" string veya true/false boolean olarak gelebilir
-            disabled_value = normalized_peer.get('disabled')
-            if disabled_value is not None:
-                if isinstance(disabled_value, str):
-                    # String ise "true" veya "false" kontrolü yap
-                    normalized_peer['disabled'] = disabled_value.lower() in ('true', 'yes', '1')
-                elif isinstance(disabled_value, bool):
-                    # Boolean ise olduğu gibi kullan
-                    normalized_peer['disabled'] = disabled_value
-                else:
-                    # Diğer tipler için boolean'a çevir
-                    normalized_peer['disabled'] = bool(disabled_value)
-            else:
-                # disabled None ise varsayılan olarak False (aktif)
-                normalized_peer['disabled'] = False
-
-            normalized_peers.append(normalized_peer)
+        normalized_peers = [self._normalize_peer(peer) for peer in peers]
         
         # Peer verilerini logla (debug için)
         if normalized_peers:
@@ -608,10 +845,46 @@ class MikroTikConnection:
         
         # Cache'le (60 saniye) - sadece cache kullanılıyorsa
         if use_cache:
-            set_cache(cache_key, normalized_peers, ttl=60)
+            await set_cache(cache_key, normalized_peers, ttl=60)
         
         return normalized_peers
     
+    async def find_wireguard_peer(
+        self,
+        interface: Optional[str] = None,
+        peer_id: Optional[str] = None,
+        public_key: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Tek bir peer'ı router'da filtreli print ile arar (?.id= veya ?public-key=)
+        Tüm peer listesi çekilmez; cevapta en fazla bir kayıt döner
+
+        Args:
+            interface: Interface adı (verilirse peer'ın bu interface'te olması gerekir)
+            peer_id: Peer .id değeri ("*5" veya "5")
+            public_key: Peer public key
+
+        Returns:
+            Normalize edilmiş peer veya None
+        """
+        queries: Dict[str, Any] = {}
+        if peer_id is not None:
+            normalized_id = normalize_peer_id(peer_id)
+            if normalized_id is None:
+                return None
+            queries[".id"] = normalized_id
+        elif public_key:
+            queries["public-key"] = str(public_key).strip()
+        else:
+            return None
+        if interface:
+            queries["interface"] = interface
+
+        peers = await self.execute_command("/interface/wireguard/peers", "print", **queries)
+        if not peers:
+            return None
+        return self._normalize_peer(peers[0])
+
     async def add_wireguard_peer(self, interface: str, public_key: str, **kwargs) -> Dict[str, Any]:
         """
         Yeni WireGuard peer ekler
@@ -666,45 +939,28 @@ class MikroTikConnection:
             **params
         )
 
-        # DEBUG: Result'u logla
-        logger.info(f"🔍 MikroTik add command result: {result}, type: {type(result)}")
-
         # Peer eklendikten sonra cache'i temizle
-        invalidate_pattern(f"wireguard_peers:{interface}")
+        await invalidate_pattern(f"wireguard_peers:{interface}")
         mikrotik_cache.clear("wireguard_interfaces")
+        await delete_cache("wireguard_interfaces")
+        self._mark_peers_changed(interface)
 
-        # MikroTik add komutu boş liste döndürüyor, peer ID'yi almak için
-        # yeni eklenen peer'ı public key ile bulmalıyız
-        logger.info(f"✅ Peer eklendi. Public key ile aranıyor: {public_key_normalized[:20]}...")
+        # Yeni peer'ın .id değeri add yanıtından (ret) alınır, peer listesi tekrar çekilmez
+        peer_id = normalize_peer_id(result[0].get("ret")) if result else None
+        if peer_id:
+            peer = self._normalize_peer({"id": peer_id, "disabled": "false", **params})
+            logger.info(f"✅ Peer eklendi: ID={peer_id}, Public Key={public_key_normalized[:20]}...")
+            return peer
 
-        # Yeni eklenen peer'ı public key ile bul
+        # Eski RouterOS sürümleri ret dönmeyebilir; sadece bu peer filtreli print ile sorgulanır
+        logger.info(f"✅ Peer eklendi. Public key ile aranıyor: {public_key_normalized[:20]}...")
         try:
-            # Cache'i bypass et - peer'ları doğrudan API'den çek
-            peers = await self.execute_command(
-                "/interface/wireguard/peers",
-                "print",
-                interface=interface
-            )
-
-            # Public key ile peer'ı bul
-            for p in peers:
-                peer_public_key = p.get('public-key') or p.get('public_key')
-                if peer_public_key:
-                    peer_public_key_normalized = str(peer_public_key).strip()
-                    if peer_public_key_normalized == public_key_normalized:
-                        peer = dict(p)
-                        # Public key normalize et
-                        peer['public-key'] = public_key_normalized
-                        peer['public_key'] = public_key_normalized
-                        peer_id = peer.get('.id') or peer.get('id')
-                        logger.info(f"✅ Peer bulundu: ID={peer_id}, Public Key={public_key_normalized[:20]}...")
-                        return peer
-
+            peer = await self.find_wireguard_peer(interface=interface, public_key=public_key_normalized)
+            if peer:
+                return peer
             logger.warning(f"⚠️ Yeni eklenen peer bulunamadı: Public Key={public_key_normalized[:20]}...")
         except Exception as e:
             logger.error(f"❌ Yeni peer bilgisi alınamadı: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
 
         # Fallback: En azından public key'i döndür
         return {'public-key': public_key_normalized, 'public_key': public_key_normalized}
@@ -721,121 +977,13 @@ class MikroTikConnection:
         Returns:
             Güncellenmiş peer bilgisi
         """
-        # Bağlantının açık olduğundan emin ol
-        await self.ensure_connected()
-        
-        # Eğer interface belirtilmişse, peer'ı bulmak için önce listeleme yap
-        if interface:
-            peers = await self.get_wireguard_peers(interface)
-            target_peer = None
-            
-            logger.info(f"Peer arama: Aranan ID={peer_id}, Interface={interface}, Mevcut peer sayısı={len(peers)}")
-            if peers:
-                # MikroTik API'den gelen peer verilerinde hem 'id' hem '.id' olabilir
-                logger.info(f"Mevcut peer ID'leri: {[str(p.get('id') or p.get('.id', 'YOK')) for p in peers]}")
-                logger.info(f"İlk peer örneği: {peers[0]}")
-                logger.info(f"İlk peer'ın tüm anahtarları: {list(peers[0].keys())}")
-            
-            # Peer ID None veya boş ise, tüm peer'ları döndür (ilk peer'ı kullan)
-            if not peer_id or peer_id == 'None' or peer_id == 'undefined' or peer_id == 'null':
-                logger.warning(f"Peer ID geçersiz: {peer_id}. Tüm peer'lar listeleniyor.")
-                if peers and len(peers) > 0:
-                    target_peer = peers[0]
-                    logger.warning(f"İlk peer kullanılıyor: {target_peer.get('.id')}")
-                else:
-                    raise Exception(f"Peer bulunamadı. Interface: {interface}, Peer sayısı: {len(peers)}")
-            else:
-                # Peer ID eşleştirmesi - farklı formatları kontrol et
-                peer_id_variants = [peer_id, str(peer_id)]
-                if str(peer_id).startswith("*"):
-                    peer_id_variants.append(str(peer_id)[1:])  # *5 -> 5
-                
-                for p in peers:
-                    # MikroTik API'den gelen peer verilerinde hem 'id' hem '.id' olabilir
-                    # Önce 'id' kontrolü yap (MikroTik API genelde 'id' kullanır)
-                    peer_dot_id = p.get("id") or p.get(".id")
-                    if peer_dot_id is None:
-                        # Tüm anahtarları kontrol et
-                        for key in p.keys():
-                            if key == 'id' or key == '.id' or (key.endswith('id') and not key.startswith('endpoint')):
-                                peer_dot_id = p.get(key)
-                                if peer_dot_id:
-                                    logger.debug(f"Alternatif ID anahtarı bulundu: {key}={peer_dot_id}")
-                                    break
-                        if peer_dot_id is None:
-                            continue
-                    
-                    peer_dot_id_str = str(peer_dot_id)
-                    logger.debug(f"Karşılaştırma: Aranan={peer_id}, Mevcut={peer_dot_id_str}")
-                    
-                    # Direkt eşleşme
-                    if peer_dot_id_str in peer_id_variants or peer_dot_id in peer_id_variants:
-                        target_peer = p
-                        logger.info(f"Peer direkt eşleşme ile bulundu: {peer_dot_id_str}")
-                        break
-                    
-                    # * karakterini kaldırarak karşılaştırma
-                    peer_dot_id_normalized = peer_dot_id_str.lstrip("*")
-                    for variant in peer_id_variants:
-                        variant_normalized = str(variant).lstrip("*")
-                        if peer_dot_id_normalized == variant_normalized:
-                            target_peer = p
-                            logger.info(f"Peer normalize edilmiş eşleşme ile bulundu: {peer_dot_id_normalized} == {variant_normalized}")
-                            break
-                    
-                    if target_peer:
-                        break
-                
-                if not target_peer:
-                    # Peer bulunamadıysa, tüm peer'ları göster ve hata fırlat
-                    error_msg = f"Peer bulunamadı (ID: {peer_id}, Interface: {interface}). Mevcut peer sayısı: {len(peers)}"
-                    if peers:
-                        # MikroTik API'den gelen peer verilerinde hem 'id' hem '.id' olabilir
-                        error_msg += f"\nMevcut peer ID'leri: {[str(p.get('id') or p.get('.id', 'YOK')) for p in peers]}"
-                        error_msg += f"\nİlk peer'ın tüm anahtarları: {list(peers[0].keys())}"
-                        # Son çare: İlk peer'ı kullan
-                        if len(peers) == 1:
-                            logger.warning(f"Peer eşleştirmesi yapılamadı ama sadece bir peer var, onu kullanıyoruz.")
-                            target_peer = peers[0]
-                        else:
-                            raise Exception(error_msg)
-                    else:
-                        raise Exception(error_msg)
-            
-            if target_peer:
-                # Gerçek peer ID'yi kullan - MikroTik API'de hem 'id' hem '.id' olabilir
-                # Önce 'id' kontrolü yap (MikroTik API genelde 'id' kullanır)
-                peer_id = target_peer.get("id") or target_peer.get(".id")
-                if peer_id is None:
-                    # Peer ID hala None ise, tüm anahtarları kontrol et
-                    for key in target_peer.keys():
-                        if key == 'id' or key == '.id' or (key.endswith('id') and not key.startswith('endpoint')):
-                            peer_id = target_peer.get(key)
-                            if peer_id:
-                                logger.info(f"Alternatif ID anahtarından peer ID bulundu: {key}={peer_id}")
-                                break
-                    if peer_id is None:
-                        raise Exception(f"Peer bulundu ama ID None. Interface: {interface}, Peer keys: {list(target_peer.keys())}")
-                logger.info(f"Peer bulundu, gerçek ID kullanılıyor: {peer_id}")
-            else:
-                raise Exception(f"Peer bulunamadı (ID: {peer_id}, Interface: {interface})")
-        
-        # Peer ID kontrolü - None veya geçersiz ise hata fırlat
-        if peer_id is None or peer_id == 'None' or peer_id == 'undefined' or peer_id == 'null':
+        # Peer ID'yi RouterOS formatına getir ("5" -> "*5"); peer listesi çekilmez,
+        # set komutu .id ile doğrudan çalışır, peer yoksa router "no such item" döner
+        peer_id_str = normalize_peer_id(peer_id)
+        if peer_id_str is None:
             raise Exception(f"Peer ID geçersiz: {peer_id}. Interface: {interface}. Lütfen sayfayı yenileyin.")
         
-        # MikroTik API'de set komutu için .id parametresi doğru formatta olmalı
-        # routeros-api kütüphanesinde .id parametresi direkt olarak geçilir
-        params = {}
-        
-        # Peer ID'yi string'e çevir (MikroTik API string bekler)
-        peer_id_str = str(peer_id).strip()
-        
-        # Geçersiz değer kontrolü
-        if peer_id_str == "None" or peer_id_str == "" or peer_id_str == "undefined" or peer_id_str == "null":
-            raise Exception(f"Geçersiz Peer ID: '{peer_id_str}'. Interface: {interface}. Lütfen sayfayı yenileyin.")
-        
-        params[".id"] = peer_id_str
+        params = {".id": peer_id_str}
         logger.info(f"Peer ID kullanılıyor: '{peer_id_str}'")
         
         # Interface parametresi eklenmemeli (set komutunda sadece .id yeterli)
@@ -886,13 +1034,16 @@ class MikroTikConnection:
             # Peer güncellendikten sonra cache'i temizle (HEM redis_cache HEM mikrotik_cache)
             if interface:
                 # Redis cache'i temizle (get_wireguard_peers tarafından kullanılıyor)
-                invalidate_pattern(f"wireguard_peers:{interface}")
+                await invalidate_pattern(f"wireguard_peers:{interface}")
                 # Mikrotik cache'i de temizle (eski sistem için)
                 mikrotik_cache.invalidate_pattern(f"wireguard_peers:{interface}")
                 logger.info(f"✅ Cache temizlendi: wireguard_peers:{interface}")
+            self._mark_peers_changed(interface)
             
             return result[0] if result else {}
         except Exception as e:
+            if "no such item" in str(e).lower():
+                raise Exception(f"Peer bulunamadı (ID: {peer_id_str}, Interface: {interface})")
             logger.error(f"Peer güncelleme hatası: {e}")
             logger.error(f"Kullanılan parametreler: {params}")
             import traceback
@@ -910,86 +1061,12 @@ class MikroTikConnection:
         Returns:
             Silme başarılıysa True
         """
-        await self.ensure_connected()
-        
-        # Eğer interface belirtilmişse, peer'ı bulmak için önce listeleme yap
-        if interface:
-            peers = await self.get_wireguard_peers(interface)
-            target_peer = None
-            
-            logger.info(f"Peer silme: Aranan ID={peer_id}, Interface={interface}, Mevcut peer sayısı={len(peers)}")
-            if peers:
-                logger.info(f"Mevcut peer ID'leri: {[str(p.get('id') or p.get('.id', 'YOK')) for p in peers]}")
-            
-            # Peer ID eşleştirmesi - farklı formatları kontrol et
-            peer_id_variants = [peer_id, str(peer_id)]
-            if str(peer_id).startswith("*"):
-                peer_id_variants.append(str(peer_id)[1:])  # *5 -> 5
-            
-            for p in peers:
-                # MikroTik API'den gelen peer verilerinde hem 'id' hem '.id' olabilir
-                peer_dot_id = p.get("id") or p.get(".id")
-                if peer_dot_id is None:
-                    # Tüm anahtarları kontrol et
-                    for key in p.keys():
-                        if key == 'id' or key == '.id' or (key.endswith('id') and not key.startswith('endpoint')):
-                            peer_dot_id = p.get(key)
-                            if peer_dot_id:
-                                logger.debug(f"Alternatif ID anahtarı bulundu: {key}={peer_dot_id}")
-                                break
-                    if peer_dot_id is None:
-                        continue
-                
-                peer_dot_id_str = str(peer_dot_id)
-                logger.debug(f"Karşılaştırma: Aranan={peer_id}, Mevcut={peer_dot_id_str}")
-                
-                # Direkt eşleşme
-                if peer_dot_id_str in peer_id_variants or peer_dot_id in peer_id_variants:
-                    target_peer = p
-                    logger.info(f"Peer direkt eşleşme ile bulundu: {peer_dot_id_str}")
-                    break
-                
-                # * karakterini kaldırarak karşılaştırma
-                peer_dot_id_normalized = peer_dot_id_str.lstrip("*")
-                for variant in peer_id_variants:
-                    variant_normalized = str(variant).lstrip("*")
-                    if peer_dot_id_normalized == variant_normalized:
-                        target_peer = p
-                        logger.info(f"Peer normalize edilmiş eşleşme ile bulundu: {peer_dot_id_normalized} == {variant_normalized}")
-                        break
-                
-                if target_peer:
-                    break
-            
-            if target_peer:
-                # Gerçek peer ID'yi kullan - MikroTik API'de hem 'id' hem '.id' olabilir
-                peer_id = target_peer.get("id") or target_peer.get(".id")
-                if peer_id is None:
-                    # Peer ID hala None ise, tüm anahtarları kontrol et
-                    for key in target_peer.keys():
-                        if key == 'id' or key == '.id' or (key.endswith('id') and not key.startswith('endpoint')):
-                            peer_id = target_peer.get(key)
-                            if peer_id:
-                                logger.info(f"Alternatif ID anahtarından peer ID bulundu: {key}={peer_id}")
-                                break
-                    if peer_id is None:
-                        raise Exception(f"Peer bulundu ama ID None. Interface: {interface}, Peer keys: {list(target_peer.keys())}")
-                logger.info(f"Peer bulundu, gerçek ID kullanılıyor: {peer_id}")
-            else:
-                raise Exception(f"Peer bulunamadı (ID: {peer_id}, Interface: {interface})")
-        
-        # Peer ID kontrolü - None veya geçersiz ise hata fırlat
-        if peer_id is None or peer_id == 'None' or peer_id == 'undefined' or peer_id == 'null':
+        # Peer ID'yi RouterOS formatına getir ("5" -> "*5"); peer listesi çekilmez,
+        # remove komutu .id ile doğrudan çalışır, peer yoksa router "no such item" döner
+        peer_id_str = normalize_peer_id(peer_id)
+        if peer_id_str is None:
             raise Exception(f"Peer ID geçersiz: {peer_id}. Interface: {interface}. Lütfen sayfayı yenileyin.")
         
-        # MikroTik API'de remove komutu için .id parametresi kullanılır
-        # routeros-api kütüphanesinde .id parametresi direkt olarak geçilir
-        peer_id_str = str(peer_id).strip()
-        
-        # Geçersiz değer kontrolü
-        if peer_id_str == "None" or peer_id_str == "" or peer_id_str == "undefined" or peer_id_str == "null":
-            raise Exception(f"Geçersiz Peer ID: '{peer_id_str}'. Interface: {interface}. Lütfen sayfayı yenileyin.")
-        
         logger.info(f"Peer silme: Peer ID='{peer_id_str}', Interface={interface}")
         
         try:
@@ -1004,16 +1081,208 @@ class MikroTikConnection:
             
             # Peer silindikten sonra cache'i temizle
             if interface:
+                await invalidate_pattern(f"wireguard_peers:{interface}")
                 mikrotik_cache.invalidate_pattern(f"wireguard_peers:{interface}")
+            self._mark_peers_changed(interface)
             
             return True
         except Exception as e:
+            if "no such item" in str(e).lower():
+                raise Exception(f"Peer bulunamadı (ID: {peer_id_str}, Interface: {interface})")
             logger.error(f"Peer silme hatası: {e}")
             logger.error(f"Kullanılan Peer ID: {peer_id_str}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             raise
     
+    async def execute_batch(self, path: str, command: str, item_ids: List[str],
+                            chunk_size: int = 200, **kwargs) -> Dict[str, Optional[str]]:
+        """
+        Aynı komutu birden fazla .id için çalıştırır (enable/disable/remove/set)
+        Her chunk router'a tek seferde pipelined tagged cümleler olarak gönderilir,
+        yanıtlar tek round trip'te toplanır. Event loop bloklanmaz.
+
+        Args:
+            path: API path (örn: "/interface/wireguard/peers")
+            command: Komut (enable, disable, remove, set)
+            item_ids: .id listesi
+            chunk_size: Tek pipeline'da gönderilecek maksimum komut sayısı
+            **kwargs: Her komuta eklenecek ortak parametreler (set için)
+
+        Returns:
+            {id: None (başarılı) veya hata mesajı} - giriş sırası korunur
+        """
+        # Tekrarlanan ve boş ID'leri ayıkla (sırayı koru)
+        unique_ids = [str(i).strip() for i in dict.fromkeys(item_ids) if i and str(i).strip()]
+        results: Dict[str, Optional[str]] = {}
+        if not unique_ids:
+            return results
+
+        if not await self.ensure_connected():
+            raise Exception("MikroTik router'a bağlanılamadı")
+
+        logger.info(f"MikroTik toplu komut: {path}/{command} - {len(unique_ids)} kayıt")
+
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            if self.async_client is not None:
+                responses = await self.async_client.call_many(
+                    path, command, [{".id": item_id, **kwargs} for item_id in chunk]
+                )
+                for item_id, response in zip(chunk, responses):
+                    results[item_id] = response.trap_message if isinstance(response, RouterOsTrapError) else None
+            else:
+                results.update(await self.run_with_api(
+                    lambda api: _run_batch_sync(api, path, command, chunk, kwargs)
+                ))
+            self._mark_io()
+
+        return results
+
+    async def execute_pipelined(self, path: str, command: str, argument_list: List[Dict[str, Any]],
+                                chunk_size: int = 100) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Aynı komutu her biri kendi argümanlarıyla çalıştırır (toplu add/set)
+        Her chunk router'a tek seferde pipelined tagged cümleler olarak gönderilir
+
+        Args:
+            path: API path (örn: "/interface/wireguard/peers")
+            command: Komut (add, set)
+            argument_list: Komut başına argümanlar
+            chunk_size: Tek pipeline'da gönderilecek maksimum komut sayısı
+
+        Returns:
+            Her argüman için (ret, hata mesajı) - giriş sırası korunur
+        """
+        results: List[Tuple[Optional[str], Optional[str]]] = []
+        if not argument_list:
+            return results
+
+        if not await self.ensure_connected():
+            raise Exception("MikroTik router'a bağlanılamadı")
+
+        logger.info(f"MikroTik pipelined komut: {path}/{command} - {len(argument_list)} kayıt")
+
+        for start in range(0, len(argument_list), chunk_size):
+            chunk = argument_list[start:start + chunk_size]
+            if self.async_client is not None:
+                responses = await self.async_client.call_many(path, command, chunk)
+                for response in responses:
+                    if isinstance(response, RouterOsTrapError):
+                        results.append((None, response.trap_message))
+                    else:
+                        results.append((response.done_message.get("ret"), None))
+            else:
+                results.extend(await self.run_with_api(
+                    lambda api: _run_pipeline_sync(api, path, command, chunk)
+                ))
+            self._mark_io()
+
+        return results
+
+    async def add_wireguard_peers(self, interface: str, peers: List[Dict[str, Any]],
+                                  chunk_size: int = 100) -> List[Dict[str, Any]]:
+        """
+        Birden fazla WireGuard peer'ını pipelined add ile ekler (toplu oluşturma)
+        Peer listesi tekrar çekilmez; her peer'ın .id değeri add yanıtından (ret) alınır
+
+        Args:
+            interface: Interface adı
+            peers: Peer parametreleri (public-key, allowed-address, comment, ...)
+            chunk_size: Tek pipeline'da gönderilecek maksimum komut sayısı
+
+        Returns:
+            Her peer için normalize edilmiş kayıt; başarısızsa {"error": mesaj} (giriş sırası korunur)
+            Pipeline yarıda koparsa sonuçlar peer listesinden doğrulanır; doğrulanamazsa Exception
+        """
+        argument_list = []
+        for params in peers:
+            arguments = {key: value for key, value in params.items() if key not in ("mtu", "endpoint")}
+            arguments["interface"] = interface
+            arguments["public-key"] = str(arguments.get("public-key", "")).strip()
+            argument_list.append(arguments)
+
+        pipeline_error = None
+        try:
+            results = await self.execute_pipelined(
+                "/interface/wireguard/peers", "add", argument_list, chunk_size=chunk_size
+            )
+        except Exception as e:
+            # Pipeline yarıda koptu: önceki add'lerin bir kısmı router'da uygulanmış olabilir
+            pipeline_error = str(e) or type(e).__name__
+            results = [(None, None)] * len(argument_list)
+        finally:
+            # Kısmi başarıda da cache güncel olmamalı
+            await invalidate_pattern(f"wireguard_peers:{interface}")
+            mikrotik_cache.clear("wireguard_interfaces")
+            await delete_cache("wireguard_interfaces")
+            self._mark_peers_changed(interface)
+
+        if pipeline_error is not None:
+            # Hangi peer'ların eklendiği public key ile yeniden okunur; okunamazsa hata yükseltilir
+            # (çağıran sonuç bilinmeden IP rezervasyonlarını serbest bırakmamalı)
+            logger.warning(f"⚠️ Toplu add yarıda kesildi, sonuçlar router'dan doğrulanıyor: {pipeline_error}")
+            try:
+                existing = await self.get_wireguard_peers(interface, use_cache=False)
+            except Exception as verify_error:
+                raise Exception(
+                    f"Toplu add yarıda kesildi ve sonuç doğrulanamadı: {pipeline_error} ({verify_error})"
+                )
+            ids_by_key = {peer.get("public-key"): peer.get(".id") or peer.get("id") for peer in existing}
+            results = [
+                (ids_by_key[arguments["public-key"]], None) if ids_by_key.get(arguments["public-key"])
+                else (None, pipeline_error)
+                for arguments in argument_list
+            ]
+
+        peer_ids = [
+            None if error is not None else normalize_peer_id(ret.decode() if isinstance(ret, bytes) else ret)
+            for ret, error in results
+        ]
+
+        # Eski RouterOS sürümleri ret dönmeyebilir; eksik ID'ler tek bir liste çekimiyle public key'den bulunur
+        if any(peer_id is None and error is None for peer_id, (_, error) in zip(peer_ids, results)):
+            existing = await self.get_wireguard_peers(interface, use_cache=False)
+            ids_by_key = {peer.get("public-key"): peer.get(".id") or peer.get("id") for peer in existing}
+            peer_ids = [
+                peer_id or normalize_peer_id(ids_by_key.get(arguments["public-key"]))
+                for peer_id, arguments in zip(peer_ids, argument_list)
+            ]
+
+        peers_added = []
+        for arguments, peer_id, (_, error) in zip(argument_list, peer_ids, results):
+            if error is not None:
+                peers_added.append({"error": error})
+            elif peer_id is None:
+                peers_added.append({"error": "Yeni peer'ın ID'si alınamadı"})
+            else:
+                peers_added.append(self._normalize_peer({"id": peer_id, "disabled": "false", **arguments}))
+        return peers_added
+
+    async def bulk_update_peers(self, interface: str, command: str, peer_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Birden fazla WireGuard peer'ını toplu olarak enable/disable/remove eder
+        İşlem sonrası ilgili cache'leri temizler
+
+        Args:
+            interface: Interface adı (cache temizliği için)
+            command: enable, disable veya remove
+            peer_ids: Peer .id listesi
+
+        Returns:
+            {peer_id: None (başarılı) veya hata mesajı}
+        """
+        if command not in ("enable", "disable", "remove"):
+            raise ValueError(f"Desteklenmeyen toplu peer komutu: {command}")
+
+        try:
+            return await self.execute_batch("/interface/wireguard/peers", command, peer_ids)
+        finally:
+            # Kısmi başarıda da cache güncel olmamalı
+            await invalidate_pattern(f"wireguard_peers:{interface}")
+            mikrotik_cache.invalidate_pattern(f"wireguard_peers:{interface}")
+            self._mark_peers_changed(interface)
+    
     async def toggle_interface(self, interface_name: str, enable: bool) -> bool:
         """
         Interface'i aç/kapat
@@ -1031,7 +1300,10 @@ class MikroTikConnection:
         
         # Interface durumu değiştiğinde cache'i temizle
         mikrotik_cache.clear("wireguard_interfaces")
+        await delete_cache("wireguard_interfaces")
         mikrotik_cache.invalidate_pattern(f"wireguard_peers:{interface_name}")
+        await invalidate_pattern(f"wireguard_peers:{interface_name}")
+        self._mark_peers_changed(interface_name)
         
         return True
     
@@ -1098,22 +1370,13 @@ class MikroTikConnection:
         # Private key - belirtilmişse kullan, yoksa otomatik oluştur
         if private_key:
             private_key = str(private_key).strip()
-            # Public key'i private key'den türet (wg pubkey komutu ile)
+            # Public key'i private key'den türet (X25519, wg pubkey karşılığı)
             try:
-                import subprocess
-                pub_result = subprocess.run(
-                    ['wg', 'pubkey'],
-                    input=private_key,
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                public_key = pub_result.stdout.strip()
-                params["public-key"] = public_key
-            except (FileNotFoundError, subprocess.CalledProcessError, Exception) as e:
-                # wg komutu yoksa veya hata olursa, private key'i direkt kullan
-                # MikroTik otomatik olarak public key'i oluşturacak
-                logger.warning(f"Public key oluşturulamadı ({type(e).__name__}), MikroTik otomatik oluşturacak")
+                from app.services.wireguard_key_pool import public_key_from_private
+                params["public-key"] = public_key_from_private(private_key)
+            except ValueError as e:
+                # Geçersiz anahtarda public key gönderilmez, MikroTik anahtarı kendisi doğrular
+                logger.warning(f"Public key türetilemedi ({e}), MikroTik otomatik oluşturacak")
         else:
             # Private key belirtilmemişse, MikroTik otomatik oluşturacak
             logger.info("Private key belirtilmedi, MikroTik otomatik oluşturacak")
@@ -1134,6 +1397,7 @@ class MikroTikConnection:
         
         # Interface eklendikten sonra cache'i temizle
         mikrotik_cache.clear("wireguard_interfaces")
+        await delete_cache("wireguard_interfaces")
         
         # Sonucu normalize et
         if result:
@@ -1232,6 +1496,7 @@ class MikroTikConnection:
         
         # Interface güncellendikten sonra cache'i temizle
         mikrotik_cache.clear("wireguard_interfaces")
+        await delete_cache("wireguard_interfaces")
         
         # Sonucu normalize et
         if result:
@@ -1309,7 +1574,10 @@ class MikroTikConnection:
 
         # Interface silindikten sonra cache'i temizle
         mikrotik_cache.clear("wireguard_interfaces")
+        await delete_cache("wireguard_interfaces")
         mikrotik_cache.invalidate_pattern(f"wireguard_peers:{interface_name}")
+        await invalidate_pattern(f"wireguard_peers:{interface_name}")
+        self._mark_peers_changed(interface_name)
 
         return True
 
@@ -0,0 +1,194 @@
+"""
+MikroTik RouterOS API oturum havuzu
+Birden fazla kimliği doğrulanmış API oturumunu ve bunlara ait sınırlı thread pool'u yönetir
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional, Callable, Any, Deque, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RouterSession:
+    """
+    Tek bir RouterOS API oturumu (socket + login)
+    routeros-api thread-safe olmadığı için aynı anda sadece bir çağrı tarafından kullanılır
+    """
+
+    def __init__(self, pool: Any, api: Any):
+        self.pool = pool  # RouterOsApiPool instance
+        self.api = api  # RouterOsApi nesnesi
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.broken = False
+
+    @property
+    def healthy(self) -> bool:
+        """
+        Oturumun kullanılabilir olup olmadığını döner
+        routeros-api bağlantı hatasında pool.disconnect() çağırır ve connected=False olur
+        """
+        return not self.broken and bool(getattr(self.pool, "connected", False))
+
+    def close(self):
+        """Socket'i kapatır (blocking, executor içinde çağrılmalı)"""
+        try:
+            self.pool.disconnect()
+        except Exception as e:
+            logger.debug(f"Oturum kapatma hatası (göz ardı edildi): {e}")
+
+
+class RouterSessionPool:
+    """
+    RouterOS API oturum havuzu
+    - En fazla `size` adet oturum açar (lazy)
+    - Her çağrı bir oturumu ödünç alır, iş bitince havuza geri koyar
+    - Bozulan oturumlar geri konmaz, kapatılır ve gerektiğinde yenisi açılır
+    - Blocking çağrılar varsayılan executor yerine havuza özel thread pool'da çalışır
+    """
+
+    def __init__(self, factory: Callable[[], Tuple[Any, Any]], size: int = 4, checkout_timeout: float = 30.0):
+        """
+        Args:
+            factory: Yeni (RouterOsApiPool, api) çifti döndüren blocking fonksiyon
+            size: Maksimum eşzamanlı oturum sayısı
+            checkout_timeout: Boş oturum beklerken maksimum süre (saniye)
+        """
+        self._factory = factory
+        self.size = max(1, int(size))
+        self.checkout_timeout = checkout_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="routeros")
+        self._idle: Deque[RouterSession] = deque()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._open_count = 0
+        self._closed = False
+
+        # İstatistikler
+        self.checkouts = 0
+        self.sessions_created = 0
+        self.sessions_discarded = 0
+        self.checkout_wait_total = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore'u event loop çalışırken oluştur (modül import anında loop yok)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        return self._semaphore
+
+    async def run_blocking(self, func: Callable, *args) -> Any:
+        """Blocking bir fonksiyonu havuza özel thread pool'da çalıştırır"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def add_session(self, pool: Any, api: Any) -> RouterSession:
+        """
+        Dışarıda açılmış bir oturumu havuza ekler (connect() sırasında açılan ilk oturum)
+        """
+        session = RouterSession(pool, api)
+        self._open_count += 1
+        self.sessions_created += 1
+        self._idle.append(session)
+        return session
+
+    async def _open_session(self) -> RouterSession:
+        """Yeni bir oturum açar (socket + login)"""
+        pool, api = await self.run_blocking(self._factory)
+        self._open_count += 1
+        self.sessions_created += 1
+        logger.debug(f"Yeni RouterOS oturumu açıldı ({self._open_count}/{self.size})")
+        return RouterSession(pool, api)
+
+    async def _discard(self, session: RouterSession):
+        """Oturumu kapatır ve sayaçtan düşer"""
+        self._open_count = max(0, self._open_count - 1)
+        self.sessions_discarded += 1
+        try:
+            await self.run_blocking(session.close)
+        except RuntimeError:
+            # Executor kapatılmış (havuz bırakıldı), socket'i doğrudan kapat
+            session.close()
+        except Exception as e:
+            logger.debug(f"Oturum kapatılamadı: {e}")
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Havuzdan bir oturum ödünç alır
+
+        Usage:
+            async with pool.session() as session:
+                result = await pool.run_blocking(lambda: session.api.get_resource('/x').get())
+        """
+        if self._closed:
+            raise Exception("MikroTik oturum havuzu kapalı")
+
+        semaphore = self._get_semaphore()
+        wait_start = time.monotonic()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.checkout_timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"MikroTik oturum havuzundan bağlantı alınamadı (timeout {self.checkout_timeout}s)")
+        self.checkout_wait_total += time.monotonic() - wait_start
+        self.checkouts += 1
+        if self._closed:
+            # Beklerken havuz kapatıldı (yeniden bağlanma), yeni havuz kullanılmalı
+            semaphore.release()
+            raise Exception("MikroTik oturum havuzu kapatıldı, bağlantı yenileniyor")
+
+        session: Optional[RouterSession] = None
+        try:
+            # Sağlıklı bir boş oturum bul, bozuk olanları at
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.healthy:
+                    session = candidate
+                    break
+                await self._discard(candidate)
+
+            if session is None:
+                session = await self._open_session()
+
+            # Bağlantı kaynaklı hatalarda routeros-api pool.connected=False yapar,
+            # healthy kontrolü oturumun tekrar kullanılmasını engeller
+            try:
+                yield session
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                # İptal/timeout durumunda executor thread'i oturumu hala kullanıyor olabilir,
+                # yarım kalmış bir yanıtı başka çağrıya vermemek için oturumu at
+                session.broken = True
+                raise
+            finally:
+                session.last_used = time.monotonic()
+                if self._closed or not session.healthy:
+                    await self._discard(session)
+                else:
+                    self._idle.append(session)
+        finally:
+            semaphore.release()
+
+    async def close(self):
+        """Tüm boş oturumları kapatır ve havuzu kullanım dışı bırakır"""
+        self._closed = True
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+    def shutdown_executor(self):
+        """Thread pool'u kapatır (havuz tamamen bırakılırken)"""
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        """Havuz istatistiklerini döner"""
+        return {
+            "size": self.size,
+            "open_sessions": self._open_count,
+            "idle_sessions": len(self._idle),
+            "in_use": self._open_count - len(self._idle),
+            "checkouts": self.checkouts,
+            "sessions_created": self.sessions_created,
+            "sessions_discarded": self.sessions_discarded,
+            "avg_checkout_wait_ms": round(self.checkout_wait_total / max(1, self.checkouts) * 1000, 2),
+        }
@@ -5,6 +5,8 @@ from app.models.settings import MikroTikSettings
 from app.models.peer_handshake import PeerHandshake
 from app.models.traffic_log import TrafficLog
 from app.models.peer_traffic_log import PeerTrafficLog
+from app.models.peer_traffic_counter import PeerTrafficCounter
+from app.models.traffic_rollup import PeerTrafficRollup, TrafficRollup
 from app.models.peer_key import PeerKey
 from app.models.ip_pool import IPPool, IPAllocation
 from app.models.notification import Notification
@@ -22,6 +24,9 @@ __all__ = [
     "PeerHandshake",
     "TrafficLog",
     "PeerTrafficLog",
+    "PeerTrafficCounter",
+    "PeerTrafficRollup",
+    "TrafficRollup",
     "PeerKey",
     "IPPool",
     "IPAllocation",
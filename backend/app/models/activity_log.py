@@ -2,7 +2,7 @@
 Activity Log model
 Kullanıcı ve sistem aktivitelerini kaydetmek için veritabanı modeli
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database.database import Base
 
@@ -43,6 +43,12 @@ class ActivityLog(Base):
     # Zaman damgası
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
+    __table_args__ = (
+        # İstatistikler: zaman penceresi içinde kategori / aksiyon bazlı GROUP BY
+        Index('idx_activity_logs_created_category', 'created_at', 'category'),
+        Index('idx_activity_logs_created_action', 'created_at', 'action'),
+    )
+
     def to_dict(self):
         """Model'i dictionary'ye çevir"""
         return {
@@ -0,0 +1,29 @@
+"""
+Peer trafik sayaç modeli
+Her peer'ın MikroTik'ten okunan son ham rx/tx sayaçlarını saklar
+Periyodik trafik kayıtlarında bir önceki örnekle fark (delta) hesaplamak için kullanılır
+"""
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database.database import Base
+
+
+class PeerTrafficCounter(Base):
+    """
+    Peer trafik sayaç tablosu modeli
+    Periyot tipi + interface + peer anahtarı başına tek satır (son örnek)
+    """
+    __tablename__ = "peer_traffic_counters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period_type = Column(String, nullable=False)  # 'hourly', 'daily', 'monthly', 'yearly'
+    interface_name = Column(String, nullable=False)  # Interface adı
+    peer_key = Column(String, nullable=False)  # Public key (yoksa "id:<peer_id>")
+    peer_id = Column(String, nullable=True)  # Örnek alınırken geçerli MikroTik peer ID (yeniden eklenme tespiti için)
+    rx_bytes = Column(BigInteger, default=0, nullable=False)  # Son ham rx sayacı
+    tx_bytes = Column(BigInteger, default=0, nullable=False)  # Son ham tx sayacı
+    sampled_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Örnek zamanı
+
+    __table_args__ = (
+        UniqueConstraint('period_type', 'interface_name', 'peer_key', name='uq_peer_traffic_counter'),
+    )
@@ -2,7 +2,7 @@
 Peer trafik log modeli
 Her peer'ın trafik kullanımını kaydeder
 """
-from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Float
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Float, Index
 from sqlalchemy.sql import func
 from app.database.database import Base
 
@@ -27,3 +27,8 @@ class PeerTrafficLog(Base):
     tx_mb = Column(Float, default=0.0, nullable=False)  # Yükleme (MB)
     notes = Column(String, nullable=True)  # Ek notlar
 
+    # Composite index'ler - Rollup penceresi/retention ve tek peer sorguları için
+    __table_args__ = (
+        Index('idx_peer_traffic_logs_period_time', 'period_type', 'timestamp'),
+        Index('idx_peer_traffic_logs_peer_lookup', 'peer_id', 'interface_name', 'period_type', 'timestamp'),
+    )
@@ -2,7 +2,7 @@
 Trafik log modeli
 Sistem trafik kullanımını kaydeder
 """
-from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Float
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Float, Index
 from sqlalchemy.sql import func
 from app.database.database import Base
 
@@ -26,3 +26,7 @@ class TrafficLog(Base):
     active_peer_count = Column(Integer, default=0, nullable=False)  # Aktif peer sayısı
     notes = Column(String, nullable=True)  # Ek notlar
 
+    # Composite index - Rollup penceresi ve retention için
+    __table_args__ = (
+        Index('idx_traffic_logs_period_time', 'period_type', 'timestamp'),
+    )
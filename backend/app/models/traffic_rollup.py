@@ -0,0 +1,61 @@
+"""
+Trafik rollup modelleri
+Ham trafik örneklerinin saatlik/günlük/aylık/yıllık özetlerini saklar
+Grafikler ham tabloyu taramadan uygun katmandan okunur
+"""
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Float, Index, UniqueConstraint
+from app.database.database import Base
+
+
+class PeerTrafficRollup(Base):
+    """
+    Peer trafik özet tablosu modeli
+    Katman + interface + peer anahtarı + bucket başına tek satır
+    """
+    __tablename__ = "peer_traffic_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tier = Column(String, nullable=False)  # 'hourly', 'daily', 'monthly', 'yearly'
+    timestamp = Column(DateTime(timezone=True), nullable=False)  # Bucket başlangıcı
+    interface_name = Column(String, nullable=False)  # Interface adı
+    peer_key = Column(String, nullable=False)  # Public key (yoksa peer ID)
+    peer_id = Column(String, nullable=True)  # Bucket içindeki son MikroTik peer ID
+    peer_name = Column(String, nullable=True)  # Peer adı/comment
+    public_key = Column(String, nullable=True)  # Peer public key
+    rx_bytes = Column(BigInteger, default=0, nullable=False)  # Bucket toplam indirme (bytes)
+    tx_bytes = Column(BigInteger, default=0, nullable=False)  # Bucket toplam yükleme (bytes)
+    rx_mb = Column(Float, default=0.0, nullable=False)  # İndirme (MB)
+    tx_mb = Column(Float, default=0.0, nullable=False)  # Yükleme (MB)
+    sample_count = Column(Integer, default=0, nullable=False)  # Bucket'a giren ham örnek sayısı
+
+    __table_args__ = (
+        UniqueConstraint('tier', 'interface_name', 'peer_key', 'timestamp', name='uq_peer_traffic_rollup'),
+        # Peer grafikleri: peer anahtarı + interface + katman + zaman aralığı
+        Index('idx_peer_rollup_lookup', 'peer_key', 'interface_name', 'tier', 'timestamp'),
+        # Rollup yeniden hesaplama ve retention: katman + zaman
+        Index('idx_peer_rollup_tier_time', 'tier', 'timestamp'),
+    )
+
+
+class TrafficRollup(Base):
+    """
+    Sistem geneli trafik özet tablosu modeli
+    Katman + bucket başına tek satır
+    """
+    __tablename__ = "traffic_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tier = Column(String, nullable=False)  # 'hourly', 'daily', 'monthly', 'yearly'
+    timestamp = Column(DateTime(timezone=True), nullable=False)  # Bucket başlangıcı
+    total_rx_bytes = Column(BigInteger, default=0, nullable=False)  # Toplam indirme (bytes)
+    total_tx_bytes = Column(BigInteger, default=0, nullable=False)  # Toplam yükleme (bytes)
+    total_rx_mb = Column(Float, default=0.0, nullable=False)  # Toplam indirme (MB)
+    total_tx_mb = Column(Float, default=0.0, nullable=False)  # Toplam yükleme (MB)
+    interface_count = Column(Integer, default=0, nullable=False)  # Bucket içindeki maksimum interface sayısı
+    peer_count = Column(Integer, default=0, nullable=False)  # Bucket içindeki maksimum peer sayısı
+    active_peer_count = Column(Integer, default=0, nullable=False)  # Bucket içindeki maksimum aktif peer sayısı
+    sample_count = Column(Integer, default=0, nullable=False)  # Bucket'a giren ham örnek sayısı
+
+    __table_args__ = (
+        UniqueConstraint('tier', 'timestamp', name='uq_traffic_rollup'),
+    )
@@ -3,11 +3,13 @@ Activity Log Service
 Aktivite log kayıtlarını oluşturma ve sorgulama servisi
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, and_
+from sqlalchemy import select, desc, and_, func
 from app.models.activity_log import ActivityLog
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from app.utils.datetime_helper import utcnow
+from app.services.log_sink import log_sink
+from app.services.log_retention_service import log_retention
 import logging
 import json
 
@@ -19,7 +21,7 @@ class ActivityLogService:
 
     @staticmethod
     async def log_activity(
-        db: AsyncSession,
+        db: Optional[AsyncSession],
         action: str,
         category: str,
         description: str,
@@ -32,12 +34,13 @@ class ActivityLogService:
         extra_data: Optional[Dict[str, Any]] = None,
         success: str = 'success',
         error_message: Optional[str] = None,
-    ) -> ActivityLog:
+    ) -> None:
         """
-        Yeni aktivite log kaydı oluştur
+        Yeni aktivite log kaydını yazma kuyruğuna alır
+        Kayıt isteğin session'ına eklenmez; log_sink tarafından toplu INSERT ile yazılır
 
         Args:
-            db: Database session
+            db: Kullanılmaz (geriye dönük uyumluluk için tutuluyor)
             action: Aksiyon adı (örn: 'login', 'create_peer')
             category: Kategori (örn: 'auth', 'wireguard')
             description: İnsan okunabilir açıklama
@@ -50,38 +53,25 @@ class ActivityLogService:
             extra_data: Ek bilgiler (opsiyonel, dict)
             success: Sonuç durumu ('success', 'failure', 'error')
             error_message: Hata mesajı (opsiyonel)
-
-        Returns:
-            ActivityLog: Oluşturulan log kaydı
         """
-        try:
-            # Extra data'yı JSON'a çevir
-            extra_data_json = json.dumps(extra_data) if extra_data else None
-
-            log_entry = ActivityLog(
-                user_id=user_id,
-                username=username,
-                action=action,
-                category=category,
-                description=description,
-                target_type=target_type,
-                target_id=target_id,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                extra_data=extra_data_json,
-                success=success,
-                error_message=error_message,
-            )
-
-            db.add(log_entry)
-            await db.flush()  # Pending state'e al, commit get_db() dependency'sinde yapılacak
-
-            logger.info(f"Activity logged: {action} by {username or 'system'}")
-            return log_entry
-
-        except Exception as e:
-            logger.error(f"Failed to log activity: {e}")
-            raise  # Rollback get_db() dependency'sinde yapılacak
+        # Extra data'yı JSON'a çevir
+        extra_data_json = json.dumps(extra_data) if extra_data else None
+
+        await log_sink.put("activity", {
+            "user_id": user_id,
+            "username": username,
+            "action": action,
+            "category": category,
+            "description": description,
+            "target_type": target_type,
+            "target_id": target_id,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "extra_data": extra_data_json,
+            "success": success,
+            "error_message": error_message,
+        })
+        logger.info(f"Activity logged: {action} by {username or 'system'}")
 
     @staticmethod
     async def get_logs(
@@ -170,7 +160,7 @@ class ActivityLogService:
             int: Toplam log sayısı
         """
         try:
-            query = select(ActivityLog)
+            query = select(func.count(ActivityLog.id))
 
             # Filtreler
             conditions = []
@@ -197,9 +187,7 @@ class ActivityLogService:
                 query = query.where(and_(*conditions))
 
             result = await db.execute(query)
-            logs = result.scalars().all()
-
-            return len(logs)
+            return result.scalar() or 0
 
         except Exception as e:
             logger.error(f"Failed to count activity logs: {e}")
@@ -241,6 +229,68 @@ class ActivityLogService:
             logger.error(f"Failed to get recent activity: {e}")
             raise
 
+    @staticmethod
+    async def get_stats(
+        db: AsyncSession,
+        hours: int = 24,
+        top_actions: int = 10,
+    ) -> Dict[str, Any]:
+        """
+        Son X saatteki aktivite istatistiklerini GROUP BY sorgularıyla hesaplar
+        ORM nesnesi yüklenmez; pencere (created_at, category) / (created_at, action) index'lerinden okunur
+
+        Args:
+            db: Database session
+            hours: Kaç saat geriye git
+            top_actions: Döndürülecek en sık aksiyon sayısı
+
+        Returns:
+            Dict: total, by_category, by_success, by_action (en sık top_actions aksiyon)
+        """
+        try:
+            in_window = ActivityLog.created_at >= utcnow() - timedelta(hours=hours)
+
+            by_category: Dict[str, int] = {}
+            for category, count in (await db.execute(
+                select(ActivityLog.category, func.count())
+                .where(in_window)
+                .group_by(ActivityLog.category)
+            )).all():
+                key = category or 'unknown'
+                by_category[key] = by_category.get(key, 0) + count
+
+            by_success: Dict[str, int] = {}
+            for success, count in (await db.execute(
+                select(ActivityLog.success, func.count())
+                .where(in_window)
+                .group_by(ActivityLog.success)
+            )).all():
+                key = success or 'unknown'
+                by_success[key] = by_success.get(key, 0) + count
+
+            action_count = func.count().label('count')
+            by_action: Dict[str, int] = {}
+            for action, count in (await db.execute(
+                select(ActivityLog.action, action_count)
+                .where(in_window)
+                .group_by(ActivityLog.action)
+                .order_by(desc(action_count), ActivityLog.action)
+                .limit(top_actions)
+            )).all():
+                key = action or 'unknown'
+                by_action[key] = by_action.get(key, 0) + count
+
+            return {
+                "total": sum(by_category.values()),
+                "by_category": by_category,
+                "by_success": by_success,
+                "by_action": by_action,
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to get activity stats: {e}")
+            raise
+
     @staticmethod
     async def cleanup_old_logs(
         db: AsyncSession,
@@ -248,32 +298,21 @@ class ActivityLogService:
     ) -> int:
         """
         Eski logları temizle (opsiyonel bakım işlemi)
+        Silme log_retention ile parça parça yapılır, tablo uzun süre kilitlenmez
 
         Args:
-            db: Database session
+            db: Kullanılmaz (geriye dönük uyumluluk için tutuluyor)
             days: Kaç günden eski logları sil
 
         Returns:
             int: Silinen kayıt sayısı
         """
         try:
-            cutoff_date = utcnow() - timedelta(days=days)
-
-            query = select(ActivityLog).where(ActivityLog.created_at < cutoff_date)
-            result = await db.execute(query)
-            old_logs = result.scalars().all()
-
-            count = len(old_logs)
-
-            for log in old_logs:
-                db.delete(log)  # session.delete() is synchronous in SQLAlchemy 2.0
-
-            await db.commit()
+            count = await log_retention.purge_table("activity_logs", days=days)
 
             logger.info(f"Cleaned up {count} old activity logs (older than {days} days)")
             return count
 
         except Exception as e:
             logger.error(f"Failed to cleanup old logs: {e}")
-            await db.rollback()
             raise
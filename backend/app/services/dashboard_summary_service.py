@@ -0,0 +1,167 @@
+"""
+Dashboard özet servisi
+Dashboard sayaçlarını toplu sorgularla hesaplar ve kısa süreli bellekte tutar.
+Çok sayıda açık sekmenin periyodik istekleri veritabanına gitmeden bellekteki özetten karşılanır.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import select, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.activity_log import ActivityLog
+from app.models.ip_pool import IPPool
+from app.models.peer_template import PeerTemplate
+from app.models.user import User
+from app.services.ip_allocation_index import ip_allocation_index
+from app.utils.datetime_helper import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardSummary:
+    """
+    Dashboard özet deposu
+    - Pool, tahsis, kullanıcı, template ve aktivite sayaçları tek hesaplamada üretilir:
+      pool listesi + tek aggregate SELECT (skaler alt sorgular), pool doluluğu tahsis indeksinden
+    - Özet ttl saniye boyunca bellekten sunulur, eşzamanlı yenilemeler tek hesaplamada birleşir
+    - Tahsis, pool, kullanıcı ve template değişikliklerinde invalidate() ile hemen geçersiz olur
+    """
+
+    def __init__(self, ttl: float = 10.0):
+        self.ttl = ttl
+        self._summary: Optional[Dict[str, Any]] = None
+        self._computed_at = 0.0
+        self._version = 0  # invalidate() her çağrıldığında artar
+        self._lock = asyncio.Lock()
+
+        # İstatistikler
+        self.hits = 0
+        self.refreshes = 0
+
+    def _is_fresh(self) -> bool:
+        return self._summary is not None and time.monotonic() - self._computed_at <= self.ttl
+
+    def invalidate(self):
+        """Özeti geçersiz kılar, bir sonraki istekte yeniden hesaplanır"""
+        self._summary = None
+        self._version += 1
+
+    async def get(self, db: AsyncSession) -> Dict[str, Any]:
+        """Güncel özeti döner, gerekirse yeniden hesaplar"""
+        if self._is_fresh():
+            self.hits += 1
+            return self._summary
+
+        async with self._lock:
+            # Kilidi beklerken başka bir istek hesaplamış olabilir
+            if self._is_fresh():
+                self.hits += 1
+                return self._summary
+
+            version = self._version
+            summary = await self._compute(db)
+            # Hesaplama sırasında invalidate edildiyse sonucu saklama (eski veri olabilir)
+            if version == self._version:
+                self._summary = summary
+                self._computed_at = time.monotonic()
+            self.refreshes += 1
+            return summary
+
+    async def _compute(self, db: AsyncSession) -> Dict[str, Any]:
+        """Tüm dashboard sayaçlarını hesaplar"""
+        twenty_four_hours_ago = utcnow() - timedelta(hours=24)
+        most_used = (
+            select(PeerTemplate.id)
+            .order_by(desc(PeerTemplate.usage_count))
+            .limit(1)
+            .scalar_subquery()
+        )
+        counters = (await db.execute(
+            select(
+                select(func.count(PeerTemplate.id)).scalar_subquery().label('total_templates'),
+                select(PeerTemplate.name).where(PeerTemplate.id == most_used).scalar_subquery().label('most_used_name'),
+                select(PeerTemplate.usage_count).where(PeerTemplate.id == most_used).scalar_subquery().label('most_used_count'),
+                select(func.count(User.id)).scalar_subquery().label('total_users'),
+                select(func.count(User.id)).where(User.is_active == True).scalar_subquery().label('active_users'),
+                select(func.count(ActivityLog.id)).where(
+                    ActivityLog.created_at >= twenty_four_hours_ago
+                ).scalar_subquery().label('activities_24h'),
+            )
+        )).one()
+
+        pools = (await db.execute(select(IPPool).order_by(IPPool.created_at.desc()))).scalars().all()
+        indexes = await ip_allocation_index.get_many(db, pools)
+
+        pool_usage: List[Dict[str, Any]] = []
+        totals = {
+            4: {'total_pools': 0, 'total_ips': 0, 'allocated_ips': 0, 'available_ips': 0},
+            6: {'total_pools': 0, 'total_ips': 0, 'allocated_ips': 0, 'available_ips': 0},
+        }
+        for pool in pools:
+            index = indexes[pool.id]
+            # Router'a gidilmez, mevcut peer snapshot'ı yeterli
+            await ip_allocation_index.sync_router(db, index, refresh=False)
+            pool_stats = index.utilization()
+
+            # IPv4 ve IPv6 adres sayıları ayrı toplanır (tek bir /64 bile IPv4 toplamlarını anlamsız kılar)
+            family = totals[pool_stats['ip_version']]
+            family['total_pools'] += 1
+            family['total_ips'] += pool_stats['total_ips']
+            family['allocated_ips'] += pool_stats['allocated']
+            family['available_ips'] += pool_stats['available']
+
+            pool_usage.append({
+                'pool_id': pool.id,
+                'pool_name': pool.name,
+                'interface_name': pool.interface_name,
+                'subnet': pool.subnet,
+                'is_active': pool.is_active,
+                **pool_stats
+            })
+
+        for family in totals.values():
+            in_use = family['total_ips'] - family['available_ips']
+            family['usage_percent'] = round(in_use / family['total_ips'] * 100, 2) if family['total_ips'] > 0 else 0
+
+        return {
+            'stats': {
+                'ip_pool': {
+                    **totals[4],
+                    'total_pools': len(pools),
+                    'ipv6': totals[6]
+                },
+                'templates': {
+                    'total_templates': counters.total_templates or 0,
+                    'most_used_template': {
+                        'name': counters.most_used_name,
+                        'usage_count': counters.most_used_count or 0
+                    } if counters.most_used_name is not None else None
+                },
+                'users': {
+                    'total_users': counters.total_users or 0,
+                    'active_users': counters.active_users or 0
+                },
+                'activity': {
+                    'last_24h': counters.activities_24h or 0
+                }
+            },
+            'pool_usage': pool_usage,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Özet deposu istatistiklerini döner"""
+        return {
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "age_seconds": round(time.monotonic() - self._computed_at, 1) if self._summary else None,
+        }
+
+
+# Global dashboard özeti
+dashboard_summary = DashboardSummary(ttl=settings.DASHBOARD_SUMMARY_TTL)
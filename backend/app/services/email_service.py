@@ -2,7 +2,7 @@
 Email gönderim servisi
 SMTP ile email gönderme ve template yönetimi
 """
-import smtplib
+import aiosmtplib
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -127,17 +127,17 @@ class EmailService:
             html_part = MIMEText(html_body, 'html')
             msg.attach(html_part)
             
-            # SMTP ile gönder
-            if settings.smtp_use_ssl:
-                server = smtplib.SMTP_SSL(settings.smtp_host, settings.smtp_port)
-            else:
-                server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-                if settings.smtp_use_tls:
-                    server.starttls()
-            
-            server.login(settings.smtp_username, smtp_password)
-            server.send_message(msg)
-            server.quit()
+            # SMTP ile gönder (async, event loop'u bloklamaz)
+            await aiosmtplib.send(
+                msg,
+                hostname=settings.smtp_host,
+                port=settings.smtp_port,
+                username=settings.smtp_username,
+                password=smtp_password,
+                use_tls=bool(settings.smtp_use_ssl),
+                start_tls=bool(settings.smtp_use_tls) and not settings.smtp_use_ssl,
+                timeout=30,
+            )
             
             # Log kaydet
             email_log = EmailLog(
@@ -287,6 +287,18 @@ class EmailService:
         template = templates.get(template_name, "<p>{message}</p>")
         return template.format(**kwargs)
     
+    @staticmethod
+    def is_notification_enabled(settings: EmailSettings, event_type: str) -> bool:
+        """Olay tipi için email bildirimi açık mı?"""
+        preferences = {
+            "backup_success": settings.notify_backup_success,
+            "backup_failure": settings.notify_backup_failure,
+            "peer_added": settings.notify_peer_added,
+            "peer_deleted": settings.notify_peer_deleted,
+            "system_alert": settings.notify_system_alerts,
+        }
+        return bool(preferences.get(event_type))
+    
     @staticmethod
     async def send_notification(
         db: AsyncSession,
@@ -295,48 +307,20 @@ class EmailService:
         template_data: Dict[str, Any]
     ) -> bool:
         """
-        Notification email gönder
+        Notification email'ini arka plan bildirim kuyruğuna bırakır (beklemez)
+        Tercih kontrolü, birleştirme ve tüm alıcılara tek SMTP bağlantısıyla gönderim
+        bildirim dağıtıcısında yapılır
         
         Args:
-            db: Database session
+            db: Database session (geriye uyumluluk için, kullanılmaz)
             event_type: Olay tipi (backup_success, peer_added, vb.)
             subject: Email başlığı
             template_data: Template verileri
         
         Returns:
-            bool: Başarılı ise True
+            bool: Kuyruğa alındıysa True
         """
-        settings = await EmailService.get_settings(db)
-        
-        if not settings or not settings.enabled or not settings.recipient_emails:
-            return False
-        
-        # Event type için notification açık mı kontrol et
-        notification_enabled = False
-        if event_type == "backup_success" and settings.notify_backup_success:
-            notification_enabled = True
-        elif event_type == "backup_failure" and settings.notify_backup_failure:
-            notification_enabled = True
-        elif event_type == "peer_added" and settings.notify_peer_added:
-            notification_enabled = True
-        elif event_type == "peer_deleted" and settings.notify_peer_deleted:
-            notification_enabled = True
-        elif event_type == "system_alert" and settings.notify_system_alerts:
-            notification_enabled = True
-        
-        if not notification_enabled:
-            logger.debug(f"Notification disabled for event: {event_type}")
-            return False
-        
-        # Template oluştur
-        html_body = EmailService.get_email_template(event_type, **template_data)
-        
-        # Tüm alıcılara gönder
-        recipients = [email.strip() for email in settings.recipient_emails.split(",") if email.strip()]
-        
-        success_count = 0
-        for recipient in recipients:
-            if await EmailService.send_email(db, recipient, subject, html_body, event_type, template_data):
-                success_count += 1
+        # Lazy import (circular import önleme)
+        from app.services.notification_dispatcher import notification_dispatcher
         
-        return success_count > 0
+        return notification_dispatcher.enqueue_email(event_type, subject, template_data)
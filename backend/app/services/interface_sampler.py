@@ -0,0 +1,369 @@
+"""
+Interface trafik örnekleyici
+WAN ve WireGuard interface'lerinin anlık hızlarını (monitor-traffic) ve kümülatif
+sayaçlarını tek bir döngüde çeker. WebSocket aboneleri ve REST endpoint'leri router'a
+kendileri gitmez, son örnekleri buradaki halka tampondan okur; router yükü izleyen
+kişi sayısından bağımsızdır.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.mikrotik.connection import mikrotik_conn
+
+logger = logging.getLogger(__name__)
+
+# Örnek dinleyicisi: {"type": "traffic_update" | "error", ...} mesajını alır
+SampleListener = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Sayaç sorgusunda istenen alanlar (tüm interface detayları yerine)
+_COUNTER_PROPLIST = "name,rx-byte,tx-byte,running"
+
+
+class InterfaceSampler:
+    """
+    Paylaşımlı interface örnekleyici
+    - Döngü sadece abone (WebSocket) varken veya son REST okumasından sonra kısa bir süre çalışır
+    - Her turda izlenen tüm interface'ler için tek monitor-traffic çağrısı yapılır
+    - Kümülatif rx/tx sayaçları daha seyrek (counter_interval) tek /interface print ile yenilenir
+    - Interface keşfi (WAN comment'i + WireGuard listesi) cache'lenir; sadece interface
+      eklenince/silinince (invalidate_interfaces) veya monitor-traffic başarısız olunca yenilenir
+    - Son örnekler halka tamponda (history) tutulur
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        counter_interval: float = 10.0,
+        history_size: int = 120,
+        idle_timeout: float = 30.0
+    ):
+        """
+        Args:
+            interval: Hız örnekleme aralığı (saniye)
+            counter_interval: Kümülatif sayaç yenileme aralığı (saniye)
+            history_size: Halka tamponda tutulacak örnek sayısı
+            idle_timeout: Abone yokken son REST okumasından sonra döngünün çalışmaya devam edeceği süre
+        """
+        self.interval = interval
+        self.counter_interval = counter_interval
+        self.idle_timeout = idle_timeout
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._counters: Dict[str, Dict[str, Any]] = {}
+        self._counters_at = 0.0
+        self._listeners: List[SampleListener] = []
+        self._task: Optional[asyncio.Task] = None
+        self._first_sample: Optional[asyncio.Event] = None
+        self._live_lock = asyncio.Lock()
+        self._last_read = 0.0
+
+        # Interface keşif cache'i
+        self.wan_interface_name: Optional[str] = None
+        self.wg_interface_names: List[str] = []
+        self._discovered = False
+
+        # İstatistikler
+        self.samples = 0
+        self.discoveries = 0
+        self.errors = 0
+
+    # ===== Interface keşfi =====
+
+    def invalidate_interfaces(self):
+        """Interface eklenip silindiğinde (veya yeniden adlandırıldığında) keşfi geçersiz kılar"""
+        self._discovered = False
+        self._counters_at = 0.0
+
+    async def _discover(self):
+        """WAN (comment'inde 'wan' geçen) ve WireGuard interface'lerini bulur"""
+        wan_interface_name = None
+        interfaces = await mikrotik_conn.execute_command("/interface", "print")
+        for iface in interfaces:
+            if 'wan' in (iface.get('comment') or '').lower():
+                wan_interface_name = iface.get('name')
+                break
+
+        wg_interface_names = []
+        try:
+            for wg in await mikrotik_conn.execute_command("/interface/wireguard", "print"):
+                if wg.get('name') and wg['name'] not in wg_interface_names:
+                    wg_interface_names.append(wg['name'])
+        except Exception as e:
+            logger.warning(f"WireGuard interface listesi alınamadı: {e}")
+
+        if wan_interface_name != self.wan_interface_name or wg_interface_names != self.wg_interface_names:
+            logger.info(f"İzlenen interface'ler: WAN={wan_interface_name or '-'}, WireGuard={wg_interface_names}")
+        if not wan_interface_name:
+            logger.warning("WAN interface bulunamadı")
+
+        self.wan_interface_name = wan_interface_name
+        self.wg_interface_names = wg_interface_names
+        self._discovered = True
+        self.discoveries += 1
+
+    def _monitored_interfaces(self) -> List[str]:
+        names = [self.wan_interface_name] if self.wan_interface_name else []
+        names.extend(self.wg_interface_names)
+        return names
+
+    # ===== Örnekleme =====
+
+    async def _refresh_counters(self):
+        """İzlenen interface'lerin kümülatif sayaçlarını tek sorguda yeniler"""
+        rows = await mikrotik_conn.call('/interface', 'print', {'.proplist': _COUNTER_PROPLIST}, timeout=10.0)
+        monitored = set(self._monitored_interfaces())
+        self._counters = {
+            row['name']: {
+                "rx_bytes": int(row.get('rx-byte', 0) or 0),
+                "tx_bytes": int(row.get('tx-byte', 0) or 0),
+                "running": str(row.get('running', 'false')).lower() == 'true',
+            }
+            for row in rows or []
+            if row.get('name') in monitored
+        }
+        self._counters_at = time.monotonic()
+
+    def _build_sample(self, traffic_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """monitor-traffic sonucundan traffic_update verisini oluşturur"""
+        wan_data = None
+        wg_total_rx_bps = 0
+        wg_total_tx_bps = 0
+        wg_interfaces_data = []
+
+        for data in traffic_data:
+            iface_name = data.get('name', '')
+            rx_rate_bps = int(data.get('rx-bits-per-second', 0) or 0)
+            tx_rate_bps = int(data.get('tx-bits-per-second', 0) or 0)
+
+            if iface_name == self.wan_interface_name:
+                wan_data = {
+                    "interface_name": iface_name,
+                    "rx_rate": round(rx_rate_bps / 8, 2),
+                    "tx_rate": round(tx_rate_bps / 8, 2),
+                    "rx_rate_bps": rx_rate_bps,
+                    "tx_rate_bps": tx_rate_bps,
+                    "running": True
+                }
+            elif iface_name in self.wg_interface_names:
+                wg_total_rx_bps += rx_rate_bps
+                wg_total_tx_bps += tx_rate_bps
+                wg_interfaces_data.append({
+                    "name": iface_name,
+                    "rx_rate_bps": rx_rate_bps,
+                    "tx_rate_bps": tx_rate_bps
+                })
+
+        return {
+            "wan": wan_data,
+            "wireguard": {
+                "total_rx_rate": round(wg_total_rx_bps / 8, 2),
+                "total_tx_rate": round(wg_total_tx_bps / 8, 2),
+                "total_rx_rate_bps": wg_total_rx_bps,
+                "total_tx_rate_bps": wg_total_tx_bps,
+                "interfaces": wg_interfaces_data
+            },
+            "timestamp": asyncio.get_running_loop().time()
+        }
+
+    async def _sample_once(self) -> Optional[Dict[str, Any]]:
+        """
+        Tek örnekleme turu
+
+        Returns:
+            Dinleyicilere gönderilecek mesaj (hata durumunda "error" mesajı)
+        """
+        if not await mikrotik_conn.ensure_connected():
+            return {"type": "error", "message": "MikroTik bağlantısı kurulamadı"}
+
+        if not self._discovered:
+            await self._discover()
+
+        interfaces_to_monitor = self._monitored_interfaces()
+        if not interfaces_to_monitor:
+            # Yeni interface eklenmiş olabilir, bir sonraki turda tekrar ara
+            self._discovered = False
+            return {"type": "error", "message": "İzlenecek interface bulunamadı"}
+
+        if time.monotonic() - self._counters_at >= self.counter_interval:
+            try:
+                await self._refresh_counters()
+            except Exception as e:
+                logger.debug(f"Interface sayaçları alınamadı: {e}")
+
+        # Oturum havuzundan ayrı bir oturum (veya asyncio istemcide ayrı bir tag) kullanılır
+        try:
+            traffic_data = await mikrotik_conn.call(
+                '/interface',
+                'monitor-traffic',
+                {
+                    # Virgülle ayrılmış interface listesi
+                    'interface': ','.join(interfaces_to_monitor),
+                    'once': ''
+                },
+                timeout=10.0
+            )
+        except Exception as e:
+            logger.error(f"monitor-traffic error: {e}")
+            traffic_data = None
+
+        if not traffic_data:
+            # monitor-traffic başarısız (interface silinmiş olabilir), keşfi yenile
+            self._discovered = False
+            return None
+
+        sample = self._build_sample(traffic_data)
+        self._history.append(sample)
+        self.samples += 1
+        if self._first_sample is not None:
+            self._first_sample.set()
+        return {"type": "traffic_update", "data": sample}
+
+    def _should_run(self) -> bool:
+        return bool(self._listeners) or time.monotonic() - self._last_read < self.idle_timeout
+
+    async def _run(self):
+        """Örnekleme döngüsü"""
+        logger.info("Interface sampler started")
+        while self._should_run():
+            try:
+                message = await self._sample_once()
+                if message is not None:
+                    await self._notify(message)
+                await asyncio.sleep(self.interval if message is None or message["type"] != "error" else 5)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Interface sampler error: {e}")
+                self._discovered = False
+                await asyncio.sleep(2)
+        logger.info("Interface sampler stopped")
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._first_sample = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _notify(self, message: Dict[str, Any]):
+        for listener in list(self._listeners):
+            try:
+                await listener(message)
+            except Exception as e:
+                logger.error(f"Interface sampler dinleyici hatası: {e}")
+
+    # ===== Okuma / abonelik =====
+
+    def subscribe(self, listener: SampleListener):
+        """Her örnekte çağrılacak dinleyiciyi ekler ve gerekirse döngüyü başlatır"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        self._ensure_running()
+
+    def unsubscribe(self, listener: SampleListener):
+        """Dinleyiciyi çıkarır; abone kalmazsa döngü idle_timeout sonunda kendiliğinden durur"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _is_fresh(self, sample: Dict[str, Any]) -> bool:
+        """Örnek son birkaç örnekleme aralığı içinde mi alınmış?"""
+        age = asyncio.get_running_loop().time() - sample["timestamp"]
+        return age <= max(self.interval * 3, 2.0)
+
+    async def latest(self, wait: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        En son örneği döner (REST endpoint'leri için)
+        Döngü çalışmıyorsa başlatılır ve ilk örnek en fazla `wait` saniye beklenir.
+        Son örnek eskiyse (döngü router'dan örnek alamıyor) tek seferlik canlı örnek alınır;
+        o da alınamazsa son örnek "stale": True ile döner
+
+        Args:
+            wait: Yeni örnek için maksimum bekleme (varsayılan: 5 x interval)
+        """
+        self._last_read = time.monotonic()
+        self._ensure_running()
+        if self._history and self._is_fresh(self._history[-1]):
+            return self._history[-1]
+
+        timeout = wait or self.interval * 5
+        if not self._first_sample.is_set():
+            # Döngü yeni başladı, ilk örneği bekle
+            try:
+                await asyncio.wait_for(self._first_sample.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        elif self._history:
+            # Eşzamanlı REST okumaları tek canlı örnekte birleşir
+            async with self._live_lock:
+                if not self._is_fresh(self._history[-1]):
+                    try:
+                        await asyncio.wait_for(self._sample_once(), timeout=timeout)
+                    except Exception as e:
+                        logger.debug(f"Canlı trafik örneği alınamadı: {e}")
+
+        if not self._history:
+            return None
+        sample = self._history[-1]
+        if self._is_fresh(sample):
+            return sample
+        return {**sample, "stale": True}
+
+    async def counters(self, wait: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """İzlenen interface'lerin son kümülatif sayaçlarını döner"""
+        await self.latest(wait)
+        return self._counters
+
+    def counters_age(self) -> Optional[float]:
+        """Kümülatif sayaçların yaşı (saniye), hiç okunmadıysa None"""
+        if not self._counters_at:
+            return None
+        return time.monotonic() - self._counters_at
+
+    def counters_stale(self) -> bool:
+        """Sayaçlar planlanan yenilemeyi (counter_interval) kaçırdıysa True"""
+        age = self.counters_age()
+        return age is None or age > self.counter_interval + max(self.interval * 3, 2.0)
+
+    def history(self, seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Halka tampondaki örnekleri döner (seconds verilirse sadece son N saniye)"""
+        self._last_read = time.monotonic()
+        samples = list(self._history)
+        if seconds is not None and samples:
+            since = samples[-1]["timestamp"] - seconds
+            samples = [sample for sample in samples if sample["timestamp"] >= since]
+        return samples
+
+    async def stop(self):
+        """Döngüyü durdurur (uygulama kapanırken)"""
+        self._listeners.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Örnekleyici istatistiklerini döner"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "subscribers": len(self._listeners),
+            "history": len(self._history),
+            "samples": self.samples,
+            "discoveries": self.discoveries,
+            "errors": self.errors,
+            "wan_interface": self.wan_interface_name,
+            "wireguard_interfaces": list(self.wg_interface_names),
+        }
+
+
+# Global interface örnekleyici
+interface_sampler = InterfaceSampler(
+    interval=settings.INTERFACE_SAMPLE_INTERVAL,
+    counter_interval=settings.INTERFACE_COUNTER_INTERVAL,
+    history_size=settings.INTERFACE_SAMPLE_HISTORY,
+)
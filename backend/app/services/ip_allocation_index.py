@@ -0,0 +1,362 @@
+"""
+IP havuzu tahsis indeksi
+Her havuz için boş adresleri sıralı tamsayı aralıkları (free-list) olarak bellekte tutar.
+Sıradaki boş IP aralığı taramadan O(1), tahsis/serbest bırakma O(log n) arama ile bulunur.
+Adresler tamsayı olarak işlendiğinden IPv4 ve IPv6 havuzları (örn. /64) aynı şekilde desteklenir;
+doluluk adres sayısına değil tahsis sayısına bağlıdır.
+İndeks ilk kullanımda veritabanından tek sorgu ile kurulur, IPPoolService tarafından güncel tutulur.
+"""
+import asyncio
+import bisect
+import ipaddress
+import logging
+from typing import Dict, List, Optional, Set, Tuple, Any, Iterable
+
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ip_pool import IPPool, IPAllocation
+
+logger = logging.getLogger(__name__)
+
+
+def parse_address(address: str) -> Optional[Tuple[int, int]]:
+    """
+    IP adresini (CIDR eki varsa atılır) (sürüm, tamsayı) olarak döner
+    Geçersiz adres için None döner
+    """
+    if not address:
+        return None
+    address = address.strip()
+    if '/' in address:
+        address = address.split('/')[0]
+    try:
+        ip_obj = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    return ip_obj.version, int(ip_obj)
+
+
+def pool_contains(pool: IPPool, address: str) -> bool:
+    """
+    Adres havuzun start_ip - end_ip aralığında mı?
+    Farklı IP sürümleri (IPv4 adres / IPv6 havuz) karşılaştırma hatası yerine False döner
+    """
+    parsed = parse_address(address)
+    if parsed is None:
+        return False
+    start = ipaddress.ip_address(pool.start_ip)
+    end = ipaddress.ip_address(pool.end_ip)
+    return parsed[0] == start.version and int(start) <= parsed[1] <= int(end)
+
+
+class IntervalSet:
+    """
+    Ayrık, kapalı tamsayı aralıklarının sıralı kümesi
+    Başlangıç ve bitişler iki paralel listede tutulur, arama bisect ile yapılır
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]] = ()):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._size = 0
+        for start, end in intervals:
+            self.add_range(start, end)
+
+    @property
+    def size(self) -> int:
+        """
+        Kümedeki toplam tamsayı sayısı
+        (len() yerine property: IPv6 aralıkları sys.maxsize'ı aşabilir)
+        """
+        return self._size
+
+    def __contains__(self, value: int) -> bool:
+        index = bisect.bisect_right(self._starts, value) - 1
+        return index >= 0 and self._ends[index] >= value
+
+    def first(self) -> Optional[int]:
+        """En küçük eleman (boşsa None)"""
+        return self._starts[0] if self._starts else None
+
+    def interval_count(self) -> int:
+        """Aralık sayısı"""
+        return len(self._starts)
+
+    def intervals(self) -> List[Tuple[int, int]]:
+        """Aralıkların listesi"""
+        return list(zip(self._starts, self._ends))
+
+    def add(self, value: int):
+        """Tek değer ekler"""
+        self.add_range(value, value)
+
+    def add_range(self, start: int, end: int):
+        """[start, end] aralığını ekler, komşu/çakışan aralıklarla birleştirir"""
+        if start > end:
+            return
+        # start-1'e kadar biten aralıklarla birleşebilir
+        left = bisect.bisect_left(self._ends, start - 1)
+        right = bisect.bisect_right(self._starts, end + 1)
+        if left < right:
+            removed = sum(e - s + 1 for s, e in zip(self._starts[left:right], self._ends[left:right]))
+            start = min(start, self._starts[left])
+            end = max(end, self._ends[right - 1])
+            del self._starts[left:right]
+            del self._ends[left:right]
+            self._size -= removed
+        self._starts.insert(left, start)
+        self._ends.insert(left, end)
+        self._size += end - start + 1
+
+    def discard(self, value: int) -> bool:
+        """Tek değeri çıkarır, gerekirse aralığı ikiye böler. Değer kümedeyse True döner"""
+        index = bisect.bisect_right(self._starts, value) - 1
+        if index < 0 or self._ends[index] < value:
+            return False
+        start, end = self._starts[index], self._ends[index]
+        if start == end:
+            del self._starts[index]
+            del self._ends[index]
+        elif value == start:
+            self._starts[index] = value + 1
+        elif value == end:
+            self._ends[index] = value - 1
+        else:
+            self._ends[index] = value - 1
+            self._starts.insert(index + 1, value + 1)
+            self._ends.insert(index + 1, end)
+        self._size -= 1
+        return True
+
+
+class PoolAllocationIndex:
+    """
+    Tek bir havuzun tahsis indeksi
+    Bir adres üç kaynaktan biri kullanıyorsa dolu sayılır:
+    veritabanı tahsisi, router'daki peer allowed-address'i veya gateway
+    """
+
+    def __init__(self, pool: IPPool, allocated: Iterable[str]):
+        self.pool_id = pool.id
+        self.interface_name = pool.interface_name
+        self.start = int(ipaddress.ip_address(pool.start_ip))
+        self.end = int(ipaddress.ip_address(pool.end_ip))
+        self.version = ipaddress.ip_address(pool.start_ip).version
+        self.signature = IPAllocationIndex.pool_signature(pool)
+
+        self.free = IntervalSet([(self.start, self.end)])
+        self.allocated: Set[int] = set()
+        self.router: Set[int] = set()
+        self.reserved: Set[int] = set()
+        self.router_snapshot: Any = None  # router kümesinin hesaplandığı peer snapshot'ı
+        self.lock = asyncio.Lock()
+
+        gateway = self._value(pool.gateway) if pool.gateway else None
+        if gateway is not None:
+            self._mark(self.reserved, gateway)
+        for address in allocated:
+            value = self._value(address)
+            if value is not None:
+                self._mark(self.allocated, value)
+
+    def _value(self, address: str) -> Optional[int]:
+        """Adresi tamsayıya çevirir; geçersizse veya havuzun IP sürümünde değilse None"""
+        parsed = parse_address(address)
+        if parsed is None or parsed[0] != self.version:
+            return None
+        return parsed[1]
+
+    def to_address(self, value: int) -> str:
+        """Tamsayıyı havuzun IP sürümünde adrese çevirir"""
+        if self.version == 6:
+            return str(ipaddress.IPv6Address(value))
+        return str(ipaddress.IPv4Address(value))
+
+    def in_range(self, value: int) -> bool:
+        return self.start <= value <= self.end
+
+    def _is_used(self, value: int) -> bool:
+        return value in self.allocated or value in self.router or value in self.reserved
+
+    def _mark(self, layer: Set[int], value: int):
+        layer.add(value)
+        if self.in_range(value):
+            self.free.discard(value)
+
+    def _unmark(self, layer: Set[int], value: int):
+        layer.discard(value)
+        if self.in_range(value) and not self._is_used(value):
+            self.free.add(value)
+
+    def next_free(self) -> Optional[str]:
+        """Sıradaki boş adres (yoksa None)"""
+        value = self.free.first()
+        return self.to_address(value) if value is not None else None
+
+    def mark_allocated(self, address: str):
+        value = self._value(address)
+        if value is not None:
+            self._mark(self.allocated, value)
+
+    def mark_released(self, address: str):
+        value = self._value(address)
+        if value is not None:
+            self._unmark(self.allocated, value)
+
+    def used_intervals(self) -> List[Tuple[int, int]]:
+        """Kullanılan adresler (boş aralıkların havuz içindeki tümleyeni)"""
+        used = []
+        cursor = self.start
+        for start, end in self.free.intervals():
+            if start > cursor:
+                used.append((cursor, start - 1))
+            cursor = end + 1
+        if cursor <= self.end:
+            used.append((cursor, self.end))
+        return used
+
+    def utilization(self) -> Dict[str, Any]:
+        """
+        Havuz doluluğu - boş liste boyutu tutulduğundan adres sayısından bağımsızdır
+        in_use; veritabanı tahsisleri, router'daki adresler ve gateway'i kapsar
+        """
+        total = self.end - self.start + 1
+        available = self.free.size
+        in_use = total - available
+        return {
+            'ip_version': self.version,
+            'total_ips': total,
+            'allocated': sum(1 for value in self.allocated if self.in_range(value)),
+            'in_use': in_use,
+            'available': available,
+            'usage_percent': round(in_use / total * 100, 2) if total > 0 else 0
+        }
+
+    def sync_router(self, snapshot: Any, peers: List[Dict[str, Any]]):
+        """Router'da kullanılan adres kümesini yeni peer snapshot'ına göre farkla günceller"""
+        addresses: Set[int] = set()
+        for peer in peers:
+            for address in (peer.get('allowed-address') or '').split(','):
+                value = self._value(address)
+                if value is not None and self.in_range(value):
+                    addresses.add(value)
+
+        for value in addresses - self.router:
+            self._mark(self.router, value)
+        for value in self.router - addresses:
+            self._unmark(self.router, value)
+        self.router_snapshot = snapshot
+
+
+class IPAllocationIndex:
+    """
+    Havuz tahsis indekslerinin yöneticisi
+    - İndeks havuz başına ilk kullanımda kurulur (tek sorgu)
+    - Havuz aralığı/gateway değişirse yeniden kurulur
+    - Router'daki adresler peer snapshot deposundan, snapshot değiştikçe güncellenir
+    """
+
+    def __init__(self):
+        self._pools: Dict[int, PoolAllocationIndex] = {}
+
+        # İstatistikler
+        self.builds = 0
+
+    @staticmethod
+    def pool_signature(pool: IPPool) -> Tuple[str, str, Optional[str], str]:
+        """İndeksin geçerliliğini belirleyen havuz alanları"""
+        return (pool.start_ip, pool.end_ip, pool.gateway, pool.interface_name)
+
+    async def get(self, db: AsyncSession, pool: IPPool) -> PoolAllocationIndex:
+        """Havuzun indeksini döner, yoksa veya havuz değiştiyse veritabanından kurar"""
+        return (await self.get_many(db, [pool]))[pool.id]
+
+    async def get_many(self, db: AsyncSession, pools: Iterable[IPPool]) -> Dict[int, PoolAllocationIndex]:
+        """
+        Birden fazla havuzun indeksini döner
+        Kurulması gereken tüm havuzların tahsisleri tek sorguda yüklenir
+        """
+        indexes: Dict[int, PoolAllocationIndex] = {}
+        missing: List[IPPool] = []
+        for pool in pools:
+            index = self._pools.get(pool.id)
+            if index is not None and index.signature == self.pool_signature(pool):
+                indexes[pool.id] = index
+            else:
+                missing.append(pool)
+
+        if not missing:
+            return indexes
+
+        result = await db.execute(
+            select(IPAllocation.pool_id, IPAllocation.ip_address).where(
+                and_(
+                    IPAllocation.pool_id.in_([pool.id for pool in missing]),
+                    IPAllocation.status == 'allocated'
+                )
+            )
+        )
+        allocated: Dict[int, List[str]] = {}
+        for pool_id, ip_address in result.all():
+            allocated.setdefault(pool_id, []).append(ip_address)
+
+        for pool in missing:
+            index = PoolAllocationIndex(pool, allocated.get(pool.id, ()))
+            # Kurulum sırasında başka bir istek indeks oluşturduysa onu koru (kilidi paylaşsınlar)
+            current = self._pools.get(pool.id)
+            if current is not None and current.signature == index.signature:
+                indexes[pool.id] = current
+                continue
+            self._pools[pool.id] = index
+            indexes[pool.id] = index
+            self.builds += 1
+            logger.debug(f"IP tahsis indeksi kuruldu: {pool.name} - {index.free.size} boş adres")
+        return indexes
+
+    async def sync_router(self, db: AsyncSession, index: PoolAllocationIndex, refresh: bool = True):
+        """
+        Router'daki peer adreslerini indekse yansıtır (snapshot değişmediyse işlem yapmaz)
+
+        Args:
+            refresh: False ise router'a gidilmez, sadece mevcut snapshot kullanılır (istatistikler için)
+        """
+        from app.services.peer_snapshot_store import peer_snapshot_store
+
+        if refresh:
+            try:
+                snapshot = await peer_snapshot_store.get_snapshot(db, index.interface_name)
+            except Exception as e:
+                # MikroTik bağlantı hatası olursa sadece database'e güven
+                logger.warning(f"MikroTik peer kontrolü yapılamadı, sadece database kullanılıyor: {e}")
+                return
+        else:
+            snapshot = peer_snapshot_store.peek(index.interface_name)
+
+        if snapshot is not None and snapshot is not index.router_snapshot:
+            index.sync_router(snapshot, snapshot.peers)
+
+    def mark_released(self, pool_id: int, address: str):
+        """Serbest bırakılan adresi (indeks kuruluysa) boş listeye geri ekler"""
+        index = self._pools.get(pool_id)
+        if index is not None:
+            index.mark_released(address)
+
+    def invalidate(self, pool_id: Optional[int] = None):
+        """İndeksi düşürür, bir sonraki kullanımda yeniden kurulur (pool_id yoksa tümü)"""
+        if pool_id is None:
+            self._pools.clear()
+        else:
+            self._pools.pop(pool_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """İndeks istatistiklerini döner"""
+        return {
+            "pools": len(self._pools),
+            "builds": self.builds,
+            "free_intervals": sum(index.free.interval_count() for index in self._pools.values()),
+        }
+
+
+# Global IP tahsis indeksi
+ip_allocation_index = IPAllocationIndex()
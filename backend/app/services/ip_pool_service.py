@@ -3,15 +3,54 @@ IP Pool Service
 IP havuzu yönetimi ve IP tahsisi için iş mantığı
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func, delete
+from sqlalchemy import select, and_, or_, delete, event
+from sqlalchemy.orm import Session
 from app.models.ip_pool import IPPool, IPAllocation
-from typing import Optional, List, Dict, Any
+from app.services.ip_allocation_index import ip_allocation_index, pool_contains
+from app.services.dashboard_summary_service import dashboard_summary
+from typing import Optional, List, Dict, Any, Tuple
 import ipaddress
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# commit=False tahsislerinde çağıranın transaction'ı bitene kadar bekleyen indeks işaretleri (session.info)
+_PENDING_MARKS_KEY = "ip_allocation_pending_marks"
+
+
+def _clear_pending_marks(session: Session):
+    """Transaction commit edildi, indeks işaretleri kalıcı"""
+    session.info.pop(_PENDING_MARKS_KEY, None)
+
+
+def _release_pending_marks(session: Session, transaction):
+    """
+    Transaction commit edilmeden bitti (rollback veya rollback'siz session kapanışı),
+    tahsis satırları yazılmadı; indeks işaretleri kaldırılır
+    """
+    if transaction.parent is not None:
+        # Savepoint/alt transaction; işaretler dış transaction'a bağlı
+        return
+    for pool_id, address in session.info.pop(_PENDING_MARKS_KEY, ()):
+        ip_allocation_index.mark_released(pool_id, address)
+
+
+def _track_uncommitted(db: AsyncSession, pool_id: int, addresses: List[str]):
+    """
+    commit=False tahsislerinde indeks işaretlerini çağıranın transaction'ına bağlar:
+    commit'te kalır, rollback'te veya session commit'siz kapanınca serbest bırakılır
+    (dinleyiciler session başına bir kez eklenir)
+    """
+    session = db.sync_session
+    pending = session.info.get(_PENDING_MARKS_KEY)
+    if pending is None:
+        pending = session.info[_PENDING_MARKS_KEY] = []
+        if not event.contains(session, "after_commit", _clear_pending_marks):
+            event.listen(session, "after_commit", _clear_pending_marks)
+            event.listen(session, "after_transaction_end", _release_pending_marks)
+    pending.extend((pool_id, address) for address in addresses)
+
 
 class IPPoolService:
     """IP havuzu yönetim servisi"""
@@ -47,19 +86,8 @@ class IPPoolService:
         Returns:
             Oluşturulan IPPool objesi
         """
-        # IP formatlarını doğrula
-        try:
-            ipaddress.ip_network(subnet)
-            ipaddress.ip_address(start_ip)
-            ipaddress.ip_address(end_ip)
-            if gateway:
-                ipaddress.ip_address(gateway)
-        except ValueError as e:
-            raise ValueError(f"Geçersiz IP formatı: {e}")
-
-        # Başlangıç IP'nin bitiş IP'den küçük olduğunu kontrol et
-        if ipaddress.ip_address(start_ip) >= ipaddress.ip_address(end_ip):
-            raise ValueError("Başlangıç IP'si bitiş IP'sinden küçük olmalıdır")
+        # IP formatlarını ve aralığı doğrula (IPv4 veya IPv6)
+        IPPoolService._validate_range(subnet, start_ip, end_ip, gateway)
 
         pool = IPPool(
             name=name,
@@ -77,9 +105,41 @@ class IPPoolService:
         await db.commit()
         await db.refresh(pool)
 
+        dashboard_summary.invalidate()
         logger.info(f"IP havuzu oluşturuldu: {name} ({subnet})")
         return pool
 
+    @staticmethod
+    def _validate_range(
+        subnet: str,
+        start_ip: str,
+        end_ip: str,
+        gateway: Optional[str] = None
+    ):
+        """
+        Havuz aralığını doğrular
+        Subnet, başlangıç/bitiş IP ve gateway aynı IP sürümünde olmalı,
+        aralık subnet içinde kalmalı ve başlangıç bitişten küçük olmalıdır
+        """
+        try:
+            network = ipaddress.ip_network(subnet)
+            start = ipaddress.ip_address(start_ip)
+            end = ipaddress.ip_address(end_ip)
+            gateway_ip = ipaddress.ip_address(gateway) if gateway else None
+        except ValueError as e:
+            raise ValueError(f"Geçersiz IP formatı: {e}")
+
+        addresses = [start, end] + ([gateway_ip] if gateway_ip else [])
+        if any(ip.version != network.version for ip in addresses):
+            raise ValueError(f"Subnet, IP aralığı ve gateway aynı IP sürümünde olmalıdır (IPv{network.version})")
+
+        # Başlangıç IP'nin bitiş IP'den küçük olduğunu kontrol et
+        if start >= end:
+            raise ValueError("Başlangıç IP'si bitiş IP'sinden küçük olmalıdır")
+
+        if start not in network or end not in network:
+            raise ValueError(f"IP aralığı subnet içinde olmalıdır: {subnet}")
+
     @staticmethod
     async def get_pool(db: AsyncSession, pool_id: int) -> Optional[IPPool]:
         """Pool ID'ye göre havuzu getirir"""
@@ -131,22 +191,13 @@ class IPPoolService:
             return None
 
         # IP formatlarını doğrula (eğer güncelleniyorsa)
-        if 'subnet' in kwargs:
-            try:
-                ipaddress.ip_network(kwargs['subnet'])
-            except ValueError as e:
-                raise ValueError(f"Geçersiz subnet formatı: {e}")
-
-        if 'start_ip' in kwargs or 'end_ip' in kwargs:
-            start = kwargs.get('start_ip', pool.start_ip)
-            end = kwargs.get('end_ip', pool.end_ip)
-            try:
-                ipaddress.ip_address(start)
-                ipaddress.ip_address(end)
-                if ipaddress.ip_address(start) >= ipaddress.ip_address(end):
-                    raise ValueError("Başlangıç IP'si bitiş IP'sinden küçük olmalıdır")
-            except ValueError as e:
-                raise ValueError(f"Geçersiz IP formatı: {e}")
+        if {'subnet', 'start_ip', 'end_ip', 'gateway'} & kwargs.keys():
+            IPPoolService._validate_range(
+                kwargs.get('subnet', pool.subnet),
+                kwargs.get('start_ip', pool.start_ip),
+                kwargs.get('end_ip', pool.end_ip),
+                kwargs.get('gateway', pool.gateway)
+            )
 
         # Güncelleme
         for key, value in kwargs.items():
@@ -155,7 +206,10 @@ class IPPoolService:
 
         await db.commit()
         await db.refresh(pool)
+        # Aralık/gateway değiştiyse tahsis indeksi yeniden kurulur
+        ip_allocation_index.invalidate(pool_id)
 
+        dashboard_summary.invalidate()
         logger.info(f"IP havuzu güncellendi: {pool.name}")
         return pool
 
@@ -187,6 +241,8 @@ class IPPoolService:
             return False
 
         await db.commit()
+        ip_allocation_index.invalidate(pool_id)
+        dashboard_summary.invalidate()
         logger.info(f"IP havuzu silindi: {pool_name}")
         return True
 
@@ -198,7 +254,8 @@ class IPPoolService:
         peer_public_key: Optional[str] = None,
         peer_name: Optional[str] = None,
         ip_address: Optional[str] = None,
-        notes: Optional[str] = None
+        notes: Optional[str] = None,
+        commit: bool = True
     ) -> Optional[IPAllocation]:
         """
         IP tahsis eder (manuel veya otomatik)
@@ -211,6 +268,7 @@ class IPPoolService:
             peer_name: Peer adı (opsiyonel)
             ip_address: Belirli bir IP tahsis et (opsiyonel, boş ise otomatik)
             notes: Notlar
+            commit: False ise sadece flush edilir, commit çağıranın transaction'ına bırakılır
 
         Returns:
             IPAllocation objesi veya None (başarısız ise)
@@ -220,64 +278,203 @@ class IPPoolService:
             logger.error(f"Havuz bulunamadı veya aktif değil: {pool_id}")
             return None
 
-        # Manuel IP tahsisi
-        if ip_address:
-            # IP formatını doğrula
-            try:
-                ip_obj = ipaddress.ip_address(ip_address)
-            except ValueError:
-                logger.error(f"Geçersiz IP formatı: {ip_address}")
-                return None
-
-            # IP'nin havuz aralığında olduğunu kontrol et
-            start_ip = ipaddress.ip_address(pool.start_ip)
-            end_ip = ipaddress.ip_address(pool.end_ip)
-
-            if not (start_ip <= ip_obj <= end_ip):
-                logger.error(f"IP havuz aralığında değil: {ip_address}")
-                return None
-
-            # IP'nin zaten tahsis edilmediğini kontrol et
-            existing = await db.execute(
-                select(IPAllocation).where(
-                    and_(
-                        IPAllocation.pool_id == pool_id,
-                        IPAllocation.ip_address == ip_address,
-                        IPAllocation.status == 'allocated'
-                    )
-                )
+        index = await ip_allocation_index.get(db, pool)
+
+        # Aynı havuzdaki tahsisler sırayla yapılır, iki eşzamanlı istek aynı IP'yi alamaz
+        async with index.lock:
+            # Manuel IP tahsisi
+            if ip_address:
+                # IP formatını doğrula
+                try:
+                    ip_address = str(ipaddress.ip_address(ip_address))
+                except ValueError:
+                    logger.error(f"Geçersiz IP formatı: {ip_address}")
+                    return None
+
+                # IP'nin havuz aralığında (ve aynı IP sürümünde) olduğunu kontrol et
+                if not pool_contains(pool, ip_address):
+                    logger.error(f"IP havuz aralığında değil: {ip_address}")
+                    return None
+
+                # IP'nin zaten tahsis edilmediğini kontrol et
+                if await IPPoolService._is_allocated(db, pool_id, ip_address):
+                    logger.error(f"IP zaten tahsis edilmiş: {ip_address}")
+                    return None
+
+                assigned_ip = ip_address
+
+            # Otomatik IP tahsisi
+            else:
+                await ip_allocation_index.sync_router(db, index)
+                while True:
+                    assigned_ip = index.next_free()
+                    if not assigned_ip:
+                        logger.error(f"Havuzda boş IP kalmadı: {pool.name}")
+                        return None
+                    # İndeks başka bir worker'ın tahsisini görmemiş olabilir, veritabanından doğrula
+                    if not await IPPoolService._is_allocated(db, pool_id, assigned_ip):
+                        break
+                    index.mark_allocated(assigned_ip)
+
+            # Tahsisi oluştur
+            allocation = IPAllocation(
+                pool_id=pool_id,
+                ip_address=assigned_ip,
+                peer_id=peer_id,
+                peer_public_key=peer_public_key,
+                peer_name=peer_name,
+                status='allocated',
+                notes=notes
             )
-            if existing.scalar_one_or_none():
-                logger.error(f"IP zaten tahsis edilmiş: {ip_address}")
-                return None
 
-            assigned_ip = ip_address
+            db.add(allocation)
+            if commit:
+                await db.commit()
+            else:
+                await db.flush()
+                _track_uncommitted(db, pool_id, [assigned_ip])
+            # db.refresh kaldırıldı - greenlet hatasını önlemek için
+            # Allocation ID zaten oluşturuldu, diğer alanlar değişmedi
+            index.mark_allocated(assigned_ip)
+
+        dashboard_summary.invalidate()
+        logger.info(f"IP tahsis edildi: {assigned_ip} → {peer_name or peer_id or 'bilinmeyen'}")
+        return allocation
 
-        # Otomatik IP tahsisi
-        else:
-            assigned_ip = await IPPoolService.find_next_available_ip(db, pool_id)
-            if not assigned_ip:
-                logger.error(f"Havuzda boş IP kalmadı: {pool.name}")
-                return None
-
-        # Tahsisi oluştur
-        allocation = IPAllocation(
-            pool_id=pool_id,
-            ip_address=assigned_ip,
-            peer_id=peer_id,
-            peer_public_key=peer_public_key,
-            peer_name=peer_name,
-            status='allocated',
-            notes=notes
-        )
+    @staticmethod
+    async def allocate_ips(
+        db: AsyncSession,
+        pool_id: int,
+        count: int = 0,
+        ip_addresses: Optional[List[str]] = None,
+        peer_names: Optional[List[Optional[str]]] = None,
+        notes: Optional[str] = None,
+        commit: bool = True
+    ) -> Optional[List[IPAllocation]]:
+        """
+        Birden fazla IP'yi tek rezervasyonda tahsis eder (toplu peer oluşturma için)
+        Havuz kilidi bir kez alınır, router durumu bir kez senkronize edilir,
+        dolu adresler tek sorguyla ayıklanır ve tahsisler tek flush ile yazılır
 
-        db.add(allocation)
-        await db.commit()
-        # db.refresh kaldırıldı - greenlet hatasını önlemek için
-        # Allocation ID zaten oluşturuldu, diğer alanlar değişmedi
+        Args:
+            db: Database session
+            pool_id: Pool ID
+            count: Otomatik tahsis edilecek IP sayısı (ip_addresses verilmezse)
+            ip_addresses: Belirli IP'leri tahsis et (havuz dışı veya dolu olanlar atlanır)
+            peer_names: Tahsis başına peer adı (sırayla)
+            notes: Notlar
+            commit: False ise sadece flush edilir, commit çağıranın transaction'ına bırakılır
 
-        logger.info(f"IP tahsis edildi: {assigned_ip} → {peer_name or peer_id or 'bilinmeyen'}")
-        return allocation
+        Returns:
+            Tahsis listesi (giriş sırasıyla); otomatik tahsiste havuz yetmezse None
+        """
+        pool = await IPPoolService.get_pool(db, pool_id)
+        if not pool or not pool.is_active:
+            logger.error(f"Havuz bulunamadı veya aktif değil: {pool_id}")
+            return None
+
+        index = await ip_allocation_index.get(db, pool)
+        names_by_address: Dict[str, Optional[str]] = {}
+
+        async with index.lock:
+            if ip_addresses is not None:
+                # Manuel IP'ler: format ve havuz aralığı kontrolü
+                candidates = []
+                for i, address in enumerate(ip_addresses):
+                    try:
+                        address = str(ipaddress.ip_address(address))
+                    except ValueError:
+                        logger.error(f"Geçersiz IP formatı: {address}")
+                        continue
+                    if pool_contains(pool, address):
+                        candidates.append(address)
+                        if peer_names and i < len(peer_names):
+                            names_by_address.setdefault(address, peer_names[i])
+                allocated = await IPPoolService._allocated_among(db, pool_id, candidates)
+                assigned = [address for address in dict.fromkeys(candidates) if address not in allocated]
+            else:
+                await ip_allocation_index.sync_router(db, index)
+                assigned = []
+                while len(assigned) < count:
+                    # Sıradaki boş adresler indeksten alınır, başka bir worker'ın tahsisleri tek sorguyla elenir
+                    batch = []
+                    while len(batch) < count - len(assigned):
+                        address = index.next_free()
+                        if not address:
+                            break
+                        index.mark_allocated(address)
+                        batch.append(address)
+                    if not batch:
+                        # Geçici işaretleri geri al, havuz yetmiyor
+                        for address in assigned:
+                            index.mark_released(address)
+                        logger.error(f"Havuzda yeterli boş IP yok: {pool.name} ({count} istendi, {len(assigned)} bulundu)")
+                        return None
+                    allocated = await IPPoolService._allocated_among(db, pool_id, batch)
+                    for address in batch:
+                        if address not in allocated:
+                            assigned.append(address)
+
+                if peer_names:
+                    names_by_address.update(zip(assigned, peer_names))
+
+            allocations = [
+                IPAllocation(
+                    pool_id=pool_id,
+                    ip_address=address,
+                    peer_name=names_by_address.get(address),
+                    status='allocated',
+                    notes=notes
+                )
+                for address in assigned
+            ]
+            db.add_all(allocations)
+            try:
+                if commit:
+                    await db.commit()
+                else:
+                    await db.flush()
+                    _track_uncommitted(db, pool_id, assigned)
+            except Exception:
+                # İndeks veritabanıyla uyumsuz kalmasın, bir sonraki kullanımda yeniden kurulur
+                ip_allocation_index.invalidate(pool_id)
+                raise
+            for address in assigned:
+                index.mark_allocated(address)
+
+        dashboard_summary.invalidate()
+        logger.info(f"{len(allocations)} IP tahsis edildi: {pool.name}")
+        return allocations
+
+    @staticmethod
+    async def _allocated_among(db: AsyncSession, pool_id: int, ip_addresses: List[str]) -> set:
+        """Verilen IP'lerden havuzda aktif tahsisi olanları döner (tek sorgu)"""
+        if not ip_addresses:
+            return set()
+        result = await db.execute(
+            select(IPAllocation.ip_address).where(
+                and_(
+                    IPAllocation.pool_id == pool_id,
+                    IPAllocation.ip_address.in_(ip_addresses),
+                    IPAllocation.status == 'allocated'
+                )
+            )
+        )
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def _is_allocated(db: AsyncSession, pool_id: int, ip_address: str) -> bool:
+        """IP'nin havuzda aktif bir tahsisi var mı?"""
+        existing = await db.execute(
+            select(IPAllocation.id).where(
+                and_(
+                    IPAllocation.pool_id == pool_id,
+                    IPAllocation.ip_address == ip_address,
+                    IPAllocation.status == 'allocated'
+                )
+            ).limit(1)
+        )
+        return existing.scalar_one_or_none() is not None
 
     @staticmethod
     async def release_ip(
@@ -319,6 +516,7 @@ class IPPoolService:
         # (Released olarak işaretlemek yerine siliyoruz ki IP yeniden kullanılabilsin)
         ip_address = allocation.ip_address
         allocation_id_to_delete = allocation.id
+        pool_id = allocation.pool_id
 
         # DELETE statement kullan (greenlet hatası önlemek için)
         result = await db.execute(
@@ -329,13 +527,40 @@ class IPPoolService:
             return False
 
         await db.commit()
+        ip_allocation_index.mark_released(pool_id, ip_address)
+        dashboard_summary.invalidate()
         logger.info(f"IP serbest bırakıldı ve tahsis kaydı silindi: {ip_address}")
         return True
 
+    @staticmethod
+    async def release_allocations(db: AsyncSession, reservations: List[Tuple[int, int, str]], commit: bool = True) -> int:
+        """
+        Birden fazla tahsisi tek DELETE ile serbest bırakır (örn. router'a eklenemeyen toplu peer'lar)
+
+        Args:
+            reservations: (allocation_id, pool_id, ip_address) listesi
+
+        Returns:
+            Silinen tahsis sayısı
+        """
+        if not reservations:
+            return 0
+
+        result = await db.execute(
+            delete(IPAllocation).where(IPAllocation.id.in_([allocation_id for allocation_id, _, _ in reservations]))
+        )
+        if commit:
+            await db.commit()
+        for _, pool_id, ip_address in reservations:
+            ip_allocation_index.mark_released(pool_id, ip_address)
+        dashboard_summary.invalidate()
+        logger.info(f"{result.rowcount} IP tahsisi serbest bırakıldı")
+        return result.rowcount
+
     @staticmethod
     async def find_next_available_ip(db: AsyncSession, pool_id: int) -> Optional[str]:
         """
-        Havuzda sıradaki boş IP'yi bulur
+        Havuzda sıradaki boş IP'yi bulur (rezerve etmez, tahsis için allocate_ip kullanılır)
         MikroTik'te kullanımdaki IP'leri de kontrol eder
 
         Args:
@@ -349,56 +574,13 @@ class IPPoolService:
         if not pool:
             return None
 
-        start_ip = ipaddress.ip_address(pool.start_ip)
-        end_ip = ipaddress.ip_address(pool.end_ip)
-
-        # 1. Tahsis edilmiş IP'leri al (database'den)
-        result = await db.execute(
-            select(IPAllocation.ip_address).where(
-                and_(
-                    IPAllocation.pool_id == pool_id,
-                    IPAllocation.status == 'allocated'
-                )
-            )
-        )
-        allocated_ips = {row[0] for row in result.fetchall()}
+        index = await ip_allocation_index.get(db, pool)
+        await ip_allocation_index.sync_router(db, index)
 
-        # 2. MikroTik'te kullanımdaki IP'leri al (gerçek kullanım)
-        try:
-            from app.mikrotik.connection import mikrotik_conn
-            peers = await mikrotik_conn.get_wireguard_peers(pool.interface_name)
-
-            # Her peer'ın allowed-address'inden IP'leri çıkar
-            for peer in peers:
-                allowed_addresses = peer.get('allowed-address', '')
-                if allowed_addresses:
-                    # Virgülle ayrılmış adresleri ayır
-                    for addr in allowed_addresses.split(','):
-                        addr = addr.strip()
-                        # /32 veya /24 gibi subnet'i kaldır, sadece IP'yi al
-                        if '/' in addr:
-                            ip_only = addr.split('/')[0]
-                            allocated_ips.add(ip_only)
-                        else:
-                            allocated_ips.add(addr)
-
-            logger.debug(f"Pool {pool.name} - Kullanımdaki IP'ler: {allocated_ips}")
-        except Exception as e:
-            # MikroTik bağlantı hatası olursa sadece database'e güven
-            logger.warning(f"MikroTik peer kontrolü yapılamadı, sadece database kullanılıyor: {e}")
-
-        # 3. Gateway IP'yi de ekle (kullanılamaz)
-        if pool.gateway:
-            allocated_ips.add(pool.gateway)
-
-        # 4. Aralıktaki tüm IP'leri kontrol et
-        current_ip = start_ip
-        while current_ip <= end_ip:
-            ip_str = str(current_ip)
-            if ip_str not in allocated_ips:
-                logger.info(f"✅ Pool {pool.name} - Boş IP bulundu: {ip_str}")
-                return ip_str
-            current_ip += 1
+        ip_str = index.next_free()
+        if ip_str:
+            logger.info(f"✅ Pool {pool.name} - Boş IP bulundu: {ip_str}")
+            return ip_str
 
         logger.warning(f"⚠️ Pool {pool.name} - Tüm IP'ler kullanımda!")
         return None
@@ -407,11 +589,14 @@ class IPPoolService:
     async def get_pool_stats(db: AsyncSession, pool_id: int) -> Dict[str, Any]:
         """
         Havuz istatistiklerini döner
+        Tahsis indeksinden hesaplanır, adresler tek tek sayılmaz (IPv6 /64 havuzlar dahil)
 
         Returns:
             {
+                'ip_version': int,
                 'total_ips': int,
                 'allocated': int,
+                'in_use': int,
                 'available': int,
                 'usage_percent': float
             }
@@ -420,31 +605,10 @@ class IPPoolService:
         if not pool:
             return {}
 
-        # Toplam IP sayısını hesapla
-        start_ip = ipaddress.ip_address(pool.start_ip)
-        end_ip = ipaddress.ip_address(pool.end_ip)
-        total_ips = int(end_ip) - int(start_ip) + 1
-
-        # Tahsis edilmiş IP sayısını al
-        result = await db.execute(
-            select(func.count(IPAllocation.id)).where(
-                and_(
-                    IPAllocation.pool_id == pool_id,
-                    IPAllocation.status == 'allocated'
-                )
-            )
-        )
-        allocated = result.scalar() or 0
-
-        available = total_ips - allocated
-        usage_percent = (allocated / total_ips * 100) if total_ips > 0 else 0
-
-        return {
-            'total_ips': total_ips,
-            'allocated': allocated,
-            'available': available,
-            'usage_percent': round(usage_percent, 2)
-        }
+        index = await ip_allocation_index.get(db, pool)
+        # İstatistik için router'a gidilmez, mevcut peer snapshot'ı yeterli
+        await ip_allocation_index.sync_router(db, index, refresh=False)
+        return index.utilization()
 
     @staticmethod
     async def get_allocations(
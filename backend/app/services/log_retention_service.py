@@ -0,0 +1,251 @@
+"""
+Log retention servisi
+Log tablolarındaki eski kayıtları tablo başına saklama süresine göre siler.
+Silme küçük parçalar halinde yapılır (DELETE ... WHERE id IN (SELECT id ... LIMIT n)),
+her parça kendi kısa transaction'ında commit edilir; böylece monitoring yazarken tablo uzun süre kilitlenmez.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import delete, select
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.models.activity_log import ActivityLog
+from app.models.email_settings import EmailLog
+from app.models.log_entry import LogEntry
+from app.models.peer_handshake import PeerHandshake
+from app.models.peer_traffic_log import PeerTrafficLog
+from app.models.telegram_notification_log import TelegramNotificationLog
+from app.models.traffic_log import TrafficLog
+from app.utils.datetime_helper import utcnow
+
+logger = logging.getLogger(__name__)
+
+retention_deleted_rows = Counter(
+    'log_retention_deleted_rows_total', 'Rows deleted by the log retention job', ['table']
+)
+retention_last_run = Gauge(
+    'log_retention_last_run_timestamp_seconds', 'Unix time of the last completed log retention run'
+)
+
+
+def _policies() -> List[Dict[str, Any]]:
+    """
+    Tablo başına retention politikaları (gün, 0 = süresiz)
+    Ham trafik örnekleri de burada silinir; rollup katmanlarının retention'ı rollup motorundadır.
+    Rollup katmanlarından önce yazılmış 'hourly'/'daily' trafik kayıtları rollup'a girmez;
+    karşılık gelen rollup katmanının süresi dolunca silinir (aylık/yıllık gibi süresiz)
+    """
+    legacy_traffic_days = {
+        "hourly": settings.TRAFFIC_HOURLY_RETENTION_DAYS,
+        "daily": settings.TRAFFIC_DAILY_RETENTION_DAYS,
+    }
+    legacy_policies = [
+        policy
+        for period_type, days in legacy_traffic_days.items()
+        for policy in (
+            {"table": f"peer_traffic_logs:{period_type}", "model": PeerTrafficLog,
+             "column": PeerTrafficLog.timestamp, "days": days,
+             "where": [PeerTrafficLog.period_type == period_type]},
+            {"table": f"traffic_logs:{period_type}", "model": TrafficLog,
+             "column": TrafficLog.timestamp, "days": days,
+             "where": [TrafficLog.period_type == period_type]},
+        )
+    ]
+    return [
+        {"table": "activity_logs", "model": ActivityLog, "column": ActivityLog.created_at,
+         "days": settings.ACTIVITY_LOG_RETENTION_DAYS},
+        {"table": "log_entries", "model": LogEntry, "column": LogEntry.created_at,
+         "days": settings.AUDIT_LOG_RETENTION_DAYS},
+        {"table": "peer_handshakes", "model": PeerHandshake, "column": PeerHandshake.event_time,
+         "days": settings.PEER_HANDSHAKE_RETENTION_DAYS},
+        {"table": "telegram_notification_logs", "model": TelegramNotificationLog,
+         "column": TelegramNotificationLog.created_at, "days": settings.TELEGRAM_LOG_RETENTION_DAYS},
+        {"table": "email_logs", "model": EmailLog, "column": EmailLog.sent_at,
+         "days": settings.EMAIL_LOG_RETENTION_DAYS},
+        {"table": "peer_traffic_logs", "model": PeerTrafficLog, "column": PeerTrafficLog.timestamp,
+         "days": settings.TRAFFIC_RAW_RETENTION_DAYS, "where": [PeerTrafficLog.period_type == "raw"]},
+        {"table": "traffic_logs", "model": TrafficLog, "column": TrafficLog.timestamp,
+         "days": settings.TRAFFIC_RAW_RETENTION_DAYS, "where": [TrafficLog.period_type == "raw"]},
+        *legacy_policies,
+    ]
+
+
+class LogRetentionService:
+    """
+    Parçalı log retention zamanlayıcısı
+    - interval saniyede bir tüm politikaları sırayla uygular
+    - Her parçada en fazla batch_size satır silinir, parçalar arasında batch_pause saniye beklenir
+    - Aynı anda tek çalıştırma yapılır (zamanlayıcı ve manuel temizlik aynı kilidi kullanır)
+    """
+
+    def __init__(self, interval: float = 3600.0, batch_size: int = 5000, batch_pause: float = 0.05):
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # İlerleme ve istatistikler
+        self.runs = 0
+        self.last_run_at = None
+        self.last_run_seconds: Optional[float] = None
+        self.last_run_deleted: Dict[str, int] = {}
+        self.total_deleted: Dict[str, int] = {}
+        self.current_table: Optional[str] = None
+        self.current_deleted = 0
+        self.errors = 0
+
+    @staticmethod
+    def _cutoff(column, days: int):
+        cutoff = utcnow() - timedelta(days=days)
+        # Zaman dilimi bilgisi olmayan kolonlar (örn. email_logs.sent_at) naive UTC tutar
+        if not getattr(column.type, "timezone", False):
+            cutoff = cutoff.replace(tzinfo=None)
+        return cutoff
+
+    async def purge(self, table: str, model, column, days: int, where: Optional[list] = None) -> int:
+        """
+        column < (şimdi - days) olan satırları parça parça siler
+
+        Returns:
+            Silinen satır sayısı
+        """
+        conditions = [column < self._cutoff(column, days), *(where or [])]
+        deleted = 0
+        self.current_table = table
+        self.current_deleted = 0
+        try:
+            while True:
+                batch_ids = select(model.id).where(*conditions).limit(self.batch_size)
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        delete(model)
+                        .where(model.id.in_(batch_ids))
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+
+                count = result.rowcount or 0
+                deleted += count
+                self.current_deleted = deleted
+                if count:
+                    retention_deleted_rows.labels(table=table).inc(count)
+                if count < self.batch_size:
+                    break
+                # Bekleyen yazmalara (monitoring, log yazıcısı) sıra ver
+                await asyncio.sleep(self.batch_pause)
+        finally:
+            self.current_table = None
+            self.total_deleted[table] = self.total_deleted.get(table, 0) + deleted
+
+        if deleted:
+            logger.info(f"🗑️ Retention: {table} tablosundan {deleted} kayıt silindi ({days} günden eski)")
+        return deleted
+
+    async def purge_table(self, table: str, days: Optional[int] = None) -> int:
+        """
+        Tek bir tablonun politikasını (isteğe bağlı farklı gün sayısıyla) uygular
+        Politika süresi 0 ise tablo süresiz saklanır; açıkça days=0 verilirse tüm kayıtlar silinir
+        """
+        policy = next((p for p in _policies() if p["table"] == table), None)
+        if policy is None:
+            raise Exception(f"Retention politikası bulunamadı: {table}")
+        if days is None:
+            days = policy["days"]
+            if not days or days <= 0:
+                return 0
+        elif days < 0:
+            raise Exception(f"Geçersiz gün sayısı: {days}")
+        async with self._lock:
+            return await self.purge(table, policy["model"], policy["column"], days, policy.get("where"))
+
+    async def run_once(self) -> Dict[str, int]:
+        """
+        Tüm politikaları uygular
+
+        Returns:
+            {tablo: silinen satır sayısı}
+        """
+        async with self._lock:
+            started = time.monotonic()
+            deleted: Dict[str, int] = {}
+            for policy in _policies():
+                if not policy["days"] or policy["days"] <= 0:
+                    continue
+                try:
+                    deleted[policy["table"]] = await self.purge(
+                        policy["table"], policy["model"], policy["column"], policy["days"], policy.get("where")
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"❌ Retention hatası ({policy['table']}): {e}")
+
+            self.runs += 1
+            self.last_run_at = utcnow()
+            self.last_run_seconds = round(time.monotonic() - started, 2)
+            self.last_run_deleted = deleted
+            retention_last_run.set(time.time())
+            return deleted
+
+    async def _loop(self):
+        logger.info("🕐 Log retention zamanlayıcısı başlatıldı")
+        # Başlangıçta senkronizasyon ve ilk monitoring turuyla yarışmamak için kısa bekleme
+        await asyncio.sleep(60)
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Log retention döngüsü hatası: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Retention zamanlayıcısını başlatır"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Retention zamanlayıcısını durdurur (yarım kalan parça commit edilmeden bırakılır)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Retention istatistiklerini ve ilerlemeyi döner"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "batch_size": self.batch_size,
+            "policies": {policy["table"]: policy["days"] for policy in _policies()},
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": self.last_run_seconds,
+            "last_run_deleted": self.last_run_deleted,
+            "total_deleted": self.total_deleted,
+            "in_progress": {
+                "table": self.current_table,
+                "deleted": self.current_deleted,
+            } if self.current_table else None,
+            "errors": self.errors,
+        }
+
+
+# Global log retention servisi
+log_retention = LogRetentionService(
+    interval=settings.LOG_RETENTION_INTERVAL_SECONDS,
+    batch_size=settings.LOG_RETENTION_BATCH_SIZE,
+    batch_pause=settings.LOG_RETENTION_BATCH_PAUSE,
+)
@@ -0,0 +1,235 @@
+"""
+Log yazma tamponu (write-behind)
+Audit (log_entries) ve aktivite (activity_logs) kayıtları istek sırasında veritabanına yazılmaz;
+kuyruğa alınır ve tek bir yazıcı görev tarafından toplu INSERT (executemany) ile kaydedilir.
+Böylece log yazımı peer işlemlerine gecikme veya veritabanı kilidi eklemez.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.models.activity_log import ActivityLog
+from app.models.log_entry import LogEntry
+from app.utils.datetime_helper import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Kayıt tipi -> model
+_MODELS = {
+    "audit": LogEntry,
+    "activity": ActivityLog,
+}
+
+
+class LogSink:
+    """
+    Toplu log yazıcısı
+    - put() kuyruk doluysa yer açılana kadar bekler (backpressure), aksi halde hemen döner
+    - enqueue() hiç beklemez; kuyruk doluysa kaydı atar ve sayar (senkron bağlamlar için)
+    - Yazıcı görev flush_interval_ms dolduğunda veya batch_size kayda ulaşıldığında tek transaction'da yazar
+    - "database locked" gibi hatalarda artan beklemeyle tekrar dener
+    - Kısıt ihlali olan kayıt batch bölünerek ayıklanır, batch'in geri kalanı yazılır
+    - stop() kuyrukta kalan tüm kayıtları yazdıktan sonra görevi durdurur
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        batch_size: int = 200,
+        flush_interval_ms: int = 500,
+        max_retries: int = 5
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # İstatistikler
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.retries = 0
+        self.failed = 0
+        self.backpressure_waits = 0
+
+    # ===== Kuyruğa alma =====
+
+    @staticmethod
+    def _record(kind: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        # Zaman damgası olay anında alınır (toplu yazımda server_default flush zamanını verirdi)
+        values.setdefault("created_at", utcnow())
+        return {"kind": kind, "values": values}
+
+    async def put(self, kind: str, values: Dict[str, Any]):
+        """Kaydı kuyruğa alır; kuyruk doluysa yer açılana kadar bekler"""
+        record = self._record(kind, values)
+        if self._stopping:
+            # Kapanış sırasında gelen kayıtlar doğrudan yazılır
+            await self._write([record])
+            return
+        self._ensure_running()
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(record)
+        self.queued += 1
+
+    def enqueue(self, kind: str, values: Dict[str, Any]) -> bool:
+        """Kaydı beklemeden kuyruğa alır; kuyruk doluysa atar"""
+        self._ensure_running()
+        try:
+            self._queue.put_nowait(self._record(kind, values))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Log kuyruğu dolu, kayıt atıldı: {kind}/{values.get('action')}")
+            return False
+        self.queued += 1
+        return True
+
+    def _ensure_running(self):
+        if self._stopping:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    # ===== Yazıcı =====
+
+    async def _run(self):
+        """Kuyruktaki kayıtları toplayıp yazan döngü"""
+        loop = asyncio.get_running_loop()
+        while True:
+            record = await self._queue.get()
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _insert(self, batch: List[Dict[str, Any]]):
+        """Kayıtları tip başına tek executemany INSERT ile, tek transaction'da yazar"""
+        rows: Dict[str, List[Dict[str, Any]]] = {}
+        for record in batch:
+            rows.setdefault(record["kind"], []).append(record["values"])
+
+        async with AsyncSessionLocal() as db:
+            for kind, values in rows.items():
+                await db.execute(insert(_MODELS[kind]), values)
+            await db.commit()
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        """
+        Batch'i yazar
+        - Geçici hatalarda (ör. "database locked") artan beklemeyle tekrar dener
+        - Kısıt/veri hatası (IntegrityError, DataError) tekrar denenmez; batch ikiye bölünerek
+          sadece hatalı kayıt atılır, diğerleri yazılır
+        """
+        for attempt in range(self.max_retries):
+            try:
+                await self._insert(batch)
+                self.written += len(batch)
+                self.flushes += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except (IntegrityError, DataError) as e:
+                if len(batch) == 1:
+                    self._drop(batch, e)
+                    return
+                middle = len(batch) // 2
+                await self._write(batch[:middle])
+                await self._write(batch[middle:])
+                return
+            except Exception as e:
+                if attempt < self.max_retries - 1:
+                    self.retries += 1
+                    delay = min(0.2 * (2 ** attempt), 5.0)
+                    logger.warning(
+                        f"Log yazımı başarısız (deneme {attempt + 1}/{self.max_retries}), "
+                        f"{delay:.1f}s sonra tekrar denenecek: {e}"
+                    )
+                    await asyncio.sleep(delay)
+                else:
+                    self._drop(batch, e)
+
+    def _drop(self, batch: List[Dict[str, Any]], error: Exception):
+        """Yazılamayan kayıtları sayar ve kaybolmasınlar diye uygulama loguna düşer"""
+        self.failed += len(batch)
+        logger.error(f"❌ {len(batch)} log kaydı yazılamadı: {error}")
+        for record in batch:
+            values = record["values"]
+            logger.error(
+                f"Yazılamayan log: {record['kind']} {values.get('username')} "
+                f"{values.get('action')} {values.get('details') or values.get('description')}"
+            )
+
+    # ===== Yaşam döngüsü =====
+
+    async def flush(self, timeout: Optional[float] = None):
+        """Kuyrukta bekleyen tüm kayıtların yazılmasını bekler"""
+        if self._task is None or self._task.done():
+            return
+        await asyncio.wait_for(self._queue.join(), timeout=timeout)
+
+    async def stop(self, timeout: float = 10.0):
+        """Kuyruktaki tüm kayıtları yazar ve yazıcı görevi durdurur"""
+        self._stopping = True
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Log kuyruğu kapanışta süresinde boşaltılamadı ({self._queue.qsize()} kayıt)")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        # Görev hiç başlamadıysa veya süre dolduysa kalanları doğrudan yaz
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for start in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[start:start + self.batch_size])
+        logger.info(f"Log yazıcısı durduruldu ({self.written} kayıt yazıldı)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Log yazıcısı istatistiklerini döner"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queue_depth": self._queue.qsize(),
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "retries": self.retries,
+            "failed": self.failed,
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+
+# Global log yazıcısı
+log_sink = LogSink(
+    queue_size=settings.LOG_SINK_QUEUE_SIZE,
+    batch_size=settings.LOG_SINK_BATCH_SIZE,
+    flush_interval_ms=settings.LOG_SINK_FLUSH_INTERVAL_MS,
+)
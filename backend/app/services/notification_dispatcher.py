@@ -0,0 +1,449 @@
+"""
+Bildirim dağıtıcısı
+Telegram ve email bildirimlerini arka planda, istek/monitoring döngüsünü bekletmeden gönderir.
+Kısa sürede gelen benzer olaylar tek mesajda birleştirilir ("wg0 üzerinde 37 peer bağlantısı kesildi"),
+kanal başına hız sınırı uygulanır ve geçici hatalarda artan beklemeyle tekrar denenir.
+"""
+import asyncio
+import logging
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosmtplib
+
+from app.config import settings as app_settings
+from app.database.database import AsyncSessionLocal
+from app.models.email_settings import EmailLog
+from app.services.email_service import EmailService
+from app.services.telegram_notification_service import TelegramNotificationService, close_http_session
+from app.utils.crypto import decrypt_password
+from app.utils.datetime_helper import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Birleştirilmiş mesajda listelenecek maksimum olay sayısı
+_MAX_LISTED_EVENTS = 20
+
+# Tek turda işlenecek maksimum olay sayısı
+_MAX_BATCH_SIZE = 1000
+
+
+class RateLimiter:
+    """Token bucket hız sınırlayıcı (dakikada `rate_per_minute` gönderim, aynı kadar burst)"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = max(1.0, float(rate_per_minute))
+        self.tokens = self.capacity
+        self.refill_rate = self.capacity / 60.0
+        self._updated_at = time.monotonic()
+
+    async def acquire(self):
+        """Gönderim hakkı alınana kadar bekler"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.refill_rate)
+            self._updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.refill_rate)
+
+
+class NotificationDispatcher:
+    """
+    Arka plan bildirim kuyruğu
+    - enqueue_* çağrıları beklemez; kuyruk doluysa olay atılır ve sayılır
+    - Tek worker ilk olaydan sonra coalesce_window saniye bekleyip gelen olayları toplar,
+      aynı tip + interface için threshold ve üzeri olay tek mesajda birleşir
+    - Telegram tek bir kalıcı HTTP oturumu, email tek bir kalıcı SMTP bağlantısı kullanır
+    - Telegram/email ayarları settings_ttl saniye bellekte tutulur (ayar kaydında invalidate edilir)
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 1000,
+        coalesce_window: float = 5.0,
+        coalesce_threshold: int = 3,
+        telegram_rate: float = 20,
+        email_rate: float = 30,
+        max_retries: int = 3,
+        settings_ttl: float = 30.0,
+        smtp_idle_timeout: float = 60.0
+    ):
+        self.coalesce_window = coalesce_window
+        self.coalesce_threshold = coalesce_threshold
+        self.max_retries = max_retries
+        self.settings_ttl = settings_ttl
+        self.smtp_idle_timeout = smtp_idle_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._telegram_limiter = RateLimiter(telegram_rate)
+        self._email_limiter = RateLimiter(email_rate)
+
+        # Ayar cache'i: kanal -> (ayar nesnesi, yüklenme zamanı)
+        self._settings_cache: Dict[str, Tuple[Any, float]] = {}
+
+        # Kalıcı SMTP bağlantısı
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._smtp_key: Optional[tuple] = None
+
+        # İstatistikler
+        self.queued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    # ===== Kuyruğa alma =====
+
+    def enqueue_telegram(
+        self,
+        event_type: str,
+        title: str,
+        description: str,
+        details: Optional[str] = None,
+        peer_id: Optional[str] = None,
+        interface: Optional[str] = None,
+        user_id: Optional[int] = None,
+    ) -> bool:
+        """Telegram kritik olay bildirimini kuyruğa alır"""
+        return self._enqueue({
+            "channel": "telegram",
+            "event_type": event_type,
+            "title": title,
+            "description": description,
+            "details": details,
+            "peer_id": peer_id,
+            "interface": interface,
+            "user_id": user_id,
+        })
+
+    def enqueue_email(self, event_type: str, subject: str, template_data: Dict[str, Any]) -> bool:
+        """Email bildirimini kuyruğa alır (alıcılar ayarlardan okunur)"""
+        return self._enqueue({
+            "channel": "email",
+            "event_type": event_type,
+            "subject": subject,
+            "template_data": template_data,
+        })
+
+    def _enqueue(self, event: Dict[str, Any]) -> bool:
+        self._ensure_running()
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Bildirim kuyruğu dolu, olay atıldı: {event['channel']}/{event['event_type']}")
+            return False
+        self.queued += 1
+        return True
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def invalidate_settings(self, channel: Optional[str] = None):
+        """Telegram/email ayarları değiştiğinde cache'i ve SMTP bağlantısını geçersiz kılar"""
+        if channel is None:
+            self._settings_cache.clear()
+        else:
+            self._settings_cache.pop(channel, None)
+        if channel in (None, "email"):
+            # Yeni sunucu/şifre bir sonraki gönderimde kullanılsın
+            self._smtp_key = None
+
+    # ===== Worker =====
+
+    async def _run(self):
+        """Kuyruktaki olayları toplayıp gönderen döngü"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout=self.smtp_idle_timeout)
+            except asyncio.TimeoutError:
+                # Boşta kalan SMTP bağlantısını bırak
+                await self._close_smtp()
+                continue
+
+            batch = [event]
+            deadline = loop.time() + self.coalesce_window
+            while len(batch) < _MAX_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._dispatch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Bildirim gönderim hatası: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _dispatch(self, batch: List[Dict[str, Any]]):
+        telegram_events = [event for event in batch if event["channel"] == "telegram"]
+        email_events = [event for event in batch if event["channel"] == "email"]
+        if telegram_events:
+            await self._dispatch_telegram(telegram_events)
+        if email_events:
+            await self._dispatch_email(email_events)
+
+    async def _get_settings(self, channel: str):
+        """Kanal ayarlarını cache'ten veya veritabanından getirir"""
+        cached = self._settings_cache.get(channel)
+        if cached is not None and time.monotonic() - cached[1] < self.settings_ttl:
+            return cached[0]
+
+        async with AsyncSessionLocal() as db:
+            if channel == "telegram":
+                settings = await TelegramNotificationService.get_settings(db)
+            else:
+                settings = await EmailService.get_settings(db)
+        self._settings_cache[channel] = (settings, time.monotonic())
+        return settings
+
+    @staticmethod
+    def _group(events: List[Dict[str, Any]], key) -> List[List[Dict[str, Any]]]:
+        """Olayları ilk görülme sırasını koruyarak gruplar"""
+        groups: Dict[Any, List[Dict[str, Any]]] = {}
+        for event in events:
+            groups.setdefault(key(event), []).append(event)
+        return list(groups.values())
+
+    # ===== Telegram =====
+
+    def _coalesce_telegram(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Aynı tip ve interface'teki olayları tek bildirime çevirir"""
+        first = events[0]
+        count = len(events)
+        interface = first["interface"]
+        where = f"<b>{interface}</b> üzerinde " if interface else ""
+
+        if first["event_type"] == "peer_down":
+            title = f"{count} Peer Bağlantısı Koptu"
+            description = f"{where}{count} peer bağlantısı kesildi"
+        elif first["event_type"] == "peer_up":
+            title = f"{count} Peer Yeniden Bağlandı"
+            description = f"{where}{count} peer tekrar bağlandı"
+        else:
+            title = f"{first['title']} (x{count})"
+            description = f"{where}{count} olay"
+
+        lines = [f"• {event['description']}" for event in events[:_MAX_LISTED_EVENTS]]
+        if count > _MAX_LISTED_EVENTS:
+            lines.append(f"... ve {count - _MAX_LISTED_EVENTS} olay daha")
+
+        self.coalesced += count - 1
+        return {
+            **first,
+            "title": title,
+            "description": description,
+            "details": "\n".join(lines),
+            "peer_id": None,
+        }
+
+    async def _dispatch_telegram(self, events: List[Dict[str, Any]]):
+        settings = await self._get_settings("telegram")
+        if not settings or not settings.enabled or not settings.bot_token or not settings.chat_id:
+            return
+
+        # Bildirim kategorisi aktif mi kontrol et
+        if settings.notification_categories:
+            events = [event for event in events if event["event_type"] in settings.notification_categories]
+
+        for group in self._group(events, lambda event: (event["event_type"], event["interface"])):
+            if len(group) >= self.coalesce_threshold:
+                group = [self._coalesce_telegram(group)]
+            for event in group:
+                await self._send_telegram(settings, event)
+
+    async def _send_telegram(self, settings, event: Dict[str, Any]):
+        """Tek Telegram mesajını hız sınırı ve tekrar deneme ile gönderir, sonucu loglar"""
+        message = TelegramNotificationService.format_event(
+            event["event_type"], event["title"], event["description"], event["details"]
+        )
+
+        for attempt in range(self.max_retries + 1):
+            await self._telegram_limiter.acquire()
+            result = await TelegramNotificationService.deliver(settings.bot_token, settings.chat_id, message)
+            if result["success"] or not result.get("retryable") or attempt == self.max_retries:
+                break
+            self.retries += 1
+            await asyncio.sleep(result.get("retry_after") or min(2 ** attempt, 30))
+
+        if result["success"]:
+            self.sent += 1
+            logger.info(f"✅ Telegram bildirimi gönderildi: {event['event_type']} - {event['title']}")
+        else:
+            self.failed += 1
+            logger.error(f"❌ Telegram bildirimi gönderilemedi: {result.get('error')}")
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await TelegramNotificationService.write_log(
+                    db, settings, message, result,
+                    category=event["event_type"], title=event["title"],
+                    peer_id=event["peer_id"], interface_name=event["interface"], user_id=event["user_id"],
+                )
+        except Exception as e:
+            logger.error(f"Telegram log kaydı yazılamadı: {e}")
+
+    # ===== Email =====
+
+    async def _get_smtp(self, settings) -> aiosmtplib.SMTP:
+        """Kalıcı SMTP bağlantısını döner, yoksa veya ayarlar değiştiyse yeniden bağlanır"""
+        key = (settings.smtp_host, settings.smtp_port, settings.smtp_username,
+               settings.smtp_use_ssl, settings.smtp_use_tls)
+        if self._smtp is not None and self._smtp.is_connected and self._smtp_key == key:
+            return self._smtp
+
+        await self._close_smtp()
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.smtp_host,
+            port=settings.smtp_port,
+            use_tls=bool(settings.smtp_use_ssl),
+            start_tls=bool(settings.smtp_use_tls) and not settings.smtp_use_ssl,
+            timeout=30,
+        )
+        await smtp.connect()
+        await smtp.login(settings.smtp_username, decrypt_password(settings.smtp_password))
+        self._smtp = smtp
+        self._smtp_key = key
+        return smtp
+
+    async def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                await self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+            self._smtp_key = None
+
+    async def _dispatch_email(self, events: List[Dict[str, Any]]):
+        settings = await self._get_settings("email")
+        if not settings or not settings.enabled or not settings.recipient_emails:
+            return
+
+        recipients = [email.strip() for email in settings.recipient_emails.split(",") if email.strip()]
+        logs: List[EmailLog] = []
+
+        for group in self._group(events, lambda event: event["event_type"]):
+            event_type = group[0]["event_type"]
+            if not EmailService.is_notification_enabled(settings, event_type):
+                logger.debug(f"Notification disabled for event: {event_type}")
+                continue
+
+            subject = group[0]["subject"]
+            html_body = "<hr>".join(
+                EmailService.get_email_template(event_type, **event["template_data"]) for event in group
+            )
+            if len(group) > 1:
+                subject = f"{subject} (+{len(group) - 1})"
+                self.coalesced += len(group) - 1
+
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = subject
+            msg['From'] = f"{settings.from_name} <{settings.from_email}>"
+            msg.attach(MIMEText(html_body, 'html'))
+
+            # Aynı bağlantı üzerinden her alıcıya ayrı gönderim
+            for recipient in recipients:
+                del msg['To']
+                msg['To'] = recipient
+                error = await self._send_email(settings, msg)
+                if error is None:
+                    self.sent += 1
+                    logger.info(f"✅ Email gönderildi: {recipient} - {subject}")
+                else:
+                    self.failed += 1
+                    logger.error(f"❌ Email gönderme hatası: {error}")
+                logs.append(EmailLog(
+                    recipient=recipient,
+                    subject=subject,
+                    status="sent" if error is None else "failed",
+                    error_message=error,
+                    event_type=event_type,
+                    event_data=str([event["template_data"] for event in group]),
+                    sent_at=utcnow()
+                ))
+
+        if logs:
+            try:
+                async with AsyncSessionLocal() as db:
+                    db.add_all(logs)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Email log kayıtları yazılamadı: {e}")
+
+    async def _send_email(self, settings, msg: MIMEMultipart) -> Optional[str]:
+        """Mesajı hız sınırı ve tekrar deneme ile gönderir; hata mesajı veya None döner"""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            await self._email_limiter.acquire()
+            try:
+                smtp = await self._get_smtp(settings)
+                await smtp.send_message(msg)
+                return None
+            except aiosmtplib.SMTPRecipientsRefused as e:
+                # Alıcı reddedildi, tekrar denemenin anlamı yok
+                return str(e)
+            except Exception as e:
+                error = str(e)
+                # Bağlantı bozulmuş olabilir, bir sonraki denemede yeniden kur
+                await self._close_smtp()
+                if attempt < self.max_retries:
+                    self.retries += 1
+                    await asyncio.sleep(min(2 ** attempt, 30))
+        return error
+
+    # ===== Yaşam döngüsü =====
+
+    async def stop(self, timeout: float = 10.0):
+        """Kuyruktaki bildirimleri göndermeye çalışır, ardından worker'ı ve bağlantıları kapatır"""
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Bildirim kuyruğu kapanışta boşaltılamadı ({self._queue.qsize()} olay)")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self._close_smtp()
+        await close_http_session()
+
+    def stats(self) -> Dict[str, Any]:
+        """Dağıtıcı istatistiklerini döner"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queue_depth": self._queue.qsize(),
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+        }
+
+
+# Global bildirim dağıtıcısı
+notification_dispatcher = NotificationDispatcher(
+    queue_size=app_settings.NOTIFICATION_QUEUE_SIZE,
+    coalesce_window=app_settings.NOTIFICATION_COALESCE_WINDOW,
+    coalesce_threshold=app_settings.NOTIFICATION_COALESCE_THRESHOLD,
+    telegram_rate=app_settings.NOTIFICATION_TELEGRAM_RATE,
+    email_rate=app_settings.NOTIFICATION_EMAIL_RATE,
+    max_retries=app_settings.NOTIFICATION_MAX_RETRIES,
+)
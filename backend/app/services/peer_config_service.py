@@ -0,0 +1,385 @@
+"""
+Peer client config ve QR kod servisi
+- Client config metni tek yerden üretilir; /qrcode, /config ve toplu export aynı çıktıyı verir
+- QR PNG'leri config metninin SHA-256 özetiyle adreslenen LRU cache'te tutulur,
+  aynı config (aynı anahtar, adres, endpoint) tekrar kodlanmaz
+- PNG kodlama event loop dışında, process havuzunda yapılır
+- Bir interface'in (veya bir grubun) tüm config ve QR'ları ZIP olarak akıtılır
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.mikrotik.connection import mikrotik_conn, normalize_peer_id
+from app.models.peer_key import PeerKey
+from app.models.peer_metadata import PeerMetadata
+from app.services.peer_snapshot_store import peer_snapshot_store
+from app.utils.qrcode_generator import render_qrcode_png
+
+logger = logging.getLogger(__name__)
+
+# Varsayılan client AllowedIPs (tüm trafik tünelden)
+DEFAULT_CLIENT_ALLOWED_IPS = "0.0.0.0/0, ::/0"
+
+# Toplu export'ta IN sorgusu başına public key sayısı
+_EXPORT_QUERY_CHUNK = 500
+
+
+# ===== Config üretimi =====
+
+async def find_interface(interface: str) -> Optional[Dict[str, Any]]:
+    """Interface'i adı veya .id'si ile bulur (interface listesi cache'ten okunur)"""
+    for item in await mikrotik_conn.get_wireguard_interfaces():
+        if item.get("name") == interface or item.get(".id") == interface:
+            return item
+    return None
+
+
+async def find_peer_key(db: AsyncSession, peer: Dict[str, Any], peer_id: Optional[str] = None) -> Optional[PeerKey]:
+    """
+    Peer'ın PeerKey kaydını tek sorguyla bulur
+    Public key benzersiz ve her kayıtta dolu olduğu için önce ona bakılır; router .id'leri
+    silinen peer'lardan sonra yeniden kullanılabildiğinden ID yalnızca public key yoksa kullanılır
+    """
+    public_key = peer.get("public-key") or peer.get("public_key")
+    if public_key:
+        result = await db.execute(select(PeerKey).where(PeerKey.public_key == str(public_key).strip()))
+        return result.scalar_one_or_none()
+
+    normalized_id = normalize_peer_id(peer.get(".id") or peer.get("id") or peer_id)
+    if normalized_id is None:
+        return None
+    result = await db.execute(
+        select(PeerKey).where(PeerKey.peer_id.in_([normalized_id, normalized_id[1:]])).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+def _interface_public_key(interface_data: Dict[str, Any]) -> Optional[str]:
+    """Interface public key'ini sürüme göre değişen alan adlarından bulur"""
+    public_key = interface_data.get("public-key") or interface_data.get("public_key") or interface_data.get("publicKey")
+    if not public_key:
+        for key, value in interface_data.items():
+            key_lower = key.lower()
+            # WireGuard key'leri genelde 40+ karakter
+            if 'public' in key_lower and 'key' in key_lower and value and len(str(value).strip()) > 20:
+                public_key = value
+                break
+    return str(public_key).strip() if public_key else None
+
+
+def _keepalive_seconds(value: str) -> str:
+    """RouterOS süre biçimini ("25s", "1m", "1m30s") saniyeye çevirir"""
+    value = str(value).strip()
+    parts = re.findall(r'(\d+)([hms]?)', value)
+    if not parts:
+        return value
+    multipliers = {"h": 3600, "m": 60, "s": 1, "": 1}
+    return str(sum(int(number) * multipliers[unit] for number, unit in parts))
+
+
+def build_client_config(
+    peer: Dict[str, Any],
+    interface_data: Dict[str, Any],
+    private_key: Optional[str] = None,
+    key_record: Optional[PeerKey] = None
+) -> str:
+    """
+    Peer için client tarafı WireGuard config metnini oluşturur
+
+    Args:
+        peer: Router'dan gelen (normalize edilmiş) peer kaydı
+        interface_data: Peer'ın bağlı olduğu interface kaydı
+        private_key: İstekle gelen private key (öncelikli)
+        key_record: Peer'ın PeerKey kaydı (private key, client AllowedIPs, endpoint)
+
+    Returns:
+        Config metni (private key yoksa placeholder içerir)
+    """
+    config_lines = ["[Interface]", ""]
+
+    # NOT: MikroTik RouterOS'ta peer'lar için private-key alanı YOKTUR
+    client_private_key = str(private_key or (key_record.private_key if key_record else None) or "").strip()
+    config_lines.append(f"PrivateKey = {client_private_key or '<YOUR_PRIVATE_KEY>'}")
+
+    # Address - allowed-address içindeki /32 adres, yoksa ilk adres
+    if peer.get("allowed-address"):
+        addresses = [addr.strip() for addr in peer.get("allowed-address").split(",")]
+        client_address = next((addr for addr in addresses if "/32" in addr), addresses[0])
+        if client_address:
+            config_lines.append(f"Address = {client_address}")
+
+    # MTU - varsayılan 1380, DNS - varsayılan 1.1.1.1
+    config_lines.append(f"MTU = {peer.get('mtu') or interface_data.get('mtu') or 1380}")
+    config_lines.append(f"DNS = {peer.get('dns') or '1.1.1.1'}")
+
+    config_lines += ["", "[Peer]", ""]
+
+    # Server'ın public key'i (interface'den)
+    interface_public_key = _interface_public_key(interface_data)
+    config_lines.append(f"PublicKey = {interface_public_key or '<INTERFACE_PUBLIC_KEY_NOT_FOUND>'}")
+
+    # Allowed IPs - kullanıcının girdiği client AllowedIPs değeri (PeerKey kaydında)
+    if peer.get("public-key") or peer.get("public_key"):
+        allowed_ips = key_record.client_allowed_ips if key_record else None
+    else:
+        allowed_ips = peer.get("endpoint-allowed-address") or peer.get("endpoint_allowed_address")
+    config_lines.append(f"AllowedIPs = {str(allowed_ips or '').strip() or DEFAULT_CLIENT_ALLOWED_IPS}")
+
+    # Endpoint - PeerKey kaydından, yoksa varsayılan adres ve interface portu
+    if key_record and key_record.endpoint_address and key_record.endpoint_port:
+        config_lines.append(f"Endpoint = {key_record.endpoint_address}:{key_record.endpoint_port}")
+    elif interface_data.get("listen-port"):
+        config_lines.append(f"Endpoint = vpn.sahacam.com:{interface_data.get('listen-port')}")
+
+    # Persistent Keepalive - varsayılan 25
+    keepalive = peer.get("persistent-keepalive")
+    config_lines.append(f"PersistentKeepalive = {_keepalive_seconds(keepalive) if keepalive else 25}")
+
+    preshared_key = peer.get("preshared-key") or peer.get("preshared_key")
+    if preshared_key:
+        config_lines.append(f"PresharedKey = {str(preshared_key).strip()}")
+
+    return "\n".join(config_lines)
+
+
+# ===== ZIP akışı =====
+
+class _ZipBuffer:
+    """
+    zipfile'ın yazdığı byte'ları biriktirir; akış her adımda drain() ile boşaltılır
+    seek/tell olmadığı için zipfile data descriptor kullanır (arşiv bellekte tutulmaz)
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _file_name(value: str) -> str:
+    """Peer adını ZIP içinde güvenli dosya adına çevirir"""
+    return re.sub(r'[^\w.-]+', '_', value).strip('._') or "peer"
+
+
+def _peer_label(peer: Dict[str, Any]) -> str:
+    allowed = (peer.get("allowed-address") or "").split(",")[0].strip()
+    return (
+        peer.get("name") or peer.get("comment")
+        or (allowed.split("/")[0] if allowed else None)
+        or str(peer.get(".id") or peer.get("id") or "peer")
+    )
+
+
+# ===== Render cache =====
+
+class PeerConfigRenderer:
+    """
+    QR kod render cache'i ve toplu export
+    - Anahtar: config metninin SHA-256 özeti; config değişirse (anahtar, adres, endpoint) yeni giriş oluşur
+    - LRU: max_entries aşılınca en uzun süredir kullanılmayan PNG atılır
+    - Aynı config için eşzamanlı istekler tek render'ı bekler
+    - Render process havuzunda yapılır; havuz bozulursa thread'de devam edilir
+    """
+
+    def __init__(self, max_entries: int = 512, workers: int = 2):
+        self.max_entries = max(0, max_entries)
+        self.workers = max(0, workers)
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        # İstatistikler
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+
+    async def _render(self, config: str) -> bytes:
+        if self.workers <= 0:
+            return await asyncio.to_thread(render_qrcode_png, config)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, render_qrcode_png, config)
+        except BrokenProcessPool:
+            logger.warning("⚠️ QR render process havuzu bozuldu, yeniden oluşturulacak")
+            self._executor = None
+            return await asyncio.to_thread(render_qrcode_png, config)
+
+    def _store(self, digest: str, png: bytes):
+        if self.max_entries <= 0:
+            return
+        self._entries[digest] = png
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def qrcode_png(self, config: str, remember: bool = True) -> bytes:
+        """
+        Config metninin QR kod PNG'sini döner (cache'ten veya render ederek)
+
+        Args:
+            config: Client config metni
+            remember: Sonuç cache'e yazılsın mı (toplu export etkileşimli girişleri silmesin diye False verir)
+        """
+        digest = hashlib.sha256(config.encode("utf-8")).hexdigest()
+        png = self._entries.get(digest)
+        if png is not None:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return png
+
+        task = self._pending.get(digest)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._render(config))
+            self._pending[digest] = task
+            task.add_done_callback(lambda _, key=digest: self._pending.pop(key, None))
+        else:
+            self.shared += 1
+
+        png = await asyncio.shield(task)
+        if remember:
+            self._store(digest, png)
+        return png
+
+    # ===== Toplu export =====
+
+    async def prepare_export(
+        self,
+        db: AsyncSession,
+        interface_data: Dict[str, Any],
+        group: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Interface'in (isteğe bağlı yalnızca bir grubun) peer config'lerini hazırlar
+        Peer'lar snapshot'tan, PeerKey kayıtları parça başına tek IN sorgusuyla okunur
+
+        Returns:
+            [{"name", "config", "has_private_key"}, ...]
+        """
+        interface = interface_data.get("name")
+        peers = await peer_snapshot_store.get_peers(db, interface)
+
+        if group:
+            result = await db.execute(
+                select(PeerMetadata.peer_id, PeerMetadata.public_key)
+                .where(PeerMetadata.interface_name == interface, PeerMetadata.group_name == group)
+            )
+            rows = result.all()
+            group_ids = {normalize_peer_id(row.peer_id) for row in rows} - {None}
+            group_keys = {row.public_key for row in rows if row.public_key}
+            peers = [
+                peer for peer in peers
+                if peer.get("public-key") in group_keys
+                or normalize_peer_id(peer.get(".id") or peer.get("id")) in group_ids
+            ]
+
+        public_keys = [peer.get("public-key") for peer in peers if peer.get("public-key")]
+        records: Dict[str, PeerKey] = {}
+        for start in range(0, len(public_keys), _EXPORT_QUERY_CHUNK):
+            result = await db.execute(
+                select(PeerKey).where(PeerKey.public_key.in_(public_keys[start:start + _EXPORT_QUERY_CHUNK]))
+            )
+            records.update({record.public_key: record for record in result.scalars()})
+
+        entries = []
+        used_names = set()
+        for peer in peers:
+            record = records.get(peer.get("public-key"))
+            name = base = _file_name(_peer_label(peer))
+            suffix = 2
+            while name.lower() in used_names:
+                name = f"{base}_{suffix}"
+                suffix += 1
+            used_names.add(name.lower())
+            entries.append({
+                "name": name,
+                "config": build_client_config(peer, interface_data, key_record=record),
+                "has_private_key": bool(record and record.private_key),
+            })
+        return entries
+
+    async def stream_zip(self, entries: List[Dict[str, Any]], include_qr: bool = True) -> AsyncIterator[bytes]:
+        """
+        Config (.conf) ve QR (.png) dosyalarını ZIP olarak parça parça üretir
+        QR'lar worker sayısı kadar paralel render edilir; PNG'ler zaten sıkıştırılmış olduğundan STORED yazılır
+        """
+        buffer = _ZipBuffer()
+        step = max(1, self.workers) * 4
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for start in range(0, len(entries), step):
+                chunk = entries[start:start + step]
+                pngs = await asyncio.gather(
+                    *(self.qrcode_png(entry["config"], remember=False) for entry in chunk)
+                ) if include_qr else []
+                for index, entry in enumerate(chunk):
+                    archive.writestr(f"{entry['name']}.conf", entry["config"])
+                    if include_qr:
+                        archive.writestr(f"{entry['name']}.png", pngs[index], compress_type=zipfile.ZIP_STORED)
+                yield buffer.drain()
+
+            missing = [entry["name"] for entry in entries if not entry["has_private_key"]]
+            if missing:
+                archive.writestr(
+                    "EKSIK_PRIVATE_KEY.txt",
+                    "Aşağıdaki peer'ların private key'i kayıtlı değil, config'lerinde placeholder var:\n"
+                    + "\n".join(missing) + "\n"
+                )
+        yield buffer.drain()
+
+    # ===== Yaşam döngüsü =====
+
+    def clear(self):
+        """Render cache'ini boşaltır"""
+        self._entries.clear()
+
+    async def stop(self):
+        """Process havuzunu kapatır ve cache'i boşaltır"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Render cache istatistiklerini döner"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": sum(len(png) for png in self._entries.values()),
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "evictions": self.evictions,
+        }
+
+
+# Global config/QR render servisi
+peer_config_renderer = PeerConfigRenderer(
+    max_entries=settings.CONFIG_RENDER_CACHE_SIZE,
+    workers=settings.CONFIG_RENDER_WORKERS,
+)
@@ -3,11 +3,13 @@ Peer handshake tracking servisi
 Peer'ların online/offline durumlarını ve zamanlarını takip eder
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, desc, or_
-from typing import List, Optional, Dict, Any
+from sqlalchemy import select, update, and_, desc, or_, func
+from typing import List, Optional, Dict, Any, Tuple
 from app.models.peer_handshake import PeerHandshake
 from datetime import datetime, timedelta, timezone
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -95,6 +97,34 @@ def is_peer_online(last_handshake_value: Optional[str]) -> bool:
     return seconds < 90
 
 
+def _is_real_status_change(
+    previous_is_online: bool,
+    current_is_online: bool,
+    last_handshake_value: Optional[str]
+) -> bool:
+    """
+    Durum farkının gerçek bir kopma/bağlanma mı yoksa handshake gecikmesi mi olduğunu belirler
+    
+    - Online'dan offline'a geçiş: handshake >= 90 saniye olmalı veya handshake değeri olmamalı
+      (Persistent keepalive 25s olduğu için handshake gecikmeleri normaldir, 90s güvenli bir değer)
+    - Offline'dan online'a geçiş: handshake < 90 saniye olmalı
+    """
+    if previous_is_online == current_is_online:
+        return False
+    
+    if not last_handshake_value:
+        # Handshake değeri yok - sadece online'dan offline'a geçiş gerçek kopmadır
+        return not current_is_online
+    
+    handshake_seconds = parse_mikrotik_time(last_handshake_value)
+    if handshake_seconds is None:
+        return False
+    
+    if current_is_online:
+        return handshake_seconds < 90
+    return handshake_seconds >= 90
+
+
 async def track_peer_status(
     db: AsyncSession,
     peer_id: str,
@@ -156,58 +186,16 @@ async def track_peer_status(
             #   (Persistent keepalive 25s olduğu için handshake gecikmeleri normaldir, 90s güvenli bir değer)
             # - Offline'dan online'a geçiş: handshake < 90 saniye olmalı VE önceki kayıt offline olmalı
             
-            is_real_status_change = False
-            
-            if not current_is_online and last_record.is_online:
-                # Online'dan offline'a geçiş - gerçek kopma mı?
-                if last_handshake_value:
-                    handshake_seconds = parse_mikrotik_time(last_handshake_value)
-                    # 90 saniye: Persistent keepalive ile handshake farklı şeylerdir
-                    # Handshake gecikmeleri normaldir, sadece gerçek kopmaları yakalamalıyız
-                    if handshake_seconds is not None and handshake_seconds >= 90:
-                        # Handshake 90 saniye veya daha fazla - gerçek kopma
-                        is_real_status_change = True
-                else:
-                    # Handshake değeri yok - gerçek kopma
-                    is_real_status_change = True
-            elif current_is_online and not last_record.is_online:
-                # Offline'dan online'a geçiş - gerçek bağlanma mı?
-                if last_handshake_value:
-                    handshake_seconds = parse_mikrotik_time(last_handshake_value)
-                    if handshake_seconds is not None and handshake_seconds < 90:
-                        # Handshake 90 saniyeden az - gerçek bağlanma
-                        is_real_status_change = True
+            is_real_status_change = _is_real_status_change(
+                last_record.is_online, current_is_online, last_handshake_value
+            )
             
             if is_real_status_change:
                 should_create_new = True
                 logger.info(f"Peer durum değişikliği tespit edildi: {peer_id} ({interface_name}) - {last_record.event_type} -> {'online' if current_is_online else 'offline'}")
                 
-                # Telegram bildirimi gönder (async, non-blocking)
-                try:
-                    TelegramService = get_telegram_service()
-                    if not current_is_online:
-                        # Peer offline oldu - peer_down bildirimi
-                        await TelegramService.send_critical_event(
-                            db=db,
-                            event_type="peer_down",
-                            title=f"🔴 Peer Bağlantısı Koptu",
-                            description=f"**{peer_name or peer_id}** bağlantısı kesildi",
-                            details=f"Interface: {interface_name}\nSon handshake: {last_handshake_value or 'never'}"
-                        )
-                        logger.info(f"Telegram bildirimi gönderildi: peer_down - {peer_id}")
-                    else:
-                        # Peer online oldu - peer_up bildirimi
-                        await TelegramService.send_critical_event(
-                            db=db,
-                            event_type="peer_up",
-                            title=f"🟢 Peer Yeniden Bağlandı",
-                            description=f"**{peer_name or peer_id}** tekrar bağlandı",
-                            details=f"Interface: {interface_name}\nHandshake: {last_handshake_value or 'yeni'}"
-                        )
-                        logger.info(f"Telegram bildirimi gönderildi: peer_up - {peer_id}")
-                except Exception as telegram_error:
-                    # Telegram hatası peer tracking'i etkilemez
-                    logger.error(f"Telegram bildirimi gönderilemedi: {telegram_error}")
+                # Telegram bildirimi gönder (hata peer tracking'i etkilemez)
+                await _notify_status_change(db, interface_name, peer_id, peer_name, current_is_online, last_handshake_value)
             else:
                 # Gerçek durum değişikliği değil, sadece handshake gecikmesi
                 # Önceki durumu koru ve kaydı güncelle
@@ -273,6 +261,272 @@ async def track_peer_status(
         raise
 
 
+class PeerStateTracker:
+    """
+    Toplu peer durum takibi
+    
+    Her interface için peer'ların son durumunu bellekte tutar (ilk kullanımda tek sorgu ile
+    veritabanından yüklenir), MikroTik'ten gelen peer listesinin tamamını tek seferde karşılaştırır
+    ve sadece gerçek durum değişikliklerini tek bir toplu insert ile yazar.
+    Durum değişmeyen peer'lar için veritabanına hiç sorgu gönderilmez.
+    """
+    
+    def __init__(self, resync_interval: float = 300.0):
+        """
+        Args:
+            resync_interval: Bellekteki durum tablosunun veritabanından yeniden yüklenme aralığı (saniye).
+                             Başka bir process'in yazdığı kayıtlarla tutarlılığı korur.
+        """
+        self.resync_interval = resync_interval
+        # (interface_name, peer_id) -> son kaydın özeti
+        self._states: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # interface_name -> son yükleme zamanı (monotonic)
+        self._loaded_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        
+        # İstatistikler
+        self.snapshots = 0
+        self.peers_checked = 0
+        self.transitions_written = 0
+        self.state_loads = 0
+    
+    def _get_lock(self, interface_name: str) -> asyncio.Lock:
+        """Aynı interface için eşzamanlı karşılaştırmaları sıraya sokar"""
+        lock = self._locks.get(interface_name)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[interface_name] = lock
+        return lock
+    
+    async def _load_interface_states(self, db: AsyncSession, interface_name: str):
+        """
+        Interface'teki tüm peer'ların son kaydını tek sorgu ile yükler
+        """
+        latest = (
+            select(
+                PeerHandshake.peer_id,
+                func.max(PeerHandshake.event_time).label("max_event_time")
+            )
+            .where(PeerHandshake.interface_name == interface_name)
+            .group_by(PeerHandshake.peer_id)
+            .subquery()
+        )
+        query = (
+            select(
+                PeerHandshake.id,
+                PeerHandshake.peer_id,
+                PeerHandshake.is_online,
+                PeerHandshake.peer_name,
+                PeerHandshake.public_key
+            )
+            .join(
+                latest,
+                and_(
+                    PeerHandshake.peer_id == latest.c.peer_id,
+                    PeerHandshake.event_time == latest.c.max_event_time
+                )
+            )
+            .where(PeerHandshake.interface_name == interface_name)
+            .order_by(PeerHandshake.id)
+        )
+        result = await db.execute(query)
+        
+        # Önceki yüklemeden kalan durumları temizle
+        for key in [key for key in self._states if key[0] == interface_name]:
+            del self._states[key]
+        
+        # Aynı event_time'a sahip birden fazla kayıt varsa en yüksek id'li olan kazanır (order_by id)
+        for row in result.all():
+            self._states[(interface_name, row.peer_id)] = {
+                "id": row.id,
+                "is_online": row.is_online,
+                "peer_name": row.peer_name,
+                "public_key": row.public_key,
+            }
+        
+        self._loaded_at[interface_name] = time.monotonic()
+        self.state_loads += 1
+        logger.debug(f"Peer durum tablosu yüklendi: {interface_name}")
+    
+    async def track_snapshot(
+        self,
+        db: AsyncSession,
+        interface_name: str,
+        peers: List[Dict[str, Any]]
+    ) -> List[PeerHandshake]:
+        """
+        Bir interface'in peer listesini toplu olarak takip eder
+        
+        Args:
+            db: Veritabanı session'ı
+            interface_name: Interface adı
+            peers: MikroTik'ten gelen peer listesi
+        
+        Returns:
+            Oluşturulan durum değişikliği kayıtları
+        """
+        async with self._get_lock(interface_name):
+            loaded_at = self._loaded_at.get(interface_name)
+            if loaded_at is None or time.monotonic() - loaded_at > self.resync_interval:
+                await self._load_interface_states(db, interface_name)
+            
+            turkey_tz = timezone(timedelta(hours=3))
+            current_time = datetime.now(turkey_tz)
+            
+            new_records: List[PeerHandshake] = []
+            metadata_updates: List[Dict[str, Any]] = []
+            notifications: List[Tuple[PeerHandshake, Optional[str]]] = []
+            
+            for peer in peers:
+                peer_id = peer.get('id') or peer.get('.id')
+                if not peer_id:
+                    continue
+                peer_id = str(peer_id)
+                
+                public_key = peer.get('public-key') or peer.get('public_key')
+                if public_key:
+                    public_key = str(public_key).strip()
+                peer_name = peer.get('comment') or peer.get('name')
+                last_handshake_value = peer.get('last-handshake')
+                current_is_online = is_peer_online(last_handshake_value)
+                
+                state = self._states.get((interface_name, peer_id))
+                if state is not None:
+                    if not _is_real_status_change(state["is_online"], current_is_online, last_handshake_value):
+                        # Durum değişmedi (veya sadece handshake gecikmesi) - sadece isim/key değiştiyse güncelle
+                        if (peer_name and peer_name != state["peer_name"]) or (public_key and public_key != state["public_key"]):
+                            state["peer_name"] = peer_name or state["peer_name"]
+                            state["public_key"] = public_key or state["public_key"]
+                            metadata_updates.append({
+                                "id": state["id"],
+                                "peer_name": state["peer_name"],
+                                "public_key": state["public_key"],
+                                "last_updated": current_time,
+                            })
+                        continue
+                
+                record = PeerHandshake(
+                    peer_id=peer_id,
+                    interface_name=interface_name,
+                    peer_name=peer_name,
+                    public_key=public_key,
+                    handshake_count=0,  # Eski sütun için default değer
+                    is_online=current_is_online,
+                    event_time=current_time,
+                    last_handshake_value=last_handshake_value,
+                    event_type='online' if current_is_online else 'offline',
+                    first_seen=current_time,
+                    last_updated=current_time
+                )
+                new_records.append(record)
+                if state is not None:
+                    # İlk kayıt değil, gerçek durum değişikliği - bildirim gönderilecek
+                    notifications.append((record, last_handshake_value))
+                    logger.info(f"Peer durum değişikliği tespit edildi: {peer_id} ({interface_name}) - {'online' if current_is_online else 'offline'}")
+            
+            self.snapshots += 1
+            self.peers_checked += len(peers)
+            
+            if not new_records and not metadata_updates:
+                return []
+            
+            try:
+                if new_records:
+                    db.add_all(new_records)
+                if metadata_updates:
+                    # Primary key üzerinden toplu UPDATE (executemany)
+                    await db.execute(update(PeerHandshake), metadata_updates)
+                await db.flush()
+                await db.commit()
+            except Exception as e:
+                logger.error(f"Peer durum kayıtları yazılamadı ({interface_name}): {e}")
+                await db.rollback()
+                # Bellekteki tablo DB ile uyumsuz kalmasın, bir sonraki turda yeniden yüklensin
+                self._loaded_at.pop(interface_name, None)
+                raise
+            
+            for record in new_records:
+                self._states[(interface_name, record.peer_id)] = {
+                    "id": record.id,
+                    "is_online": record.is_online,
+                    "peer_name": record.peer_name,
+                    "public_key": record.public_key,
+                }
+            self.transitions_written += len(new_records)
+            
+            if new_records:
+                logger.info(f"Peer durum kayıtları yazıldı: {interface_name} - {len(new_records)} kayıt ({len(notifications)} durum değişikliği)")
+        
+        # Telegram bildirimleri lock dışında gönderilir (yavaş ağ çağrısı karşılaştırmayı bekletmesin)
+        for record, last_handshake_value in notifications:
+            await _notify_status_change(
+                db, record.interface_name, record.peer_id, record.peer_name, record.is_online, last_handshake_value
+            )
+        
+        return new_records
+    
+    def forget_interface(self, interface_name: str):
+        """Silinen/yeniden adlandırılan interface'in durum tablosunu bırakır"""
+        for key in [key for key in self._states if key[0] == interface_name]:
+            del self._states[key]
+        self._loaded_at.pop(interface_name, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Takip istatistiklerini döner"""
+        return {
+            "tracked_peers": len(self._states),
+            "tracked_interfaces": len(self._loaded_at),
+            "snapshots": self.snapshots,
+            "peers_checked": self.peers_checked,
+            "transitions_written": self.transitions_written,
+            "state_loads": self.state_loads,
+        }
+
+
+async def _notify_status_change(
+    db: AsyncSession,
+    interface_name: str,
+    peer_id: str,
+    peer_name: Optional[str],
+    is_online: bool,
+    last_handshake_value: Optional[str]
+):
+    """
+    Durum değişikliği için Telegram bildirimi gönderir (hata peer tracking'i etkilemez)
+    interface/peer_id dağıtıcıya iletilir; aynı interface'teki up/down olayları tek özet mesajda birleşir
+    """
+    try:
+        TelegramService = get_telegram_service()
+        if not is_online:
+            await TelegramService.send_critical_event(
+                db=db,
+                event_type="peer_down",
+                title="🔴 Peer Bağlantısı Koptu",
+                description=f"**{peer_name or peer_id}** bağlantısı kesildi",
+                details=f"Interface: {interface_name}\nSon handshake: {last_handshake_value or 'never'}",
+                peer_id=peer_id,
+                interface=interface_name
+            )
+            logger.info(f"Telegram bildirimi gönderildi: peer_down - {peer_id}")
+        else:
+            await TelegramService.send_critical_event(
+                db=db,
+                event_type="peer_up",
+                title="🟢 Peer Yeniden Bağlandı",
+                description=f"**{peer_name or peer_id}** tekrar bağlandı",
+                details=f"Interface: {interface_name}\nHandshake: {last_handshake_value or 'yeni'}",
+                peer_id=peer_id,
+                interface=interface_name
+            )
+            logger.info(f"Telegram bildirimi gönderildi: peer_up - {peer_id}")
+    except Exception as telegram_error:
+        logger.error(f"Telegram bildirimi gönderilemedi: {telegram_error}")
+
+
+# Global tracker instance
+peer_state_tracker = PeerStateTracker()
+
+
 async def get_peer_logs(
     db: AsyncSession,
     peer_id: str,
@@ -0,0 +1,575 @@
+"""
+Toplu peer oluşturma (provisioning) servisi
+Bir müşteri lokasyonunun tüm peer'larını tek işte oluşturur:
+- Otomatik IP'ler havuzdan tek rezervasyonda alınır
+- Eksik anahtarlar önceden üretilmiş anahtar havuzundan alınır
+- Peer'lar router'a pipelined add ile parça parça gönderilir (peer listesi tekrar çekilmez)
+- PeerKey / PeerMetadata kayıtları toplu INSERT ile, tahsis güncellemeleriyle tek transaction'da yazılır
+İlerleme, işi başlatan kullanıcının bildirim WebSocket'ine (/ws/notifications) akıtılır
+"""
+import asyncio
+import ipaddress
+import logging
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, update
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.mikrotik.connection import mikrotik_conn
+from app.models.ip_pool import IPAllocation
+from app.models.peer_key import PeerKey
+from app.models.peer_metadata import PeerMetadata
+from app.models.peer_template import PeerTemplate
+from app.services.ip_pool_service import IPPoolService
+from app.services.ip_allocation_index import pool_contains
+from app.services.log_service import create_log
+from app.services.notification_service import notify_peer_created
+from app.services.peer_snapshot_store import peer_snapshot_store
+from app.services.wireguard_key_pool import public_key_from_private, wireguard_key_pool
+from app.utils.datetime_helper import utcnow
+from app.websocket.connection_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# add_peer ile aynı IP/CIDR deseni (IPv4 veya IPv6)
+_IP_PATTERN = re.compile(r'^(\d{1,3}\.){3}\d{1,3}(\/\d+)?$|^([0-9a-fA-F]{0,4}:){2,7}[0-9a-fA-F]{0,4}(\/\d+)?$')
+
+# Bellekte tutulacak bitmiş iş sayısı (durum sorgusu için)
+_MAX_FINISHED_JOBS = 20
+
+
+def _split_addresses(value: Optional[str]) -> List[str]:
+    """Virgülle ayrılmış adreslerden geçerli IP/CIDR olanları döner"""
+    return [addr.strip() for addr in (value or "").split(",") if _IP_PATTERN.match(addr.strip())]
+
+
+class PeerProvisioningService:
+    """
+    Toplu peer oluşturma işlerini yönetir
+    - İşler sırayla çalışır (aynı anda tek iş), böylece havuz ve router yükü sınırlı kalır
+    - Her iş kendi DB session'ını kullanır, istekten bağımsızdır
+    """
+
+    def __init__(self, router_batch_size: int = 100):
+        self.router_batch_size = max(1, router_batch_size)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # ===== Spec hazırlama =====
+
+    @staticmethod
+    def specs_from_template(template: PeerTemplate, count: int, name_prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Şablondan count adet peer spec'i üretir
+        Not şablonundaki {number} değişkeni peer sırasıyla değiştirilir
+        """
+        from app.services.peer_template_service import PeerTemplateService
+
+        base = PeerTemplateService.prepare_peer_data_from_template(template)
+        metadata = base.pop("metadata", {})
+        keepalive = base.get("persistent_keepalive")
+        prefix = name_prefix or template.name
+
+        specs = []
+        for number in range(1, count + 1):
+            spec = dict(base)
+            spec["name"] = f"{prefix}-{number}"
+            spec["persistent_keepalive"] = f"{keepalive}s" if keepalive else None
+            spec["template_id"] = template.id
+            spec_metadata = dict(metadata)
+            if spec_metadata.get("notes"):
+                spec_metadata["notes"] = spec_metadata["notes"].replace("{number}", str(number))
+            spec["metadata"] = spec_metadata
+            specs.append(spec)
+        return specs
+
+    # ===== İş yönetimi =====
+
+    def submit(self, interface: str, specs: List[Dict[str, Any]], user_id: int, username: str,
+               ip_address: Optional[str] = None, template_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Yeni toplu oluşturma işini kuyruğa alır ve hemen döner
+
+        Returns:
+            İş durumu (job_id ile)
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "interface": interface,
+            "user_id": user_id,
+            "status": "queued",
+            "stage": "queued",
+            "total": len(specs),
+            "done": 0,
+            "failed": 0,
+            "created_at": utcnow().isoformat(),
+            "finished_at": None,
+            "error": None,
+            "results": [],
+        }
+        self.jobs[job_id] = job
+        self._prune_jobs()
+        self._tasks[job_id] = asyncio.create_task(
+            self._run(job, specs, username, ip_address, template_id)
+        )
+        logger.info(f"📦 Toplu peer oluşturma işi kuyruğa alındı: {job_id} ({len(specs)} peer, {interface})")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def _prune_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:-_MAX_FINISHED_JOBS]:
+            self.jobs.pop(job_id, None)
+
+    async def _progress(self, job: Dict[str, Any], stage: str, message: Optional[str] = None):
+        """İş durumunu günceller ve kullanıcının WebSocket bağlantılarına iletir (kuyruğa bırakır, beklemez)"""
+        job["stage"] = stage
+        await manager.send_to_user(job["user_id"], {
+            "type": "peer_provision_progress",
+            "data": {
+                "job_id": job["job_id"],
+                "interface": job["interface"],
+                "status": job["status"],
+                "stage": stage,
+                "total": job["total"],
+                "done": job["done"],
+                "failed": job["failed"],
+                "message": message,
+            }
+        })
+
+    # ===== Adımlar =====
+
+    async def _allocate(self, db, job: Dict[str, Any], peers: List[Dict[str, Any]]):
+        """
+        Otomatik IP isteyen peer'lara havuzdan tek rezervasyonda IP verir,
+        manuel IP'leri ait oldukları havuzda tek seferde kaydeder
+        Tahsisler hemen commit edilir (tekil peer eklemeleri aynı IP'yi alamaz);
+        router'a eklenemeyen peer'larınki sonradan serbest bırakılır
+        """
+        interface = job["interface"]
+        pools = await IPPoolService.get_pools(db, interface_name=interface, is_active=True)
+
+        # Manuel IP'ler bir pool'a aitse track edilir (her pool için tek tahsis çağrısı)
+        # Önce yapılır ki otomatik tahsis bu adresleri atlasın
+        for pool in pools:
+            owners = {}
+            for peer in peers:
+                if peer["auto"] or not peer["allowed_ips"] or "allocation" in peer:
+                    continue
+                # allocate_ips kanonik adres döner (küçük harf/sıkıştırılmış IPv6), anahtar da aynı biçimde tutulur
+                try:
+                    ip_only = str(ipaddress.ip_address(peer["allowed_ips"][0].split('/')[0]))
+                except ValueError:
+                    continue
+                if pool_contains(pool, ip_only) and ip_only not in owners:
+                    owners[ip_only] = peer
+            if not owners:
+                continue
+            tracked = await IPPoolService.allocate_ips(
+                db,
+                pool.id,
+                ip_addresses=list(owners),
+                peer_names=[peer["name"] for peer in owners.values()],
+                notes=f"Manuel tahsis (toplu) - {interface}"
+            ) or []
+            for allocation in tracked:
+                owner = owners[allocation.ip_address]
+                owner["allocation"] = allocation
+                owner["reservation"] = (allocation.id, allocation.pool_id, allocation.ip_address)
+
+        auto_peers = [peer for peer in peers if peer["auto"]]
+        if auto_peers:
+            if not pools:
+                raise Exception(f"Bu interface için aktif IP pool bulunamadı: {interface}")
+            pool = pools[0]
+            reserved = await IPPoolService.allocate_ips(
+                db,
+                pool.id,
+                count=len(auto_peers),
+                peer_names=[peer["name"] for peer in auto_peers],
+                notes=f"Toplu tahsis - {interface}"
+            )
+            if reserved is None:
+                raise Exception(f"IP pool'da yeterli boş IP yok: {pool.name} ({len(auto_peers)} gerekli)")
+            for peer, allocation in zip(auto_peers, reserved):
+                host_prefix = 128 if ":" in allocation.ip_address else 32
+                peer["allowed_ips"] = [f"{allocation.ip_address}/{host_prefix}"]
+                peer["allocation"] = allocation
+                peer["reservation"] = (allocation.id, allocation.pool_id, allocation.ip_address)
+
+    async def _push(self, job: Dict[str, Any], peers: List[Dict[str, Any]]):
+        """Peer'ları router'a parça parça pipelined add ile gönderir"""
+        interface = job["interface"]
+        for start in range(0, len(peers), self.router_batch_size):
+            chunk = peers[start:start + self.router_batch_size]
+            # Sonuç gelmeden hata olursa bu peer'ların router durumu bilinmez (bkz. _recover)
+            for peer in chunk:
+                peer["pushed"] = True
+            added = await mikrotik_conn.add_wireguard_peers(
+                interface, [peer["params"] for peer in chunk], chunk_size=self.router_batch_size
+            )
+
+            # Birden fazla allowed-address'i olan peer'lar önce tek adresle eklenir, sonra set edilir
+            # (MikroTik API virgülle ayrılmış değerleri add'de doğru işlemiyor)
+            followups = []
+            for peer, result in zip(chunk, added):
+                if "error" in result:
+                    peer["error"] = result["error"]
+                    job["failed"] += 1
+                    continue
+                peer["peer_id"] = result.get("id")
+                peer["peer"] = result
+                job["done"] += 1
+                if len(peer["router_addresses"]) > 1:
+                    followups.append(peer)
+
+            if followups:
+                full_addresses = [",".join(peer["router_addresses"]) for peer in followups]
+                set_results = await mikrotik_conn.execute_pipelined(
+                    "/interface/wireguard/peers",
+                    "set",
+                    [{".id": peer["peer_id"], "allowed-address": value} for peer, value in zip(followups, full_addresses)],
+                    chunk_size=self.router_batch_size
+                )
+                for peer, value, (_, error) in zip(followups, full_addresses, set_results):
+                    if error is None:
+                        peer["peer"]["allowed-address"] = value
+                    else:
+                        logger.error(f"❌ Allowed-address güncellenemedi ({peer['peer_id']}): {error}")
+
+            await self._progress(job, "router")
+
+    async def _write_records(self, db, job: Dict[str, Any], peers: List[Dict[str, Any]],
+                             template_id: Optional[int]):
+        """PeerKey/PeerMetadata toplu INSERT, tahsis güncellemeleri ve şablon sayacı tek transaction'da"""
+        interface = job["interface"]
+        created = [peer for peer in peers if peer.get("peer_id")]
+
+        try:
+            key_rows = [
+                {
+                    "peer_id": peer["peer_id"],
+                    "interface_name": interface,
+                    "public_key": peer["public_key"],
+                    "private_key": peer["private_key"],
+                    "client_allowed_ips": peer["client_allowed_ips"],
+                    "endpoint_address": peer["spec"].get("endpoint_address"),
+                    "endpoint_port": peer["spec"].get("endpoint_port"),
+                    "template_id": template_id or peer["spec"].get("template_id"),
+                }
+                for peer in created if peer["private_key"]
+            ]
+            if key_rows:
+                # Aynı public key ile kalmış eski kayıt varsa yenisi geçerlidir (add_peer ile aynı davranış)
+                await db.execute(
+                    delete(PeerKey).where(PeerKey.public_key.in_([row["public_key"] for row in key_rows]))
+                )
+                await db.execute(insert(PeerKey), key_rows)
+
+            metadata_rows = []
+            for peer in created:
+                metadata = {k: v for k, v in (peer["spec"].get("metadata") or {}).items() if v}
+                if metadata:
+                    metadata_rows.append({
+                        "peer_id": peer["peer_id"],
+                        "interface_name": interface,
+                        "public_key": peer["public_key"],
+                        "group_name": metadata.get("group_name"),
+                        "group_color": metadata.get("group_color"),
+                        "tags": metadata.get("tags"),
+                        "notes": metadata.get("notes"),
+                    })
+            if metadata_rows:
+                await db.execute(insert(PeerMetadata), metadata_rows)
+
+            # Tahsisler peer ID ile eşleştirilir (rezervasyon ID'siyle, session'dan bağımsız),
+            # router'a eklenmediği kesin olan peer'ların IP'leri serbest bırakılır
+            allocation_rows = []
+            failed_reservations = []
+            for peer in peers:
+                reservation = peer.get("reservation")
+                if reservation is None:
+                    continue
+                if peer.get("peer_id"):
+                    allocation_rows.append({
+                        "id": reservation[0],
+                        "peer_id": str(peer["peer_id"]),
+                        "peer_public_key": peer["public_key"],
+                    })
+                elif not peer.get("unconfirmed"):
+                    failed_reservations.append(reservation)
+            if allocation_rows:
+                await db.execute(update(IPAllocation), allocation_rows)
+            await IPPoolService.release_allocations(db, failed_reservations, commit=False)
+
+            if template_id and created:
+                await db.execute(
+                    update(PeerTemplate)
+                    .where(PeerTemplate.id == template_id)
+                    .values(usage_count=func.coalesce(PeerTemplate.usage_count, 0) + len(created),
+                            last_used_at=utcnow())
+                )
+
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            peer_snapshot_store.invalidate(interface)
+
+    async def _add_routes(self, peers: List[Dict[str, Any]], interface: str):
+        """Endpoint subnet'leri için IP route ekler (router subnet listesi bir kez alınır)"""
+        pending = [peer for peer in peers if peer.get("peer_id") and peer["endpoint_subnets"]]
+        if not pending:
+            return
+
+        existing_subnets = await mikrotik_conn.get_interface_subnets()
+        for peer in pending:
+            gateway_ip = peer["router_addresses"][0].split('/')[0] if peer["router_addresses"] else None
+            if not gateway_ip:
+                continue
+            for subnet in peer["endpoint_subnets"]:
+                try:
+                    if str(ipaddress.ip_network(subnet, strict=False)) in existing_subnets:
+                        continue
+                    await mikrotik_conn.add_ip_route(
+                        dst_address=subnet,
+                        gateway=gateway_ip,
+                        comment=f"{peer['name'] or 'Unnamed peer'} for WireGuard peer {interface}"
+                    )
+                except Exception as route_error:
+                    # Route ekleme hatası peer oluşturmayı engellemez
+                    logger.error(f"❌ IP route eklenemedi ({subnet} via {gateway_ip}): {route_error}")
+
+    @staticmethod
+    def _prepare(spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Spec'i çalışma kaydına çevirir (adres ayrıştırma, varsayılanlar)"""
+        allowed = (spec.get("allowed_address") or "").strip()
+        endpoint_ips = _split_addresses(spec.get("endpoint_allowed_address"))
+        client_allowed_ips = (spec.get("endpoint_allowed_address") or "").strip() or "0.0.0.0/0, ::/0"
+        public_key = (spec.get("public_key") or "").strip()
+        private_key = (spec.get("private_key") or "").strip() or None
+        if private_key and not public_key:
+            # Yalnızca private key verilmişse public key ondan türetilir
+            try:
+                public_key = public_key_from_private(private_key)
+            except ValueError:
+                pass
+        return {
+            "spec": spec,
+            "name": (spec.get("name") or "").strip() or None,
+            "auto": not allowed or allowed.lower() == "auto",
+            "allowed_ips": [] if allowed.lower() in ("", "auto") else _split_addresses(allowed),
+            "endpoint_ips": endpoint_ips,
+            "endpoint_subnets": [ip for ip in endpoint_ips if '/' in ip and not ip.endswith('/32')],
+            "client_allowed_ips": client_allowed_ips,
+            "public_key": public_key,
+            "private_key": private_key,
+        }
+
+    @staticmethod
+    def _build_params(peer: Dict[str, Any]):
+        """Router add parametrelerini hazırlar (add_peer ile aynı alanlar)"""
+        spec = peer["spec"]
+        peer["router_addresses"] = peer["allowed_ips"] + peer["endpoint_ips"]
+        params = {"public-key": peer["public_key"]}
+        if peer["router_addresses"]:
+            params["allowed-address"] = peer["router_addresses"][0]
+        if peer["name"]:
+            params["name"] = peer["name"]
+        if spec.get("comment") and spec["comment"].strip():
+            params["comment"] = spec["comment"].strip()
+        params["persistent-keepalive"] = spec.get("persistent_keepalive") or "25s"
+        if spec.get("preshared_key"):
+            params["preshared-key"] = spec["preshared_key"]
+        if peer["private_key"]:
+            params["private-key"] = peer["private_key"]
+        peer["params"] = params
+
+    async def _run(self, job: Dict[str, Any], specs: List[Dict[str, Any]], username: str,
+                   ip_address: Optional[str], template_id: Optional[int]):
+        interface = job["interface"]
+        peers = [self._prepare(spec) for spec in specs]
+        written = False
+        valid: List[Dict[str, Any]] = []
+
+        async with self._lock:
+            job["status"] = "running"
+            try:
+                async with AsyncSessionLocal() as db:
+                    # 1) IP tahsisi (tek rezervasyon)
+                    await self._progress(job, "allocating")
+                    await self._allocate(db, job, peers)
+
+                    # 2) Eksik anahtarlar (anahtar havuzu)
+                    missing = [peer for peer in peers if not peer["public_key"] and not peer["private_key"]]
+                    if missing:
+                        await self._progress(job, "keys", f"{len(missing)} anahtar çifti üretiliyor")
+                        for peer, (private_key, public_key) in zip(missing, await wireguard_key_pool.take_many(len(missing))):
+                            peer["private_key"] = private_key
+                            peer["public_key"] = public_key
+
+                    # Geçersiz ve tekrarlanan peer'lar router'a gönderilmez
+                    seen_keys = set()
+                    for peer in peers:
+                        if not peer["public_key"]:
+                            peer["error"] = "Geçersiz private key"
+                        elif not peer["allowed_ips"] and not peer["endpoint_ips"]:
+                            peer["error"] = "Geçerli allowed-address yok"
+                        elif peer["public_key"] in seen_keys:
+                            peer["error"] = "Aynı public key istekte birden fazla kez var"
+                        elif await peer_snapshot_store.lookup(interface, public_key=peer["public_key"], fallback=False):
+                            peer["error"] = "Bu public key ile peer zaten mevcut"
+                        else:
+                            seen_keys.add(peer["public_key"])
+                            self._build_params(peer)
+                            valid.append(peer)
+                            continue
+                        job["failed"] += 1
+
+                    # 3) Router (pipelined add)
+                    await self._progress(job, "router")
+                    await self._push(job, valid)
+
+                    # 4) Veritabanı (toplu INSERT, tek transaction)
+                    await self._progress(job, "database")
+                    await self._write_records(db, job, peers, template_id)
+                    written = True
+
+                # 5) Endpoint subnet route'ları
+                await self._add_routes(valid, interface)
+
+                job["status"] = "completed"
+            except asyncio.CancelledError:
+                job["status"] = "failed"
+                job["error"] = "İş iptal edildi"
+                raise
+            except Exception as e:
+                logger.error(f"❌ Toplu peer oluşturma hatası ({job['job_id']}): {e}")
+                # Durum, uzlaştırma bitene kadar "running" kalır (sonuçlar henüz kesin değil)
+                if not written and await self._recover(job, peers, template_id):
+                    # Kayıtlar ikinci denemede yazıldı ve router durumu bilinmeyen peer yok
+                    await self._add_routes(valid, interface)
+                    job["status"] = "completed"
+                else:
+                    job["status"] = "failed"
+                    job["error"] = str(e)
+            finally:
+                job["finished_at"] = utcnow().isoformat()
+                job["results"] = [
+                    {
+                        "name": peer["name"],
+                        "peer_id": peer.get("peer_id"),
+                        "public_key": peer["public_key"] or None,
+                        "allowed_address": (peer.get("peer") or {}).get("allowed-address"),
+                        "error": peer.get("error"),
+                        # Kayıt yazılamadıysa router'daki peer'ın anahtarı kaybolmasın diye sonuçta döner
+                        "private_key": peer["private_key"] if peer.get("unsaved") else None,
+                    }
+                    for peer in peers
+                ]
+                self._tasks.pop(job["job_id"], None)
+                await self._progress(job, job["status"], job["error"])
+
+        created = job["done"]
+        logger.info(f"📦 Toplu peer oluşturma bitti: {job['job_id']} - {created} oluşturuldu, {job['failed']} başarısız")
+        if created:
+            await self._notify(job, username, ip_address)
+
+    async def _recover(self, job: Dict[str, Any], peers: List[Dict[str, Any]], template_id: Optional[int]) -> bool:
+        """
+        Kayıtlar yazılmadan biten işte router ile veritabanını uzlaştırır
+        - Router durumu bilinmeyen (gönderilmiş, sonucu doğrulanamamış) peer'ların IP'leri serbest bırakılmaz
+        - Router'a eklenmiş peer'lar varsa kayıtlar yeni bir session'da bir kez daha yazılır
+          (başarısız peer'ların rezervasyonları aynı transaction'da bırakılır)
+        - Yine yazılamazsa anahtarlar iş sonucunda tutulur, yalnızca kesin başarısızların IP'leri bırakılır
+
+        Returns:
+            Kayıtlar yazıldıysa ve durumu bilinmeyen peer yoksa True
+        """
+        unconfirmed = False
+        for peer in peers:
+            if peer.get("pushed") and not peer.get("peer_id") and not peer.get("error"):
+                peer["unconfirmed"] = True
+                peer["unsaved"] = True
+                peer["error"] = "Router sonucu doğrulanamadı, IP rezervasyonu korunuyor"
+                job["failed"] += 1
+                unconfirmed = True
+
+        if any(peer.get("peer_id") for peer in peers):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self._write_records(db, job, peers, template_id)
+                logger.info(f"✅ Toplu oluşturma kayıtları ikinci denemede yazıldı ({job['job_id']})")
+                return not unconfirmed
+            except Exception as write_error:
+                logger.error(f"❌ Toplu oluşturma kayıtları yazılamadı ({job['job_id']}): {write_error}")
+                for peer in peers:
+                    if peer.get("peer_id"):
+                        peer["unsaved"] = True
+
+        unused = [
+            peer["reservation"] for peer in peers
+            if "reservation" in peer and not peer.get("peer_id") and not peer.get("unconfirmed")
+        ]
+        if unused:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await IPPoolService.release_allocations(db, unused)
+            except Exception as release_error:
+                logger.error(f"❌ Rezerve IP'ler serbest bırakılamadı: {release_error}")
+        return False
+
+    async def _notify(self, job: Dict[str, Any], username: str, ip_address: Optional[str]):
+        """Peer başına değil, iş başına tek bildirim ve tek aktivite kaydı"""
+        interface = job["interface"]
+        try:
+            async with AsyncSessionLocal() as db:
+                await notify_peer_created(
+                    db=db,
+                    user_id=job["user_id"],
+                    peer_name=f"{job['done']} peer (toplu)",
+                    interface=interface
+                )
+        except Exception as e:
+            logger.error(f"⚠️ Toplu oluşturma bildirimi gönderilemedi: {e}")
+
+        await create_log(
+            None,
+            username,
+            "peers_bulk_provisioned",
+            details=f"Interface: {interface}, Oluşturulan: {job['done']}, Başarısız: {job['failed']}, İş: {job['job_id']}",
+            ip_address=ip_address
+        )
+
+    async def stop(self):
+        """Çalışan işleri iptal eder"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        for task in list(self._tasks.values()):
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self.jobs),
+            "running": sum(1 for job in self.jobs.values() if job["status"] == "running"),
+            "queued": sum(1 for job in self.jobs.values() if job["status"] == "queued"),
+        }
+
+
+# Global toplu oluşturma servisi
+peer_provisioning = PeerProvisioningService(
+    router_batch_size=settings.PROVISION_ROUTER_BATCH_SIZE,
+)
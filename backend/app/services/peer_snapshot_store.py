@@ -0,0 +1,483 @@
+"""
+Peer snapshot deposu
+MikroTik'teki WireGuard peer listelerinin process içi tek yetkili kopyasını tutar.
+Peer monitoring zamanlayıcısı snapshot'ları yeniler; HTTP endpoint'leri ve WebSocket
+bağlantı yöneticisi router'a ve veritabanına peer başına gitmeden buradan okur.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Any, Iterable, Callable, Awaitable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.mikrotik.connection import mikrotik_conn, normalize_peer_id
+from app.models.peer_key import PeerKey
+from app.services.peer_handshake_service import peer_state_tracker
+
+logger = logging.getLogger(__name__)
+
+# WebSocket üzerinden gönderilmeyecek gizli alanlar
+_SECRET_FIELDS = ("private-key", "private_key", "preshared-key", "preshared_key")
+
+# Her örneklemede değişen trafik sayaçları; diff'te "changed" yerine ayrı "counters" alanında gider
+_COUNTER_FIELDS = ("rx", "tx", "rx-bytes", "tx-bytes", "rx_bytes", "tx_bytes")
+
+# Snapshot dinleyicisi: (interface_name, mesaj) -> coroutine
+SnapshotListener = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def _byte_counter(peer: Dict[str, Any], name: str) -> Optional[int]:
+    """Peer'ın rx/tx byte sayacını döner (RouterOS sürümüne göre 'rx-bytes' veya 'rx')"""
+    value = peer.get(f'{name}-bytes', peer.get(name))
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class InterfaceSnapshot:
+    """
+    Tek bir interface'in peer snapshot'ı
+    Peer'lar hem normalize edilmiş MikroTik .id ("*1A") hem de public key ile indekslenir
+    """
+
+    def __init__(
+        self,
+        interface_name: str,
+        peers: List[Dict[str, Any]],
+        generation: int,
+        fetched_at: Optional[float] = None
+    ):
+        self.interface_name = interface_name
+        self.peers = peers
+        self.generation = generation  # Snapshot alınırken geçerli peer değişiklik sayacı
+        # Router'dan okuma anı (time.monotonic); yaş ve hız aralığı buna göre hesaplanır
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_public_key: Dict[str, Dict[str, Any]] = {}
+        for peer in peers:
+            peer_id = normalize_peer_id(peer.get('id') or peer.get('.id'))
+            if peer_id:
+                self.by_id[peer_id] = peer
+            public_key = peer.get('public-key') or peer.get('public_key')
+            if public_key:
+                self.by_public_key[str(public_key).strip()] = peer
+
+    @property
+    def age(self) -> float:
+        """Snapshot yaşı (saniye)"""
+        return time.monotonic() - self.fetched_at
+
+
+class PeerSnapshotStore:
+    """
+    Interface bazlı peer snapshot deposu
+    - Snapshot'lar peer monitoring döngüsünde (15 saniye) yenilenir
+    - Okuma sırasında snapshot çok eskiyse veya peer'lar değiştirildiyse
+      (MikroTikConnection peer değişiklik sayacı) router'dan tek sefer yeniden çekilir
+    - Aynı interface için eşzamanlı yenilemeler tek router isteğinde birleşir
+    - saved_in_db alanı interface başına tek PeerKey sorgusu ile hesaplanır
+    """
+
+    def __init__(self, max_age: float = 20.0):
+        """
+        Args:
+            max_age: Snapshot'ın yeniden çekilmeden sunulabileceği maksimum yaş (saniye)
+        """
+        self.max_age = max_age
+        self._snapshots: Dict[str, InterfaceSnapshot] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Diff tabanı: son yayınlanan snapshot (invalidate() ile silinmez)
+        self._published: Dict[str, InterfaceSnapshot] = {}
+        self._listeners: List[SnapshotListener] = []
+
+        # İstatistikler
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.diffs = 0
+        self.lookup_hits = 0
+        self.lookup_misses = 0
+
+    def _get_lock(self, interface_name: str) -> asyncio.Lock:
+        """Interface başına yenileme kilidi"""
+        lock = self._locks.get(interface_name)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[interface_name] = lock
+        return lock
+
+    def _is_fresh(self, snapshot: Optional[InterfaceSnapshot], max_age: float) -> bool:
+        """Snapshot hem yeterince yeni hem de son peer değişikliğinden sonra alınmış mı?"""
+        return (
+            snapshot is not None
+            and snapshot.age <= max_age
+            and snapshot.generation == mikrotik_conn.get_peer_generation(snapshot.interface_name)
+        )
+
+    async def _load_saved_keys(self, db: AsyncSession, interface_name: str) -> set:
+        """Interface için veritabanına kayıtlı public key'leri tek sorguda getirir"""
+        result = await db.execute(
+            select(PeerKey.public_key).where(PeerKey.interface_name == interface_name)
+        )
+        return {str(key).strip() for key in result.scalars().all() if key}
+
+    async def publish(
+        self,
+        db: AsyncSession,
+        interface_name: str,
+        peers: List[Dict[str, Any]],
+        generation: Optional[int] = None,
+        fetched_at: Optional[float] = None
+    ) -> InterfaceSnapshot:
+        """
+        Router'dan çekilmiş peer listesini işler ve snapshot olarak saklar
+        - Interface kilidi altında çalışır; refresh() ile eşzamanlı yayınlar sıraya girer
+        - Saklanandan daha eski okunmuş liste atılır, saklanan snapshot döner
+        - Handshake durum değişikliklerini toplu olarak kaydeder
+        - saved_in_db alanını doldurur
+
+        Args:
+            db: Veritabanı session'ı
+            interface_name: Interface adı
+            peers: get_wireguard_peers() sonucu
+            generation: Peer listesi çekilmeden önce alınan değişiklik sayacı
+            fetched_at: Peer listesi çekilmeden önce alınan time.monotonic() değeri
+                (verilmezse şimdiki zaman; veritabanı işleri snapshot yaşına eklenmez)
+        """
+        async with self._get_lock(interface_name):
+            return await self._publish(db, interface_name, peers, generation, fetched_at)
+
+    def _newer_snapshot(self, interface_name: str, generation: int, fetched_at: float) -> Optional[InterfaceSnapshot]:
+        """Saklanan snapshot verilen okumadan daha yeniyse onu döner"""
+        stored = self._published.get(interface_name)
+        if stored is not None and (generation < stored.generation or fetched_at < stored.fetched_at):
+            return self._snapshots.get(interface_name) or stored
+        return None
+
+    async def _publish(
+        self,
+        db: AsyncSession,
+        interface_name: str,
+        peers: List[Dict[str, Any]],
+        generation: Optional[int],
+        fetched_at: Optional[float]
+    ) -> InterfaceSnapshot:
+        """publish() gövdesi, interface kilidi altında çağrılır"""
+        if generation is None:
+            generation = mikrotik_conn.get_peer_generation(interface_name)
+        if fetched_at is None:
+            fetched_at = time.monotonic()
+
+        newer = self._newer_snapshot(interface_name, generation, fetched_at)
+        if newer is not None:
+            # Yavaş bir okuma daha yeni snapshot'ın üzerine yazmasın (diff tabanı geri gitmesin)
+            logger.debug(f"Eski peer listesi atıldı ({interface_name}), daha yeni snapshot mevcut")
+            return newer
+
+        try:
+            handshake_records = await peer_state_tracker.track_snapshot(db, interface_name, peers)
+        except Exception as e:
+            logger.error(f"Peer durum tracking hatası ({interface_name}): {e}")
+            handshake_records = []
+
+        try:
+            saved_keys = await self._load_saved_keys(db, interface_name)
+        except Exception as e:
+            logger.error(f"Kayıtlı peer key'leri alınamadı ({interface_name}): {e}")
+            saved_keys = set()
+
+        # Snapshot kendi kopyasını tutar; çağıranın listesi (ör. bağlantı önbelleği) değiştirilmez
+        peers = [dict(peer) for peer in peers]
+        for peer in peers:
+            public_key = peer.get('public-key') or peer.get('public_key')
+            peer['saved_in_db'] = bool(public_key) and str(public_key).strip() in saved_keys
+
+        snapshot = InterfaceSnapshot(interface_name, peers, generation, fetched_at)
+        self._snapshots[interface_name] = snapshot
+        self.refreshes += 1
+
+        previous = self._published.get(interface_name)
+        self._published[interface_name] = snapshot
+        if self._listeners:
+            if previous is None:
+                message = {
+                    "type": "peer_snapshot",
+                    "interface": interface_name,
+                    "data": self.public_view(snapshot.peers)
+                }
+            else:
+                message = self._build_diff(previous, snapshot, handshake_records)
+            if message is not None:
+                await self._notify(interface_name, message)
+        return snapshot
+
+    def subscribe(self, listener: SnapshotListener):
+        """
+        Snapshot değişikliklerini dinleyecek coroutine fonksiyonunu kaydeder
+        İlk yayında tam snapshot ("peer_snapshot"), sonrakilerde sadece fark ("peer_diff") iletilir
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    async def _notify(self, interface_name: str, message: Dict[str, Any]):
+        """Dinleyicilere mesajı iletir, dinleyici hataları snapshot yayınını bozmaz"""
+        for listener in self._listeners:
+            try:
+                await listener(interface_name, message)
+            except Exception as e:
+                logger.error(f"Snapshot dinleyici hatası ({interface_name}): {e}")
+
+    def _build_diff(
+        self,
+        previous: InterfaceSnapshot,
+        current: InterfaceSnapshot,
+        handshake_records: List[Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        İki snapshot arasındaki farkı hesaplar (peer .id bazında)
+        - added: yeni peer'lar (gizli alanlar çıkarılmış)
+        - removed: silinen peer id'leri
+        - changed: {peer_id: {alan: yeni değer}} (gizli alanlar ve trafik sayaçları hariç)
+        - counters: {peer_id: {sayaç: yeni değer}} (sadece değişen rx/tx sayaçları)
+        - handshake: online/offline geçişleri
+        - rates: iki snapshot arasındaki rx/tx hızı (byte/saniye)
+
+        Returns:
+            "peer_diff" mesajı, hiçbir fark yoksa None
+        """
+        added = [
+            peer for peer_id, peer in current.by_id.items()
+            if peer_id not in previous.by_id
+        ]
+        removed = [peer_id for peer_id in previous.by_id if peer_id not in current.by_id]
+
+        changed: Dict[str, Dict[str, Any]] = {}
+        counters: Dict[str, Dict[str, Any]] = {}
+        rates: Dict[str, Dict[str, int]] = {}
+        elapsed = current.fetched_at - previous.fetched_at
+        for peer_id, peer in current.by_id.items():
+            old = previous.by_id.get(peer_id)
+            if old is None:
+                continue
+
+            fields = {}
+            counter_fields = {}
+            for key, value in peer.items():
+                if key in _SECRET_FIELDS or old.get(key) == value:
+                    continue
+                if key in _COUNTER_FIELDS:
+                    counter_fields[key] = value
+                else:
+                    fields[key] = value
+            fields.update({
+                key: None for key in old
+                if key not in peer and key not in _SECRET_FIELDS and key not in _COUNTER_FIELDS
+            })
+            if fields:
+                changed[peer_id] = fields
+            if counter_fields:
+                counters[peer_id] = counter_fields
+
+            if elapsed >= 1:
+                rate = {}
+                for name in ('rx', 'tx'):
+                    new_bytes = _byte_counter(peer, name)
+                    old_bytes = _byte_counter(old, name)
+                    # Sayaç sıfırlandıysa (peer yeniden oluşturuldu / router reboot) örnek atlanır
+                    if new_bytes is not None and old_bytes is not None and new_bytes >= old_bytes:
+                        rate[f'{name}_rate'] = int((new_bytes - old_bytes) / elapsed)
+                if rate and (rate.get('rx_rate') or rate.get('tx_rate') or peer_id in changed):
+                    rates[peer_id] = rate
+
+        # İlk kez görülen peer'ların kayıtları geçiş değil, sadece önceki snapshot'ta olanlar iletilir
+        handshake = [
+            {
+                "peer_id": record.peer_id,
+                "is_online": record.is_online,
+                "event_time": record.event_time.isoformat() if record.event_time else None,
+            }
+            for record in handshake_records
+            if record.peer_id in previous.by_id
+        ]
+
+        if not (added or removed or changed or counters or handshake):
+            return None
+
+        self.diffs += 1
+        return {
+            "type": "peer_diff",
+            "interface": current.interface_name,
+            "generation": current.generation,
+            "data": {
+                "added": self.public_view(added),
+                "removed": removed,
+                "changed": changed,
+                "counters": counters,
+                "handshake": handshake,
+                "rates": rates,
+                "interval": round(elapsed, 1),
+            }
+        }
+
+    async def refresh(self, db: AsyncSession, interface_name: str) -> InterfaceSnapshot:
+        """Interface'in peer'larını router'dan çeker ve snapshot'ı yeniler (interface kilidi altında çağrılır)"""
+        generation = mikrotik_conn.get_peer_generation(interface_name)
+        fetched_at = time.monotonic()
+        peers = await mikrotik_conn.get_wireguard_peers(interface_name, use_cache=False)
+        return await self._publish(db, interface_name, peers, generation, fetched_at)
+
+    async def get_snapshot(
+        self,
+        db: AsyncSession,
+        interface_name: str,
+        max_age: Optional[float] = None
+    ) -> InterfaceSnapshot:
+        """
+        Interface snapshot'ını döner, gerekirse router'dan yeniler
+
+        Args:
+            db: Veritabanı session'ı
+            interface_name: Interface adı
+            max_age: Kabul edilebilir maksimum yaş (varsayılan: self.max_age)
+        """
+        max_age = self.max_age if max_age is None else max_age
+
+        snapshot = self._snapshots.get(interface_name)
+        if self._is_fresh(snapshot, max_age):
+            self.hits += 1
+            return snapshot
+
+        async with self._get_lock(interface_name):
+            # Kilidi beklerken başka bir istek yenilemiş olabilir
+            snapshot = self._snapshots.get(interface_name)
+            if self._is_fresh(snapshot, max_age):
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            return await self.refresh(db, interface_name)
+
+    async def get_peers(
+        self,
+        db: AsyncSession,
+        interface_name: str,
+        max_age: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Interface'in peer listesini döner (snapshot'tan)
+        Peer kayıtları sığ kopyadır; çağıran taraf değiştirse de snapshot ve diff tabanı bozulmaz
+        """
+        snapshot = await self.get_snapshot(db, interface_name, max_age)
+        return [dict(peer) for peer in snapshot.peers]
+
+    def peek(self, interface_name: str) -> Optional[InterfaceSnapshot]:
+        """Router'a gitmeden mevcut snapshot'ı döner (yoksa None)"""
+        return self._snapshots.get(interface_name)
+
+    def find_by_public_key(self, interface_name: str, public_key: str) -> Optional[Dict[str, Any]]:
+        """Snapshot'ta public key ile peer arar (kaydın kopyasını döner)"""
+        snapshot = self._snapshots.get(interface_name)
+        if snapshot is None or not public_key:
+            return None
+        peer = snapshot.by_public_key.get(public_key.strip())
+        return dict(peer) if peer is not None else None
+
+    def find_by_id(self, interface_name: str, peer_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot'ta MikroTik .id ile peer arar ("5", "*5" ve "*a" aynı peer'ı bulur, kaydın kopyasını döner)"""
+        snapshot = self._snapshots.get(interface_name)
+        normalized_id = normalize_peer_id(peer_id)
+        if snapshot is None or normalized_id is None:
+            return None
+        peer = snapshot.by_id.get(normalized_id)
+        return dict(peer) if peer is not None else None
+
+    async def lookup(
+        self,
+        interface_name: Optional[str],
+        peer_id: Optional[str] = None,
+        public_key: Optional[str] = None,
+        fallback: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Tek bir peer'ı bulur
+        - Snapshot güncelse (yaşı max_age içinde ve peer değişikliği yok) indeksten O(1) okunur
+        - Aksi halde veya indekste yoksa router'a filtreli print (?.id= / ?public-key=) gönderilir;
+          tüm peer listesi çekilmez
+
+        Args:
+            interface_name: Interface adı (None ise peer tüm interface'lerde aranır)
+            peer_id: MikroTik .id
+            public_key: Peer public key
+            fallback: False ise router'a gidilmez, sadece güncel snapshot kullanılır
+
+        Returns:
+            Peer kaydının kopyası veya None
+        """
+        snapshot = self._snapshots.get(interface_name) if interface_name else None
+        if self._is_fresh(snapshot, self.max_age):
+            if peer_id is not None:
+                peer = self.find_by_id(interface_name, peer_id)
+            else:
+                peer = self.find_by_public_key(interface_name, public_key)
+            if peer is not None:
+                self.lookup_hits += 1
+                return peer
+
+        self.lookup_misses += 1
+        if not fallback:
+            return None
+        return await mikrotik_conn.find_wireguard_peer(
+            interface=interface_name,
+            peer_id=peer_id,
+            public_key=None if peer_id is not None else public_key
+        )
+
+    def invalidate(self, interface_name: Optional[str] = None):
+        """
+        Snapshot'ı geçersiz kılar (router dışı değişiklikler için, örn. PeerKey kaydı)
+        Interface verilmezse tüm snapshot'lar geçersiz olur
+        """
+        if interface_name is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(interface_name, None)
+
+    def forget(self, interface_name: str):
+        """Interface silindiğinde snapshot'ını ve diff tabanını tamamen kaldırır"""
+        self._snapshots.pop(interface_name, None)
+        self._published.pop(interface_name, None)
+
+    def interfaces(self) -> Iterable[str]:
+        """Snapshot'ı bulunan interface adları"""
+        return list(self._snapshots.keys())
+
+    @staticmethod
+    def public_view(peers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Peer listesinin gizli anahtarlar çıkarılmış kopyasını döner (WebSocket için)"""
+        return [
+            {key: value for key, value in peer.items() if key not in _SECRET_FIELDS}
+            for peer in peers
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Depo istatistiklerini döner"""
+        return {
+            "interfaces": len(self._snapshots),
+            "peers": sum(len(snapshot.peers) for snapshot in self._snapshots.values()),
+            "max_age_seconds": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "diffs": self.diffs,
+            "lookup_hits": self.lookup_hits,
+            "lookup_misses": self.lookup_misses,
+            "listeners": len(self._listeners),
+        }
+
+
+# Global peer snapshot deposu
+peer_snapshot_store = PeerSnapshotStore(max_age=settings.PEER_SNAPSHOT_MAX_AGE)
@@ -5,6 +5,7 @@ Peer şablonları yönetimi için iş mantığı
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, desc
 from app.models.peer_template import PeerTemplate
+from app.services.dashboard_summary_service import dashboard_summary
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from app.utils.datetime_helper import utcnow
@@ -76,6 +77,7 @@ class PeerTemplateService:
         await db.flush()  # ID almak için flush yap, commit get_db() dependency'sinde yapılacak
         await db.refresh(template)
 
+        dashboard_summary.invalidate()
         logger.info(f"Peer şablonu oluşturuldu: {name}")
         return template
 
@@ -172,6 +174,7 @@ class PeerTemplateService:
         await db.delete(template)
         # Commit işlemi get_db() dependency'sinde yapılacak
 
+        dashboard_summary.invalidate()
         logger.info(f"Peer şablonu silindi: {template.name}")
         return True
 
@@ -6,6 +6,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, desc
 from typing import List, Optional, Dict, Any
 from app.models.peer_traffic_log import PeerTrafficLog
+from app.models.traffic_rollup import PeerTrafficRollup
+from app.services.traffic_rollup_service import ROLLUP_TIER_NAMES
+from app.services.peer_snapshot_store import peer_snapshot_store
 from datetime import datetime, timedelta, timezone
 import logging
 
@@ -74,6 +77,53 @@ async def save_peer_traffic_log(
         raise
 
 
+async def _rollup_peer_keys(db: AsyncSession, peer_id: str, interface_name: str) -> List[str]:
+    """
+    MikroTik peer ID'sini rollup satırlarının peer_key değerlerine çevirir
+    Rollup'lar public key ile yazılır (public key yoksa "id:<peer_id>"); public key önce
+    snapshot'tan, yoksa bu peer ID'ye ait en son ham kayıttan veya rollup satırından okunur
+    """
+    keys = [f"id:{peer_id}"]
+    public_key = None
+    peer = peer_snapshot_store.find_by_id(interface_name, peer_id)
+    if peer:
+        public_key = peer.get("public-key") or peer.get("public_key")
+    if not public_key:
+        for model in (PeerTrafficLog, PeerTrafficRollup):
+            result = await db.execute(
+                select(model.public_key).where(
+                    and_(
+                        model.peer_id == peer_id,
+                        model.interface_name == interface_name,
+                        model.public_key.isnot(None)
+                    )
+                ).order_by(desc(model.timestamp)).limit(1)
+            )
+            public_key = result.scalar_one_or_none()
+            if public_key:
+                break
+    if public_key and public_key.strip():
+        keys.append(public_key.strip())
+    return keys
+
+
+async def _peer_filter(db: AsyncSession, peer_id: str, interface_name: str, period_type: str):
+    """Periyoda göre sorgulanacak modeli ve peer/interface/periyot filtresini döner"""
+    # Saatlik/günlük/aylık/yıllık veriler rollup katmanından okunur, diğerleri ham tablodan
+    if period_type in ROLLUP_TIER_NAMES:
+        peer_keys = await _rollup_peer_keys(db, peer_id, interface_name)
+        return PeerTrafficRollup, and_(
+            PeerTrafficRollup.peer_key.in_(peer_keys),
+            PeerTrafficRollup.interface_name == interface_name,
+            PeerTrafficRollup.tier == period_type
+        )
+    return PeerTrafficLog, and_(
+        PeerTrafficLog.peer_id == peer_id,
+        PeerTrafficLog.interface_name == interface_name,
+        PeerTrafficLog.period_type == period_type
+    )
+
+
 async def get_peer_traffic_logs(
     db: AsyncSession,
     peer_id: str,
@@ -82,9 +132,10 @@ async def get_peer_traffic_logs(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 1000
-) -> List[PeerTrafficLog]:
+) -> List[Any]:
     """
     Peer trafik log kayıtlarını getirir
+    Rollup katmanları (hourly, daily, monthly, yearly) için PeerTrafficRollup kayıtları döner
     
     Args:
         db: Veritabanı session'ı
@@ -99,20 +150,15 @@ async def get_peer_traffic_logs(
         Peer trafik log kayıtları listesi
     """
     try:
-        query = select(PeerTrafficLog).where(
-            and_(
-                PeerTrafficLog.peer_id == peer_id,
-                PeerTrafficLog.interface_name == interface_name,
-                PeerTrafficLog.period_type == period_type
-            )
-        )
+        model, peer_filter = await _peer_filter(db, peer_id, interface_name, period_type)
+        query = select(model).where(peer_filter)
         
         if start_date:
-            query = query.where(PeerTrafficLog.timestamp >= start_date)
+            query = query.where(model.timestamp >= start_date)
         if end_date:
-            query = query.where(PeerTrafficLog.timestamp <= end_date)
+            query = query.where(model.timestamp <= end_date)
         
-        query = query.order_by(desc(PeerTrafficLog.timestamp)).limit(limit)
+        query = query.order_by(desc(model.timestamp)).limit(limit)
         
         result = await db.execute(query)
         return result.scalars().all()
@@ -144,26 +190,22 @@ async def get_peer_traffic_summary(
         Peer trafik özet istatistikleri
     """
     try:
+        model, peer_filter = await _peer_filter(db, peer_id, interface_name, period_type)
+        
         query = select(
-            func.sum(PeerTrafficLog.rx_bytes).label('total_rx'),
-            func.sum(PeerTrafficLog.tx_bytes).label('total_tx'),
-            func.avg(PeerTrafficLog.rx_bytes).label('avg_rx'),
-            func.avg(PeerTrafficLog.tx_bytes).label('avg_tx'),
-            func.max(PeerTrafficLog.rx_bytes).label('max_rx'),
-            func.max(PeerTrafficLog.tx_bytes).label('max_tx'),
-            func.count(PeerTrafficLog.id).label('record_count')
-        ).where(
-            and_(
-                PeerTrafficLog.peer_id == peer_id,
-                PeerTrafficLog.interface_name == interface_name,
-                PeerTrafficLog.period_type == period_type
-            )
-        )
+            func.sum(model.rx_bytes).label('total_rx'),
+            func.sum(model.tx_bytes).label('total_tx'),
+            func.avg(model.rx_bytes).label('avg_rx'),
+            func.avg(model.tx_bytes).label('avg_tx'),
+            func.max(model.rx_bytes).label('max_rx'),
+            func.max(model.tx_bytes).label('max_tx'),
+            func.count(model.id).label('record_count')
+        ).where(peer_filter)
         
         if start_date:
-            query = query.where(PeerTrafficLog.timestamp >= start_date)
+            query = query.where(model.timestamp >= start_date)
         if end_date:
-            query = query.where(PeerTrafficLog.timestamp <= end_date)
+            query = query.where(model.timestamp <= end_date)
         
         result = await db.execute(query)
         row = result.first()
@@ -8,6 +8,7 @@ from app.models.peer_key import PeerKey
 from app.models.peer_metadata import PeerMetadata
 from app.models.sync_status import SyncStatus
 from app.models.ip_pool import IPPool, IPAllocation
+from app.services.ip_allocation_index import ip_allocation_index, pool_contains
 from app.mikrotik.connection import mikrotik_conn
 from typing import Dict, Any, List
 import logging
@@ -325,14 +326,11 @@ class SyncService:
                 ip_only = addr.split('/')[0] if '/' in addr else addr
 
                 try:
-                    ip_obj = ipaddress.ip_address(ip_only)
+                    ipaddress.ip_address(ip_only)
 
-                    # Hangi pool'a ait kontrol et
+                    # Hangi pool'a ait kontrol et (farklı IP sürümündeki pool'lar atlanır)
                     for pool in pools:
-                        start_ip = ipaddress.ip_address(pool.start_ip)
-                        end_ip = ipaddress.ip_address(pool.end_ip)
-
-                        if start_ip <= ip_obj <= end_ip:
+                        if pool_contains(pool, ip_only):
                             # Allocation var mı kontrol et
                             alloc_result = await db.execute(
                                 select(IPAllocation).where(
@@ -356,6 +354,7 @@ class SyncService:
                                     notes=f"MikroTik sync sırasında otomatik link edildi"
                                 )
                                 db.add(allocation)
+                                ip_allocation_index.invalidate(pool.id)
                                 logger.debug(f"IP {ip_only} pool {pool.name}'e link edildi")
 
                             break  # Pool bulundu
@@ -2,11 +2,13 @@
 Telegram Notification Service
 Telegram bot ile bildirim gönderme servisi
 """
+import asyncio
 import logging
 import aiohttp
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from app.models.telegram_settings import TelegramSettings
 from app.models.telegram_notification_log import TelegramNotificationLog
 from app.utils.datetime_helper import utcnow
@@ -14,9 +16,116 @@ from app.utils.datetime_helper import utcnow
 logger = logging.getLogger(__name__)
 
 
+# Tüm Telegram istekleri için paylaşımlı HTTP oturumu (bağlantı havuzu ve keep-alive)
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Paylaşımlı aiohttp oturumunu döner, yoksa oluşturur"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+    return _http_session
+
+
+async def close_http_session():
+    """Paylaşımlı HTTP oturumunu kapatır (uygulama kapanırken)"""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
 class TelegramNotificationService:
     """Telegram bildirim servisi"""
 
+    @staticmethod
+    async def get_settings(db: AsyncSession) -> Optional[TelegramSettings]:
+        """Telegram ayarlarını getir"""
+        result = await db.execute(select(TelegramSettings).where(TelegramSettings.id == 1))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def deliver(bot_token: str, chat_id: str, message: str, parse_mode: str = "HTML") -> Dict[str, Any]:
+        """
+        Mesajı Telegram Bot API'ye gönderir (log yazmaz)
+
+        Returns:
+            {"success", "message_id", "error", "retryable", "retry_after"}
+            retryable: ağ hatası, 429 veya 5xx (tekrar denenebilir)
+        """
+        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        payload = {
+            "chat_id": chat_id,
+            "text": message,
+            "parse_mode": parse_mode,
+        }
+
+        try:
+            session = await get_http_session()
+            async with session.post(url, json=payload) as response:
+                if response.status == 200:
+                    response_data = await response.json()
+                    return {
+                        "success": True,
+                        "message_id": response_data.get("result", {}).get("message_id"),
+                    }
+
+                error_text = await response.text()
+                retry_after = None
+                if response.status == 429:
+                    try:
+                        retry_after = (await response.json()).get("parameters", {}).get("retry_after")
+                    except Exception:
+                        retry_after = None
+                return {
+                    "success": False,
+                    "error": f"HTTP {response.status}: {error_text}",
+                    "retryable": response.status == 429 or response.status >= 500,
+                    "retry_after": retry_after,
+                }
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {
+                "success": False,
+                "error": f"HTTP Error: {str(e) or type(e).__name__}",
+                "retryable": True,
+            }
+
+    @staticmethod
+    async def write_log(
+        db: AsyncSession,
+        settings: Optional[TelegramSettings],
+        message: str,
+        result: Dict[str, Any],
+        category: str = "general",
+        title: str = None,
+        peer_id: str = None,
+        interface_name: str = None,
+        user_id: int = None,
+    ):
+        """Gönderim sonucunu telegram_notification_logs tablosuna yazar"""
+        bot_token = settings.bot_token if settings and settings.bot_token else None
+        db.add(TelegramNotificationLog(
+            category=category,
+            title=title or message[:100],
+            message=message,
+            chat_id=settings.chat_id if settings and settings.chat_id else "unknown",
+            bot_token_preview=(bot_token[:20] + "..." if len(bot_token) > 20 else bot_token) if bot_token else "error",
+            status="sent" if result.get("success") else "failed",
+            success=bool(result.get("success")),
+            error_message=result.get("error"),
+            peer_id=peer_id,
+            interface_name=interface_name,
+            user_id=user_id,
+            telegram_message_id=result.get("message_id"),
+        ))
+        if result.get("success"):
+            # Son bildirim zamanını güncelle
+            await db.execute(
+                update(TelegramSettings).where(TelegramSettings.id == 1).values(last_notification_at=utcnow())
+            )
+        await db.commit()
+
     @staticmethod
     async def send_message(
         db: AsyncSession,
@@ -29,7 +138,8 @@ class TelegramNotificationService:
         user_id: int = None,
     ) -> bool:
         """
-        Telegram'a mesaj gönder ve log kaydet
+        Telegram'a mesajı hemen gönder ve log kaydet
+        (Kullanıcının sonucu beklediği işlemler için; olay bildirimleri send_critical_event ile kuyruğa gider)
 
         Args:
             db: Database session
@@ -44,11 +154,10 @@ class TelegramNotificationService:
         Returns:
             bool: Başarılı ise True
         """
-        telegram_log = None
+        settings = None
         try:
             # Telegram ayarlarını al
-            result = await db.execute(select(TelegramSettings).where(TelegramSettings.id == 1))
-            settings = result.scalar_one_or_none()
+            settings = await TelegramNotificationService.get_settings(db)
 
             if not settings:
                 logger.warning("Telegram ayarları bulunamadı")
@@ -62,112 +171,49 @@ class TelegramNotificationService:
                 logger.warning("Telegram bot_token veya chat_id eksik")
                 return False
 
-            # Telegram Bot API URL'i
-            url = f"https://api.telegram.org/bot{settings.bot_token}/sendMessage"
-
-            # Mesaj payload'u
-            payload = {
-                "chat_id": settings.chat_id,
-                "text": message,
-                "parse_mode": parse_mode,
-            }
+            result = await TelegramNotificationService.deliver(settings.bot_token, settings.chat_id, message, parse_mode)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
 
-            # Async HTTP request
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        # Başarılı gönderim - log kaydet
-                        response_data = await response.json()
-                        telegram_message_id = response_data.get("result", {}).get("message_id")
-                        
-                        # Log kaydı oluştur
-                        telegram_log = TelegramNotificationLog(
-                            category=category,
-                            title=title or message[:100],
-                            message=message,
-                            chat_id=settings.chat_id,
-                            bot_token_preview=settings.bot_token[:20] + "..." if len(settings.bot_token) > 20 else settings.bot_token,
-                            status="sent",
-                            success=True,
-                            peer_id=peer_id,
-                            interface_name=interface_name,
-                            user_id=user_id,
-                            telegram_message_id=telegram_message_id,
-                        )
-                        db.add(telegram_log)
-                        
-                        # Son bildirim zamanını güncelle
-                        settings.last_notification_at = utcnow()
-                        await db.commit()
-                        
-                        logger.info(f"✅ Telegram mesajı gönderildi ve log kaydedildi: {message[:50]}...")
-                        return True
-                    else:
-                        # Başarısız gönderim - hata log kaydet
-                        error_text = await response.text()
-                        
-                        telegram_log = TelegramNotificationLog(
-                            category=category,
-                            title=title or message[:100],
-                            message=message,
-                            chat_id=settings.chat_id,
-                            bot_token_preview=settings.bot_token[:20] + "..." if len(settings.bot_token) > 20 else settings.bot_token,
-                            status="failed",
-                            success=False,
-                            error_message=f"HTTP {response.status}: {error_text}",
-                            peer_id=peer_id,
-                            interface_name=interface_name,
-                            user_id=user_id,
-                        )
-                        db.add(telegram_log)
-                        await db.commit()
-                        
-                        logger.error(f"❌ Telegram API hatası ({response.status}): {error_text}")
-                        return False
-
-        except aiohttp.ClientError as e:
-            # HTTP hatası - log kaydet
-            telegram_log = TelegramNotificationLog(
-                category=category,
-                title=title or message[:100],
-                message=message,
-                chat_id=settings.chat_id if settings else "unknown",
-                bot_token_preview="error",
-                status="failed",
-                success=False,
-                error_message=f"HTTP Error: {str(e)}",
-                peer_id=peer_id,
-                interface_name=interface_name,
-                user_id=user_id,
+        try:
+            await TelegramNotificationService.write_log(
+                db, settings, message, result,
+                category=category, title=title,
+                peer_id=peer_id, interface_name=interface_name, user_id=user_id,
             )
-            db.add(telegram_log)
-            await db.commit()
-            
-            logger.error(f"❌ Telegram HTTP hatası: {e}")
-            return False
         except Exception as e:
-            # Genel hata - log kaydet
-            if telegram_log is None:
-                telegram_log = TelegramNotificationLog(
-                    category=category,
-                    title=title or message[:100],
-                    message=message,
-                    chat_id="unknown",
-                    bot_token_preview="error",
-                    status="failed",
-                    success=False,
-                    error_message=str(e),
-                    peer_id=peer_id,
-                    interface_name=interface_name,
-                    user_id=user_id,
-                )
-                db.add(telegram_log)
-                await db.commit()
-            
-            logger.error(f"❌ Telegram mesaj gönderme hatası: {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
-            return False
+            logger.error(f"Telegram log kaydı yazılamadı: {e}")
+
+        if result.get("success"):
+            logger.info(f"✅ Telegram mesajı gönderildi ve log kaydedildi: {message[:50]}...")
+            return True
+        logger.error(f"❌ Telegram mesaj gönderme hatası: {result.get('error')}")
+        return False
+
+    @staticmethod
+    def format_event(event_type: str, title: str, description: str, details: Optional[str] = None) -> str:
+        """Kritik olay mesajını formatlar (HTML)"""
+        emoji_map = {
+            "peer_down": "🔴",
+            "peer_up": "🟢",
+            "mikrotik_disconnect": "⚠️",
+            "backup_failed": "💾",
+            "login_failed": "🔒",
+            "system_error": "❌",
+        }
+        emoji = emoji_map.get(event_type, "ℹ️")
+
+        message = f"{emoji} <b>{title}</b>\n\n"
+        message += f"{description}\n"
+
+        if details:
+            message += f"\n📋 Detaylar:\n{details}"
+
+        # Timestamp ekle (Türkiye saat dilimi - UTC+3)
+        turkey_tz = timezone(timedelta(hours=3))
+        timestamp = datetime.now(turkey_tz).strftime("%Y-%m-%d %H:%M:%S")
+        message += f"\n\n🕐 {timestamp}"
+        return message
 
     @staticmethod
     async def send_critical_event(
@@ -181,10 +227,12 @@ class TelegramNotificationService:
         user_id: int = None,
     ) -> bool:
         """
-        Kritik olay bildirimi gönder
+        Kritik olay bildirimini arka plan bildirim kuyruğuna bırakır (beklemez)
+        Ayar/kategori kontrolü, toplu birleştirme, hız sınırı ve tekrar deneme
+        bildirim dağıtıcısında yapılır
 
         Args:
-            db: Database session
+            db: Database session (geriye uyumluluk için, kullanılmaz)
             event_type: Olay tipi (peer_down, mikrotik_disconnect, vb.)
             title: Bildirim başlığı
             description: Kısa açıklama
@@ -194,58 +242,20 @@ class TelegramNotificationService:
             user_id: İlgili kullanıcı ID (opsiyonel)
 
         Returns:
-            bool: Başarılı ise True
+            bool: Kuyruğa alındıysa True
         """
-        try:
-            # Telegram ayarlarını al
-            result = await db.execute(select(TelegramSettings).where(TelegramSettings.id == 1))
-            settings = result.scalar_one_or_none()
-
-            if not settings or not settings.enabled:
-                return False
-
-            # Bildirim kategorisi aktif mi kontrol et
-            if settings.notification_categories:
-                if event_type not in settings.notification_categories:
-                    logger.debug(f"Kategori devre dışı: {event_type}")
-                    return False
-
-            # Mesajı formatla (HTML)
-            emoji_map = {
-                "peer_down": "🔴",
-                "peer_up": "🟢",
-                "mikrotik_disconnect": "⚠️",
-                "backup_failed": "💾",
-                "login_failed": "🔒",
-                "system_error": "❌",
-            }
-            emoji = emoji_map.get(event_type, "ℹ️")
-
-            message = f"{emoji} <b>{title}</b>\n\n"
-            message += f"{description}\n"
-            
-            if details:
-                message += f"\n📋 Detaylar:\n{details}"
+        # Lazy import (circular import önleme)
+        from app.services.notification_dispatcher import notification_dispatcher
 
-            # Timestamp ekle (Türkiye saat dilimi - UTC+3)
-            from datetime import datetime, timezone, timedelta
-            turkey_tz = timezone(timedelta(hours=3))
-            timestamp = datetime.now(turkey_tz).strftime("%Y-%m-%d %H:%M:%S")
-            message += f"\n\n🕐 {timestamp}"
-
-            return await TelegramNotificationService.send_message(
-                db, 
-                message,
-                category=event_type,
-                title=title,
-                peer_id=peer_id,
-                interface_name=interface,
-                user_id=user_id,
-            )
-
-        except Exception as e:
-            logger.error(f"Kritik olay bildirimi hatası: {e}")
-            return False
+        return notification_dispatcher.enqueue_telegram(
+            event_type=event_type,
+            title=title,
+            description=description,
+            details=details,
+            peer_id=peer_id,
+            interface=interface,
+            user_id=user_id,
+        )
 
     @staticmethod
     async def send_test_message(db: AsyncSession) -> bool:
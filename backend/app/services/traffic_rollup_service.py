@@ -0,0 +1,375 @@
+"""
+Trafik rollup servisi
+Ham trafik örneklerini saatlik → günlük → aylık → yıllık özet katmanlarına indirger
+ve katman başına saklama süresini (retention) uygular
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, and_
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.models.peer_traffic_log import PeerTrafficLog
+from app.models.traffic_log import TrafficLog
+from app.models.traffic_rollup import PeerTrafficRollup, TrafficRollup
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Türkiye saat dilimi (UTC+3) - bucket sınırları yerel saate göre hesaplanır
+TURKEY_TZ = timezone(timedelta(hours=3))
+
+# Ham örneklerin period_type değeri
+RAW_PERIOD = "raw"
+
+
+def _to_local(value: datetime) -> datetime:
+    """Timestamp'i Türkiye saat dilimine çevirir (SQLite timezone bilgisini saklamaz)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=TURKEY_TZ)
+    return value.astimezone(TURKEY_TZ)
+
+
+def hour_bucket(value: datetime) -> datetime:
+    """Saat başlangıcı"""
+    return _to_local(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(value: datetime) -> datetime:
+    """Gün başlangıcı"""
+    return _to_local(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_bucket(value: datetime) -> datetime:
+    """Ay başlangıcı"""
+    return _to_local(value).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def year_bucket(value: datetime) -> datetime:
+    """Yıl başlangıcı"""
+    return _to_local(value).replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+# (katman, kaynak katman, bucket fonksiyonu) - sırayla işlenir, her katman bir öncekinden beslenir
+ROLLUP_TIERS: List[Tuple[str, str, Callable[[datetime], datetime]]] = [
+    ("hourly", RAW_PERIOD, hour_bucket),
+    ("daily", "hourly", day_bucket),
+    ("monthly", "daily", month_bucket),
+    ("yearly", "monthly", year_bucket),
+]
+
+ROLLUP_TIER_NAMES = tuple(tier for tier, _, _ in ROLLUP_TIERS)
+
+
+def _retention_days() -> Dict[str, int]:
+    """
+    Rollup katmanı başına saklama süreleri (gün, 0 = süresiz)
+    Ham örnekler büyük tablolarda olduğu için log_retention tarafından parça parça silinir
+    """
+    return {
+        "hourly": settings.TRAFFIC_HOURLY_RETENTION_DAYS,
+        "daily": settings.TRAFFIC_DAILY_RETENTION_DAYS,
+    }
+
+
+class TrafficRollupEngine:
+    """
+    Trafik rollup motoru
+    - Her katman için son özet bucket'ından (watermark) itibaren kaynak katmanı okur
+    - Açık (devam eden) bucket her çalıştırmada yeniden hesaplanır, grafikler güncel kalır
+    - Yeniden hesaplanan bucket'lar tek transaction'da silinip yeniden yazılır (idempotent)
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+        # İstatistikler
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_rows: Dict[str, int] = {}
+        self.rows_pruned = 0
+
+    async def _window_start(
+        self,
+        db: AsyncSession,
+        tier: str,
+        source: str,
+        bucket: Callable[[datetime], datetime],
+        now: datetime
+    ) -> Optional[datetime]:
+        """
+        Yeniden hesaplanacak pencerenin başlangıcı
+        Son yazılmış bucket ile bir önceki bucket'tan erken olanı (kesintiden sonra boşluk kalmaz)
+        """
+        previous_bucket = bucket(bucket(now) - timedelta(microseconds=1))
+
+        latest = await db.scalar(select(func.max(TrafficRollup.timestamp)).where(TrafficRollup.tier == tier))
+        if latest is not None:
+            return min(bucket(latest), previous_bucket)
+
+        # İlk çalıştırma: kaynak katmanın en eski kaydından başla
+        if source == RAW_PERIOD:
+            earliest = await db.scalar(
+                select(func.min(TrafficLog.timestamp)).where(TrafficLog.period_type == RAW_PERIOD)
+            )
+        else:
+            earliest = await db.scalar(
+                select(func.min(TrafficRollup.timestamp)).where(TrafficRollup.tier == source)
+            )
+        return bucket(earliest) if earliest is not None else None
+
+    async def _aggregate_peers(
+        self,
+        db: AsyncSession,
+        source: str,
+        bucket: Callable[[datetime], datetime],
+        window_start: datetime
+    ) -> Dict[Tuple[str, str, datetime], Dict[str, Any]]:
+        """Kaynak katmandaki peer kayıtlarını bucket'lara toplar (satırlar stream edilir)"""
+        if source == RAW_PERIOD:
+            query = select(
+                PeerTrafficLog.timestamp,
+                PeerTrafficLog.interface_name,
+                PeerTrafficLog.peer_id,
+                PeerTrafficLog.peer_name,
+                PeerTrafficLog.public_key,
+                PeerTrafficLog.rx_bytes,
+                PeerTrafficLog.tx_bytes,
+            ).where(
+                and_(
+                    PeerTrafficLog.period_type == RAW_PERIOD,
+                    PeerTrafficLog.timestamp >= window_start
+                )
+            ).order_by(PeerTrafficLog.timestamp)
+        else:
+            query = select(
+                PeerTrafficRollup.timestamp,
+                PeerTrafficRollup.interface_name,
+                PeerTrafficRollup.peer_id,
+                PeerTrafficRollup.peer_name,
+                PeerTrafficRollup.public_key,
+                PeerTrafficRollup.rx_bytes,
+                PeerTrafficRollup.tx_bytes,
+                PeerTrafficRollup.sample_count,
+                PeerTrafficRollup.peer_key,
+            ).where(
+                and_(
+                    PeerTrafficRollup.tier == source,
+                    PeerTrafficRollup.timestamp >= window_start
+                )
+            ).order_by(PeerTrafficRollup.timestamp)
+
+        buckets: Dict[Tuple[str, str, datetime], Dict[str, Any]] = {}
+        result = await db.stream(query)
+        async for row in result:
+            if source == RAW_PERIOD:
+                peer_key = (row.public_key or "").strip() or f"id:{row.peer_id}"
+                samples = 1
+            else:
+                peer_key = row.peer_key
+                samples = row.sample_count or 0
+
+            key = (row.interface_name, peer_key, bucket(row.timestamp))
+            entry = buckets.get(key)
+            if entry is None:
+                entry = {"rx_bytes": 0, "tx_bytes": 0, "sample_count": 0}
+                buckets[key] = entry
+            entry["rx_bytes"] += row.rx_bytes or 0
+            entry["tx_bytes"] += row.tx_bytes or 0
+            entry["sample_count"] += samples
+            # Satırlar zamana göre sıralı, son görülen isim/ID kazanır
+            entry["peer_id"] = row.peer_id
+            entry["peer_name"] = row.peer_name or entry.get("peer_name")
+            entry["public_key"] = row.public_key or entry.get("public_key")
+        return buckets
+
+    async def _aggregate_totals(
+        self,
+        db: AsyncSession,
+        source: str,
+        bucket: Callable[[datetime], datetime],
+        window_start: datetime
+    ) -> Dict[datetime, Dict[str, Any]]:
+        """Kaynak katmandaki sistem geneli kayıtları bucket'lara toplar"""
+        if source == RAW_PERIOD:
+            query = select(
+                TrafficLog.timestamp,
+                TrafficLog.total_rx_bytes,
+                TrafficLog.total_tx_bytes,
+                TrafficLog.interface_count,
+                TrafficLog.peer_count,
+                TrafficLog.active_peer_count,
+            ).where(
+                and_(
+                    TrafficLog.period_type == RAW_PERIOD,
+                    TrafficLog.timestamp >= window_start
+                )
+            )
+        else:
+            query = select(
+                TrafficRollup.timestamp,
+                TrafficRollup.total_rx_bytes,
+                TrafficRollup.total_tx_bytes,
+                TrafficRollup.interface_count,
+                TrafficRollup.peer_count,
+                TrafficRollup.active_peer_count,
+                TrafficRollup.sample_count,
+            ).where(
+                and_(
+                    TrafficRollup.tier == source,
+                    TrafficRollup.timestamp >= window_start
+                )
+            )
+
+        buckets: Dict[datetime, Dict[str, Any]] = {}
+        result = await db.execute(query)
+        for row in result.all():
+            key = bucket(row.timestamp)
+            entry = buckets.setdefault(key, {
+                "total_rx_bytes": 0,
+                "total_tx_bytes": 0,
+                "interface_count": 0,
+                "peer_count": 0,
+                "active_peer_count": 0,
+                "sample_count": 0,
+            })
+            entry["total_rx_bytes"] += row.total_rx_bytes or 0
+            entry["total_tx_bytes"] += row.total_tx_bytes or 0
+            entry["interface_count"] = max(entry["interface_count"], row.interface_count or 0)
+            entry["peer_count"] = max(entry["peer_count"], row.peer_count or 0)
+            entry["active_peer_count"] = max(entry["active_peer_count"], row.active_peer_count or 0)
+            entry["sample_count"] += 1 if source == RAW_PERIOD else (row.sample_count or 0)
+        return buckets
+
+    async def _rollup_tier(
+        self,
+        db: AsyncSession,
+        tier: str,
+        source: str,
+        bucket: Callable[[datetime], datetime],
+        now: datetime
+    ) -> int:
+        """Tek bir katmanı yeniden hesaplar, yazılan peer satırı sayısını döner"""
+        window_start = await self._window_start(db, tier, source, bucket, now)
+        if window_start is None:
+            return 0
+
+        peer_buckets = await self._aggregate_peers(db, source, bucket, window_start)
+        total_buckets = await self._aggregate_totals(db, source, bucket, window_start)
+
+        await db.execute(
+            delete(PeerTrafficRollup).where(
+                and_(PeerTrafficRollup.tier == tier, PeerTrafficRollup.timestamp >= window_start)
+            )
+        )
+        await db.execute(
+            delete(TrafficRollup).where(
+                and_(TrafficRollup.tier == tier, TrafficRollup.timestamp >= window_start)
+            )
+        )
+
+        db.add_all([
+            PeerTrafficRollup(
+                tier=tier,
+                timestamp=bucket_start,
+                interface_name=interface_name,
+                peer_key=peer_key,
+                peer_id=entry["peer_id"],
+                peer_name=entry["peer_name"],
+                public_key=entry["public_key"],
+                rx_bytes=entry["rx_bytes"],
+                tx_bytes=entry["tx_bytes"],
+                rx_mb=entry["rx_bytes"] / (1024 * 1024),
+                tx_mb=entry["tx_bytes"] / (1024 * 1024),
+                sample_count=entry["sample_count"]
+            )
+            for (interface_name, peer_key, bucket_start), entry in peer_buckets.items()
+        ])
+        db.add_all([
+            TrafficRollup(
+                tier=tier,
+                timestamp=bucket_start,
+                total_rx_bytes=entry["total_rx_bytes"],
+                total_tx_bytes=entry["total_tx_bytes"],
+                total_rx_mb=entry["total_rx_bytes"] / (1024 * 1024),
+                total_tx_mb=entry["total_tx_bytes"] / (1024 * 1024),
+                interface_count=entry["interface_count"],
+                peer_count=entry["peer_count"],
+                active_peer_count=entry["active_peer_count"],
+                sample_count=entry["sample_count"]
+            )
+            for bucket_start, entry in total_buckets.items()
+        ])
+        await db.commit()
+        return len(peer_buckets)
+
+    async def _apply_retention(self, db: AsyncSession, now: datetime) -> int:
+        """Saklama süresi dolan özetleri siler"""
+        pruned = 0
+        for tier, days in _retention_days().items():
+            if not days or days <= 0:
+                continue
+            cutoff = now - timedelta(days=days)
+            result = await db.execute(
+                delete(PeerTrafficRollup).where(
+                    and_(PeerTrafficRollup.tier == tier, PeerTrafficRollup.timestamp < cutoff)
+                )
+            )
+            pruned += result.rowcount or 0
+            await db.execute(
+                delete(TrafficRollup).where(
+                    and_(TrafficRollup.tier == tier, TrafficRollup.timestamp < cutoff)
+                )
+            )
+        await db.commit()
+        return pruned
+
+    async def run(self, db: Optional[AsyncSession] = None) -> Dict[str, int]:
+        """
+        Tüm katmanları sırayla günceller ve retention uygular
+
+        Returns:
+            {katman: yazılan peer özet satırı sayısı}
+        """
+        if db is None:
+            async with AsyncSessionLocal() as own_db:
+                return await self.run(own_db)
+
+        async with self._lock:
+            now = datetime.now(TURKEY_TZ)
+            written: Dict[str, int] = {}
+            for tier, source, bucket in ROLLUP_TIERS:
+                try:
+                    written[tier] = await self._rollup_tier(db, tier, source, bucket, now)
+                except Exception as e:
+                    logger.error(f"Trafik rollup hatası ({tier}): {e}")
+                    await db.rollback()
+                    # Üst katmanlar bu katmandan beslendiği için devam etme
+                    break
+
+            try:
+                self.rows_pruned += await self._apply_retention(db, now)
+            except Exception as e:
+                logger.error(f"Trafik retention hatası: {e}")
+                await db.rollback()
+
+            self.runs += 1
+            self.last_run_at = now
+            self.last_run_rows = written
+            logger.debug(f"Trafik rollup tamamlandı: {written}")
+            return written
+
+    def stats(self) -> Dict[str, Any]:
+        """Rollup istatistiklerini döner"""
+        return {
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_rows": self.last_run_rows,
+            "rows_pruned": self.rows_pruned,
+            "retention_days": _retention_days(),
+        }
+
+
+# Global trafik rollup motoru
+traffic_rollup_engine = TrafficRollupEngine()
@@ -0,0 +1,307 @@
+"""
+Trafik sayaç örnekleyici
+MikroTik'in kümülatif rx/tx sayaçlarından periyot kullanımını (delta) ve hızı hesaplar
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
+from typing import Dict, List, Optional, Any, Tuple
+from app.database.database import AsyncSessionLocal
+from app.mikrotik.connection import mikrotik_conn
+from app.models.peer_traffic_counter import PeerTrafficCounter
+from app.models.peer_traffic_log import PeerTrafficLog
+from app.models.traffic_log import TrafficLog
+from app.services.peer_snapshot_store import peer_snapshot_store
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _peer_counter_key(peer: Dict[str, Any]) -> Optional[str]:
+    """
+    Peer için kalıcı sayaç anahtarı
+    Public key peer silinip yeniden eklense de aynı kalır; yoksa MikroTik ID kullanılır
+    """
+    public_key = peer.get('public-key') or peer.get('public_key')
+    if public_key:
+        return str(public_key).strip()
+    peer_id = peer.get('id') or peer.get('.id')
+    return f"id:{peer_id}" if peer_id else None
+
+
+def compute_counter_delta(
+    previous: Optional[int],
+    current: int,
+    peer_changed: bool = False
+) -> int:
+    """
+    Kümülatif sayaçtan iki örnek arası farkı hesaplar
+
+    - Önceki örnek yoksa veya peer yeniden eklendiyse sayaç 0'dan başlamıştır, fark = mevcut değer
+    - Sayaç geriye gittiyse (router reboot, peer yeniden oluşturuldu) sıfırlanmıştır, fark = mevcut değer
+    """
+    if previous is None or peer_changed or current < previous:
+        return current
+    return current - previous
+
+
+class TrafficCounterSampler:
+    """
+    Periyot bazlı trafik sayaç örnekleyici
+    - Her periyot tipi için peer başına son ham sayacı bellekte tutar
+      (ilk kullanımda peer_traffic_counters tablosundan tek sorgu ile yüklenir)
+    - Her örneklemede peer başına delta ve hız (byte/s) hesaplar
+    - Peer trafik kayıtları, toplam trafik kaydı ve sayaç güncellemeleri tek transaction'da yazılır
+    """
+
+    def __init__(self):
+        # period_type -> {(interface_name, peer_key): {"id", "peer_id", "rx_bytes", "tx_bytes", "sampled_at"}}
+        self._baselines: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        # period_type -> {(interface_name, peer_key): {"rx_rate": .., "tx_rate": ..}}
+        self.last_rates: Dict[str, Dict[Tuple[str, str], Dict[str, float]]] = {}
+        self._lock = asyncio.Lock()
+
+        # İstatistikler
+        self.samples = 0
+        self.counter_resets = 0
+
+    async def _load_baselines(self, db: AsyncSession, period_type: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Periyodun son sayaçlarını veritabanından yükler (tek sorgu)"""
+        baselines = self._baselines.get(period_type)
+        if baselines is None:
+            result = await db.execute(
+                select(PeerTrafficCounter).where(PeerTrafficCounter.period_type == period_type)
+            )
+            baselines = {
+                (counter.interface_name, counter.peer_key): {
+                    "id": counter.id,
+                    "peer_id": counter.peer_id,
+                    "rx_bytes": counter.rx_bytes or 0,
+                    "tx_bytes": counter.tx_bytes or 0,
+                    "sampled_at": counter.sampled_at,
+                }
+                for counter in result.scalars().all()
+            }
+            self._baselines[period_type] = baselines
+            logger.debug(f"Trafik sayaçları yüklendi: {period_type} - {len(baselines)} peer")
+        return baselines
+
+    async def _collect_peers(self, db: AsyncSession) -> Tuple[List[Tuple[str, List[Dict[str, Any]]]], int]:
+        """
+        Tüm interface'lerin peer listelerini toplar (peer snapshot deposundan)
+
+        Returns:
+            ([(interface_name, peers)], interface_count)
+        """
+        interfaces = await mikrotik_conn.get_wireguard_interfaces()
+        collected = []
+        for iface in interfaces:
+            interface_name = iface.get('name') or iface.get('.id')
+            if not interface_name:
+                continue
+            try:
+                peers = await peer_snapshot_store.get_peers(db, interface_name)
+                collected.append((interface_name, peers))
+            except Exception as e:
+                logger.error(f"Peer trafik verisi alınamadı ({interface_name}): {e}")
+        return collected, len(interfaces)
+
+    async def sample(self, period_type: str, db: Optional[AsyncSession] = None) -> TrafficLog:
+        """
+        Bir periyot örneği alır ve kullanımı kaydeder
+
+        Args:
+            period_type: Periyot tipi ('hourly', 'daily', 'monthly', 'yearly')
+            db: Veritabanı session'ı (verilmezse yeni session açılır)
+
+        Returns:
+            Oluşturulan TrafficLog kaydı
+        """
+        if db is None:
+            async with AsyncSessionLocal() as own_db:
+                return await self.sample(period_type, own_db)
+
+        async with self._lock:
+            baselines = await self._load_baselines(db, period_type)
+            # Periyodun hiç sayacı yoksa (ilk çalıştırma) bu örnek sadece başlangıç noktasıdır
+            primed = bool(baselines)
+            collected, interface_count = await self._collect_peers(db)
+
+            turkey_tz = timezone(timedelta(hours=3))
+            current_time = datetime.now(turkey_tz)
+
+            traffic_rows: List[PeerTrafficLog] = []
+            new_counters: List[PeerTrafficCounter] = []
+            counter_updates: List[Dict[str, Any]] = []
+            updated_keys: List[Tuple[str, str]] = []
+            seen_keys = set()
+            rates: Dict[Tuple[str, str], Dict[str, float]] = {}
+            total_rx_bytes = 0
+            total_tx_bytes = 0
+            peer_count = 0
+            active_peer_count = 0
+
+            for interface_name, peers in collected:
+                peer_count += len(peers)
+                for peer in peers:
+                    # Aktif peer sayısını kontrol et
+                    disabled = peer.get('disabled', 'true')
+                    if disabled == 'false' or disabled is False:
+                        active_peer_count += 1
+
+                    key = _peer_counter_key(peer)
+                    if not key or (interface_name, key) in seen_keys:
+                        continue
+                    seen_keys.add((interface_name, key))
+
+                    peer_id = peer.get('id') or peer.get('.id')
+                    peer_id = str(peer_id) if peer_id else None
+                    rx_bytes = int(peer.get('rx-bytes') or peer.get('rx') or 0)
+                    tx_bytes = int(peer.get('tx-bytes') or peer.get('tx') or 0)
+
+                    previous = baselines.get((interface_name, key))
+                    if previous is None:
+                        if primed:
+                            # Son örnekten sonra eklenen peer - sayaç 0'dan başladı
+                            rx_delta = compute_counter_delta(None, rx_bytes)
+                            tx_delta = compute_counter_delta(None, tx_bytes)
+                        else:
+                            rx_delta = tx_delta = None
+                        counter = PeerTrafficCounter(
+                            period_type=period_type,
+                            interface_name=interface_name,
+                            peer_key=key,
+                            peer_id=peer_id,
+                            rx_bytes=rx_bytes,
+                            tx_bytes=tx_bytes,
+                            sampled_at=current_time
+                        )
+                        new_counters.append(counter)
+                    else:
+                        peer_changed = bool(peer_id and previous["peer_id"] and peer_id != previous["peer_id"])
+                        if peer_changed or rx_bytes < previous["rx_bytes"] or tx_bytes < previous["tx_bytes"]:
+                            self.counter_resets += 1
+                            logger.debug(f"Trafik sayacı sıfırlanmış: {key[:20]} ({interface_name})")
+                        rx_delta = compute_counter_delta(previous["rx_bytes"], rx_bytes, peer_changed)
+                        tx_delta = compute_counter_delta(previous["tx_bytes"], tx_bytes, peer_changed)
+
+                        previous_time = previous["sampled_at"]
+                        if previous_time is not None:
+                            if previous_time.tzinfo is None:
+                                previous_time = previous_time.replace(tzinfo=turkey_tz)
+                            elapsed = (current_time - previous_time).total_seconds()
+                            if elapsed > 0:
+                                rates[(interface_name, key)] = {
+                                    "rx_rate": rx_delta / elapsed,
+                                    "tx_rate": tx_delta / elapsed,
+                                }
+
+                        updated_keys.append((interface_name, key))
+                        counter_updates.append({
+                            "id": previous["id"],
+                            "peer_id": peer_id,
+                            "rx_bytes": rx_bytes,
+                            "tx_bytes": tx_bytes,
+                            "sampled_at": current_time,
+                        })
+
+                    if rx_delta is None:
+                        continue
+
+                    total_rx_bytes += rx_delta
+                    total_tx_bytes += tx_delta
+                    if peer_id:
+                        traffic_rows.append(PeerTrafficLog(
+                            timestamp=current_time,
+                            peer_id=peer_id,
+                            interface_name=interface_name,
+                            peer_name=peer.get('comment') or peer.get('name'),
+                            public_key=peer.get('public-key'),
+                            period_type=period_type,
+                            rx_bytes=rx_delta,
+                            tx_bytes=tx_delta,
+                            rx_mb=rx_delta / (1024 * 1024),
+                            tx_mb=tx_delta / (1024 * 1024)
+                        ))
+
+            # Peer listesi alınabilen interface'lerde artık bulunmayan peer'ların sayaçlarını temizle
+            sampled_interfaces = {interface_name for interface_name, _ in collected}
+            stale_keys = [
+                key for key in baselines
+                if key[0] in sampled_interfaces and key not in seen_keys
+            ]
+
+            traffic_log = TrafficLog(
+                timestamp=current_time,
+                period_type=period_type,
+                total_rx_bytes=total_rx_bytes,
+                total_tx_bytes=total_tx_bytes,
+                total_rx_mb=total_rx_bytes / (1024 * 1024),
+                total_tx_mb=total_tx_bytes / (1024 * 1024),
+                interface_count=interface_count,
+                peer_count=peer_count,
+                active_peer_count=active_peer_count,
+                notes=None if primed else "Başlangıç örneği (sayaçlar kaydedildi)"
+            )
+
+            try:
+                db.add_all(traffic_rows)
+                db.add_all(new_counters)
+                db.add(traffic_log)
+                if counter_updates:
+                    # Primary key üzerinden toplu UPDATE (executemany)
+                    await db.execute(update(PeerTrafficCounter), counter_updates)
+                stale_ids = [baselines[key]["id"] for key in stale_keys]
+                if stale_ids:
+                    await db.execute(delete(PeerTrafficCounter).where(PeerTrafficCounter.id.in_(stale_ids)))
+                await db.commit()
+            except Exception as e:
+                logger.error(f"Trafik örneği kaydedilemedi ({period_type}): {e}")
+                await db.rollback()
+                # Bellekteki sayaçlar DB ile uyumsuz kalmasın, bir sonraki örnekte yeniden yüklensin
+                self._baselines.pop(period_type, None)
+                raise
+
+            for key, update_values in zip(updated_keys, counter_updates):
+                baselines[key].update(update_values)
+            for counter in new_counters:
+                baselines[(counter.interface_name, counter.peer_key)] = {
+                    "id": counter.id,
+                    "peer_id": counter.peer_id,
+                    "rx_bytes": counter.rx_bytes,
+                    "tx_bytes": counter.tx_bytes,
+                    "sampled_at": counter.sampled_at,
+                }
+            for key in stale_keys:
+                baselines.pop(key, None)
+            self.last_rates[period_type] = rates
+            self.samples += 1
+
+        logger.info(f"Trafik kaydı oluşturuldu: {period_type} - RX: {total_rx_bytes / (1024*1024):.2f} MB, TX: {total_tx_bytes / (1024*1024):.2f} MB ({len(traffic_rows)} peer)")
+        return traffic_log
+
+    def get_peer_rates(self, period_type: str, interface_name: str) -> Dict[str, Dict[str, float]]:
+        """
+        Son periyot örneğindeki peer ortalama hızlarını döner (byte/s)
+
+        Returns:
+            {peer_key: {"rx_rate": .., "tx_rate": ..}}
+        """
+        return {
+            key: rate
+            for (iface, key), rate in self.last_rates.get(period_type, {}).items()
+            if iface == interface_name
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Örnekleyici istatistiklerini döner"""
+        return {
+            "samples": self.samples,
+            "counter_resets": self.counter_resets,
+            "tracked_counters": {period: len(counters) for period, counters in self._baselines.items()},
+        }
+
+
+# Global trafik sayaç örnekleyici
+traffic_sampler = TrafficCounterSampler()
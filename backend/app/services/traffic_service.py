@@ -6,6 +6,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, desc
 from typing import List, Optional, Dict, Any
 from app.models.traffic_log import TrafficLog
+from app.models.traffic_rollup import TrafficRollup
+from app.services.traffic_rollup_service import ROLLUP_TIER_NAMES
 from datetime import datetime, timedelta, timezone
 import logging
 
@@ -77,9 +79,10 @@ async def get_traffic_logs(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 1000
-) -> List[TrafficLog]:
+) -> List[Any]:
     """
     Trafik log kayıtlarını getirir
+    Rollup katmanları (hourly, daily, monthly, yearly) için TrafficRollup kayıtları döner
     
     Args:
         db: Veritabanı session'ı
@@ -92,14 +95,20 @@ async def get_traffic_logs(
         Trafik log kayıtları listesi
     """
     try:
-        query = select(TrafficLog).where(TrafficLog.period_type == period_type)
+        # Saatlik/günlük/aylık/yıllık veriler rollup katmanından okunur, diğerleri ham tablodan
+        if period_type in ROLLUP_TIER_NAMES:
+            model = TrafficRollup
+            query = select(TrafficRollup).where(TrafficRollup.tier == period_type)
+        else:
+            model = TrafficLog
+            query = select(TrafficLog).where(TrafficLog.period_type == period_type)
         
         if start_date:
-            query = query.where(TrafficLog.timestamp >= start_date)
+            query = query.where(model.timestamp >= start_date)
         if end_date:
-            query = query.where(TrafficLog.timestamp <= end_date)
+            query = query.where(model.timestamp <= end_date)
         
-        query = query.order_by(desc(TrafficLog.timestamp)).limit(limit)
+        query = query.order_by(desc(model.timestamp)).limit(limit)
         
         result = await db.execute(query)
         return result.scalars().all()
@@ -127,20 +136,27 @@ async def get_traffic_summary(
         Trafik özet istatistikleri
     """
     try:
+        if period_type in ROLLUP_TIER_NAMES:
+            model = TrafficRollup
+            period_filter = TrafficRollup.tier == period_type
+        else:
+            model = TrafficLog
+            period_filter = TrafficLog.period_type == period_type
+        
         query = select(
-            func.sum(TrafficLog.total_rx_bytes).label('total_rx'),
-            func.sum(TrafficLog.total_tx_bytes).label('total_tx'),
-            func.avg(TrafficLog.total_rx_bytes).label('avg_rx'),
-            func.avg(TrafficLog.total_tx_bytes).label('avg_tx'),
-            func.max(TrafficLog.total_rx_bytes).label('max_rx'),
-            func.max(TrafficLog.total_tx_bytes).label('max_tx'),
-            func.count(TrafficLog.id).label('record_count')
-        ).where(TrafficLog.period_type == period_type)
+            func.sum(model.total_rx_bytes).label('total_rx'),
+            func.sum(model.total_tx_bytes).label('total_tx'),
+            func.avg(model.total_rx_bytes).label('avg_rx'),
+            func.avg(model.total_tx_bytes).label('avg_tx'),
+            func.max(model.total_rx_bytes).label('max_rx'),
+            func.max(model.total_tx_bytes).label('max_tx'),
+            func.count(model.id).label('record_count')
+        ).where(period_filter)
         
         if start_date:
-            query = query.where(TrafficLog.timestamp >= start_date)
+            query = query.where(model.timestamp >= start_date)
         if end_date:
-            query = query.where(TrafficLog.timestamp <= end_date)
+            query = query.where(model.timestamp <= end_date)
         
         result = await db.execute(query)
         row = result.first()
@@ -0,0 +1,163 @@
+"""
+WireGuard anahtar havuzu
+Anahtar çiftleri `wg genkey`/`wg pubkey` süreçleri başlatılmadan, cryptography kütüphanesiyle
+(X25519 / Curve25519) uygulama içinde üretilir. Önceden üretilmiş çiftler bellekte tutulur;
+havuz eşik altına düştüğünde arka plan görevi tamamlar, böylece /generate-keys ve toplu
+oluşturma anahtarı beklemeden alır.
+"""
+import asyncio
+import base64
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def generate_keypair() -> Tuple[str, str]:
+    """
+    WireGuard özel ve genel anahtar çifti üretir (wg genkey | wg pubkey ile aynı biçim)
+
+    Returns:
+        (private_key, public_key) - 32 byte, base64
+    """
+    private_key = X25519PrivateKey.generate()
+    return (
+        base64.b64encode(private_key.private_bytes_raw()).decode('ascii'),
+        base64.b64encode(private_key.public_key().public_bytes_raw()).decode('ascii'),
+    )
+
+
+def public_key_from_private(private_key: str) -> str:
+    """
+    Base64 özel anahtardan genel anahtarı türetir (wg pubkey karşılığı)
+    Geçersiz anahtarda ValueError verir
+    """
+    raw = base64.b64decode(private_key.strip(), validate=True)
+    if len(raw) != 32:
+        raise ValueError("WireGuard özel anahtarı 32 byte olmalı")
+    public_key = X25519PrivateKey.from_private_bytes(raw).public_key()
+    return base64.b64encode(public_key.public_bytes_raw()).decode('ascii')
+
+
+def _generate_batch(count: int) -> List[Tuple[str, str]]:
+    return [generate_keypair() for _ in range(count)]
+
+
+class WireGuardKeyPool:
+    """
+    Önceden üretilmiş anahtar çifti havuzu
+    - take() havuzdan bir çift alır; havuz boşsa çifti o anda üretir (istek hiç başarısız olmaz)
+    - Havuz low_watermark altına düşünce arka plan görevi size'a kadar parça parça doldurur
+    - Her çift yalnızca bir kez verilir
+    """
+
+    def __init__(self, size: int = 256, low_watermark: int = 64, refill_batch: int = 32):
+        self.size = max(0, size)
+        self.low_watermark = min(max(0, low_watermark), self.size)
+        self.refill_batch = max(1, refill_batch)
+        self._keys: Deque[Tuple[str, str]] = deque()
+        self._refill_needed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # İstatistikler
+        self.generated = 0
+        self.served = 0
+        self.misses = 0
+        self.refills = 0
+
+    # ===== Anahtar alma =====
+
+    def take(self) -> Tuple[str, str]:
+        """Havuzdan bir anahtar çifti alır (boşsa o anda üretir)"""
+        self.served += 1
+        try:
+            pair = self._keys.popleft()
+        except IndexError:
+            self.misses += 1
+            self.generated += 1
+            pair = generate_keypair()
+        self._check_level()
+        return pair
+
+    async def take_many(self, count: int) -> List[Tuple[str, str]]:
+        """count adet anahtar çifti alır; havuzda olmayanlar thread'de üretilir"""
+        if count <= 0:
+            return []
+        pairs = []
+        while self._keys and len(pairs) < count:
+            pairs.append(self._keys.popleft())
+        missing = count - len(pairs)
+        if missing:
+            self.misses += missing
+            self.generated += missing
+            pairs.extend(await asyncio.to_thread(_generate_batch, missing))
+        self.served += count
+        self._check_level()
+        return pairs
+
+    def _check_level(self):
+        if len(self._keys) < self.low_watermark:
+            self._refill_needed.set()
+
+    # ===== Doldurma =====
+
+    async def _loop(self):
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+            try:
+                while len(self._keys) < self.size:
+                    count = min(self.refill_batch, self.size - len(self._keys))
+                    self._keys.extend(await asyncio.to_thread(_generate_batch, count))
+                    self.generated += count
+                self.refills += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Anahtar havuzu doldurulamadı: {e}")
+                await asyncio.sleep(5)
+                self._refill_needed.set()
+
+    def start(self):
+        """Doldurma görevini başlatır ve havuzu ilk kez doldurur"""
+        if self.size <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        self._refill_needed.set()
+
+    async def stop(self):
+        """Doldurma görevini durdurur ve havuzdaki anahtarları bellekten atar"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Havuz doluluğu ve istatistiklerini döner"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "size": self.size,
+            "available": len(self._keys),
+            "low_watermark": self.low_watermark,
+            "generated": self.generated,
+            "served": self.served,
+            "misses": self.misses,
+            "refills": self.refills,
+        }
+
+
+# Global anahtar havuzu
+wireguard_key_pool = WireGuardKeyPool(
+    size=settings.WG_KEY_POOL_SIZE,
+    low_watermark=settings.WG_KEY_POOL_LOW_WATERMARK,
+)
@@ -3,19 +3,39 @@ Cache yardımcı modülü
 MikroTik API çağrılarını cache'ler
 """
 import time
-from typing import Optional, Dict, Any, Callable
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, List, Set, Tuple
 import logging
 from functools import wraps
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Prefix indeksinde anahtar segment ayracı (örn. "wireguard_peers:wg0")
+KEY_SEPARATOR = ":"
+
+
+def _key_prefixes(key: str) -> List[str]:
+    """
+    Anahtarın segment önekleri
+    "wireguard_peers:wg0:x" -> ["wireguard_peers", "wireguard_peers:wg0", "wireguard_peers:wg0:x"]
+    """
+    parts = key.split(KEY_SEPARATOR)
+    return [KEY_SEPARATOR.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
 
 class SimpleCache:
     """
     Basit in-memory cache sınıfı
     MikroTik API çağrılarını kısa süreli cache'ler
     Thread-safe ve async-safe
+
+    - LRU: OrderedDict ile get/set/eviction O(1)
+    - TTL: süre dolumları min-heap'te tutulur, set sırasında süresi dolanlar topluca temizlenir
+    - Pattern invalidation: anahtarlar ':' segment önekleriyle indekslenir,
+      önek pattern'leri tüm anahtarları taramadan silinir
     """
 
     def __init__(self, default_ttl: int = 55, max_size: int = 1000):
@@ -26,10 +46,48 @@ class SimpleCache:
             default_ttl: Varsayılan cache süresi (saniye) - 55s (daha az API çağrısı için)
             max_size: Maksimum cache boyutu (LRU eviction için)
         """
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        # key -> (value, expires_at); sıra = LRU sırası (baş en eski)
+        self._cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
         self.default_ttl = default_ttl
         self.max_size = max_size
-        self._access_times: Dict[str, float] = {}  # LRU tracking
+        # (expires_at, key) - güncellenen anahtarların eski kayıtları purge sırasında atlanır
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # segment öneki -> anahtarlar
+        self._prefix_index: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+        # İstatistikler
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key: str) -> None:
+        """Anahtarı cache'den ve prefix indeksinden siler (kilit altında çağrılır)"""
+        if self._cache.pop(key, None) is None:
+            return
+        for prefix in _key_prefixes(key):
+            keys = self._prefix_index.get(prefix)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._prefix_index[prefix]
+
+    def _purge_expired(self, now: float) -> None:
+        """Süresi dolmuş kayıtları heap sırasıyla siler (kilit altında çağrılır)"""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            # Anahtar sonradan yeni TTL ile yazıldıysa bu heap kaydı eskidir
+            if entry is not None and entry[1] == expires_at:
+                self._remove(key)
+                self.expirations += 1
+
+        # Sık güncellenen anahtarlar heap'te eski kayıt biriktirir, gerekirse yeniden kur
+        if len(heap) > 2 * len(self._cache) + 64:
+            self._expiry_heap = [(expires_at, key) for key, (_, expires_at) in self._cache.items()]
+            heapq.heapify(self._expiry_heap)
 
     def get(self, key: str) -> Optional[Any]:
         """
@@ -42,21 +100,25 @@ class SimpleCache:
         Returns:
             Cache'deki değer veya None
         """
-        if key not in self._cache:
-            return None
-
-        entry = self._cache[key]
-        # TTL kontrolü
-        if time.time() > entry['expires_at']:
-            # Süresi dolmuş, cache'den sil
-            del self._cache[key]
-            if key in self._access_times:
-                del self._access_times[key]
-            return None
-
-        # LRU tracking - En son erişim zamanını güncelle
-        self._access_times[key] = time.time()
-        return entry['value']
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            # TTL kontrolü
+            if time.monotonic() >= expires_at:
+                # Süresi dolmuş, cache'den sil (heap kaydı purge sırasında atlanır)
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # LRU tracking - en son kullanılan sona taşınır
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
 
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """
@@ -69,23 +131,27 @@ class SimpleCache:
             ttl: Cache süresi (saniye), None ise default_ttl kullanılır
         """
         ttl = ttl or self.default_ttl
-        expires_at = time.time() + ttl
-
-        # Cache boyut kontrolü (LRU eviction)
-        if len(self._cache) >= self.max_size and key not in self._cache:
-            # En az kullanılan (LRU) anahtarı bul ve sil
-            if self._access_times:
-                lru_key = min(self._access_times, key=self._access_times.get)
-                del self._cache[lru_key]
-                del self._access_times[lru_key]
-                logger.debug(f"LRU eviction: {lru_key}")
-
-        self._cache[key] = {
-            'value': value,
-            'expires_at': expires_at
-        }
-        self._access_times[key] = time.time()
-    
+        now = time.monotonic()
+        expires_at = now + ttl
+
+        with self._lock:
+            self._purge_expired(now)
+
+            if key in self._cache:
+                self._cache.move_to_end(key)
+            else:
+                # Cache boyut kontrolü (LRU eviction) - en eski anahtar OrderedDict'in başında
+                while len(self._cache) >= self.max_size:
+                    lru_key = next(iter(self._cache))
+                    self._remove(lru_key)
+                    self.evictions += 1
+                    logger.debug(f"LRU eviction: {lru_key}")
+                for prefix in _key_prefixes(key):
+                    self._prefix_index.setdefault(prefix, set()).add(key)
+
+            self._cache[key] = (value, expires_at)
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+
     def clear(self, key: Optional[str] = None) -> None:
         """
         Cache'i temizle
@@ -93,32 +159,51 @@ class SimpleCache:
         Args:
             key: Belirli bir anahtarı temizle, None ise tüm cache'i temizle
         """
-        if key:
-            if key in self._cache:
-                del self._cache[key]
-            if key in self._access_times:
-                del self._access_times[key]
-        else:
-            self._cache.clear()
-            self._access_times.clear()
-    
+        with self._lock:
+            if key:
+                self._remove(key)
+            else:
+                self._cache.clear()
+                self._expiry_heap.clear()
+                self._prefix_index.clear()
+
     def invalidate_pattern(self, pattern: str) -> None:
         """
         Belirli bir pattern'e uyan cache anahtarlarını temizle
 
+        Pattern bir segment önekiyse (örn. "wireguard_peers:wg0") prefix indeksi kullanılır,
+        sondaki '*' veya ':' yok sayılır. Aksi halde basit string içerme kontrolüne düşülür.
+
         Args:
-            pattern: Temizlenecek anahtar pattern'i (basit string içerme kontrolü)
+            pattern: Temizlenecek anahtar pattern'i
         """
-        keys_to_delete = [k for k in self._cache.keys() if pattern in k]
-        for key in keys_to_delete:
-            del self._cache[key]
-            if key in self._access_times:
-                del self._access_times[key]
-    
+        with self._lock:
+            prefix = pattern.rstrip("*").rstrip(KEY_SEPARATOR)
+            indexed = self._prefix_index.get(prefix)
+            if indexed is not None:
+                keys_to_delete = list(indexed)
+            else:
+                keys_to_delete = [k for k in self._cache.keys() if pattern in k]
+            for key in keys_to_delete:
+                self._remove(key)
+
     def size(self) -> int:
         """Cache'deki kayıt sayısını döndür"""
         return len(self._cache)
 
+    def stats(self) -> Dict[str, Any]:
+        """Cache istatistiklerini döndür"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
 
 # Global cache instance
 # MikroTik API çağrıları için 30 saniyelik cache (performans için artırıldı)
@@ -128,36 +213,62 @@ mikrotik_cache = SimpleCache(default_ttl=30)
 def cached(ttl: int = 10, key_prefix: str = ""):
     """
     Fonksiyon cache decorator'ı
-    
+    Aynı anahtar için eşzamanlı cache miss'ler tek çağrıda birleşir (single-flight):
+    ilk istek fonksiyonu çalıştırır, diğerleri aynı sonucu bekler
+
     Args:
         ttl: Cache süresi (saniye)
         key_prefix: Cache anahtarı öneki
-        
+
     Usage:
         @cached(ttl=10, key_prefix="interfaces")
         async def get_interfaces():
             ...
     """
     def decorator(func: Callable):
+        # Devam eden çağrılar: cache_key -> Future
+        in_flight: Dict[str, asyncio.Future] = {}
+
+        @wraps(func)
         async def wrapper(*args, **kwargs):
             # Cache anahtarı oluştur
             cache_key = f"{key_prefix}:{func.__name__}:{str(args)}:{str(sorted(kwargs.items()))}"
-            
+
             # Cache'den kontrol et
             cached_value = mikrotik_cache.get(cache_key)
             if cached_value is not None:
                 logger.debug(f"Cache hit: {cache_key}")
                 return cached_value
-            
+
+            # Aynı anahtar için çalışan bir çağrı varsa onun sonucunu bekle
+            pending = in_flight.get(cache_key)
+            if pending is not None:
+                logger.debug(f"Cache miss (bekleyen çağrıya katıldı): {cache_key}")
+                return await asyncio.shield(pending)
+
             # Cache'de yok, fonksiyonu çalıştır
             logger.debug(f"Cache miss: {cache_key}")
-            result = await func(*args, **kwargs)
-            
+            future = asyncio.get_running_loop().create_future()
+            in_flight[cache_key] = future
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                # Bekleyen yoksa "exception was never retrieved" uyarısını önle
+                future.exception()
+                raise
+            except BaseException:
+                # İptal edilen çağrı bekleyenleri de iptal eder
+                future.cancel()
+                raise
+            finally:
+                in_flight.pop(cache_key, None)
+
             # Sonucu cache'le
             mikrotik_cache.set(cache_key, result, ttl=ttl)
-            
+            future.set_result(result)
+
             return result
-        
+
         return wrapper
     return decorator
-
@@ -4,9 +4,10 @@ Peer durumlarını otomatik olarak izler ve Telegram bildirimleri gönderir
 """
 import asyncio
 import logging
+import time
 from app.database.database import AsyncSessionLocal
 from app.mikrotik.connection import mikrotik_conn
-from app.services.peer_handshake_service import track_peer_status
+from app.services.peer_snapshot_store import peer_snapshot_store
 
 logger = logging.getLogger(__name__)
 
@@ -32,39 +33,36 @@ async def monitor_all_peers():
             
             total_peers_checked = 0
             
-            for interface in interfaces:
-                interface_name = interface.get('name') or interface.get('.id')
-                if not interface_name:
-                    continue
-                
+            interface_names = [
+                interface.get('name') or interface.get('.id')
+                for interface in interfaces
+                if interface.get('name') or interface.get('.id')
+            ]
+            
+            # Router'da artık olmayan interface'lerin snapshot'larını bırak
+            for stale_interface in peer_snapshot_store.interfaces():
+                if stale_interface not in interface_names:
+                    peer_snapshot_store.forget(stale_interface)
+            
+            # Peer listeleri çekilmeden önceki değişiklik sayaçları (snapshot tutarlılığı için)
+            generations = [mikrotik_conn.get_peer_generation(name) for name in interface_names]
+            fetched_at = time.monotonic()
+            
+            # Interface'lerin peer listelerini paralel çek (oturum havuzu sayesinde sıraya girmez)
+            peer_results = await asyncio.gather(
+                *(mikrotik_conn.get_wireguard_peers(name, use_cache=False) for name in interface_names),
+                return_exceptions=True
+            )
+            
+            for interface_name, peers, generation in zip(interface_names, peer_results, generations):
                 try:
-                    # Interface'deki tüm peer'ları al
-                    peers = await mikrotik_conn.get_wireguard_peers(interface_name, use_cache=False)
+                    if isinstance(peers, Exception):
+                        raise peers
                     
-                    for peer in peers:
-                        peer_id = peer.get('id') or peer.get('.id')
-                        if not peer_id:
-                            continue
-                        
-                        # Peer bilgilerini al
-                        public_key = peer.get('public-key') or peer.get('public_key')
-                        peer_name = peer.get('comment') or peer.get('name')
-                        last_handshake = peer.get('last-handshake')
-                        
-                        if public_key:
-                            public_key = str(public_key).strip()
-                        
-                        # Peer durumunu track et (Telegram bildirimi dahil)
-                        await track_peer_status(
-                            db=db,
-                            peer_id=str(peer_id),
-                            interface_name=interface_name,
-                            peer_name=peer_name,
-                            public_key=public_key,
-                            last_handshake_value=last_handshake
-                        )
-                        
-                        total_peers_checked += 1
+                    # Snapshot deposunu yenile: durum değişiklikleri toplu yazılır (Telegram bildirimi dahil),
+                    # HTTP endpoint'leri ve WebSocket'ler bu snapshot'ı okur
+                    await peer_snapshot_store.publish(db, interface_name, peers, generation, fetched_at)
+                    total_peers_checked += len(peers)
                 
                 except Exception as e:
                     error_msg = str(e)
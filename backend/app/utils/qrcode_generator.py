@@ -8,6 +8,42 @@ import base64
 from typing import Optional
 
 
+def render_qrcode_png(data: str) -> bytes:
+    """
+    Verilen metni QR kod PNG'si olarak oluşturur
+    Yalnızca metin alıp byte döndüğü için process havuzunda çalıştırılabilir
+    
+    Args:
+        data: QR kodda gösterilecek metin (WireGuard config)
+    
+    Returns:
+        PNG görüntüsünün byte'ları
+    """
+    # QR kod oluşturucu yapılandırması
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    
+    # Veriyi ekle
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    # Görüntü oluştur
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def png_data_uri(png: bytes) -> str:
+    """PNG byte'larını <img> için base64 data URI'ye çevirir"""
+    return f"data:image/png;base64,{base64.b64encode(png).decode()}"
+
+
 def generate_qrcode(data: str) -> Optional[str]:
     """
     Verilen metni QR kod olarak oluşturur ve base64 string olarak döner
@@ -19,29 +55,7 @@ def generate_qrcode(data: str) -> Optional[str]:
         Base64 encoded PNG görüntüsü veya None
     """
     try:
-        # QR kod oluşturucu yapılandırması
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        
-        # Veriyi ekle
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Görüntü oluştur
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Base64'e dönüştür
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        
-        return f"data:image/png;base64,{img_str}"
+        return png_data_uri(render_qrcode_png(data))
     except Exception as e:
         print(f"QR kod oluşturma hatası: {e}")
         return None
-
-
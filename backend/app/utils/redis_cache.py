@@ -1,34 +1,112 @@
 """
 Redis Cache Utility
-Simple cache layer for MikroTik API responses and other frequently accessed data
+Two-tier cache layer for MikroTik API responses and other frequently accessed data
+
+- L1: in-process LRU/TTL cache holding the serialized payload (no network round trip);
+  every read decodes a fresh copy, so callers can't mutate each other's results
+- L2: Redis via the asyncio client with a shared connection pool
+- Writes and invalidations are published on a pub/sub channel so the L1 tiers of
+  other uvicorn workers drop their copies and stay coherent
+- L1 is only used while Redis is connected; without Redis there is no cross-worker
+  invalidation, so caching stays disabled as it was before the L1 tier
 """
-import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
 import logging
-from typing import Optional, Any
+import uuid
+from typing import Optional, Any, Dict, List
 from functools import wraps
 import hashlib
 
+from app.config import settings
+from app.utils.cache import SimpleCache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Pub/sub channel for cross-worker L1 invalidation
+INVALIDATION_CHANNEL = "wg_manager:cache:invalidate"
+
+# Identifies this process so it can ignore its own invalidation messages
+INSTANCE_ID = uuid.uuid4().hex
+
 # Redis client (singleton)
-redis_client = None
+redis_client: Optional[aioredis.Redis] = None
+
+# In-process L1 tier
+l1_cache = SimpleCache(default_ttl=settings.REDIS_L1_TTL, max_size=settings.REDIS_L1_MAX_SIZE)
+
+_listener_task: Optional[asyncio.Task] = None
+
+# Glob characters that the L1 prefix index can't express
+_GLOB_CHARS = ("?", "[")
+
+
+def _dumps(value: Any) -> bytes:
+    """Serialize value for Redis (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+def _loads(data: bytes) -> Any:
+    """Deserialize a value read from Redis"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _l1_enabled() -> bool:
+    """L1 follows the cache state: on only while Redis is connected and REDIS_L1_TTL > 0"""
+    return redis_client is not None and settings.REDIS_L1_TTL > 0
+
+
+def _l1_get(key: str) -> Optional[Any]:
+    """Read a fresh decoded copy from L1"""
+    if not _l1_enabled():
+        return None
+    data = l1_cache.get(key)
+    return _loads(data) if data is not None else None
 
-def init_redis(host: str = "localhost", port: int = 6379, db: int = 0):
-    """Initialize Redis connection"""
-    global redis_client
+
+def _l1_set(key: str, data: bytes, ttl: int = 60):
+    """Store a serialized payload in L1 (entries never outlive the Redis entry)"""
+    if _l1_enabled():
+        l1_cache.set(key, data, ttl=min(ttl, settings.REDIS_L1_TTL))
+
+
+def _l1_invalidate_pattern(pattern: str):
+    """Drop L1 entries matching a Redis glob pattern"""
+    prefix = pattern.rstrip("*")
+    if "*" in prefix or any(char in prefix for char in _GLOB_CHARS):
+        # Not a plain prefix - dropping the whole L1 tier is cheap and always correct
+        l1_cache.clear()
+    else:
+        l1_cache.invalidate_pattern(pattern)
+
+
+async def init_redis(url: Optional[str] = None) -> bool:
+    """Initialize Redis connection pool and start the invalidation listener"""
+    global redis_client, _listener_task
+    url = url or settings.REDIS_URL
     try:
-        redis_client = redis.Redis(
-            host=host,
-            port=port,
-            db=db,
-            decode_responses=True,
+        pool = aioredis.ConnectionPool.from_url(
+            url,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
             socket_timeout=5,
             socket_connect_timeout=5,
         )
+        client = aioredis.Redis(connection_pool=pool)
         # Test connection
-        redis_client.ping()
-        logger.info(f"✅ Redis connected: {host}:{port}/{db}")
+        await client.ping()
+        redis_client = client
+        _listener_task = asyncio.create_task(_invalidation_listener())
+        logger.info(f"✅ Redis connected: {url} (pool: {settings.REDIS_MAX_CONNECTIONS})")
         return True
     except Exception as e:
         logger.warning(f"⚠️ Redis connection failed: {e}. Cache disabled.")
@@ -36,67 +114,203 @@ def init_redis(host: str = "localhost", port: int = 6379, db: int = 0):
         return False
 
 
-def get_cache(key: str) -> Optional[Any]:
-    """Get value from cache"""
+async def close_redis():
+    """Stop the invalidation listener and close the connection pool"""
+    global redis_client, _listener_task
+    if _listener_task:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+    if redis_client:
+        try:
+            await redis_client.aclose()
+        except Exception as e:
+            logger.debug(f"Redis close error: {e}")
+        redis_client = None
+    l1_cache.clear()
+
+
+async def _invalidation_listener():
+    """Apply L1 invalidations published by other workers"""
+    while redis_client is not None:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = _loads(message["data"])
+                except Exception:
+                    continue
+                if payload.get("origin") == INSTANCE_ID:
+                    continue
+                for key in payload.get("keys", ()):
+                    l1_cache.clear(key)
+                if payload.get("pattern"):
+                    _l1_invalidate_pattern(payload["pattern"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Entries written while disconnected may be stale, start clean
+            l1_cache.clear()
+            logger.debug(f"Cache invalidation listener error: {e}")
+            await asyncio.sleep(5)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+def _invalidation_message(keys: Optional[List[str]] = None, pattern: Optional[str] = None) -> bytes:
+    """Build a pub/sub invalidation payload"""
+    payload: Dict[str, Any] = {"origin": INSTANCE_ID}
+    if keys:
+        payload["keys"] = keys
+    if pattern:
+        payload["pattern"] = pattern
+    return _dumps(payload)
+
+
+async def get_cache(key: str) -> Optional[Any]:
+    """Get value from cache (L1 first, then Redis)"""
+    value = _l1_get(key)
+    if value is not None:
+        return value
+
     if not redis_client:
         return None
-    
+
     try:
-        value = redis_client.get(key)
-        if value:
-            return json.loads(value)
+        data = await redis_client.get(key)
+        if data:
+            _l1_set(key, data)
+            return _loads(data)
         return None
     except Exception as e:
         logger.debug(f"Cache get error: {e}")
         return None
 
 
-def set_cache(key: str, value: Any, ttl: int = 60):
+async def get_many(keys: List[str]) -> Dict[str, Any]:
+    """
+    Get several values at once (L1 first, one MGET for the rest)
+
+    Returns:
+        {key: value} for the keys that were found
+    """
+    found: Dict[str, Any] = {}
+    missing: List[str] = []
+    for key in keys:
+        value = _l1_get(key)
+        if value is not None:
+            found[key] = value
+        else:
+            missing.append(key)
+
+    if not missing or not redis_client:
+        return found
+
+    try:
+        for key, data in zip(missing, await redis_client.mget(missing)):
+            if data:
+                found[key] = _loads(data)
+                _l1_set(key, data)
+    except Exception as e:
+        logger.debug(f"Cache mget error: {e}")
+    return found
+
+
+async def set_cache(key: str, value: Any, ttl: int = 60):
     """
     Set value in cache with TTL
-    
+
     Args:
         key: Cache key
-        value: Value to cache (will be JSON serialized)
+        value: Value to cache (will be serialized)
         ttl: Time to live in seconds (default: 60)
     """
     if not redis_client:
         return False
-    
+
     try:
-        serialized = json.dumps(value, default=str)
-        redis_client.setex(key, ttl, serialized)
+        data = _dumps(value)
+        # SETEX + invalidation broadcast in a single round trip
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.setex(key, ttl, data)
+            pipe.publish(INVALIDATION_CHANNEL, _invalidation_message(keys=[key]))
+            await pipe.execute()
+        _l1_set(key, data, ttl)
         return True
     except Exception as e:
         logger.debug(f"Cache set error: {e}")
         return False
 
 
-def delete_cache(key: str):
+async def set_many(values: Dict[str, Any], ttl: int = 60):
+    """Set several values with the same TTL in one pipeline"""
+    if not values:
+        return True
+
+    if not redis_client:
+        return False
+
+    try:
+        serialized = {key: _dumps(value) for key, value in values.items()}
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, data in serialized.items():
+                pipe.setex(key, ttl, data)
+            pipe.publish(INVALIDATION_CHANNEL, _invalidation_message(keys=list(values)))
+            await pipe.execute()
+        for key, data in serialized.items():
+            _l1_set(key, data, ttl)
+        return True
+    except Exception as e:
+        logger.debug(f"Cache mset error: {e}")
+        return False
+
+
+async def delete_cache(key: str):
     """Delete cache key"""
+    l1_cache.clear(key)
+
     if not redis_client:
         return False
-    
+
     try:
-        redis_client.delete(key)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, _invalidation_message(keys=[key]))
+            await pipe.execute()
         return True
     except Exception as e:
         logger.debug(f"Cache delete error: {e}")
         return False
 
 
-def invalidate_pattern(pattern: str):
+async def invalidate_pattern(pattern: str):
     """
     Invalidate all keys matching pattern
     Example: invalidate_pattern("wireguard:*")
     """
+    _l1_invalidate_pattern(pattern)
+
     if not redis_client:
         return False
-    
+
     try:
-        keys = redis_client.keys(pattern)
+        # SCAN instead of KEYS so a large keyspace doesn't block Redis
+        keys = [key async for key in redis_client.scan_iter(match=pattern, count=500)]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            if keys:
+                pipe.unlink(*keys)
+            pipe.publish(INVALIDATION_CHANNEL, _invalidation_message(pattern=pattern))
+            await pipe.execute()
         if keys:
-            redis_client.delete(*keys)
             logger.debug(f"Invalidated {len(keys)} cache keys: {pattern}")
         return True
     except Exception as e:
@@ -121,7 +335,7 @@ def cache_key(*args, **kwargs) -> str:
 def cached(ttl: int = 60, key_prefix: str = ""):
     """
     Decorator for caching function results
-    
+
     Usage:
         @cached(ttl=30, key_prefix="wireguard")
         async def get_interfaces():
@@ -136,41 +350,44 @@ def cached(ttl: int = 60, key_prefix: str = ""):
             args_hash = hashlib.md5(
                 json.dumps([args, kwargs], default=str).encode()
             ).hexdigest()[:8]
-            
+
             key = f"{key_prefix}:{func_name}:{args_hash}" if key_prefix else f"{func_name}:{args_hash}"
-            
+
             # Try cache first
-            cached_value = get_cache(key)
+            cached_value = await get_cache(key)
             if cached_value is not None:
                 logger.debug(f"Cache hit: {key}")
                 return cached_value
-            
+
             # Cache miss - execute function
             logger.debug(f"Cache miss: {key}")
             result = await func(*args, **kwargs)
-            
+
             # Store in cache
-            set_cache(key, result, ttl)
-            
+            await set_cache(key, result, ttl)
+
             return result
-        
+
         return wrapper
     return decorator
 
 
 # Stats
-def get_cache_stats() -> dict:
+async def get_cache_stats() -> dict:
     """Get Redis cache statistics"""
     if not redis_client:
-        return {"enabled": False}
-    
+        return {"enabled": False, "l1": l1_cache.stats()}
+
     try:
-        info = redis_client.info("stats")
-        memory = redis_client.info("memory")
-        
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.info("stats")
+            pipe.info("memory")
+            pipe.dbsize()
+            info, memory, total_keys = await pipe.execute()
+
         return {
             "enabled": True,
-            "total_keys": redis_client.dbsize(),
+            "total_keys": total_keys,
             "used_memory": memory.get("used_memory_human", "N/A"),
             "total_commands": info.get("total_commands_processed", 0),
             "hits": info.get("keyspace_hits", 0),
@@ -179,7 +396,9 @@ def get_cache_stats() -> dict:
                 info.get("keyspace_hits", 0) / max(1, info.get("keyspace_hits", 0) + info.get("keyspace_misses", 0)) * 100,
                 2
             ),
+            "serializer": "orjson" if orjson is not None else "json",
+            "l1": l1_cache.stats(),
         }
     except Exception as e:
         logger.debug(f"Cache stats error: {e}")
-        return {"enabled": False, "error": str(e)}
+        return {"enabled": False, "error": str(e), "l1": l1_cache.stats()}
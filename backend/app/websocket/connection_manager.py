@@ -2,18 +2,132 @@
 WebSocket bağlantı yöneticisi
 Gerçek zamanlı güncellemeler için WebSocket bağlantılarını yönetir
 """
-from typing import Dict, Set
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set
 from fastapi import WebSocket
+from prometheus_client import Counter, Gauge
+import asyncio
 import json
 import logging
 
+from app.config import settings
+
 logger = logging.getLogger(__name__)
 
+# Yavaş istemci politikaları
+# drop_oldest: kuyruk dolunca en eski frame atılır (trafik akışı gibi kayıplı akışlar)
+# disconnect: kuyruk dolunca bağlantı kapatılır, istemci yeniden bağlanıp tam snapshot alır
+#             (peer diff akışı gibi kayıp frame'in durumu bozduğu akışlar)
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DISCONNECT = "disconnect"
+
+# Kapasite aşımında kullanılan close kodu (1013: Try Again Later)
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+ws_dropped_frames = Counter(
+    'websocket_dropped_frames_total', 'WebSocket frames dropped for slow clients', ['policy']
+)
+ws_slow_client_disconnects = Counter(
+    'websocket_slow_client_disconnects_total', 'WebSocket clients disconnected for falling behind'
+)
+ws_frames_sent = Counter('websocket_frames_sent_total', 'WebSocket frames sent')
+
+
+class ClientOutbox:
+    """
+    Tek bir WebSocket bağlantısının gönderim kuyruğu
+    - Frame'ler sınırlı kuyrukta bekler, kendi task'ı sırayla gönderir
+    - Gönderim timeout'a düşerse veya hata verirse bağlantı kapatılır
+    - Kuyruk dolduğunda politikaya göre en eski frame atılır ya da bağlantı kapatılır
+    """
+
+    def __init__(self, websocket: WebSocket, policy: str, max_size: int, send_timeout: float):
+        self.websocket = websocket
+        self.policy = policy
+        self.max_size = max_size
+        self.send_timeout = send_timeout
+        self.closed = False
+        self.dropped = 0
+        self.sent = 0
+        self._queue: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._drain())
+
+    @property
+    def depth(self) -> int:
+        """Kuyrukta bekleyen frame sayısı"""
+        return len(self._queue)
+
+    def put(self, frame: str) -> bool:
+        """
+        Frame'i kuyruğa ekler (beklemez)
+
+        Returns:
+            Bağlantı hala açıksa True
+        """
+        if self.closed:
+            return False
+
+        if len(self._queue) >= self.max_size:
+            if self.policy == POLICY_DISCONNECT:
+                logger.warning(f"WebSocket istemcisi yetişemiyor, bağlantı kapatılıyor (kuyruk: {len(self._queue)})")
+                ws_slow_client_disconnects.inc()
+                self.close(SLOW_CLIENT_CLOSE_CODE)
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+            ws_dropped_frames.labels(policy=self.policy).inc()
+
+        self._queue.append(frame)
+        self._ready.set()
+        return True
+
+    async def _drain(self):
+        """Kuyruktaki frame'leri sırayla gönderir"""
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    frame = self._queue.popleft()
+                    await asyncio.wait_for(self.websocket.send_text(frame), timeout=self.send_timeout)
+                    self.sent += 1
+                    ws_frames_sent.inc()
+                self._ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"WebSocket gönderim hatası, bağlantı kapatılıyor: {e}")
+            self.closed = True
+            self._queue.clear()
+            await self._close_socket(SLOW_CLIENT_CLOSE_CODE)
+
+    async def _close_socket(self, code: int):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    def close(self, code: Optional[int] = None):
+        """
+        Gönderim task'ını durdurur
+        code verilirse WebSocket de kapatılır (endpoint'in receive döngüsü bunu görüp temizlik yapar)
+        """
+        already_closed = self.closed
+        self.closed = True
+        self._queue.clear()
+        self._task.cancel()
+        if code is not None and not already_closed:
+            asyncio.create_task(self._close_socket(code))
+
 
 class ConnectionManager:
-    """WebSocket bağlantılarını yöneten sınıf"""
+    """
+    WebSocket bağlantılarını yöneten sınıf
+    Mesajlar bir kez serialize edilir, her bağlantının sınırlı gönderim kuyruğuna (ClientOutbox)
+    bırakılır ve bağlantılar birbirini beklemeden eşzamanlı gönderilir
+    """
 
-    def __init__(self):
+    def __init__(self, outbox_size: int = 64, send_timeout: float = 5.0):
         # Interface adına göre aktif bağlantılar (WireGuard monitoring için)
         # {"wg0": {websocket1, websocket2, ...}}
         self.active_connections: Dict[str, Set[WebSocket]] = {}
@@ -22,16 +136,76 @@ class ConnectionManager:
         # {user_id: {websocket1, websocket2, ...}}
         self.user_connections: Dict[int, Set[WebSocket]] = {}
 
+        # Bağlantı başına gönderim kuyrukları
+        self.outbox_size = outbox_size
+        self.send_timeout = send_timeout
+        self._outboxes: Dict[WebSocket, ClientOutbox] = {}
+        self._dropped_closed = 0  # Kapanmış kuyrukların attığı frame'ler (istatistik için)
+
+    # ===== Outbox (gönderim kuyruğu) yönetimi =====
+
+    def register(self, websocket: WebSocket, policy: str = POLICY_DROP_OLDEST) -> ClientOutbox:
+        """Bağlantı için gönderim kuyruğu oluşturur (varsa mevcut olanı döner)"""
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            outbox = ClientOutbox(websocket, policy, self.outbox_size, self.send_timeout)
+            self._outboxes[websocket] = outbox
+        return outbox
+
+    def release(self, websocket: WebSocket):
+        """Bağlantının gönderim kuyruğunu durdurur ve kaldırır"""
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox is not None:
+            self._dropped_closed += outbox.dropped
+            outbox.close()
+
+    @staticmethod
+    def serialize(message: dict) -> str:
+        """Mesajı bir kez JSON'a çevirir (send_json ile aynı format)"""
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def send(self, websocket: WebSocket, message: dict) -> bool:
+        """Tek bir bağlantıya mesajı kuyruk üzerinden gönderir (sıralama korunur)"""
+        return self.register(websocket).put(self.serialize(message))
+
+    def fanout(self, websockets: Iterable[WebSocket], message: dict) -> List[WebSocket]:
+        """
+        Mesajı bir kez serialize edip tüm bağlantıların kuyruğuna bırakır (beklemez)
+
+        Returns:
+            Kapanmış (temizlenmesi gereken) bağlantılar
+        """
+        frame = self.serialize(message)
+        disconnected = []
+        for websocket in list(websockets):
+            if not self.register(websocket).put(frame):
+                disconnected.append(websocket)
+        return disconnected
+
+    def stats(self) -> Dict[str, int]:
+        """Gönderim kuyruğu istatistiklerini döner"""
+        outboxes = list(self._outboxes.values())
+        return {
+            "clients": len(outboxes),
+            "queued_frames": sum(outbox.depth for outbox in outboxes),
+            "max_queue_depth": max((outbox.depth for outbox in outboxes), default=0),
+            "queue_capacity": self.outbox_size,
+            "dropped_frames": self._dropped_closed + sum(outbox.dropped for outbox in outboxes),
+            "sent_frames": sum(outbox.sent for outbox in outboxes),
+        }
+
     async def connect(self, websocket: WebSocket, interface_name: str):
-        """Yeni WebSocket bağlantısını kabul et"""
-        await websocket.accept()
+        """Kabul edilmiş (accept) WebSocket bağlantısını interface aboneliğine ekler"""
         if interface_name not in self.active_connections:
             self.active_connections[interface_name] = set()
         self.active_connections[interface_name].add(websocket)
+        # Peer diff'leri sıralı ve eksiksiz olmalı: yetişemeyen istemci yeniden bağlanıp snapshot alır
+        self.register(websocket, POLICY_DISCONNECT)
         logger.info(f"WebSocket bağlantısı açıldı: {interface_name} (Toplam: {len(self.active_connections[interface_name])})")
 
     def disconnect(self, websocket: WebSocket, interface_name: str):
         """WebSocket bağlantısını kapat"""
+        self.release(websocket)
         if interface_name in self.active_connections:
             self.active_connections[interface_name].discard(websocket)
             if len(self.active_connections[interface_name]) == 0:
@@ -43,20 +217,41 @@ class ConnectionManager:
         if interface_name not in self.active_connections:
             return
 
-        # Bağlantı kopmuş WebSocket'leri temizlemek için liste
-        disconnected = []
-
-        for websocket in self.active_connections[interface_name]:
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"WebSocket mesaj gönderme hatası: {e}")
-                disconnected.append(websocket)
-
         # Kopmuş bağlantıları temizle
-        for websocket in disconnected:
+        for websocket in self.fanout(self.active_connections[interface_name], message):
             self.disconnect(websocket, interface_name)
 
+    async def send_peer_snapshot(self, websocket: WebSocket, interface_name: str) -> bool:
+        """
+        Bellekteki peer snapshot'ını tek bir bağlantıya gönderir (router'a gidilmez)
+        Gizli anahtar alanları gönderilmez
+
+        Returns:
+            Snapshot varsa ve gönderildiyse True
+        """
+        # Lazy import (circular import önleme)
+        from app.services.peer_snapshot_store import peer_snapshot_store
+
+        snapshot = peer_snapshot_store.peek(interface_name)
+        if snapshot is None:
+            return False
+
+        # Kuyruk üzerinden gönderilir, sonraki diff'lerden önce ulaşır
+        return self.send(websocket, {
+            "type": "peer_snapshot",
+            "interface": interface_name,
+            "data": peer_snapshot_store.public_view(snapshot.peers)
+        })
+
+    async def broadcast_peer_update(self, interface_name: str, message: dict):
+        """
+        Peer snapshot deposundan gelen snapshot/diff mesajını interface abonelerine iletir
+        Abone yoksa hiçbir şey yapılmaz (monitoring döngüsü tarafından çağrılır)
+        """
+        if not self.active_connections.get(interface_name):
+            return
+        await self.broadcast(interface_name, message)
+
     async def broadcast_all(self, message: dict):
         """Tüm interface'lere mesaj gönder"""
         for interface_name in list(self.active_connections.keys()):
@@ -78,6 +273,7 @@ class ConnectionManager:
         if user_id not in self.user_connections:
             self.user_connections[user_id] = set()
         self.user_connections[user_id].add(websocket)
+        self.register(websocket, POLICY_DROP_OLDEST)
         logger.info(
             f"User {user_id} WebSocket connected "
             f"(Total connections for this user: {len(self.user_connections[user_id])})"
@@ -91,6 +287,7 @@ class ConnectionManager:
             websocket: WebSocket bağlantı nesnesi
             user_id: Kullanıcı ID'si
         """
+        self.release(websocket)
         if user_id in self.user_connections:
             self.user_connections[user_id].discard(websocket)
             # Eğer kullanıcının hiç bağlantısı kalmadıysa, dict'ten sil
@@ -116,25 +313,26 @@ class ConnectionManager:
             logger.debug(f"No active connections for user {user_id}, message not sent")
             return
 
-        # Bağlantı kopmuş WebSocket'leri temizlemek için liste
-        disconnected = []
-        sent_count = 0
-
-        for websocket in self.user_connections[user_id]:
-            try:
-                await websocket.send_json(message)
-                sent_count += 1
-            except Exception as e:
-                logger.error(f"Error sending message to user {user_id}: {e}")
-                disconnected.append(websocket)
+        # Gönderim anındaki bağlantıların kopyası; temizlik canlı kümeyi değiştirse de sayım tutarlı kalır
+        connections = list(self.user_connections[user_id])
+        disconnected = self.fanout(connections, message)
 
         # Kopmuş bağlantıları temizle
         for websocket in disconnected:
             self.disconnect_user(websocket, user_id)
 
-        if sent_count > 0:
-            logger.debug(f"Message sent to user {user_id} ({sent_count} connections)")
+        queued_count = len(connections) - len(disconnected)
+        if queued_count > 0:
+            logger.debug(f"Message queued for user {user_id} ({queued_count} connections)")
 
 
 # Global ConnectionManager instance
-manager = ConnectionManager()
+manager = ConnectionManager(
+    outbox_size=settings.WEBSOCKET_OUTBOX_SIZE,
+    send_timeout=settings.WEBSOCKET_SEND_TIMEOUT
+)
+
+# Anlık toplam kuyruk derinliği (scrape sırasında hesaplanır)
+Gauge('websocket_outbox_queued_frames', 'Frames waiting in WebSocket send queues').set_function(
+    lambda: manager.stats()["queued_frames"]
+)
@@ -0,0 +1,12 @@
+-- Migration 004: Trafik rollup katmanları
+-- Tarih: 2026-10-17
+-- Amaç: Ham trafik örnekleri saatlik/günlük/aylık/yıllık özet tablolarına indirgenir.
+-- peer_traffic_rollups ve traffic_rollups tabloları uygulama başlangıcında (init_db) oluşturulur;
+-- bu dosya mevcut ham tablolar için rollup ve retention sorgularının kullandığı index'leri ekler.
+
+-- Ham örnekler: rollup penceresi ve retention silme işlemi (period_type + timestamp)
+CREATE INDEX IF NOT EXISTS idx_peer_traffic_logs_period_time ON peer_traffic_logs(period_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_traffic_logs_period_time ON traffic_logs(period_type, timestamp);
+
+-- Ham örnekler: tek peer sorguları
+CREATE INDEX IF NOT EXISTS idx_peer_traffic_logs_peer_lookup ON peer_traffic_logs(peer_id, interface_name, period_type, timestamp);
@@ -0,0 +1,10 @@
+-- Migration 007: Aktivite log istatistik index'leri
+-- Tarih: 2026-10-17
+-- Amaç: /activity-logs/stats sayaçları zaman penceresi içinde GROUP BY ile hesaplanır.
+-- Yeni kurulumlarda index'ler init_db ile oluşturulur; bu dosya mevcut veritabanları içindir.
+
+-- Zaman penceresi + kategori dağılımı
+CREATE INDEX IF NOT EXISTS idx_activity_logs_created_category ON activity_logs(created_at, category);
+
+-- Zaman penceresi + aksiyon dağılımı (en sık aksiyonlar)
+CREATE INDEX IF NOT EXISTS idx_activity_logs_created_action ON activity_logs(created_at, action);
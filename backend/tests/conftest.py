@@ -0,0 +1,13 @@
+"""
+Test ortamı
+Uygulama modülleri import edilmeden önce zorunlu ayarlar ortam değişkenleriyle verilir;
+veritabanı her test oturumu için geçici bir SQLite dosyasıdır
+"""
+import os
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-for-pytest-only-0123456789abcdef")
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='wg_manager_test_'), 'test.db')}"
+)
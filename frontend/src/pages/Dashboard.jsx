@@ -1509,7 +1509,7 @@ function Dashboard() {
                         {pool.pool_name}
                       </p>
                       <p className="text-xs text-gray-500 dark:text-gray-400">
-                        {pool.interface_name} - {pool.subnet}
+                        {pool.interface_name} - {pool.subnet}{pool.ip_version === 6 && ' (IPv6)'}
                       </p>
                     </div>
                     <div className="text-right">
@@ -1517,7 +1517,7 @@ function Dashboard() {
                         {pool.usage_percent}%
                       </p>
                       <p className="text-xs text-gray-500 dark:text-gray-400">
-                        {pool.allocated} / {pool.total_ips}
+                        {pool.in_use ?? pool.allocated} / {pool.total_ips.toLocaleString()}
                       </p>
                     </div>
                   </div>
@@ -3,7 +3,7 @@
  * Tüm interface'leri listeler ve yönetim yapar
  * Tüm peer'ları gösterir ve yönetir
  */
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Link, useNavigate } from 'react-router-dom'
 import { 
   getInterfaces, 
@@ -20,6 +20,7 @@ import {
   deleteInterface
 } from '../services/wireguardService'
 import api from '../services/api'
+import peerUpdatesWebSocket from '../services/peerUpdatesWebSocket'
 import {
   getAllPeerMetadata,
   updatePeerGroup,
@@ -55,6 +56,83 @@ import {
   Layers,
 } from 'lucide-react'
 
+/**
+ * MikroTik'ten gelen peer'ı sayfa formatına normalize eder
+ * (HTTP listesi ve WebSocket snapshot/diff mesajları için ortak)
+ */
+const normalizePeer = (peer, interfaceName, interfaceId) => {
+  // Peer ID'yi kontrol et ve varsayılan değer ekle
+  // MikroTik API'den gelen peer verilerinde hem 'id' hem '.id' olabilir
+  // Önce 'id' kontrolü yap (MikroTik API genelde 'id' kullanır)
+  let peerId = peer.id || peer['.id'] || peer['*id'] || peer['*1']
+  
+  // Eğer hala None ise, tüm anahtarları kontrol et
+  if (!peerId) {
+    for (const key in peer) {
+      // 'id' veya '.id' anahtarlarını kontrol et, ama 'endpoint' ile başlayanları atla
+      if ((key === 'id' || key === '.id' || (key.includes('id') && !key.startsWith('endpoint'))) && peer[key]) {
+        peerId = peer[key]
+        if (peerId) break
+      }
+    }
+  }
+  
+  // Hala None ise, geçici bir ID oluştur ama logla
+  if (!peerId) {
+    console.warn('Peer ID bulunamadı, geçici ID oluşturuluyor:', peer)
+    peerId = `peer-${Date.now()}-${Math.random()}`
+  }
+  
+  // MikroTik'ten gelen disabled değerini normalize et
+  // "true"/"false" string, true/false boolean, veya undefined olabilir
+  // MikroTik'te disabled=true ise peer pasif, disabled=false ise peer aktif
+  let disabled = peer.disabled
+  if (disabled === undefined || disabled === null || disabled === '') {
+    disabled = false  // Varsayılan olarak aktif
+  } else if (typeof disabled === 'string') {
+    // String değerleri kontrol et
+    const disabledLower = disabled.toLowerCase().trim()
+    disabled = disabledLower === 'true' || disabledLower === 'yes' || disabledLower === '1'
+  } else if (typeof disabled === 'boolean') {
+    disabled = disabled
+  } else {
+    // Diğer tipler için boolean'a çevir
+    disabled = Boolean(disabled)
+  }
+  
+  // Debug: disabled değerini logla
+  if (peerId && (peerId.includes('*') || peerId.includes('5') || peerId.includes('4'))) {
+    console.log('Peer disabled normalize:', {
+      peerId,
+      originalDisabled: peer.disabled,
+      normalizedDisabled: disabled,
+      type: typeof peer.disabled
+    })
+  }
+  
+  // Peer ID'yi kontrol et - None veya geçersiz ise logla
+  if (!peerId || peerId === 'undefined' || peerId === 'null' || String(peerId) === 'None') {
+    console.warn('Geçersiz peer ID bulundu:', {
+      peer,
+      peerId,
+      interfaceName,
+      allKeys: Object.keys(peer)
+    })
+  }
+  
+  // Peer ID'yi normalize et - hem 'id' hem '.id' hem '*id' kontrolü yap
+  const normalizedPeerId = peer.id || peer['.id'] || peer['*id'] || peerId
+  
+  return {
+    ...peer,
+    '.id': String(normalizedPeerId), // String'e çevir ve emin olmak için tekrar set et
+    'id': String(normalizedPeerId), // id alanını da set et
+    interfaceName: interfaceName,
+    interfaceId: interfaceId,
+    disabled: disabled  // Normalize edilmiş değer
+  }
+}
+
 function WireGuardInterfaces() {
   const navigate = useNavigate()
   const [interfaces, setInterfaces] = useState([])
@@ -129,14 +207,39 @@ function WireGuardInterfaces() {
   const [showPrivateKey, setShowPrivateKey] = useState(false)
   const [showAdvanced, setShowAdvanced] = useState(false)
 
+  // WebSocket ile canlı peer güncellemeleri
+  const [liveUpdates, setLiveUpdates] = useState(false)
+  const interfacesRef = useRef([])
+
   // Verileri yükle
   useEffect(() => {
     loadAllData()
-    // Her 5 saniyede bir yenile
-    const interval = setInterval(loadAllData, 5000)
+  }, [])
+
+  // Peer'lar WebSocket ile geliyorsa yenileme sadece interface/metadata içindir (60 sn),
+  // bağlantı yoksa eski 5 saniyelik polling'e dönülür
+  useEffect(() => {
+    const interval = setInterval(loadAllData, liveUpdates ? 60000 : 5000)
     return () => clearInterval(interval)
+  }, [liveUpdates])
+
+  // Peer snapshot/diff mesajlarını dinle
+  useEffect(() => {
+    const removeListener = peerUpdatesWebSocket.addListener(applyPeerMessage)
+    const removeStateListener = peerUpdatesWebSocket.addStateListener(setLiveUpdates)
+    return () => {
+      removeListener()
+      removeStateListener()
+      peerUpdatesWebSocket.disconnectAll()
+    }
   }, [])
 
+  // Interface listesi değiştikçe abonelikleri güncelle
+  useEffect(() => {
+    interfacesRef.current = interfaces
+    peerUpdatesWebSocket.setInterfaces(interfaces.map(iface => iface.name || iface['.id']))
+  }, [interfaces])
+
   // Modal açıldığında interface otomatik seç ve şablonları yükle
   useEffect(() => {
     if (showAddModal) {
@@ -171,78 +274,7 @@ function WireGuardInterfaces() {
         try {
           const interfaceName = iface.name || iface['.id']
           const peersRes = await getPeers(interfaceName)
-          const peers = (peersRes || []).map(peer => {
-            // Peer ID'yi kontrol et ve varsayılan değer ekle
-            // MikroTik API'den gelen peer verilerinde hem 'id' hem '.id' olabilir
-            // Önce 'id' kontrolü yap (MikroTik API genelde 'id' kullanır)
-            let peerId = peer.id || peer['.id'] || peer['*id'] || peer['*1']
-            
-            // Eğer hala None ise, tüm anahtarları kontrol et
-            if (!peerId) {
-              for (const key in peer) {
-                // 'id' veya '.id' anahtarlarını kontrol et, ama 'endpoint' ile başlayanları atla
-                if ((key === 'id' || key === '.id' || (key.includes('id') && !key.startsWith('endpoint'))) && peer[key]) {
-                  peerId = peer[key]
-                  if (peerId) break
-                }
-              }
-            }
-            
-            // Hala None ise, geçici bir ID oluştur ama logla
-            if (!peerId) {
-              console.warn('Peer ID bulunamadı, geçici ID oluşturuluyor:', peer)
-              peerId = `peer-${Date.now()}-${Math.random()}`
-            }
-            
-            // MikroTik'ten gelen disabled değerini normalize et
-            // "true"/"false" string, true/false boolean, veya undefined olabilir
-            // MikroTik'te disabled=true ise peer pasif, disabled=false ise peer aktif
-            let disabled = peer.disabled
-            if (disabled === undefined || disabled === null || disabled === '') {
-              disabled = false  // Varsayılan olarak aktif
-            } else if (typeof disabled === 'string') {
-              // String değerleri kontrol et
-              const disabledLower = disabled.toLowerCase().trim()
-              disabled = disabledLower === 'true' || disabledLower === 'yes' || disabledLower === '1'
-            } else if (typeof disabled === 'boolean') {
-              disabled = disabled
-            } else {
-              // Diğer tipler için boolean'a çevir
-              disabled = Boolean(disabled)
-            }
-            
-            // Debug: disabled değerini logla
-            if (peerId && (peerId.includes('*') || peerId.includes('5') || peerId.includes('4'))) {
-              console.log('Peer disabled normalize:', {
-                peerId,
-                originalDisabled: peer.disabled,
-                normalizedDisabled: disabled,
-                type: typeof peer.disabled
-              })
-            }
-            
-            // Peer ID'yi kontrol et - None veya geçersiz ise logla
-            if (!peerId || peerId === 'undefined' || peerId === 'null' || String(peerId) === 'None') {
-              console.warn('Geçersiz peer ID bulundu:', {
-                peer,
-                peerId,
-                interfaceName,
-                allKeys: Object.keys(peer)
-              })
-            }
-            
-            // Peer ID'yi normalize et - hem 'id' hem '.id' hem '*id' kontrolü yap
-            const normalizedPeerId = peer.id || peer['.id'] || peer['*id'] || peerId
-            
-            return {
-              ...peer,
-              '.id': String(normalizedPeerId), // String'e çevir ve emin olmak için tekrar set et
-              'id': String(normalizedPeerId), // id alanını da set et
-              interfaceName: interfaceName,
-              interfaceId: iface['.id'],
-              disabled: disabled  // Normalize edilmiş değer
-            }
-          })
+          const peers = (peersRes || []).map(peer => normalizePeer(peer, interfaceName, iface['.id']))
           peersList.push(...peers)
         } catch (error) {
           console.error(`Peer listesi alınamadı: ${iface.name}`, error)
@@ -259,6 +291,45 @@ function WireGuardInterfaces() {
     }
   }
 
+  // WebSocket'ten gelen peer snapshot'ını veya farkını peer listesine uygula
+  const applyPeerMessage = (message) => {
+    const interfaceName = message.interface
+    const iface = interfacesRef.current.find(i => (i.name || i['.id']) === interfaceName)
+    const interfaceId = iface?.['.id']
+
+    setAllPeers(prev => {
+      if (message.type === 'peer_snapshot') {
+        return [
+          ...prev.filter(p => p.interfaceName !== interfaceName),
+          ...(message.data || []).map(peer => normalizePeer(peer, interfaceName, interfaceId))
+        ]
+      }
+
+      const { added = [], removed = [], changed = {}, counters = {} } = message.data || {}
+      const removedIds = new Set(removed)
+      const next = prev
+        .filter(p => !(p.interfaceName === interfaceName && removedIds.has(p.id)))
+        .map(p => {
+          if (p.interfaceName !== interfaceName || !(changed[p.id] || counters[p.id])) return p
+          // Trafik sayaçları ayrı gelir, diğer alan değişiklikleriyle birlikte uygulanır
+          const fields = { ...counters[p.id], ...changed[p.id] }
+          const merged = { ...p, ...fields }
+          // Router'da kaldırılan alanlar null olarak gelir
+          Object.keys(fields).forEach(key => {
+            if (fields[key] === null) delete merged[key]
+          })
+          return normalizePeer(merged, interfaceName, p.interfaceId)
+        })
+
+      const existingIds = new Set(next.filter(p => p.interfaceName === interfaceName).map(p => p.id))
+      added.forEach(peer => {
+        const normalized = normalizePeer(peer, interfaceName, interfaceId)
+        if (!existingIds.has(normalized.id)) next.push(normalized)
+      })
+      return next
+    })
+  }
+
   // Grupları ve peer metadata'larını yükle
   const loadGroupsAndMetadata = async () => {
     try {
@@ -0,0 +1,228 @@
+/**
+ * WireGuard Peer Updates WebSocket Service
+ * Push-based peer updates per interface (/ws/wireguard/{interface})
+ *
+ * Features:
+ * - One socket per subscribed interface, shared by all listeners
+ * - Initial full snapshot ("peer_snapshot"), then diffs ("peer_diff")
+ * - Auto-reconnection with exponential backoff
+ * - Connection state management (callers fall back to polling when disconnected)
+ */
+
+import useAuthStore from '../store/authStore'
+
+const isDev = import.meta.env.DEV
+
+class PeerUpdatesWebSocket {
+  constructor() {
+    // interfaceName -> { ws, reconnectAttempts, reconnectTimer, pingTimer, isManualClose, state }
+    this.connections = new Map()
+    this.maxReconnectAttempts = 10
+    this.reconnectDelay = 1000
+    this.maxReconnectDelay = 30000
+    this.pingInterval = 30000
+    this.listeners = new Set()
+    this.stateListeners = new Set()
+  }
+
+  /**
+   * Get WebSocket URL with JWT token
+   */
+  getWebSocketUrl(interfaceName) {
+    const { accessToken } = useAuthStore.getState()
+    if (!accessToken) {
+      throw new Error('No access token available')
+    }
+
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+    const host = window.location.host
+    return `${protocol}//${host}/api/v1/ws/wireguard/${encodeURIComponent(interfaceName)}?token=${encodeURIComponent(accessToken)}`
+  }
+
+  /**
+   * Subscribe to the given interfaces, closing sockets of interfaces no longer listed
+   * @param {string[]} interfaceNames
+   */
+  setInterfaces(interfaceNames) {
+    const wanted = new Set(interfaceNames)
+    for (const interfaceName of [...this.connections.keys()]) {
+      if (!wanted.has(interfaceName)) {
+        this.disconnect(interfaceName)
+      }
+    }
+    for (const interfaceName of wanted) {
+      if (!this.connections.has(interfaceName)) {
+        this.connections.set(interfaceName, {
+          ws: null,
+          reconnectAttempts: 0,
+          reconnectTimer: null,
+          pingTimer: null,
+          isManualClose: false,
+          state: 'disconnected',
+        })
+        this.connect(interfaceName)
+      }
+    }
+  }
+
+  /**
+   * Connect to the interface socket
+   */
+  connect(interfaceName) {
+    const conn = this.connections.get(interfaceName)
+    if (!conn) return
+    if (conn.ws?.readyState === WebSocket.OPEN || conn.ws?.readyState === WebSocket.CONNECTING) {
+      return
+    }
+
+    try {
+      this.setConnectionState(interfaceName, 'connecting')
+      const ws = new WebSocket(this.getWebSocketUrl(interfaceName))
+      conn.ws = ws
+
+      ws.onopen = () => {
+        if (isDev) console.log(`[Peer WS] Connected: ${interfaceName}`)
+        conn.reconnectAttempts = 0
+        conn.pingTimer = setInterval(() => {
+          if (ws.readyState === WebSocket.OPEN) ws.send('ping')
+        }, this.pingInterval)
+        this.setConnectionState(interfaceName, 'connected')
+      }
+
+      ws.onmessage = (event) => {
+        try {
+          const message = JSON.parse(event.data)
+          if (message.type === 'peer_snapshot' || message.type === 'peer_diff') {
+            this.listeners.forEach(listener => {
+              try {
+                listener(message)
+              } catch (err) {
+                console.error('[Peer WS] Listener error:', err)
+              }
+            })
+          }
+        } catch (err) {
+          console.error('[Peer WS] Parse error:', err)
+        }
+      }
+
+      ws.onerror = (error) => {
+        console.error(`[Peer WS] Error: ${interfaceName}`, error)
+        this.setConnectionState(interfaceName, 'error')
+      }
+
+      ws.onclose = (event) => {
+        clearInterval(conn.pingTimer)
+        conn.pingTimer = null
+        this.setConnectionState(interfaceName, 'disconnected')
+
+        // Don't reconnect if manually closed or auth failed
+        if (conn.isManualClose || event.code === 1008) {
+          return
+        }
+        this.scheduleReconnect(interfaceName)
+      }
+    } catch (error) {
+      console.error(`[Peer WS] Connection error: ${interfaceName}`, error)
+      this.setConnectionState(interfaceName, 'error')
+      this.scheduleReconnect(interfaceName)
+    }
+  }
+
+  /**
+   * Schedule reconnection with exponential backoff
+   */
+  scheduleReconnect(interfaceName) {
+    const conn = this.connections.get(interfaceName)
+    if (!conn || conn.reconnectAttempts >= this.maxReconnectAttempts) {
+      return
+    }
+
+    conn.reconnectAttempts++
+    const delay = Math.min(
+      this.reconnectDelay * Math.pow(2, conn.reconnectAttempts - 1),
+      this.maxReconnectDelay
+    )
+    conn.reconnectTimer = setTimeout(() => this.connect(interfaceName), delay)
+  }
+
+  /**
+   * Close one interface socket
+   */
+  disconnect(interfaceName) {
+    const conn = this.connections.get(interfaceName)
+    if (!conn) return
+
+    conn.isManualClose = true
+    clearTimeout(conn.reconnectTimer)
+    clearInterval(conn.pingTimer)
+    if (conn.ws) {
+      conn.ws.close(1000, 'Manual disconnect')
+    }
+    this.connections.delete(interfaceName)
+    this.notifyStateListeners()
+  }
+
+  /**
+   * Close all sockets
+   */
+  disconnectAll() {
+    for (const interfaceName of [...this.connections.keys()]) {
+      this.disconnect(interfaceName)
+    }
+  }
+
+  /**
+   * Add peer message listener
+   * @param {Function} callback - Called with {type, interface, data} messages
+   * @returns {Function} Unsubscribe function
+   */
+  addListener(callback) {
+    this.listeners.add(callback)
+    return () => this.listeners.delete(callback)
+  }
+
+  /**
+   * Add connection state listener
+   * @param {Function} callback - Called with true when every subscribed interface is connected
+   * @returns {Function} Unsubscribe function
+   */
+  addStateListener(callback) {
+    this.stateListeners.add(callback)
+    return () => this.stateListeners.delete(callback)
+  }
+
+  setConnectionState(interfaceName, state) {
+    const conn = this.connections.get(interfaceName)
+    if (!conn) return
+    conn.state = state
+    this.notifyStateListeners()
+  }
+
+  notifyStateListeners() {
+    const connected = this.isConnected()
+    this.stateListeners.forEach(listener => {
+      try {
+        listener(connected)
+      } catch (err) {
+        console.error('[Peer WS] State listener error:', err)
+      }
+    })
+  }
+
+  /**
+   * True when every subscribed interface has an open socket
+   */
+  isConnected() {
+    if (this.connections.size === 0) return false
+    for (const conn of this.connections.values()) {
+      if (conn.state !== 'connected') return false
+    }
+    return true
+  }
+}
+
+// Singleton instance
+const peerUpdatesWebSocket = new PeerUpdatesWebSocket()
+
+export default peerUpdatesWebSocket
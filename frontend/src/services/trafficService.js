@@ -81,10 +81,10 @@ export const getYearlyTraffic = async (startDate, endDate, limit = 100, offset =
 }
 
 /**
- * Trafik kaydı oluşturur
+ * Ham trafik örneği kaydeder (özet katmanları backend'de rollup ile güncellenir)
  */
-export const recordTraffic = async (periodType) => {
-  const response = await api.post(`/traffic/record?period_type=${periodType}`)
+export const recordTraffic = async () => {
+  const response = await api.post('/traffic/record')
   return response.data
 }
 